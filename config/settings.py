@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "crispy_forms",
     "crispy_bootstrap5",
     "channels",
@@ -241,6 +242,36 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Janela (ms) para agrupar eventos WebSocket enviados a cada navegador (0 desativa)
+WHATSAPP_WS_BATCH_WINDOW_MS = int(os.getenv("WHATSAPP_WS_BATCH_WINDOW_MS", "150"))
+
+# Stream Redis de eventos WhatsApp (replay de eventos perdidos após reconexão)
+WHATSAPP_EVENTS_REDIS_URL = "redis://{}:{}/{}".format(
+    os.getenv("REDIS_HOST", "127.0.0.1"),
+    os.getenv("REDIS_PORT", "6379"),
+    os.getenv("REDIS_DB", "1"),
+)
+# Quantidade aproximada de eventos mantidos no stream
+WHATSAPP_EVENTS_STREAM_MAXLEN = 5000
+# Acima disso o navegador recebe um pedido de ressincronização completa
+WHATSAPP_EVENTS_REPLAY_LIMIT = 300
+
+# Mensagens por página no histórico do chat (paginação por cursor)
+WHATSAPP_MESSAGES_PAGE_SIZE = 50
+
+# Distribuição automática das conversas pendentes entre os atendentes online
+WHATSAPP_AUTO_ASSIGN = os.getenv("WHATSAPP_AUTO_ASSIGN", "off") == "on"
+# "least_loaded" (menos conversas em atendimento) ou "round_robin" (atribuição mais antiga)
+WHATSAPP_ASSIGNMENT_STRATEGY = os.getenv("WHATSAPP_ASSIGNMENT_STRATEGY", "least_loaded")
+# Conversas em atendimento por atendente acima das quais ele não recebe novas
+WHATSAPP_ASSIGNMENT_MAX_ACTIVE = int(os.getenv("WHATSAPP_ASSIGNMENT_MAX_ACTIVE", "10"))
+
+# Minutos que os lugares de uma pré-venda ficam reservados (renovados a cada alteração da venda)
+RESERVA_LUGARES_MINUTOS = int(os.getenv("RESERVA_LUGARES_MINUTOS", "60"))
+
+# Segundos que cada processo reutiliza a cotação do dólar antes de reler o cache
+CAMBIO_MEMORIA_SEGUNDOS = int(os.getenv("CAMBIO_MEMORIA_SEGUNDOS", "60"))
+
 # Logging Configuration
 LOGGING = {
     "version": 1,
@@ -69,3 +69,8 @@ STATUS_PAGAMENTO_CHOICES = [
     ('cancelado', 'Cancelado'),
     ('estornado', 'Estornado'),
 ]
+
+STATUS_DUPLICIDADE_CHOICES = [
+    ('pendente', 'Pendente'),
+    ('descartada', 'Descartada'),
+]
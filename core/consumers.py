@@ -2,19 +2,124 @@
 """
 WebSocket consumers for WhatsApp functionality.
 """
+import asyncio
 import json
 import logging
+from collections import OrderedDict
+from itertools import count
+from urllib.parse import parse_qs
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 
 logger = logging.getLogger(__name__)
 
 
+class EventBatcher:
+    """
+    Agrupa os eventos enviados a um socket em janelas curtas.
+
+    O primeiro evento após um período ocioso é enviado imediatamente e abre
+    uma janela de `window` segundos. Eventos recebidos durante a janela são
+    acumulados e enviados juntos ao final dela em um único frame
+    {'type': 'batch', 'events': [...]}. Atualizações de status da mesma
+    mensagem (e do contador de pendentes) substituem as anteriores ainda não
+    enviadas.
+    """
+
+    def __init__(self, send_frame, window):
+        self._send_frame = send_frame
+        self.window = window
+        self._buffer = OrderedDict()
+        self._sequence = count()
+        self._window_task = None
+
+    async def add(self, event):
+        """Enfileira um evento (dict já no formato enviado ao navegador)"""
+        if self.window <= 0:
+            await self._send_frame(event)
+            return
+
+        if self._window_task is None:
+            # Caminho rápido: socket ocioso, envia sem atraso e abre a janela
+            await self._send_frame(event)
+            self._window_task = asyncio.create_task(self._run_window())
+            return
+
+        key = self._coalesce_key(event)
+        if key is None:
+            key = ('event', next(self._sequence))
+        else:
+            # Descarta a versão anterior ainda não enviada
+            self._buffer.pop(key, None)
+        self._buffer[key] = event
+
+    async def flush(self):
+        """Envia imediatamente os eventos acumulados"""
+        if not self._buffer:
+            return
+        events = list(self._buffer.values())
+        self._buffer.clear()
+        if len(events) == 1:
+            await self._send_frame(events[0])
+        else:
+            await self._send_frame({'type': 'batch', 'events': events})
+
+    def close(self):
+        """Cancela a janela aberta e descarta eventos pendentes"""
+        if self._window_task is not None:
+            self._window_task.cancel()
+            self._window_task = None
+        self._buffer.clear()
+
+    async def _run_window(self):
+        try:
+            # Mantém a janela aberta enquanto chegarem eventos
+            while True:
+                await asyncio.sleep(self.window)
+                if not self._buffer:
+                    break
+                await self.flush()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Erro ao enviar lote de eventos WebSocket: {e}")
+        finally:
+            self._window_task = None
+
+    @staticmethod
+    def _coalesce_key(event):
+        if event.get('type') == 'message_status_update':
+            message_id = (event.get('message_status') or {}).get('message_id')
+            if message_id is not None:
+                return ('message_status', message_id)
+        elif event.get('type') == 'pending_count_update':
+            return ('pending_count',)
+        return None
+
+
 class WhatsAppComercialConsumer(AsyncWebsocketConsumer):
     """
     Consumer para atualizações em tempo real da área comercial do WhatsApp
+
+    Ao reconectar, o navegador informa o último evento recebido em
+    ?last_event_id=... e o consumer reenvia os eventos perdidos a partir do
+    stream de eventos (ou pede uma ressincronização completa).
     """
     
+    # Handlers que podem ser reexecutados a partir do stream de eventos
+    REPLAYABLE_EVENTS = {
+        'conversation_new',
+        'conversation_assigned',
+        'conversation_updated',
+        'message_received',
+        'pending_count_update',
+        'message_status_update',
+    }
+    
+    _replay_buffer = None
+    
     async def connect(self):
         """Conecta o WebSocket"""
         try:
@@ -40,83 +145,176 @@ class WhatsAppComercialConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             
+            # Grupo próprio do atendente (conversas atribuídas a ele)
+            from core.services.whatsapp_events import user_group
+            self.user_group_name = user_group(self.scope['user'].id)
+            await self.channel_layer.group_add(
+                self.user_group_name,
+                self.channel_name
+            )
+            await self.mark_online()
+            
+            # Agrupa eventos enviados ao navegador em janelas curtas
+            self.batcher = EventBatcher(
+                self.send_event,
+                getattr(settings, 'WHATSAPP_WS_BATCH_WINDOW_MS', 150) / 1000,
+            )
+            
             # Aceita a conexão
             await self.accept()
             logger.info(f"✅ WebSocket conectado com sucesso para usuário {self.scope['user'].username}")
             
+            # Reconexão: reenvia os eventos perdidos enquanto o socket estava fechado
+            query = parse_qs(self.scope.get('query_string', b'').decode())
+            last_event_id = query.get('last_event_id', [''])[0]
+            if last_event_id:
+                await self.replay_missed_events(last_event_id)
+            
+            # Distribui as conversas pendentes para o atendente que acabou de conectar
+            if getattr(settings, 'WHATSAPP_AUTO_ASSIGN', False):
+                await self.distribute_pending()
+            
         except Exception as e:
             logger.error(f"❌ Erro ao conectar WebSocket: {e}")
             await self.close(code=4000)
     
     async def disconnect(self, close_code):
         """Desconecta o WebSocket"""
+        if hasattr(self, 'batcher'):
+            self.batcher.close()
         if hasattr(self, 'room_group_name'):
             # Remove da room group
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
+        if hasattr(self, 'user_group_name'):
+            await self.channel_layer.group_discard(
+                self.user_group_name,
+                self.channel_name
+            )
+            await self.mark_offline()
         logger.info(f"WebSocket desconectado para usuário {self.scope['user'].username}")
     
     async def receive(self, text_data):
         """Recebe mensagens do WebSocket (não usado neste caso)"""
         pass
     
+    async def send_event(self, payload):
+        """Serializa e envia um frame ao navegador"""
+        await self.send(text_data=json.dumps(payload))
+    
+    async def queue_event(self, event, payload):
+        """Envia um evento passando pelo agrupador do socket"""
+        if event.get('event_id'):
+            payload['event_id'] = event['event_id']
+        if self._replay_buffer is not None:
+            self._replay_buffer.append(payload)
+        elif hasattr(self, 'batcher'):
+            await self.batcher.add(payload)
+        else:
+            await self.send_event(payload)
+    
+    async def replay_missed_events(self, last_event_id):
+        """Reenvia em um único frame os eventos posteriores a last_event_id"""
+        from core.services.whatsapp_events import read_events_after
+        
+        events = await sync_to_async(read_events_after)(last_event_id)
+        if events is None:
+            # Lacuna grande demais (ou stream indisponível): recarregar tudo
+            await self.send_event({'type': 'resync'})
+            return
+        
+        self._replay_buffer = []
+        try:
+            for event in events:
+                if event.get('type') in self.REPLAYABLE_EVENTS:
+                    await getattr(self, event['type'])(event)
+        finally:
+            payloads, self._replay_buffer = self._replay_buffer, None
+        
+        if payloads:
+            await self.send_event({'type': 'batch', 'replay': True, 'events': payloads})
+        logger.info(f"WebSocket: {len(payloads)} eventos reenviados após reconexão")
+    
     # Handlers para diferentes tipos de eventos
     async def conversation_new(self, event):
         """Nova conversa aguardando atendimento"""
-        # Busca o contador atualizado de conversas pendentes
-        pending_count = await self.get_pending_count()
+        # Usa o contador enviado no evento; se ausente, lê o contador em cache
+        pending_count = event.get('pending_count')
+        if pending_count is None:
+            pending_count = await self.get_pending_count()
         
-        await self.send(text_data=json.dumps({
+        await self.queue_event(event, {
             'type': 'conversation_new',
             'conversation': event['conversation'],
             'pending_count': pending_count
-        }))
+        })
     
     async def conversation_assigned(self, event):
         """Conversa foi atribuída a um atendente"""
-        await self.send(text_data=json.dumps({
+        payload = {
             'type': 'conversation_assigned', 
             'conversation': event['conversation']
-        }))
+        }
+        if event.get('assigned_to_me'):
+            # Enviado apenas ao grupo do atendente que recebeu a conversa
+            payload['assigned_to_me'] = True
+        await self.queue_event(event, payload)
     
     async def conversation_updated(self, event):
         """Conversa foi atualizada (nova mensagem, status, etc.)"""
-        await self.send(text_data=json.dumps({
+        await self.queue_event(event, {
             'type': 'conversation_updated',
             'conversation': event['conversation']
-        }))
+        })
     
     async def message_received(self, event):
         """Nova mensagem recebida em uma conversa"""
-        await self.send(text_data=json.dumps({
+        await self.queue_event(event, {
             'type': 'message_received',
             'message': event['message'],
             'conversation_id': event['conversation_id']
-        }))
+        })
     
     async def pending_count_update(self, event):
         """Atualiza contador de conversas pendentes"""
-        await self.send(text_data=json.dumps({
+        await self.queue_event(event, {
             'type': 'pending_count_update',
             'count': event['count']
-        }))
+        })
     
     @database_sync_to_async
     def is_comercial_user(self):
         """Verifica se o usuário pertence ao grupo Comercial"""
-        return self.scope["user"].groups.filter(name='Comercial').exists()
+        from core.services.auth_profile import user_in_group
+        return user_in_group(self.scope["user"], 'Comercial')
+    
+    @database_sync_to_async
+    def mark_online(self):
+        """Registra o atendente como disponível para a atribuição automática"""
+        from core.services.whatsapp_assignment import mark_online
+        mark_online(self.scope["user"].id)
+    
+    @database_sync_to_async
+    def mark_offline(self):
+        from core.services.whatsapp_assignment import mark_offline
+        mark_offline(self.scope["user"].id)
+    
+    @database_sync_to_async
+    def distribute_pending(self):
+        from core.services.whatsapp_assignment import distribute_pending
+        distribute_pending(user_ids=[self.scope["user"].id])
     
     @database_sync_to_async
     def get_pending_count(self):
         """Retorna o número de conversas pendentes"""
-        from core.models import WhatsAppConversation
-        return WhatsAppConversation.objects.filter(status='pending').count()
+        from core.services.whatsapp_counters import get_pending_count
+        return get_pending_count()
     
     async def message_status_update(self, event):
         """Atualização de status de mensagem (delivered, read)"""
-        await self.send(text_data=json.dumps({
+        await self.queue_event(event, {
             'type': 'message_status_update',
             'message_status': event['message_status']
-        }))
\ No newline at end of file
+        })
\ No newline at end of file
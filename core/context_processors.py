@@ -5,6 +5,8 @@ Context processors para disponibilizar dados globalmente nos templates
 from datetime import date
 from django.utils.text import slugify
 from core.models import Cambio
+from core.services import cambio
+from core.services.auth_profile import get_profile
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,23 +16,30 @@ def cambio_do_dia(request):
     """
     Context processor que disponibiliza o câmbio do dia em todos os templates
 
+    Mostra a última cotação conhecida (memória/cache/banco) - nunca busca na
+    AwesomeAPI durante o request; a busca é feita pelo comando atualizar_cambio.
+
     Uso nos templates:
     {{ cambio_hoje.valor }} - Valor da cotação
     {{ cambio_hoje.data }} - Data da cotação
     {{ cambio_hoje }} - String formatada
     """
     try:
-        cambio = Cambio.obter_cambio(date.today())
-        return {
-            "cambio_hoje": cambio,
-            "dolar_hoje": cambio.valor if cambio else None,
-        }
+        atual = cambio.ultima_cotacao()
     except Exception as e:
         logger.error(f"Erro ao obter câmbio no context processor: {e}")
+        atual = None
+
+    if atual is None:
         return {
             "cambio_hoje": None,
             "dolar_hoje": None,
         }
+    data, valor = atual
+    return {
+        "cambio_hoje": Cambio(data=data, valor=valor),
+        "dolar_hoje": valor,
+    }
 
 
 def dados_globais(request):
@@ -41,25 +50,25 @@ def dados_globais(request):
     # Detecta a área atual baseada nos grupos do usuário e URL
     area = None
     tipos_empresa_usuario = []
+    grupos_usuario = []
     
-    if request.user.is_authenticated:
-        try:
-            for group in request.user.groups.all():
-                group_slug = slugify(group.name)
-                if f"/{group_slug}/" in request.path:
-                    area = group_slug
-                    break
-            
-            # Obtém os tipos de empresa do usuário
-            if hasattr(request.user, 'empresas'):
-                tipos_set = set(
-                    request.user.empresas.filter(empresa_gruporom=True)
-                    .values_list('tipo_empresa', flat=True)
-                )
-                tipos_empresa_usuario = list(tipos_set)
-        except Exception:
-            # Se há erro de transação, retorna valores padrão
-            pass
+    # Grupos e tipos de empresa vêm do perfil de acesso em cache
+    profile = None
+    try:
+        profile = get_profile(request.user)
+    except Exception:
+        # Se há erro de transação, retorna valores padrão
+        pass
+
+    if profile is not None:
+        grupos_usuario = list(profile.groups)
+        for group_name in grupos_usuario:
+            group_slug = slugify(group_name)
+            if f"/{group_slug}/" in request.path:
+                area = group_slug
+                break
+
+        tipos_empresa_usuario = list(profile.tipos_empresa)
 
     return {
         "sistema_nome": "Grupo ROM",
@@ -67,4 +76,5 @@ def dados_globais(request):
         "data_atual": date.today(),
         "area": area,
         "tipos_empresa_usuario": tipos_empresa_usuario,
+        "grupos_usuario": grupos_usuario,
     }
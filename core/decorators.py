@@ -3,6 +3,7 @@ from functools import wraps
 from django.contrib.auth.decorators import user_passes_test
 from django.utils.text import slugify
 from django.core.exceptions import PermissionDenied
+from core.services.auth_profile import user_in_group
 
 
 def group_area_required(view_func):
@@ -34,7 +35,7 @@ def group_area_required(view_func):
             raise PermissionDenied(f"Área '{area_slug}' não reconhecida")
         
         # Verifica se o usuário tem o grupo
-        if not request.user.groups.filter(name=group_name).exists():
+        if not user_in_group(request.user, group_name):
             raise PermissionDenied(f"Usuário não tem acesso à área '{group_name}'")
         
         # Adiciona a área ao request para uso nas views
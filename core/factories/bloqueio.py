@@ -1,6 +1,5 @@
 import factory
 from core.models import Bloqueio
-from core.choices import MOEDA_CHOICES
 from .caravana import CaravanaFactory
 from .pais import PaisFactory
 from .incluso import InclusoFactory
@@ -17,8 +16,9 @@ class BloqueioFactory(factory.django.DjangoModelFactory):
     saida = factory.Faker('date_between', start_date='+1m', end_date='+1y')
     valor = factory.Faker('pydecimal', left_digits=6, right_digits=2, positive=True)
     taxas = factory.Faker('pydecimal', left_digits=4, right_digits=2, positive=True)
-    moeda_valor = factory.Faker('random_element', elements=[choice[0] for choice in MOEDA_CHOICES])
-    moeda_taxas = factory.Faker('random_element', elements=[choice[0] for choice in MOEDA_CHOICES])
+    # Real por padrão: valores em dólar exigem cotação (Cambio) no banco
+    moeda_valor = 'Real'
+    moeda_taxas = 'Real'
     terrestre = factory.Faker('boolean', chance_of_getting_true=30)
     ativo = factory.Faker('boolean', chance_of_getting_true=80)
     
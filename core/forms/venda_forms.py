@@ -279,10 +279,46 @@ class FiltrarVendasForm(forms.Form):
         
         if data_inicio and data_fim and data_inicio > data_fim:
             raise ValidationError("Data início deve ser anterior à data fim.")
-        
+
         return cleaned_data
 
 
+class ExportarVendasForm(FiltrarVendasForm):
+    """
+    Form para exportar vendas, passageiros ou pagamentos de um período
+    """
+    RELATORIO_CHOICES = [
+        ('vendas', 'Vendas'),
+        ('passageiros', 'Passageiros'),
+        ('pagamentos', 'Pagamentos'),
+    ]
+
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ]
+
+    busca = None
+
+    relatorio = forms.ChoiceField(
+        choices=RELATORIO_CHOICES,
+        initial='vendas',
+        label="Relatório",
+        widget=forms.Select(attrs={
+            'class': 'form-select'
+        })
+    )
+
+    formato = forms.ChoiceField(
+        choices=FORMATO_CHOICES,
+        initial='csv',
+        label="Formato",
+        widget=forms.Select(attrs={
+            'class': 'form-select'
+        })
+    )
+
+
 class CriarClienteRapidoForm(forms.ModelForm):
     """
     Form para criar cliente rapidamente durante uma venda
@@ -979,3 +979,65 @@ class SendDocumentForm(forms.Form):
                 raise forms.ValidationError("Arquivo não é um PDF válido.")
         
         return document
+
+
+class MessageExportForm(forms.Form):
+    """
+    Filtros da exportação de mensagens de uma conta (por período e contato)
+    """
+
+    FORMATO_CHOICES = [
+        ("csv", "CSV (planilha)"),
+        ("jsonl", "JSONL (uma mensagem por linha)"),
+    ]
+
+    account = forms.ModelChoiceField(
+        queryset=WhatsAppAccount.objects.all(),
+        widget=forms.HiddenInput(),
+    )
+
+    inicio = forms.DateField(
+        required=False,
+        label="De",
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}),
+    )
+
+    fim = forms.DateField(
+        required=False,
+        label="Até",
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}),
+    )
+
+    telefone = forms.CharField(
+        required=False,
+        max_length=20,
+        label="Telefone do contato (opcional)",
+        widget=forms.TextInput(
+            attrs={"class": "form-control", "placeholder": "+5511999999999"}
+        ),
+    )
+
+    formato = forms.ChoiceField(
+        choices=FORMATO_CHOICES,
+        initial="csv",
+        label="Formato",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        inicio = cleaned_data.get("inicio")
+        fim = cleaned_data.get("fim")
+        if inicio and fim and inicio > fim:
+            raise ValidationError("A data inicial deve ser anterior à data final.")
+
+        telefone = cleaned_data.get("telefone")
+        account = cleaned_data.get("account")
+        cleaned_data["contact"] = None
+        if telefone and account:
+            numero = "+" + re.sub(r"\D", "", telefone)
+            contact = account.contacts.filter(phone_number=numero).first()
+            if not contact:
+                raise ValidationError({"telefone": "Contato não encontrado nesta conta."})
+            cleaned_data["contact"] = contact
+        return cleaned_data
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+from core.services import whatsapp_archive
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move as mensagens de conversas WhatsApp resolvidas/encerradas há mais de N meses '
+        'para o arquivo comprimido (WhatsAppMessageArchive)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=12,
+            help='Arquiva conversas sem atividade há mais de N meses (padrão: 12)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Quantidade máxima de conversas arquivadas nesta execução'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra quantas conversas seriam arquivadas'
+        )
+        parser.add_argument(
+            '--reindex',
+            action='store_true',
+            help='Reconstrói os índices da tabela de mensagens ao final (REINDEX CONCURRENTLY)'
+        )
+        parser.add_argument(
+            '--restore',
+            type=int,
+            action='append',
+            help='ID da conversa cujas mensagens voltam do arquivo (pode ser repetido)'
+        )
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            for conversation_id in options['restore']:
+                total = whatsapp_archive.restore_conversation(conversation_id)
+                self.stdout.write(f"Conversa {conversation_id}: {total} mensagem(ns) restaurada(s)")
+            return
+
+        if options['months'] < 1:
+            raise CommandError('--months deve ser maior que zero')
+
+        queryset = whatsapp_archive.archivable_conversations(options['months']).order_by('last_activity')
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count()} conversa(s) seriam arquivadas")
+            return
+
+        before = whatsapp_archive.message_table_sizes()
+        result = whatsapp_archive.archive_conversations(queryset)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result.messages} mensagem(ns) de {result.conversations} conversa(s) "
+            f"arquivada(s) em {result.segments} registro(s) mensal(is)"
+        ))
+
+        if options['reindex'] and result.messages:
+            whatsapp_archive.reindex_message_table()
+
+        after = whatsapp_archive.message_table_sizes()
+        for label, key in (('Tabela', 'table'), ('Índices', 'indexes')):
+            self.stdout.write(
+                f"{label} de mensagens: {filesizeformat(before[key])} → {filesizeformat(after[key])}"
+            )
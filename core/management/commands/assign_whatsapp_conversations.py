@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from core.services import whatsapp_assignment
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Distribui as conversas WhatsApp pendentes entre os atendentes do Comercial online'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Quantidade máxima de conversas atribuídas nesta execução'
+        )
+        parser.add_argument(
+            '--strategy',
+            choices=whatsapp_assignment.STRATEGIES,
+            help='least_loaded ou round_robin (padrão: WHATSAPP_ASSIGNMENT_STRATEGY)'
+        )
+
+    def handle(self, *args, **options):
+        if options['limit'] is not None and options['limit'] < 1:
+            raise CommandError('--limit deve ser maior que zero')
+
+        assigned = whatsapp_assignment.distribute_pending(
+            limit=options['limit'], strategy=options['strategy']
+        )
+
+        for conversation in assigned:
+            self.stdout.write(f"Conversa {conversation.id} → {conversation.assigned_to.username}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(assigned)} conversa(s) atribuída(s)"))
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from core.services import cambio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Busca a cotação do dólar na AwesomeAPI e publica no cache (rodar periodicamente via cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data',
+            type=date.fromisoformat,
+            help='Data da cotação (AAAA-MM-DD, padrão: hoje)'
+        )
+
+    def handle(self, *args, **options):
+        atual = cambio.atualizar(options['data'])
+        if atual is None:
+            ultima = cambio.ultima_cotacao()
+            mantida = f"mantida a de {ultima[0]:%d/%m/%Y}" if ultima else "nenhuma cotação no banco"
+            raise CommandError(f"Câmbio não atualizado ({mantida})")
+
+        data, valor = atual
+        self.stdout.write(self.style.SUCCESS(f"✅ Câmbio de {data:%d/%m/%Y}: R$ {valor}"))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import random
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import Usuario, WhatsAppAccount, WhatsAppContact, WhatsAppConversation
+from core.services import whatsapp_assignment, whatsapp_counters
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula atendentes disputando a fila de conversas WhatsApp ao mesmo tempo '
+        '(SELECT ... FOR UPDATE SKIP LOCKED) e mede a vazão das atribuições. '
+        'Os dados são criados em uma conta temporária e removidos ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conversations',
+            type=int,
+            default=500,
+            help='Conversas pendentes criadas para a simulação (padrão: 500)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='Threads disputando a fila ao mesmo tempo (padrão: 16)'
+        )
+
+    def handle(self, *args, **options):
+        total, workers = options['conversations'], options['workers']
+        if total < 1 or workers < 1:
+            raise CommandError('--conversations e --workers devem ser maiores que zero')
+
+        users = list(Usuario.objects.filter(is_active=True, groups__name='Comercial')[:workers])
+        users = users or list(Usuario.objects.filter(is_active=True)[:workers])
+        if not users:
+            raise CommandError('Nenhum usuário ativo para simular os atendentes')
+
+        suffix = uuid.uuid4().hex[:12]
+        account = WhatsAppAccount.objects.create(
+            name=f'Benchmark atribuição {suffix}',
+            phone_number='+5500000000000',
+            phone_number_id=f'benchmark-{suffix}',
+            business_account_id=f'benchmark-{suffix}',
+            access_token='benchmark',
+            responsavel=users[0],
+            is_active=False,
+        )
+        try:
+            self.create_queue(account, total)
+            result = whatsapp_assignment.simulate_concurrent_claims(users, workers)
+            pending = account.conversations.filter(status='pending').count()
+        finally:
+            account.delete()
+            whatsapp_counters.reconcile_status_counts()
+
+        self.stdout.write(
+            f"{result.claims} atribuição(ões) em {result.elapsed:.2f}s "
+            f"({result.per_second:.0f}/s) com {workers} thread(s) e {len(users)} atendente(s)"
+        )
+        if result.duplicates or pending or result.claims != total:
+            raise CommandError(
+                f'Falha: {result.duplicates} conversa(s) atribuída(s) em dobro, {pending} ainda pendente(s)'
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Nenhuma conversa atribuída em dobro'))
+
+    def create_queue(self, account, total):
+        contacts = WhatsAppContact.objects.bulk_create([
+            WhatsAppContact(account=account, phone_number=f'+5500{index:09d}', name=f'Benchmark {index}')
+            for index in range(total)
+        ])
+        now = timezone.now()
+        # bulk_create não passa pelo save() - contadores reconciliados ao final
+        WhatsAppConversation.objects.bulk_create([
+            WhatsAppConversation(
+                account=account,
+                contact=contact,
+                status='pending',
+                priority=random.choice(whatsapp_assignment.PRIORITY_ORDER),
+                first_message_at=now - timedelta(seconds=random.randint(0, 86400)),
+            )
+            for contact in contacts
+        ], batch_size=1000)
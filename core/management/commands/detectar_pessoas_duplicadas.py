@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from core.services import pessoa_duplicadas
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Atualiza a fila de revisão de pessoas duplicadas (documento, email, telefone e nome)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limiar',
+            type=float,
+            default=pessoa_duplicadas.LIMIAR,
+            help=f'Pontuação mínima de 0 a 1 para o par entrar na fila (padrão: {pessoa_duplicadas.LIMIAR})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=pessoa_duplicadas.BATCH_SIZE,
+            help=f'Linhas lidas e pares gravados por vez (padrão: {pessoa_duplicadas.BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        resultado = pessoa_duplicadas.detectar(limiar=options['limiar'], batch_size=options['batch_size'])
+
+        self.stdout.write(
+            f"{resultado.pessoas} pessoa(s), {resultado.comparacoes} comparação(ões)"
+        )
+        if resultado.blocos_ignorados:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {resultado.blocos_ignorados} bloco(s) com mais de {pessoa_duplicadas.MAX_BLOCO} pessoas ignorado(s)"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"✅ {resultado.pares} par(es) na fila de revisão"))
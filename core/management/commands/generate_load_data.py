@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.services import load_data
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos em volume de produção para testes de carga '
+        '(pessoas, contatos, conversas e mensagens WhatsApp, caravanas, bloqueios, '
+        'vendas e pagamentos) com bulk_create/COPY. A mesma seed gera os mesmos dados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            choices=sorted(load_data.PRESETS),
+            default='small',
+            help='Tamanho pré-definido (padrão: small)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Semente dos dados gerados (padrão: 1)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Período do histórico em dias (padrão: 365)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Linhas por lote (padrão: 5000)'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Grava as mensagens com bulk_create em vez de COPY'
+        )
+        parser.add_argument(
+            '--skip-rollups',
+            action='store_true',
+            help='Não reconstrói resumos, volume, métricas e contadores ao final'
+        )
+        for name in load_data.SIZE_FIELDS:
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                help=f'Substitui o total de {name} do tamanho escolhido'
+            )
+
+    def handle(self, *args, **options):
+        try:
+            size = load_data.resolve_size(
+                options['size'], **{name: options[name] for name in load_data.SIZE_FIELDS}
+            )
+            generator = load_data.LoadDataGenerator(
+                size,
+                seed=options['seed'],
+                days=options['days'],
+                batch_size=options['batch_size'],
+                use_copy=not options['no_copy'],
+                rollups=not options['skip_rollups'],
+                log=lambda message: self.stdout.write(f'  {message}'),
+            )
+            began = time.perf_counter()
+            result = generator.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - began
+        total = sum(result.counts.values())
+        for name, count in result.counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} registro(s) gerado(s) em {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f}/s)'
+        ))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from core.services import estoque_lugares
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Libera os lugares das reservas de pré-vendas vencidas (rodar periodicamente via cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconciliar',
+            action='store_true',
+            help='Também recalcula os contadores de todas as caravanas a partir das reservas'
+        )
+
+    def handle(self, *args, **options):
+        lugares = estoque_lugares.liberar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"✅ {lugares} lugar(es) de reservas vencidas liberado(s)"))
+
+        if options['reconciliar']:
+            total = estoque_lugares.reconciliar()
+            self.stdout.write(self.style.SUCCESS(f"✅ Estoque de {total} caravana(s) reconciliado"))
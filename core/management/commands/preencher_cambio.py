@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.services import cambio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Grava as cotações do dólar que faltam num período (uma requisição à AwesomeAPI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inicio',
+            type=date.fromisoformat,
+            help='Primeiro dia (AAAA-MM-DD, padrão: --dias antes do fim)'
+        )
+        parser.add_argument(
+            '--fim',
+            type=date.fromisoformat,
+            help='Último dia (AAAA-MM-DD, padrão: hoje)'
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Tamanho do período quando --inicio não é informado (padrão: 30)'
+        )
+
+    def handle(self, *args, **options):
+        fim = options['fim'] or timezone.localdate()
+        inicio = options['inicio'] or fim - timedelta(days=options['dias'])
+        if inicio > fim:
+            raise CommandError("A data de início deve ser anterior à data de fim")
+
+        total = cambio.preencher_historico(inicio, fim)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} cotação(ões) gravada(s) entre {inicio:%d/%m/%Y} e {fim:%d/%m/%Y}"
+        ))
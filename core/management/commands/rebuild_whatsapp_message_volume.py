@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.services.whatsapp_volume import rebuild_volume
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recontabiliza o volume de mensagens WhatsApp por hora (painel e lista de contas) a partir das mensagens'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            help='Recontabiliza apenas as últimas N horas (padrão: todo o histórico)'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['hours'] is not None:
+            if options['hours'] < 1:
+                raise CommandError('--hours deve ser maior que zero')
+            since = timezone.now() - timedelta(hours=options['hours'])
+
+        total = rebuild_volume(since)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Volume de {total} mensagem(ns) recontabilizado"))
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from core.services.whatsapp_analytics import rebuild_response_stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói os tempos de atendimento das conversas WhatsApp (primeira resposta, '
+        'respostas e resolução) e os agregados diários a partir das mensagens'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Conversas por lote (padrão: 500)'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_response_stats(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Tempos de atendimento de {total} conversa(s) reconstruídos"))
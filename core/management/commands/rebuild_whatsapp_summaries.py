@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from core.models import WhatsAppConversation
+from core.services.whatsapp_summary import rebuild_summaries
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo das conversas WhatsApp (total, não lidas e última mensagem) a partir das mensagens'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conversation',
+            type=int,
+            action='append',
+            help='ID da conversa a reconstruir (pode ser repetido; padrão: todas)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Conversas por lote na atualização das prévias (padrão: 500)'
+        )
+
+    def handle(self, *args, **options):
+        queryset = WhatsAppConversation.objects.all()
+        if options['conversation']:
+            queryset = queryset.filter(pk__in=options['conversation'])
+
+        total = rebuild_summaries(queryset, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Resumo de {total} conversa(s) reconstruído"))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from core.models import VendaBloqueio
+from django.db.models import Max, Min
+from django.utils import timezone
+from core.services import venda_resumo
+from core.services.venda_totais import recalcular_totais
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os totais das vendas de bloqueio (passageiros, extras, pagos e pendentes) em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Vendas atualizadas por UPDATE (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--venda',
+            action='append',
+            dest='codigos',
+            help='Recalcula apenas a venda com este código (pode repetir)'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size deve ser maior que zero')
+
+        queryset = VendaBloqueio.objects.all()
+        if options['codigos']:
+            queryset = queryset.filter(codigo__in=options['codigos'])
+
+        total = recalcular_totais(queryset, batch_size=options['batch_size'])
+
+        # Os UPDATEs em massa não passam pelo resumo diário: reconstrói os dias das vendas
+        periodo = queryset.aggregate(inicio=Min('data_venda'), fim=Max('data_venda'))
+        if periodo['inicio']:
+            venda_resumo.reconciliar(timezone.localdate(periodo['inicio']), timezone.localdate(periodo['fim']))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Totais de {total} venda(s) recalculados"))
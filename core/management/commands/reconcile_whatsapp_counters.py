@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from core.services.whatsapp_counters import reconcile_status_counts, STATUSES
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os contadores de conversas WhatsApp por status (para uso em cron/scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-accounts',
+            action='store_true',
+            help='Exibe os totais de cada conta além do total global'
+        )
+
+    def handle(self, *args, **options):
+        totals = reconcile_status_counts()
+
+        global_totals = totals[None]
+        resumo = ', '.join(f"{status}={global_totals[status]}" for status in STATUSES)
+        logger.info(f"Contadores WhatsApp reconciliados: {resumo}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Contadores reconciliados: {resumo}"))
+
+        if options['verbose_accounts']:
+            for account_id, counts in totals.items():
+                if account_id is None:
+                    continue
+                linha = ', '.join(f"{status}={counts[status]}" for status in STATUSES)
+                self.stdout.write(f"  Conta {account_id}: {linha}")
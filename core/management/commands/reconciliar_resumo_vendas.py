@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.services import venda_resumo
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo diário das vendas a partir das vendas (rodar toda noite via cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=7,
+            help='Quantidade de dias, até hoje, a reconstruir (padrão: 7; 0 = todo o histórico)'
+        )
+
+    def handle(self, *args, **options):
+        dias = options['dias']
+        inicio = timezone.localdate() - timedelta(days=dias - 1) if dias > 0 else None
+        total = venda_resumo.reconciliar(inicio=inicio)
+        periodo = f"desde {inicio:%d/%m/%Y}" if inicio else "de todo o histórico"
+        self.stdout.write(self.style.SUCCESS(f"✅ Resumo diário {periodo} reconstruído ({total} venda(s))"))
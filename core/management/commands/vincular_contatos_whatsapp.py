@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from core.services import pessoa_telefones
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Vincula às pessoas os contatos WhatsApp sem pessoa, pelo telefone (índice E.164)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Refaz antes o índice de telefones de todas as pessoas (após bulk_create/update())'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=pessoa_telefones.BATCH_SIZE,
+            help=f'Contatos por lote (padrão: {pessoa_telefones.BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['reconstruir']:
+            total = pessoa_telefones.reconstruir(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"✅ {total} telefone(s) no índice"))
+
+        total = pessoa_telefones.vincular_contatos(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} contato(s) vinculado(s)"))
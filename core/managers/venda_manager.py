@@ -1,11 +1,25 @@
 # -*- coding: utf-8 -*-
 from django.db import models
-from django.db.models import Count, Sum, F, Q, Case, When, Value
+from django.db.models import Count, Sum, F, Q, Case, When, Value, OuterRef, Subquery
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from decimal import Decimal
 
 
+def _contagem(model_label):
+    """Subconsulta correlacionada com a quantidade de linhas ligadas à venda"""
+    from django.apps import apps
+    model = apps.get_model(model_label)
+    return Coalesce(
+        Subquery(
+            model.objects.filter(venda=OuterRef('pk')).order_by()
+            .values('venda').annotate(total=Count('pk')).values('total'),
+            output_field=models.IntegerField()
+        ),
+        Value(0)
+    )
+
+
 class VendaBloqueioManager(models.Manager):
     """
     Manager customizado para VendaBloqueio com queries otimizadas
@@ -31,16 +45,15 @@ class VendaBloqueioManager(models.Manager):
         Adiciona cálculos agregados diretamente na query
         Mais eficiente que usar properties para listagens
         """
+        from core.services.venda_totais import soma_pagamentos
+
         return self.com_dados_completos().annotate(
-            # Contadores
-            total_passageiros_count=Count('passageiros'),
-            total_pagamentos_count=Count('pagamentos'),
+            # Contadores (subconsultas correlacionadas - sem multiplicar linhas nos JOINs)
+            total_passageiros_count=_contagem('core.Passageiro'),
+            total_pagamentos_count=_contagem('core.Pagamento'),
             
             # Valores calculados
-            total_pago_calculado=Coalesce(
-                Sum('pagamentos__valor', filter=Q(pagamentos__status='confirmado')),
-                Value(Decimal('0'))
-            ),
+            total_pago_calculado=soma_pagamentos(),
             total_pendente_calculado=F('valor_total') - F('total_pago_calculado'),
             
             # Status derivado baseado em pagamentos
@@ -63,12 +76,16 @@ class VendaBloqueioManager(models.Manager):
         return self.filter(status=status)
     
     def do_mes_atual(self):
-        """Vendas do mês atual"""
-        hoje = timezone.now()
-        return self.filter(
-            data_venda__year=hoje.year,
-            data_venda__month=hoje.month
-        )
+        """Vendas do mês atual (faixa de data_venda - usa o índice)"""
+        from datetime import datetime, time
+        from core.services.venda_resumo import inicio_do_mes
+        inicio = timezone.make_aware(datetime.combine(inicio_do_mes(), time.min))
+        return self.filter(data_venda__gte=inicio)
+    
+    def resumo_do_mes(self, vendedor=None):
+        """Totais do mês atual lidos do resumo diário"""
+        from core.services import venda_resumo
+        return venda_resumo.totais_do_mes(vendedor)
     
     def do_vendedor(self, vendedor):
         """Vendas de um vendedor específico"""
@@ -80,22 +97,24 @@ class VendaBloqueioManager(models.Manager):
             total_pendente_calculado__gt=0
         )
     
-    def dashboard_resumo(self):
+    def dashboard_resumo(self, vendedor=None, inicio=None, fim=None):
         """
         Dados resumidos para dashboard
-        Query otimizada para estatísticas gerais
+        Lidos do resumo diário (VendaResumoDiario) - sem agregar as vendas
         """
-        return self.aggregate(
-            total_vendas=Count('id'),
-            total_valor=Sum('valor_total'),
-            total_pago=Sum('pagamentos__valor', filter=Q(pagamentos__status='confirmado')),
-            total_pendente=Sum('valor_total') - Coalesce(Sum('pagamentos__valor', filter=Q(pagamentos__status='confirmado')), 0),
+        from core.services import venda_resumo
+        totais = venda_resumo.totais(vendedor, inicio, fim)
+        return {
+            'total_vendas': totais['total_vendas'],
+            'total_valor': totais['total_valor'],
+            'total_pago': totais['total_pago'],
+            'total_pendente': totais['total_pendente'],
             
             # Por status
-            vendas_rascunho=Count('id', filter=Q(status='rascunho')),
-            vendas_confirmadas=Count('id', filter=Q(status='confirmada')),
-            vendas_canceladas=Count('id', filter=Q(status='cancelada')),
-        )
+            'vendas_rascunho': totais['por_status'].get('rascunho', 0),
+            'vendas_confirmadas': totais['por_status'].get('confirmada', 0),
+            'vendas_canceladas': totais['por_status'].get('cancelada', 0),
+        }
     
     def por_periodo(self, data_inicio, data_fim):
         """Vendas em um período específico"""
@@ -122,10 +141,19 @@ class VendaBloqueioManager(models.Manager):
     def para_relatorio_vendas(self):
         """
         Query específica para relatórios de vendas
-        Inclui todos os dados necessários de uma vez
+        Relacionamentos no JOIN e contagens/somas em subconsultas (sem
+        prefetch) - pode ser percorrida com .iterator() em streaming
         """
-        return self.com_totais_calculados().select_related(
+        from core.services.venda_totais import soma_pagamentos
+
+        return self.select_related(
+            'cliente',
+            'vendedor',
             'bloqueio__caravana',
+        ).annotate(
+            total_passageiros_count=_contagem('core.Passageiro'),
+            total_pagamentos_count=_contagem('core.Pagamento'),
+            total_pago_calculado=soma_pagamentos(),
         ).order_by('-data_venda')
     
     def vencendo_hoje(self):
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Paginação por cursor (keyset) das mensagens WhatsApp
+
+O cursor de uma mensagem é o par (timestamp, id), codificado como
+"<microssegundos desde 1970>_<id>". Páginas são obtidas com
+WHERE (timestamp, id) < cursor ORDER BY timestamp DESC, id DESC LIMIT n,
+usando o índice (conversation, -timestamp) - o custo não cresce com o
+tamanho do histórico, ao contrário de OFFSET ou de renderizar tudo.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(timestamp: datetime, pk: int) -> str:
+    """Codifica (timestamp, id) em uma string segura para URL"""
+    micros = (timestamp - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}_{pk}"
+
+
+def decode_cursor(value: Optional[str]) -> Optional[Cursor]:
+    """Decodifica o cursor (None se ausente ou inválido)"""
+    if not value:
+        return None
+    try:
+        micros, pk = value.split("_", 1)
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, OverflowError):
+        return None
+
+
+def default_page_size() -> int:
+    return getattr(settings, "WHATSAPP_MESSAGES_PAGE_SIZE", 50)
+
+
+@dataclass
+class MessagePage:
+    """Página de mensagens em ordem cronológica"""
+
+    messages: List = field(default_factory=list)
+    has_older: bool = False
+    has_newer: bool = False
+
+    @property
+    def older_cursor(self) -> Optional[str]:
+        """Cursor para buscar mensagens anteriores à página"""
+        return self.messages[0].cursor if self.messages else None
+
+    @property
+    def newest_cursor(self) -> Optional[str]:
+        """Cursor da mensagem mais recente da página"""
+        return self.messages[-1].cursor if self.messages else None
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class WhatsAppMessageQuerySet(models.QuerySet):
+    """
+    QuerySet de mensagens com paginação por cursor
+
+    Uso:
+        conversation.messages.latest_page()              # últimas mensagens
+        conversation.messages.latest_page(before=cursor) # carregar anteriores
+        conversation.messages.newer_than(cursor)         # novas mensagens
+
+        # Histórico completo, incluindo mensagens arquivadas
+        conversation.messages.including_archived(conversation).latest_page()
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._archived_conversation = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._archived_conversation = self._archived_conversation
+        return clone
+
+    def including_archived(self, conversation):
+        """
+        Completa as páginas de latest_page() com as mensagens arquivadas da conversa
+
+        As mensagens arquivadas são sempre anteriores às da tabela, então só
+        entram quando o histórico da tabela acaba.
+        """
+        clone = self._chain()
+        clone._archived_conversation = conversation
+        return clone
+
+    def before_cursor(self, cursor: Cursor):
+        timestamp, pk = cursor
+        return self.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    def after_cursor(self, cursor: Cursor):
+        timestamp, pk = cursor
+        return self.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+
+    def latest_page(self, before: Optional[Cursor] = None, limit: Optional[int] = None) -> MessagePage:
+        """
+        Retorna as `limit` mensagens mais recentes (anteriores a `before`, se informado)
+        """
+        limit = limit or default_page_size()
+        queryset = self.before_cursor(before) if before else self
+        rows = list(queryset.order_by("-timestamp", "-id")[: limit + 1])
+        has_older = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+
+        conversation = self._archived_conversation
+        if not has_older and conversation is not None and conversation.archived_message_count:
+            from core.services import whatsapp_archive
+
+            older_than = (rows[0].timestamp, rows[0].pk) if rows else before
+            archived, has_older = whatsapp_archive.archived_page(
+                conversation, before=older_than, limit=limit - len(rows)
+            )
+            rows = archived + rows
+        return MessagePage(messages=rows, has_older=has_older)
+
+    def newer_than(self, after: Cursor, limit: Optional[int] = None) -> MessagePage:
+        """
+        Retorna até `limit` mensagens posteriores a `after`
+
+        has_newer=True indica que havia mais mensagens do que o limite - o
+        cliente deve recarregar a página mais recente em vez de anexar.
+        """
+        limit = limit or default_page_size()
+        rows = list(self.after_cursor(after).order_by("timestamp", "id")[: limit + 1])
+        has_newer = len(rows) > limit
+        return MessagePage(messages=rows[:limit], has_newer=has_newer)
+
+
+class WhatsAppMessageManager(models.Manager.from_queryset(WhatsAppMessageQuerySet)):
+    """
+    Manager padrão das mensagens
+
+    O vetor de busca (search_vector) só é usado em filtros do banco - fica
+    fora dos SELECTs para não trafegar junto com cada mensagem.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer("search_vector")
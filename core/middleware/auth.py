@@ -10,25 +10,29 @@ class LoginRequiredMiddleware(MiddlewareMixin):
     mas permite exceções para URLs específicas como webhooks e APIs públicas.
     """
     
-    def process_view(self, request, view_func, view_args, view_kwargs):
-        # URLs que não precisam de autenticação
-        exempt_urls = [
-            r'^/admin/',
-            r'^/login/',
-            r'^/logout/',
-            r'^/webhook/',
-        ]
+    # URLs que não precisam de autenticação
+    DEFAULT_EXEMPT_URLS = [
+        r'^/admin/',
+        r'^/login/',
+        r'^/logout/',
+        r'^/webhook/',
+    ]
+    
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        exempt_urls = list(self.DEFAULT_EXEMPT_URLS)
         
         # Verifica se existe configuração de URLs isentas adicional
         if hasattr(settings, 'LOGIN_EXEMPT_URLS'):
             exempt_urls.extend(settings.LOGIN_EXEMPT_URLS)
         
-        path = request.path_info
-        
-        # Testa cada padrão de URL isenta
-        for exempt_url in exempt_urls:
-            if re.match(exempt_url, path):
-                return None
+        # Compila uma única vez: um só match por request
+        self.exempt_pattern = re.compile('|'.join(f'(?:{url})' for url in exempt_urls))
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Testa os padrões de URL isenta
+        if self.exempt_pattern.match(request.path_info):
+            return None
         
         # Verifica se o usuário está autenticado
         if not request.user.is_authenticated:
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_allow_null_cliente_venda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='whatsappmessage',
+            index=models.Index(fields=['conversation', '-timestamp'], name='core_whatsa_convers_1abd12_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_whatsappmessage_conversation_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='last_inbound_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Última mensagem recebida em'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Última mensagem em'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='last_message_direction',
+            field=models.CharField(blank=True, choices=[('inbound', 'Recebida'), ('outbound', 'Enviada')], max_length=10, verbose_name='Direção da última mensagem'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Prévia da última mensagem'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Total de mensagens'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='unread_inbound_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Mensagens não lidas'),
+        ),
+    ]
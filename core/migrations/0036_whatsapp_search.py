@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:01
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+# Índices de trigramas dos contatos. Ficam só na migração (não no Meta do
+# model) porque dependem da extensão pg_trgm - o banco de testes é criado sem
+# migrações. As expressões seguem o SQL gerado pelo Django: icontains usa
+# UPPER(campo::text) e contains usa campo::text.
+TRIGRAM_INDEXES = [
+    ('whatsapp_contact_name_trgm', 'UPPER("name"::text)'),
+    ('whatsapp_contact_profile_trgm', 'UPPER("profile_name"::text)'),
+    ('whatsapp_contact_phone_trgm', '("phone_number"::text)'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_whatsappconversation_summary'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddField(
+            model_name='whatsappmessage',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('content', config='portuguese'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='whatsappmessage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='whatsapp_message_search_gin'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX "{name}" ON "core_whatsappcontact" USING gin (({expression}) gin_trgm_ops)',
+            reverse_sql=f'DROP INDEX IF EXISTS "{name}"',
+        )
+        for name, expression in TRIGRAM_INDEXES
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_whatsapp_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='archived_message_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Mensagens arquivadas'),
+        ),
+        migrations.CreateModel(
+            name='WhatsAppMessageArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mês')),
+                ('message_count', models.PositiveIntegerField(default=0, verbose_name='Total de mensagens')),
+                ('first_timestamp', models.DateTimeField(verbose_name='Primeira mensagem em')),
+                ('last_timestamp', models.DateTimeField(verbose_name='Última mensagem em')),
+                ('payload', models.BinaryField(verbose_name='Mensagens (JSON comprimido)')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_archives', to='core.whatsappconversation', verbose_name='Conversa')),
+            ],
+            options={
+                'verbose_name': 'Arquivo de Mensagens WhatsApp',
+                'verbose_name_plural': 'Arquivos de Mensagens WhatsApp',
+                'ordering': ['conversation', '-month'],
+                'unique_together': {('conversation', 'month')},
+            },
+        ),
+    ]
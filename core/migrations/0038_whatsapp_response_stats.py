@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_whatsapp_message_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='awaiting_reply_since',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Aguardando resposta desde'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Primeira resposta em'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='first_response_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Tempo da primeira resposta (s)'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Respostas'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='reply_seconds_total',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Tempo total de resposta (s)'),
+        ),
+        migrations.AddField(
+            model_name='whatsappconversation',
+            name='resolution_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Tempo de resolução (s)'),
+        ),
+        migrations.CreateModel(
+            name='WhatsAppResponseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('first_response_count', models.PositiveIntegerField(default=0, verbose_name='Primeiras respostas')),
+                ('first_response_seconds', models.PositiveBigIntegerField(default=0, verbose_name='Tempo total das primeiras respostas (s)')),
+                ('reply_count', models.PositiveIntegerField(default=0, verbose_name='Respostas')),
+                ('reply_seconds', models.PositiveBigIntegerField(default=0, verbose_name='Tempo total de resposta (s)')),
+                ('resolved_count', models.PositiveIntegerField(default=0, verbose_name='Conversas resolvidas')),
+                ('resolution_seconds', models.PositiveBigIntegerField(default=0, verbose_name='Tempo total de resolução (s)')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='response_stats', to='core.whatsappaccount', verbose_name='Conta WhatsApp')),
+                ('attendant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='whatsapp_response_stats', to=settings.AUTH_USER_MODEL, verbose_name='Atendente')),
+            ],
+            options={
+                'verbose_name': 'Tempos de Atendimento WhatsApp',
+                'verbose_name_plural': 'Tempos de Atendimento WhatsApp',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'account', 'attendant'), name='whatsapp_response_stats_unique_day', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_whatsapp_response_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppMessageVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Hora')),
+                ('direction', models.CharField(choices=[('inbound', 'Recebida'), ('outbound', 'Enviada')], max_length=10, verbose_name='Direção')),
+                ('message_type', models.CharField(choices=[('text', 'Texto'), ('image', 'Imagem'), ('document', 'Documento'), ('audio', 'Áudio'), ('video', 'Vídeo'), ('sticker', 'Figurinha'), ('location', 'Localização'), ('contacts', 'Contatos'), ('template', 'Template'), ('interactive', 'Interativo'), ('system', 'Sistema')], max_length=20, verbose_name='Tipo')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviada'), ('delivered', 'Entregue'), ('read', 'Lida'), ('failed', 'Falhou')], max_length=20, verbose_name='Status')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Mensagens')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_volume', to='core.whatsappaccount', verbose_name='Conta WhatsApp')),
+            ],
+            options={
+                'verbose_name': 'Volume de Mensagens WhatsApp',
+                'verbose_name_plural': 'Volume de Mensagens WhatsApp',
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour'], name='whatsapp_volume_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('account', 'hour', 'direction', 'message_type', 'status'), name='whatsapp_message_volume_unique_hour')],
+            },
+        ),
+    ]
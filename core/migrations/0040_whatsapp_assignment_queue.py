@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_whatsapp_message_volume'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='whatsappconversation',
+            index=models.Index(fields=['status', 'priority', 'first_message_at'], name='core_whatsa_status_84afc6_idx'),
+        ),
+    ]
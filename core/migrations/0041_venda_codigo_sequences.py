@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:41
+
+from django.db import migrations
+
+
+# Uma sequence por ano com vendas, continuando do maior código existente
+# (core/services/venda_codigo.py cria as dos anos seguintes sob demanda)
+CREATE_SEQUENCES = r"""
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT substring(codigo FROM 3 FOR 4) AS ano,
+               max(substring(codigo FROM 7)::bigint) AS ultimo
+        FROM core_vendabloqueio
+        WHERE codigo ~ '^VB[0-9]{4}[0-9]+$'
+        GROUP BY 1
+    LOOP
+        EXECUTE format('CREATE SEQUENCE IF NOT EXISTS %I', 'core_vendabloqueio_codigo_' || r.ano);
+        PERFORM setval('core_vendabloqueio_codigo_' || r.ano, GREATEST(r.ultimo, 1));
+    END LOOP;
+END
+$$;
+"""
+
+DROP_SEQUENCES = r"""
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN SELECT sequencename FROM pg_sequences WHERE sequencename ~ '^core_vendabloqueio_codigo_[0-9]{4}$'
+    LOOP
+        EXECUTE format('DROP SEQUENCE IF EXISTS %I', r.sequencename);
+    END LOOP;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_whatsapp_assignment_queue'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_SEQUENCES, reverse_sql=DROP_SEQUENCES),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:53
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def preencher_estoque(apps, schema_editor):
+    """
+    Cria as reservas das vendas existentes e os contadores das caravanas
+
+    Vendas confirmadas/concluídas ficam com os lugares vendidos; pré-vendas
+    ganham uma reserva com a validade padrão a partir de agora.
+    """
+    VendaBloqueio = apps.get_model('core', 'VendaBloqueio')
+    ReservaLugar = apps.get_model('core', 'ReservaLugar')
+    EstoqueCaravana = apps.get_model('core', 'EstoqueCaravana')
+
+    expira_em = timezone.now() + timedelta(minutes=getattr(settings, 'RESERVA_LUGARES_MINUTOS', 60))
+    vendas = VendaBloqueio.objects.filter(
+        bloqueio__isnull=False, numero_passageiros__gt=0,
+        status__in=['pre-venda', 'confirmada', 'concluida'],
+    ).values_list('id', 'bloqueio_id', 'bloqueio__caravana_id', 'numero_passageiros', 'status')
+    ReservaLugar.objects.bulk_create([
+        ReservaLugar(
+            venda_id=venda_id, bloqueio_id=bloqueio_id, caravana_id=caravana_id, quantidade=quantidade,
+            status='reservado' if status == 'pre-venda' else 'vendido',
+            expira_em=expira_em if status == 'pre-venda' else None,
+        )
+        for venda_id, bloqueio_id, caravana_id, quantidade, status in vendas.iterator()
+    ], batch_size=1000)
+
+    estoques = {}
+    for row in ReservaLugar.objects.values('caravana_id', 'status').annotate(total=Sum('quantidade')):
+        estoque = estoques.setdefault(row['caravana_id'], EstoqueCaravana(caravana_id=row['caravana_id']))
+        setattr(estoque, 'vendidos' if row['status'] == 'vendido' else 'reservados', row['total'])
+    EstoqueCaravana.objects.bulk_create(estoques.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_venda_codigo_sequences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstoqueCaravana',
+            fields=[
+                ('caravana', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estoque', serialize=False, to='core.caravana', verbose_name='Caravana')),
+                ('vendidos', models.PositiveIntegerField(default=0, verbose_name='Lugares Vendidos')),
+                ('reservados', models.PositiveIntegerField(default=0, verbose_name='Lugares Reservados')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Estoque de Lugares',
+                'verbose_name_plural': 'Estoques de Lugares',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReservaLugar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.PositiveIntegerField(verbose_name='Lugares')),
+                ('status', models.CharField(choices=[('reservado', 'Reservado'), ('vendido', 'Vendido')], default='reservado', max_length=10, verbose_name='Status')),
+                ('expira_em', models.DateTimeField(blank=True, null=True, verbose_name='Expira em')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('bloqueio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas_lugares', to='core.bloqueio', verbose_name='Bloqueio')),
+                ('caravana', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_lugares', to='core.caravana', verbose_name='Caravana')),
+                ('venda', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reserva_lugares', to='core.vendabloqueio', verbose_name='Venda')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Lugares',
+                'verbose_name_plural': 'Reservas de Lugares',
+                'ordering': ['expira_em'],
+                'indexes': [models.Index(condition=models.Q(('status', 'reservado')), fields=['expira_em'], name='reserva_lugar_expira_idx')],
+            },
+        ),
+        migrations.RunPython(preencher_estoque, migrations.RunPython.noop),
+    ]
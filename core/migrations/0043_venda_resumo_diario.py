@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def preencher_resumo(apps, schema_editor):
+    """Monta o resumo diário a partir das vendas existentes"""
+    VendaBloqueio = apps.get_model('core', 'VendaBloqueio')
+    VendaResumoDiario = apps.get_model('core', 'VendaResumoDiario')
+
+    rows = (
+        VendaBloqueio.objects.order_by()
+        .annotate(dia=TruncDate('data_venda'), caravana_id=F('bloqueio__caravana_id'))
+        .values('dia', 'vendedor_id', 'caravana_id', 'status')
+        .annotate(
+            quantidade=Count('id'), passageiros=Sum('numero_passageiros'),
+            soma_total=Sum('valor_total'), soma_pago=Sum('valor_pago'), soma_pendente=Sum('valor_pendente'),
+        )
+    )
+    VendaResumoDiario.objects.bulk_create([
+        VendaResumoDiario(
+            dia=row['dia'], vendedor_id=row['vendedor_id'], caravana_id=row['caravana_id'],
+            status=row['status'], quantidade=row['quantidade'], passageiros=row['passageiros'] or 0,
+            valor_total=row['soma_total'] or 0, valor_pago=row['soma_pago'] or 0,
+            valor_pendente=row['soma_pendente'] or 0,
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_estoque_lugares'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaResumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('status', models.CharField(max_length=30, verbose_name='Status')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Vendas')),
+                ('passageiros', models.IntegerField(default=0, verbose_name='Passageiros')),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor Total')),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor Pago')),
+                ('valor_pendente', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Valor Pendente')),
+                ('caravana', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumos_vendas', to='core.caravana', verbose_name='Caravana')),
+                ('vendedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_vendas', to=settings.AUTH_USER_MODEL, verbose_name='Vendedor')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Vendas',
+                'verbose_name_plural': 'Resumos Diários de Vendas',
+                'ordering': ['-dia'],
+                'indexes': [models.Index(fields=['dia'], name='venda_resumo_dia_idx'), models.Index(fields=['vendedor', 'dia'], name='venda_resumo_vendedor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'vendedor', 'caravana', 'status'), name='venda_resumo_diario_chave', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
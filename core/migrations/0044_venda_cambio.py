@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:09
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import TruncDate
+
+
+def fixar_cambio(apps, schema_editor):
+    """Fixa nas vendas existentes a cotação do dia da venda (ou a anterior mais próxima)"""
+    Cambio = apps.get_model('core', 'Cambio')
+    VendaBloqueio = apps.get_model('core', 'VendaBloqueio')
+
+    cotacao = Cambio.objects.filter(data__lte=TruncDate(OuterRef('data_venda'))).order_by('-data')
+    VendaBloqueio.objects.filter(cambio_data__isnull=True).update(
+        cambio_data=Subquery(cotacao.values('data')[:1]),
+        cambio_valor=Subquery(cotacao.values('valor')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_venda_resumo_diario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendabloqueio',
+            name='cambio_data',
+            field=models.DateField(blank=True, null=True, verbose_name='Data do Câmbio'),
+        ),
+        migrations.AddField(
+            model_name='vendabloqueio',
+            name='cambio_valor',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True, verbose_name='Câmbio (USD/BRL)'),
+        ),
+        migrations.RunPython(fixar_cambio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:25
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+# Índices de trigramas das colunas de busca (contains/startswith viram LIKE
+# em "coluna"::text). Ficam só na migração porque dependem da extensão
+# pg_trgm (criada na 0036) - o banco de testes é criado sem migrações.
+TRIGRAM_INDEXES = [
+    ('pessoa_nome_busca_trgm', 'nome_busca'),
+    ('pessoa_doc_busca_trgm', 'doc_busca'),
+    ('pessoa_telefones_busca_trgm', 'telefones_busca'),
+    ('pessoa_emails_busca_trgm', 'emails_busca'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_venda_cambio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pessoa',
+            name='doc_busca',
+            field=models.GeneratedField(db_persist=True, expression=models.Func(django.db.models.functions.text.Lower('doc'), models.Value('[^0-9a-z]'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE', output_field=models.TextField()), output_field=models.TextField()),
+        ),
+        migrations.AddField(
+            model_name='pessoa',
+            name='emails_busca',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower(models.Func(django.db.models.functions.comparison.Coalesce('email1', models.Value('')), models.Value(' '), django.db.models.functions.comparison.Coalesce('email2', models.Value('')), models.Value(' '), django.db.models.functions.comparison.Coalesce('email3', models.Value('')), arg_joiner=' || ', output_field=models.TextField(), template='(%(expressions)s)')), output_field=models.TextField()),
+        ),
+        migrations.AddField(
+            model_name='pessoa',
+            name='nome_busca',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower(models.Func('nome', models.Value('ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ'), models.Value('AAAAAEEEEIIIIOOOOOUUUUCNaaaaaeeeeiiiiooooouuuucn'), function='TRANSLATE')), output_field=models.TextField()),
+        ),
+        migrations.AddField(
+            model_name='pessoa',
+            name='telefones_busca',
+            field=models.GeneratedField(db_persist=True, expression=models.Func(models.Func(django.db.models.functions.comparison.Coalesce('ddi1', models.Value('')), django.db.models.functions.comparison.Coalesce('ddd1', models.Value('')), django.db.models.functions.comparison.Coalesce('telefone1', models.Value('')), models.Value(' '), django.db.models.functions.comparison.Coalesce('ddi2', models.Value('')), django.db.models.functions.comparison.Coalesce('ddd2', models.Value('')), django.db.models.functions.comparison.Coalesce('telefone2', models.Value('')), models.Value(' '), django.db.models.functions.comparison.Coalesce('ddi3', models.Value('')), django.db.models.functions.comparison.Coalesce('ddd3', models.Value('')), django.db.models.functions.comparison.Coalesce('telefone3', models.Value('')), arg_joiner=' || ', output_field=models.TextField(), template='(%(expressions)s)'), models.Value('[^0-9 ]'), models.Value(''), models.Value('g'), function='REGEXP_REPLACE', output_field=models.TextField()), output_field=models.TextField()),
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX "{name}" ON "core_pessoa" USING gin (("{column}"::text) gin_trgm_ops)',
+            reverse_sql=f'DROP INDEX IF EXISTS "{name}"',
+        )
+        for name, column in TRIGRAM_INDEXES
+    ]
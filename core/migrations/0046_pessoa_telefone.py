@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:28
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Cópia congelada da normalização de core.services.pessoa_telefones: a
+# migração não depende do código atual do serviço
+DDI_PADRAO = '55'
+MIN_DIGITOS = 7
+MAX_DIGITOS = 15
+BATCH_SIZE = 1000
+
+CAMPOS_TELEFONE = (
+    ('ddi1', 'ddd1', 'telefone1'),
+    ('ddi2', 'ddd2', 'telefone2'),
+    ('ddi3', 'ddd3', 'telefone3'),
+)
+
+
+def _digitos(valor):
+    return re.sub(r'\D', '', valor or '')
+
+
+def _e164(ddi, ddd, telefone):
+    telefone = _digitos(telefone)
+    if len(telefone) < MIN_DIGITOS:
+        return None
+    numero = (_digitos(ddi) or DDI_PADRAO) + _digitos(ddd) + telefone
+    if len(numero) > MAX_DIGITOS:
+        return None
+    return f'+{numero}'
+
+
+def _variantes(numero):
+    digitos = _digitos(numero)
+    formas = [f'+{digitos}']
+    if digitos.startswith('55'):
+        local = digitos[4:]
+        if len(local) == 9 and local[0] == '9':
+            formas.append(f'+{digitos[:4]}{local[1:]}')
+        elif len(local) == 8 and local[0] in '6789':
+            formas.append(f'+{digitos[:4]}9{local}')
+    return formas
+
+
+def preencher_telefones(apps, schema_editor):
+    """Monta o índice de telefones e vincula os contatos WhatsApp sem pessoa"""
+    Pessoa = apps.get_model('core', 'Pessoa')
+    PessoaTelefone = apps.get_model('core', 'PessoaTelefone')
+    WhatsAppContact = apps.get_model('core', 'WhatsAppContact')
+
+    campos = [campo for grupo in CAMPOS_TELEFONE for campo in grupo]
+    por_numero = {}
+    lote = []
+    for pessoa in Pessoa.objects.values_list('pk', *campos).iterator(chunk_size=BATCH_SIZE):
+        pessoa_id, valores = pessoa[0], pessoa[1:]
+        encontrados = {_e164(*valores[i:i + 3]) for i in range(0, len(valores), 3)} - {None}
+        for numero in encontrados:
+            lote.append(PessoaTelefone(pessoa_id=pessoa_id, numero=numero))
+            por_numero.setdefault(numero, set()).add(pessoa_id)
+        if len(lote) >= BATCH_SIZE:
+            PessoaTelefone.objects.bulk_create(lote, ignore_conflicts=True)
+            lote = []
+    PessoaTelefone.objects.bulk_create(lote, ignore_conflicts=True)
+
+    vinculos = []
+    contatos = WhatsAppContact.objects.filter(pessoa__isnull=True).values_list('pk', 'phone_number')
+    for pk, phone_number in contatos.iterator(chunk_size=BATCH_SIZE):
+        pessoas = set().union(*(por_numero.get(forma, set()) for forma in _variantes(phone_number)))
+        # Número de mais de uma pessoa não é vinculado automaticamente
+        if len(pessoas) == 1:
+            vinculos.append(WhatsAppContact(pk=pk, pessoa_id=pessoas.pop()))
+    WhatsAppContact.objects.bulk_update(vinculos, ['pessoa'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_pessoa_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PessoaTelefone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(db_index=True, max_length=20, verbose_name='Número (E.164)')),
+                ('pessoa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telefones_e164', to='core.pessoa', verbose_name='Pessoa')),
+            ],
+            options={
+                'verbose_name': 'Telefone da Pessoa',
+                'verbose_name_plural': 'Telefones das Pessoas',
+                'constraints': [models.UniqueConstraint(fields=('pessoa', 'numero'), name='pessoa_telefone_unico')],
+            },
+        ),
+        migrations.RunPython(preencher_telefones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_pessoa_telefone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PessoaDuplicada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pontuacao', models.DecimalField(decimal_places=3, max_digits=4, verbose_name='Pontuação')),
+                ('motivos', models.CharField(max_length=100, verbose_name='Motivos')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('descartada', 'Descartada')], default='pendente', max_length=20, verbose_name='Status')),
+                ('detectado_em', models.DateTimeField(verbose_name='Detectado em')),
+                ('revisado_em', models.DateTimeField(blank=True, null=True, verbose_name='Revisado em')),
+                ('duplicata', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.pessoa', verbose_name='Possível duplicata')),
+                ('pessoa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicidades', to='core.pessoa', verbose_name='Pessoa')),
+                ('revisado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Revisado por')),
+            ],
+            options={
+                'verbose_name': 'Pessoa Duplicada',
+                'verbose_name_plural': 'Pessoas Duplicadas',
+                'ordering': ['-pontuacao', 'pk'],
+                'indexes': [models.Index(fields=['status', '-pontuacao'], name='core_pessoa_status_567fb2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('pessoa', 'duplicata'), name='pessoa_duplicada_unica'), models.CheckConstraint(condition=models.Q(('pessoa__lt', models.F('duplicata'))), name='pessoa_duplicada_ordenada')],
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from .pessoa import Pessoa
+from .pessoa import Pessoa, PessoaDuplicada, PessoaTelefone
 from .usuario import Usuario
 from .fornecedor import Fornecedor
 from .cambio import Cambio
@@ -20,11 +20,14 @@ from .dia_roteiro import DiaRoteiro
 from .extra import Extra
 from .tarefa import Tarefa
 from .nota import Nota
-from .venda import VendaBloqueio, ExtraVenda, Pagamento
-from .whatsapp import WhatsAppAccount, WhatsAppContact, WhatsAppMessage, WhatsAppTemplate, WhatsAppConversation, WhatsAppWebhookQueue
+from .venda import VendaBloqueio, ExtraVenda, Pagamento, VendaResumoDiario
+from .estoque import EstoqueCaravana, ReservaLugar
+from .whatsapp import WhatsAppAccount, WhatsAppContact, WhatsAppMessage, WhatsAppTemplate, WhatsAppConversation, WhatsAppWebhookQueue, WhatsAppMessageArchive, WhatsAppResponseStats, WhatsAppMessageVolume
 
 __all__ = [
     "Pessoa",
+    "PessoaTelefone",
+    "PessoaDuplicada",
     "Usuario",
     "Fornecedor",
     "Cambio",
@@ -49,10 +52,16 @@ __all__ = [
     "VendaBloqueio",
     "ExtraVenda",
     "Pagamento",
+    "VendaResumoDiario",
+    "EstoqueCaravana",
+    "ReservaLugar",
     "WhatsAppAccount",
     "WhatsAppContact",
     "WhatsAppMessage",
     "WhatsAppTemplate",
     "WhatsAppConversation",
     "WhatsAppWebhookQueue",
+    "WhatsAppMessageArchive",
+    "WhatsAppResponseStats",
+    "WhatsAppMessageVolume",
 ]
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 import requests
-from datetime import date, datetime
+from datetime import date, datetime, timezone as dt_timezone
 from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 import logging
 
@@ -95,6 +96,40 @@ class Cambio(models.Model):
             logger.error(f"Erro inesperado ao buscar câmbio: {e}")
             return None
 
+    @staticmethod
+    def buscar_historico_awesomeapi(inicio, fim):
+        """
+        Busca as cotações de um período na AwesomeAPI numa única requisição
+
+        Returns:
+            {data: valor} dos dias úteis do período (vazio em caso de erro)
+        """
+        try:
+            dias = (fim - inicio).days + 1
+            url = (
+                f"https://economia.awesomeapi.com.br/json/daily/USD-BRL/{dias}"
+                f"?start_date={inicio.strftime('%Y%m%d')}&end_date={fim.strftime('%Y%m%d')}"
+            )
+            logger.info(f"Buscando histórico de câmbio na AwesomeAPI: {url}")
+
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+
+            cotacoes = {}
+            # Em ordem de horário: fica a última cotação de cada dia
+            for item in sorted(response.json(), key=lambda item: int(item['timestamp'])):
+                dia = timezone.localtime(datetime.fromtimestamp(int(item['timestamp']), dt_timezone.utc)).date()
+                if inicio <= dia <= fim:
+                    cotacoes[dia] = Decimal(item['bid'])
+            return cotacoes
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erro na requisição à AwesomeAPI: {e}")
+            return {}
+        except (KeyError, ValueError, TypeError) as e:
+            logger.error(f"Erro ao processar dados da AwesomeAPI: {e}")
+            return {}
+
     @classmethod
     def obter_cambio(cls, data_consulta=None):
         """
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from django.db import models
+from .caravana import Caravana
+from .bloqueio import Bloqueio
+
+
+class EstoqueCaravana(models.Model):
+    """
+    Lugares vendidos e reservados de uma caravana
+
+    A capacidade é a quantidade da caravana (compartilhada pelos seus
+    bloqueios). Os contadores são mantidos por core/services/estoque_lugares.py
+    com a linha travada (SELECT ... FOR UPDATE), então duas vendas não
+    ocupam o mesmo lugar; as listagens leem os contadores num único JOIN em
+    vez de contar passageiros.
+    """
+
+    caravana = models.OneToOneField(
+        Caravana,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="estoque",
+        verbose_name="Caravana",
+    )
+
+    vendidos = models.PositiveIntegerField(default=0, verbose_name="Lugares Vendidos")
+
+    reservados = models.PositiveIntegerField(default=0, verbose_name="Lugares Reservados")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    class Meta:
+        verbose_name = "Estoque de Lugares"
+        verbose_name_plural = "Estoques de Lugares"
+
+    def __str__(self):
+        return f"{self.caravana_id}: {self.vendidos} vendidos, {self.reservados} reservados"
+
+
+class ReservaLugar(models.Model):
+    """
+    Lugares ocupados por uma venda de bloqueio
+
+    Pré-vendas seguram os lugares até expira_em (liberados pelo comando
+    liberar_reservas ou na próxima reserva da caravana); vendas confirmadas
+    ficam com status "vendido", sem validade.
+    """
+
+    STATUS_CHOICES = [
+        ("reservado", "Reservado"),
+        ("vendido", "Vendido"),
+    ]
+
+    venda = models.OneToOneField(
+        "VendaBloqueio",
+        on_delete=models.CASCADE,
+        related_name="reserva_lugares",
+        verbose_name="Venda",
+    )
+
+    caravana = models.ForeignKey(
+        Caravana,
+        on_delete=models.CASCADE,
+        related_name="reservas_lugares",
+        verbose_name="Caravana",
+    )
+
+    bloqueio = models.ForeignKey(
+        Bloqueio,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="reservas_lugares",
+        verbose_name="Bloqueio",
+    )
+
+    quantidade = models.PositiveIntegerField(verbose_name="Lugares")
+
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default="reservado", verbose_name="Status"
+    )
+
+    expira_em = models.DateTimeField(null=True, blank=True, verbose_name="Expira em")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+
+    class Meta:
+        verbose_name = "Reserva de Lugares"
+        verbose_name_plural = "Reservas de Lugares"
+        ordering = ["expira_em"]
+        indexes = [
+            models.Index(
+                fields=["expira_em"],
+                name="reserva_lugar_expira_idx",
+                condition=models.Q(status="reservado"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.venda_id}: {self.quantidade} lugar(es) {self.status}"
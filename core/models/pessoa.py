@@ -1,6 +1,37 @@
 from django.db import models
+from django.db.models import Func, Value
+from django.db.models.functions import Coalesce, Lower
 from django.utils.text import slugify
-from core.choices import TIPO_DOC_CHOICES, SEXO_CHOICES, TIPO_EMPRESA_CHOICES
+from core.choices import TIPO_DOC_CHOICES, SEXO_CHOICES, TIPO_EMPRESA_CHOICES, STATUS_DUPLICIDADE_CHOICES
+
+# Letras acentuadas e as correspondentes sem acento (mesma tabela usada em
+# core.services.pessoa_busca.normalizar). TRANSLATE é IMMUTABLE e pode ser
+# usado em coluna gerada - unaccent() não.
+ACENTOS = "ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ"
+SEM_ACENTO = "AAAAAEEEEIIIIOOOOOUUUUCNaaaaaeeeeiiiiooooouuuucn"
+
+
+def _sem_acento(expression):
+    return Lower(Func(expression, Value(ACENTOS), Value(SEM_ACENTO), function="TRANSLATE"))
+
+
+def _so(expression, padrao):
+    """Remove os caracteres que casam com o padrão (regex do PostgreSQL)"""
+    return Func(
+        expression, Value(padrao), Value(""), Value("g"),
+        function="REGEXP_REPLACE",
+        output_field=models.TextField(),
+    )
+
+
+def _juntar(*partes):
+    """Concatena com || (IMMUTABLE, ao contrário de CONCAT); nulo vira texto vazio"""
+    return Func(
+        *[parte if isinstance(parte, Value) else Coalesce(parte, Value("")) for parte in partes],
+        template="(%(expressions)s)",
+        arg_joiner=" || ",
+        output_field=models.TextField(),
+    )
 
 
 class Pessoa(models.Model):
@@ -116,6 +147,36 @@ class Pessoa(models.Model):
     ddd3 = models.CharField(max_length=3, blank=True, null=True, verbose_name="DDD")
     telefone3 = models.CharField(max_length=20, blank=True, null=True, verbose_name="Telefone")
 
+    # Colunas de busca mantidas pelo banco (inclusive em bulk_create/update()),
+    # com índices de trigramas - ver core.services.pessoa_busca
+    nome_busca = models.GeneratedField(
+        expression=_sem_acento("nome"),
+        output_field=models.TextField(),
+        db_persist=True,
+    )
+    doc_busca = models.GeneratedField(
+        expression=_so(Lower("doc"), "[^0-9a-z]"),
+        output_field=models.TextField(),
+        db_persist=True,
+    )
+    telefones_busca = models.GeneratedField(
+        expression=_so(
+            _juntar(
+                "ddi1", "ddd1", "telefone1", Value(" "),
+                "ddi2", "ddd2", "telefone2", Value(" "),
+                "ddi3", "ddd3", "telefone3",
+            ),
+            "[^0-9 ]",
+        ),
+        output_field=models.TextField(),
+        db_persist=True,
+    )
+    emails_busca = models.GeneratedField(
+        expression=Lower(_juntar("email1", Value(" "), "email2", Value(" "), "email3")),
+        output_field=models.TextField(),
+        db_persist=True,
+    )
+
     class Meta:
         ordering = ["nome"]
         verbose_name = "Pessoa"
@@ -192,5 +253,94 @@ class Pessoa(models.Model):
         return self.telefone_formatado
 
     def save(self, *args, **kwargs):
+        from core.services import pessoa_telefones
+
         self.slug = slugify(self.nome)
         super().save(*args, **kwargs)
+        pessoa_telefones.sincronizar(self)
+
+
+class PessoaTelefone(models.Model):
+    """
+    Telefones das pessoas no formato E.164 (+5511987654321)
+
+    Índice para encontrar a pessoa pelo número (ex.: contatos WhatsApp).
+    Mantido por Pessoa.save() - ver core.services.pessoa_telefones.
+    """
+
+    pessoa = models.ForeignKey(
+        Pessoa,
+        on_delete=models.CASCADE,
+        related_name="telefones_e164",
+        verbose_name="Pessoa",
+    )
+    numero = models.CharField(max_length=20, db_index=True, verbose_name="Número (E.164)")
+
+    class Meta:
+        verbose_name = "Telefone da Pessoa"
+        verbose_name_plural = "Telefones das Pessoas"
+        constraints = [
+            models.UniqueConstraint(fields=["pessoa", "numero"], name="pessoa_telefone_unico"),
+        ]
+
+    def __str__(self):
+        return f"{self.numero} ({self.pessoa_id})"
+
+
+class PessoaDuplicada(models.Model):
+    """
+    Par de pessoas que provavelmente são a mesma (fila de revisão)
+
+    Gerado pelo comando detectar_pessoas_duplicadas - ver
+    core.services.pessoa_duplicadas. O par é gravado com pessoa.pk <
+    duplicata.pk; pares descartados não voltam para a fila.
+    """
+
+    pessoa = models.ForeignKey(
+        Pessoa,
+        on_delete=models.CASCADE,
+        related_name="duplicidades",
+        verbose_name="Pessoa",
+    )
+    duplicata = models.ForeignKey(
+        Pessoa,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Possível duplicata",
+    )
+    pontuacao = models.DecimalField(max_digits=4, decimal_places=3, verbose_name="Pontuação")
+    motivos = models.CharField(max_length=100, verbose_name="Motivos")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_DUPLICIDADE_CHOICES,
+        default="pendente",
+        verbose_name="Status",
+    )
+    detectado_em = models.DateTimeField(verbose_name="Detectado em")
+    revisado_por = models.ForeignKey(
+        "Usuario",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="+",
+        verbose_name="Revisado por",
+    )
+    revisado_em = models.DateTimeField(blank=True, null=True, verbose_name="Revisado em")
+
+    class Meta:
+        verbose_name = "Pessoa Duplicada"
+        verbose_name_plural = "Pessoas Duplicadas"
+        ordering = ["-pontuacao", "pk"]
+        constraints = [
+            models.UniqueConstraint(fields=["pessoa", "duplicata"], name="pessoa_duplicada_unica"),
+            models.CheckConstraint(
+                condition=models.Q(pessoa__lt=models.F("duplicata")),
+                name="pessoa_duplicada_ordenada",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "-pontuacao"]),
+        ]
+
+    def __str__(self):
+        return f"{self.pessoa_id} ~ {self.duplicata_id} ({self.pontuacao})"
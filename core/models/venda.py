@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.functional import cached_property
 from decimal import Decimal
@@ -148,6 +148,21 @@ class VendaBloqueio(models.Model):
         verbose_name="Valor Pendente"
     )
     
+    # Cotação do dólar usada nos valores da venda (fixada na criação)
+    cambio_data = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Data do Câmbio"
+    )
+    
+    cambio_valor = models.DecimalField(
+        max_digits=10,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        verbose_name="Câmbio (USD/BRL)"
+    )
+    
     # Informações adicionais
     numero_passageiros = models.PositiveIntegerField(
         default=0,
@@ -197,74 +212,92 @@ class VendaBloqueio(models.Model):
         return f"{self.codigo} - {self.cliente.nome}"
     
     def save(self, *args, **kwargs):
+        """Sobrescreve save para manter os totais e o resumo diário sem recalcular extras e pagamentos"""
+        from core.services import venda_resumo, venda_totais
+
         if not self.codigo:
             self.codigo = self.gerar_codigo()
-        
-        # Recalcular totais antes de salvar
-        self.calcular_totais()
-        
+
+        # Venda travada: o resumo diário recebe a diferença entre antes e depois
+        with venda_totais.travar_venda(self.pk), venda_resumo.acompanhar(self):
+            self._salvar_totais(*args, **kwargs)
+
+    def _salvar_totais(self, *args, **kwargs):
+        from core.services import precificacao, venda_totais
+
+        if self._state.adding:
+            # Venda nova ainda não tem extras nem pagamentos
+            precificacao.fixar_cambio(self)
+            self.valor_passageiros = venda_totais.valor_passageiros(
+                self.bloqueio_id, self.numero_passageiros, self.cambio_valor
+            )
+            self.valor_extras = self.valor_pago = Decimal('0')
+            self.valor_total = self.valor_pendente = venda_totais.valor_base(self._valores_base())
+            self.status = venda_totais.novo_status(self.status, self.valor_total, self.valor_pago)
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            # Totais gravados explicitamente ou campos que não mudam o total
+            if update_fields & set(venda_totais.INCREMENTAL_FIELDS) or not update_fields & set(
+                venda_totais.BASE_FIELDS + venda_totais.PASSAGEIROS_FIELDS
+            ):
+                return super().save(*args, **kwargs)
+
+        anterior = VendaBloqueio.objects.filter(pk=self.pk).values(*venda_totais.BASE_FIELDS).first()
+        if update_fields is None or update_fields & set(venda_totais.PASSAGEIROS_FIELDS):
+            if precificacao.fixar_cambio(self) and update_fields is not None:
+                update_fields |= {'cambio_data', 'cambio_valor'}
+            self.valor_passageiros = venda_totais.valor_passageiros(
+                self.bloqueio_id, self.numero_passageiros, self.cambio_valor
+            )
+
+        # Os totais são atualizados direto no banco - um save() completo de
+        # uma instância carregada antes não pode sobrescrevê-los
+        if update_fields is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in venda_totais.INCREMENTAL_FIELDS
+            ]
+        else:
+            kwargs['update_fields'] = update_fields | {'valor_passageiros'}
         super().save(*args, **kwargs)
+
+        if anterior is not None:
+            delta = venda_totais.valor_base(self._valores_base()) - venda_totais.valor_base(anterior)
+            # Resumo diário já acompanhado pelo save()
+            valores = venda_totais.aplicar_delta(self.pk, base=delta, resumo=False)
+            venda_totais.sincronizar_instancia(self, valores)
+
+    def delete(self, *args, **kwargs):
+        from core.services import estoque_lugares, venda_resumo
+
+        # Devolve os lugares reservados/vendidos antes do CASCADE apagar a reserva
+        with transaction.atomic():
+            estoque_lugares.liberar(self)
+            venda_resumo.registrar(venda_resumo.linha(self.pk), None)
+            return super().delete(*args, **kwargs)
+
+    def _valores_base(self):
+        from core.services.venda_totais import BASE_FIELDS
+        return {name: getattr(self, name) for name in BASE_FIELDS}
     
     def gerar_codigo(self):
-        """Gera código único VB + ano + sequencial"""
-        from django.db.models import Max
-        ano = timezone.now().year
-        prefixo = "VB"
-        
-        ultimo = VendaBloqueio.objects.filter(
-            codigo__startswith=f"{prefixo}{ano}"
-        ).aggregate(Max('codigo'))['codigo__max']
-        
-        if ultimo:
-            try:
-                sequencial = int(ultimo[6:]) + 1
-            except:
-                sequencial = 1
-        else:
-            sequencial = 1
-        
-        return f"{prefixo}{ano}{sequencial:05d}"
+        """Gera código único VB + ano + sequencial (sequence do ano no banco)"""
+        from core.services.venda_codigo import proximo_codigo
+        return proximo_codigo()
     
     def calcular_totais(self):
-        """Recalcula todos os valores da venda"""
-        # Calcula valor dos passageiros (baseado no valor do bloqueio dividido pela quantidade)
-        from .passageiro import Passageiro
-        if self.pk and self.bloqueio and self.bloqueio.caravana:
-            # Valor por passageiro = valor do bloqueio / quantidade de pessoas na caravana
-            quantidade_caravana = self.bloqueio.caravana.quantidade or 1
-            valor_por_passageiro = (self.bloqueio.valor or Decimal('0')) / quantidade_caravana
-            self.valor_passageiros = valor_por_passageiro * self.numero_passageiros
-        else:
-            self.valor_passageiros = Decimal('0')
-        
-        # Calcula valor dos extras
-        self.valor_extras = sum(
-            ev.valor_total for ev in self.extravenda_set.all()
-        ) if self.pk else Decimal('0')
-        
-        # Calcula valor total
-        self.valor_total = (
-            self.valor_passageiros + 
-            self.valor_extras + 
-            self.valor_seguro + 
-            self.valor_taxas - 
-            self.valor_desconto
+        """Recalcula todos os valores da venda a partir do banco (sem salvar)"""
+        from core.services import venda_totais
+
+        venda_totais.sincronizar_instancia(
+            self, venda_totais.totais_do_banco(self.pk, self.bloqueio_id, self.numero_passageiros, self.cambio_valor)
         )
-        
-        # Calcula valor pago e pendente
-        self.valor_pago = sum(
-            p.valor for p in self.pagamentos.filter(status='confirmado')
-        ) if self.pk else Decimal('0')
-        
+        self.valor_total = venda_totais.valor_base(self._valores_base()) + self.valor_extras
         self.valor_pendente = self.valor_total - self.valor_pago
-        
-        # Atualiza status baseado nos pagamentos
-        if self.valor_pendente <= 0 and self.valor_total > 0:
-            if self.status in ['aguardando_pagamento', 'parcialmente_pago']:
-                self.status = 'pago'
-        elif self.valor_pago > 0:
-            if self.status == 'aguardando_pagamento':
-                self.status = 'parcialmente_pago'
+        self.status = venda_totais.novo_status(self.status, self.valor_total, self.valor_pago)
     
     @property
     def pode_editar(self):
@@ -496,13 +529,31 @@ class ExtraVenda(models.Model):
     
     def save(self, *args, **kwargs):
         # Calcular valor total
+        from core.services import venda_totais
+
         self.valor_total = (self.valor_unitario * self.quantidade) - self.valor_desconto
-        super().save(*args, **kwargs)
-        
-        # Atualizar totais da venda
-        if self.venda:
-            self.venda.calcular_totais()
-            self.venda.save(update_fields=['valor_extras', 'valor_total', 'valor_pendente'])
+        adding = self._state.adding
+        with venda_totais.travar_venda(self.venda_id):
+            # Valor anterior lido com a venda travada
+            anterior = None if adding else ExtraVenda.objects.filter(pk=self.pk).values_list('valor_total', flat=True).first()
+            super().save(*args, **kwargs)
+            valores = venda_totais.aplicar_delta(self.venda_id, extras=self.valor_total - (anterior or 0))
+        self._sincronizar_venda(valores)
+    
+    def delete(self, *args, **kwargs):
+        from core.services import venda_totais
+
+        with venda_totais.travar_venda(self.venda_id):
+            anterior = ExtraVenda.objects.filter(pk=self.pk).values_list('valor_total', flat=True).first()
+            result = super().delete(*args, **kwargs)
+            valores = venda_totais.aplicar_delta(self.venda_id, extras=-(anterior or 0))
+        self._sincronizar_venda(valores)
+        return result
+    
+    def _sincronizar_venda(self, valores):
+        from core.services.venda_totais import sincronizar_instancia
+        if self._meta.get_field('venda').is_cached(self):
+            sincronizar_instancia(self.venda, valores)
 
 
 class Pagamento(models.Model):
@@ -592,9 +643,88 @@ class Pagamento(models.Model):
         if self.status == 'confirmado' and not self.data_confirmacao:
             self.data_confirmacao = timezone.now()
         
-        super().save(*args, **kwargs)
-        
-        # Atualizar totais da venda
-        if self.venda:
-            self.venda.calcular_totais()
-            self.venda.save(update_fields=['valor_pago', 'valor_pendente', 'status'])
\ No newline at end of file
+        from core.services import venda_totais
+
+        adding = self._state.adding
+        with venda_totais.travar_venda(self.venda_id):
+            # Status/valor anteriores lidos com a venda travada: duas
+            # confirmações simultâneas do mesmo pagamento contam uma vez só
+            anterior = None if adding else Pagamento.objects.filter(pk=self.pk).values_list('status', 'valor').first()
+            super().save(*args, **kwargs)
+            delta = venda_totais.valor_pagamento(self.status, self.valor) - venda_totais.valor_pagamento(*(anterior or (None, 0)))
+            valores = venda_totais.aplicar_delta(self.venda_id, pago=delta)
+        self._sincronizar_venda(valores)
+    
+    def delete(self, *args, **kwargs):
+        from core.services import venda_totais
+
+        with venda_totais.travar_venda(self.venda_id):
+            anterior = Pagamento.objects.filter(pk=self.pk).values_list('status', 'valor').first()
+            result = super().delete(*args, **kwargs)
+            valores = venda_totais.aplicar_delta(self.venda_id, pago=-venda_totais.valor_pagamento(*(anterior or (None, 0))))
+        self._sincronizar_venda(valores)
+        return result
+    
+    def _sincronizar_venda(self, valores):
+        from core.services.venda_totais import sincronizar_instancia
+        if self._meta.get_field('venda').is_cached(self):
+            sincronizar_instancia(self.venda, valores)
+
+
+class VendaResumoDiario(models.Model):
+    """
+    Totais das vendas de bloqueio por dia, vendedor, caravana e status
+
+    Mantido pelas escritas de vendas, pagamentos e extras
+    (core/services/venda_resumo.py) e reconstruído pelo comando
+    reconciliar_resumo_vendas. Painéis leem daqui em vez de agregar as vendas.
+    """
+
+    dia = models.DateField(verbose_name="Dia")
+
+    vendedor = models.ForeignKey(
+        'Usuario',
+        on_delete=models.CASCADE,
+        related_name="resumos_vendas",
+        verbose_name="Vendedor"
+    )
+
+    caravana = models.ForeignKey(
+        'Caravana',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="resumos_vendas",
+        verbose_name="Caravana"
+    )
+
+    status = models.CharField(max_length=30, verbose_name="Status")
+
+    quantidade = models.IntegerField(default=0, verbose_name="Vendas")
+
+    passageiros = models.IntegerField(default=0, verbose_name="Passageiros")
+
+    valor_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Valor Total")
+
+    valor_pago = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Valor Pago")
+
+    valor_pendente = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Valor Pendente")
+
+    class Meta:
+        verbose_name = "Resumo Diário de Vendas"
+        verbose_name_plural = "Resumos Diários de Vendas"
+        ordering = ["-dia"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "vendedor", "caravana", "status"],
+                name="venda_resumo_diario_chave",
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["dia"], name="venda_resumo_dia_idx"),
+            models.Index(fields=["vendedor", "dia"], name="venda_resumo_vendedor_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.vendedor_id} {self.status}: {self.quantidade}"
@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import RegexValidator
 from django.utils import timezone
+from datetime import timedelta
 from .pessoa import Pessoa
 from .usuario import Usuario
 from ..fields import EncryptedCharField, EncryptedTextField
+from core.managers.whatsapp_manager import WhatsAppMessageManager, encode_cursor
 
 
 class WhatsAppAccount(models.Model):
@@ -284,6 +288,13 @@ class WhatsAppMessage(models.Model):
         help_text="Texto da mensagem ou dados JSON para outros tipos",
     )
 
+    # Vetor de busca textual (português), calculado pelo próprio banco
+    search_vector = models.GeneratedField(
+        expression=SearchVector("content", config="portuguese"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
     # Metadados de mídia (quando aplicável)
     media_id = models.CharField(
         max_length=100, blank=True, verbose_name="ID da Mídia"
@@ -360,14 +371,21 @@ class WhatsAppMessage(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    objects = WhatsAppMessageManager()
+
+    # Instâncias restauradas do arquivo (WhatsAppMessageArchive) - somente leitura
+    is_archived = False
+
     class Meta:
         verbose_name = "Mensagem WhatsApp"
         verbose_name_plural = "Mensagens WhatsApp"
         ordering = ["-timestamp"]
         indexes = [
             models.Index(fields=["account", "contact", "-timestamp"]),
+            models.Index(fields=["conversation", "-timestamp"]),
             models.Index(fields=["direction", "-timestamp"]),
             models.Index(fields=["status", "-timestamp"]),
+            GinIndex(fields=["search_vector"], name="whatsapp_message_search_gin"),
         ]
 
     def __str__(self):
@@ -397,6 +415,57 @@ class WhatsAppMessage(models.Model):
         else:
             return f"[{self.get_message_type_display()}]"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from core.services import whatsapp_summary
+
+        instance = super().from_db(db, field_names, values)
+        # Guarda o estado carregado para detectar mudanças de "não lida" e de status no save()
+        instance._loaded_unread = (
+            "direction" in instance.__dict__ and "status" in instance.__dict__
+            and whatsapp_summary.is_unread(instance.direction, instance.status)
+        )
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Sobrescreve save para manter o resumo da conversa e o volume por hora atualizados"""
+        from core.services import whatsapp_analytics, whatsapp_summary, whatsapp_volume
+
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+
+        unread = whatsapp_summary.is_unread(self.direction, self.status)
+        if adding:
+            whatsapp_summary.record_new_message(self)
+            whatsapp_analytics.record_message(self)
+            whatsapp_volume.record_message(self)
+        else:
+            if hasattr(self, "_loaded_unread") and unread != self._loaded_unread:
+                whatsapp_summary.record_unread_change(self.conversation_id, 1 if unread else -1)
+            loaded_status = getattr(self, "_loaded_status", None)
+            if loaded_status is not None and loaded_status != self.status:
+                whatsapp_volume.record_status_change(self, loaded_status)
+        self._loaded_unread = unread
+        self._loaded_status = self.status
+
+    def delete(self, *args, **kwargs):
+        from core.services import whatsapp_summary, whatsapp_volume
+
+        conversation_id = self.conversation_id
+        whatsapp_volume.record_message(self, -1)
+        result = super().delete(*args, **kwargs)
+        if conversation_id:
+            whatsapp_summary.rebuild_summaries(
+                WhatsAppConversation.objects.filter(pk=conversation_id)
+            )
+        return result
+
+    @property
+    def cursor(self):
+        """Cursor (timestamp, id) para paginação do histórico"""
+        return encode_cursor(self.timestamp, self.pk)
+
     @property
     def is_media(self):
         """Verifica se a mensagem contém mídia"""
@@ -746,6 +815,64 @@ class WhatsAppConversation(models.Model):
         help_text="Data para retornar o contato com o cliente",
     )
 
+    # Resumo das mensagens (mantido por WhatsAppMessage.save - ver core/services/whatsapp_summary.py)
+    message_count = models.PositiveIntegerField(
+        default=0, verbose_name="Total de mensagens"
+    )
+
+    unread_inbound_count = models.PositiveIntegerField(
+        default=0, verbose_name="Mensagens não lidas"
+    )
+
+    last_message_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Última mensagem em"
+    )
+
+    last_message_preview = models.CharField(
+        max_length=255, blank=True, verbose_name="Prévia da última mensagem"
+    )
+
+    last_message_direction = models.CharField(
+        max_length=10,
+        choices=WhatsAppMessage.DIRECTION_CHOICES,
+        blank=True,
+        verbose_name="Direção da última mensagem",
+    )
+
+    last_inbound_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Última mensagem recebida em"
+    )
+
+    # Mensagens movidas para o arquivo (ver core/services/whatsapp_archive.py)
+    archived_message_count = models.PositiveIntegerField(
+        default=0, verbose_name="Mensagens arquivadas"
+    )
+
+    # Tempos de resposta (mantidos por WhatsAppMessage.save - ver core/services/whatsapp_analytics.py)
+    awaiting_reply_since = models.DateTimeField(
+        null=True, blank=True, verbose_name="Aguardando resposta desde"
+    )
+
+    first_response_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Primeira resposta em"
+    )
+
+    first_response_seconds = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Tempo da primeira resposta (s)"
+    )
+
+    reply_count = models.PositiveIntegerField(
+        default=0, verbose_name="Respostas"
+    )
+
+    reply_seconds_total = models.PositiveBigIntegerField(
+        default=0, verbose_name="Tempo total de resposta (s)"
+    )
+
+    resolution_seconds = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Tempo de resolução (s)"
+    )
+
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
@@ -756,11 +883,58 @@ class WhatsAppConversation(models.Model):
         indexes = [
             models.Index(fields=["status", "-last_activity"]),
             models.Index(fields=["assigned_to", "-last_activity"]),
+            # Fila de atribuição (ver core/services/whatsapp_assignment.py)
+            models.Index(fields=["status", "priority", "first_message_at"]),
         ]
 
     def __str__(self):
         return f"Conversa com {self.contact.display_name} - {self.get_status_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o status carregado para detectar transições no save()
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Sobrescreve save para manter os contadores de status e o resumo atualizados"""
+        from core.services import whatsapp_analytics, whatsapp_counters, whatsapp_summary
+
+        adding = self._state.adding
+        old_status = None if adding else getattr(self, "_loaded_status", None)
+        update_fields = kwargs.get("update_fields")
+
+        # O resumo das mensagens é atualizado direto no banco - um save()
+        # completo de uma instância carregada antes não pode sobrescrevê-lo
+        if not adding and update_fields is None:
+            update_fields = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key
+                and f.name not in whatsapp_summary.SUMMARY_FIELDS + whatsapp_analytics.METRIC_FIELDS
+            ]
+            kwargs["update_fields"] = update_fields
+
+        super().save(*args, **kwargs)
+
+        if update_fields is not None and "status" not in update_fields:
+            return
+        if adding or old_status is not None:
+            whatsapp_counters.record_status_transition(
+                self.account_id, old_status, self.status
+            )
+        if old_status is not None and old_status != "resolved" and self.status == "resolved":
+            whatsapp_analytics.record_resolution(self)
+        self._loaded_status = self.status
+
+    def delete(self, *args, **kwargs):
+        from core.services import whatsapp_counters
+
+        account_id, status = self.account_id, self.status
+        result = super().delete(*args, **kwargs)
+        whatsapp_counters.record_status_transition(account_id, status, None)
+        return result
+
     def assign_to_user(self, user):
         """Atribui a conversa a um usuário"""
         self.assigned_to = user
@@ -788,10 +962,8 @@ class WhatsAppConversation(models.Model):
 
     @property
     def unread_messages_count(self):
-        """Conta mensagens não lidas do contato"""
-        return self.messages.filter(
-            direction="inbound", status__in=["sent", "delivered"]
-        ).count()
+        """Mensagens não lidas do contato (campo denormalizado)"""
+        return self.unread_inbound_count
 
     @property
     def last_message(self):
@@ -800,9 +972,24 @@ class WhatsAppConversation(models.Model):
 
     @property
     def response_time(self):
-        """Calcula tempo de resposta médio"""
-        # TODO: Implementar cálculo de tempo de resposta
-        return None
+        """Tempo médio de resposta (timedelta) - None se ainda não houve resposta"""
+        if not self.reply_count:
+            return None
+        return timedelta(seconds=self.reply_seconds_total / self.reply_count)
+
+    @property
+    def first_response_time(self):
+        """Tempo até a primeira resposta (timedelta)"""
+        if self.first_response_seconds is None:
+            return None
+        return timedelta(seconds=self.first_response_seconds)
+
+    @property
+    def resolution_time(self):
+        """Tempo entre a primeira mensagem e a resolução (timedelta)"""
+        if self.resolution_seconds is None:
+            return None
+        return timedelta(seconds=self.resolution_seconds)
     
     def is_within_24h_window(self):
         """
@@ -812,12 +999,8 @@ class WhatsAppConversation(models.Model):
         from django.utils import timezone
         from datetime import timedelta
         
-        # Busca a última mensagem recebida (inbound) na conversa
-        last_inbound_message = self.messages.filter(
-            direction='inbound'
-        ).order_by('-timestamp').first()
-        
-        if not last_inbound_message:
+        # Data da última mensagem recebida (inbound) - campo denormalizado
+        if not self.last_inbound_at:
             # Se não há mensagem recebida, não está na janela
             return False
         
@@ -825,7 +1008,7 @@ class WhatsAppConversation(models.Model):
         now = timezone.now()
         window_limit = now - timedelta(hours=24)
         
-        return last_inbound_message.timestamp > window_limit
+        return self.last_inbound_at > window_limit
 
 
 class WhatsAppWebhookQueue(models.Model):
@@ -886,3 +1069,171 @@ class WhatsAppWebhookQueue(models.Model):
 
     def __str__(self):
         return f"Webhook {self.id} - {self.get_status_display()} - {self.account.name}"
+
+
+class WhatsAppMessageArchive(models.Model):
+    """
+    Mensagens arquivadas de uma conversa em um mês (armazenamento frio)
+
+    As mensagens de conversas encerradas há muito tempo saem da tabela de
+    mensagens e ficam aqui, serializadas e comprimidas - um registro por
+    conversa e mês. A leitura continua transparente pelo histórico paginado
+    (WhatsAppMessage.objects.including_archived).
+    """
+
+    conversation = models.ForeignKey(
+        WhatsAppConversation,
+        on_delete=models.CASCADE,
+        related_name="message_archives",
+        verbose_name="Conversa",
+    )
+
+    month = models.DateField(verbose_name="Mês")
+
+    message_count = models.PositiveIntegerField(
+        default=0, verbose_name="Total de mensagens"
+    )
+
+    first_timestamp = models.DateTimeField(verbose_name="Primeira mensagem em")
+
+    last_timestamp = models.DateTimeField(verbose_name="Última mensagem em")
+
+    payload = models.BinaryField(
+        verbose_name="Mensagens (JSON comprimido)"
+    )
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Arquivo de Mensagens WhatsApp"
+        verbose_name_plural = "Arquivos de Mensagens WhatsApp"
+        ordering = ["conversation", "-month"]
+        unique_together = ["conversation", "month"]
+
+    def __str__(self):
+        return f"{self.conversation_id} - {self.month:%m/%Y} ({self.message_count} mensagens)"
+
+    def get_messages(self):
+        """Mensagens do arquivo (instâncias não salvas) em ordem cronológica"""
+        from core.services import whatsapp_archive
+
+        return whatsapp_archive.unpack_messages(self.payload)
+
+
+class WhatsAppResponseStats(models.Model):
+    """
+    Agregado diário dos tempos de atendimento por atendente e conta
+
+    Incrementado junto com as métricas da conversa (primeira resposta,
+    respostas e resoluções), para que os painéis leiam alguns registros por
+    dia em vez de percorrer as mensagens.
+    """
+
+    day = models.DateField(verbose_name="Dia")
+
+    account = models.ForeignKey(
+        WhatsAppAccount,
+        on_delete=models.CASCADE,
+        related_name="response_stats",
+        verbose_name="Conta WhatsApp",
+    )
+
+    attendant = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="whatsapp_response_stats",
+        verbose_name="Atendente",
+    )
+
+    first_response_count = models.PositiveIntegerField(
+        default=0, verbose_name="Primeiras respostas"
+    )
+
+    first_response_seconds = models.PositiveBigIntegerField(
+        default=0, verbose_name="Tempo total das primeiras respostas (s)"
+    )
+
+    reply_count = models.PositiveIntegerField(
+        default=0, verbose_name="Respostas"
+    )
+
+    reply_seconds = models.PositiveBigIntegerField(
+        default=0, verbose_name="Tempo total de resposta (s)"
+    )
+
+    resolved_count = models.PositiveIntegerField(
+        default=0, verbose_name="Conversas resolvidas"
+    )
+
+    resolution_seconds = models.PositiveBigIntegerField(
+        default=0, verbose_name="Tempo total de resolução (s)"
+    )
+
+    class Meta:
+        verbose_name = "Tempos de Atendimento WhatsApp"
+        verbose_name_plural = "Tempos de Atendimento WhatsApp"
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "account", "attendant"],
+                nulls_distinct=False,
+                name="whatsapp_response_stats_unique_day",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%d/%m/%Y} - {self.attendant_id or 'sem atendente'} ({self.reply_count} respostas)"
+
+
+class WhatsAppMessageVolume(models.Model):
+    """
+    Quantidade de mensagens por hora, conta, direção, tipo e status
+
+    Mantido pelo WhatsAppMessage.save()/delete() (novas mensagens e mudanças
+    de status) e reconstruído pelo comando rebuild_whatsapp_message_volume.
+    Os painéis e as listas de contas somam estes registros em vez de contar
+    a tabela de mensagens. Mensagens arquivadas continuam contadas.
+    """
+
+    account = models.ForeignKey(
+        WhatsAppAccount,
+        on_delete=models.CASCADE,
+        related_name="message_volume",
+        verbose_name="Conta WhatsApp",
+    )
+
+    hour = models.DateTimeField(verbose_name="Hora")
+
+    direction = models.CharField(
+        max_length=10, choices=WhatsAppMessage.DIRECTION_CHOICES, verbose_name="Direção"
+    )
+
+    message_type = models.CharField(
+        max_length=20, choices=WhatsAppMessage.MESSAGE_TYPE_CHOICES, verbose_name="Tipo"
+    )
+
+    status = models.CharField(
+        max_length=20, choices=WhatsAppMessage.MESSAGE_STATUS_CHOICES, verbose_name="Status"
+    )
+
+    count = models.PositiveIntegerField(default=0, verbose_name="Mensagens")
+
+    class Meta:
+        verbose_name = "Volume de Mensagens WhatsApp"
+        verbose_name_plural = "Volume de Mensagens WhatsApp"
+        ordering = ["-hour"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "hour", "direction", "message_type", "status"],
+                name="whatsapp_message_volume_unique_hour",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["hour"], name="whatsapp_volume_hour_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.hour:%d/%m/%Y %H:00} - {self.direction}/{self.message_type}/{self.status}: {self.count}"
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil de acesso do usuário (grupos, permissões e tipos de empresa)
+
+Quase toda view verifica grupo/permissão e o context processor precisa dos
+grupos e dos tipos de empresa do usuário. Em vez de consultar o banco em cada
+verificação, o perfil é montado uma vez, guardado no cache e memorizado no
+próprio objeto do usuário durante o request.
+
+A chave do cache inclui uma versão global, incrementada quando algo que afeta
+vários usuários muda (grupos renomeados, permissões de grupo, empresas). Mudanças
+de um único usuário apenas removem a chave dele (ver core/signals.py).
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TIMEOUT = 60 * 60
+VERSION_KEY = "auth_profile:version"
+
+# Atributo usado para memorizar o perfil no objeto do usuário
+_ATTR = "_auth_profile"
+
+
+@dataclass(frozen=True)
+class AuthProfile:
+    """Dados de autorização de um usuário"""
+
+    user_id: int
+    is_active: bool
+    is_superuser: bool
+    groups: Tuple[str, ...]
+    permissions: FrozenSet[str]
+    tipos_empresa: Tuple[str, ...]
+
+    def in_group(self, *names: str) -> bool:
+        """Verifica se o usuário pertence a algum dos grupos"""
+        return any(name in self.groups for name in names)
+
+    def has_perm(self, perm: str) -> bool:
+        """Mesma regra do ModelBackend: superusuário ativo tem todas"""
+        if not self.is_active:
+            return False
+        return self.is_superuser or perm in self.permissions
+
+
+def _version() -> int:
+    try:
+        return cache.get_or_set(VERSION_KEY, 1, None)
+    except Exception:
+        return 0
+
+
+def _key(user_id: int, version: int) -> str:
+    return f"auth_profile:{version}:{user_id}"
+
+
+def _build_profile(user) -> AuthProfile:
+    """Monta o perfil a partir do banco"""
+    groups = tuple(user.groups.order_by("id").values_list("name", flat=True))
+    permissions = frozenset(user.get_all_permissions())
+    tipos = tuple(
+        set(
+            user.empresas.filter(empresa_gruporom=True)
+            .values_list("tipo_empresa", flat=True)
+        )
+    )
+    return AuthProfile(
+        user_id=user.pk,
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+        groups=groups,
+        permissions=permissions,
+        tipos_empresa=tipos,
+    )
+
+
+def get_profile(user) -> Optional[AuthProfile]:
+    """
+    Retorna o perfil de acesso do usuário (None para anônimos)
+
+    Ordem de busca: objeto do usuário -> cache -> banco.
+    """
+    if user is None or not user.is_authenticated:
+        return None
+
+    profile = getattr(user, _ATTR, None)
+    if profile is not None:
+        return profile
+
+    key = _key(user.pk, _version())
+    try:
+        profile = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Cache indisponível para perfil de acesso: {e}")
+        profile = None
+
+    if profile is None:
+        profile = _build_profile(user)
+        try:
+            cache.set(key, profile, PROFILE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar perfil de acesso no cache: {e}")
+
+    setattr(user, _ATTR, profile)
+    # Alimenta o cache de permissões do ModelBackend (has_perm, {{ perms }})
+    if not hasattr(user, "_perm_cache"):
+        user._perm_cache = set(profile.permissions)
+    return profile
+
+
+def user_in_group(user, *names: str) -> bool:
+    """Substitui user.groups.filter(name=...).exists()"""
+    profile = get_profile(user)
+    return profile is not None and profile.in_group(*names)
+
+
+def user_has_perm(user, perm: str) -> bool:
+    """Substitui user.has_perm(...) usando o perfil em cache"""
+    profile = get_profile(user)
+    return profile is not None and profile.has_perm(perm)
+
+
+def forget_profile(user) -> None:
+    """Remove o perfil memorizado no objeto do usuário"""
+    for attr in (_ATTR, "_perm_cache", "_user_perm_cache", "_group_perm_cache"):
+        if hasattr(user, attr):
+            delattr(user, attr)
+
+
+def _delete_keys(user_ids: Iterable[int]) -> None:
+    version = _version()
+    try:
+        cache.delete_many([_key(user_id, version) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"Não foi possível invalidar perfis de acesso: {e}")
+
+
+def invalidate_users(user_ids: Iterable[int]) -> None:
+    """
+    Invalida o perfil de usuários específicos
+
+    A chave é removida imediatamente e novamente após o commit, para que um
+    request concorrente não grave no cache um perfil lido antes do commit.
+    """
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids:
+        return
+    _delete_keys(user_ids)
+    transaction.on_commit(lambda: _delete_keys(user_ids))
+
+
+def _bump_version() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Chave ainda não existe (ou expirou) - qualquer valor novo serve
+        cache.add(VERSION_KEY, 2, None)
+    except Exception as e:
+        logger.warning(f"Não foi possível invalidar perfis de acesso: {e}")
+
+
+def invalidate_all() -> None:
+    """Invalida o perfil de todos os usuários (incrementa a versão global)"""
+    _bump_version()
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Cotações do dólar (USD/BRL) lidas do banco
+
+As conversões usam a cotação do próprio dia ou, sem ela (fim de semana,
+feriado, dia ainda não buscado), a do dia anterior mais próximo.
+
+SerieCambio guarda as cotações de um período carregadas numa única
+consulta; converter muitos itens consulta a série em memória.
+
+serie() é a série completa, imutável e compartilhada pelo processo (template
+tags, listagens e relatórios): converter uma tabela inteira não faz
+consultas. Como a AwesomeAPI só tem cotação de dias úteis, o dia anterior
+mais próximo é o último dia útil.
+
+preencher_historico() busca um período inteiro numa requisição e grava só
+os dias que faltam. Fins de semana nunca têm cotação; feriados (dias úteis
+passados que a API não devolveu) ficam guardados no cache para que o mesmo
+período não seja buscado de novo.
+
+A cotação exibida em todas as páginas (context processor) vem de
+ultima_cotacao(): memória do processo -> cache (Redis) -> banco, nunca da
+rede. Só atualizar() e preencher_historico() buscam na AwesomeAPI - pelos
+comandos atualizar_cambio e preencher_cambio - e apenas um processo por vez
+atualiza a cotação do dia. Se a busca falhar, as páginas continuam com a
+última cotação conhecida.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "cambio:atual"
+SERIE_CACHE_KEY = "cambio:serie"
+CACHE_TIMEOUT = 60 * 60 * 24
+LOCK_KEY = "cambio:atualizando"
+LOCK_TIMEOUT = 60
+SEM_COTACAO_CACHE_KEY = "cambio:sem_cotacao"
+
+# (expira_em, cotação) da última leitura neste processo
+_memoria: Optional[Tuple[float, Optional[Tuple[date, Decimal]]]] = None
+# (expira_em, série) da última leitura neste processo
+_serie: Optional[Tuple[float, "SerieCambio"]] = None
+_atualizando = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SerieCambio:
+    """Cotações ordenadas por data (imutável)"""
+
+    datas: Tuple[date, ...] = ()
+    valores: Tuple[Decimal, ...] = ()
+
+    def __len__(self):
+        return len(self.datas)
+
+    def cotacao(self, dia: date) -> Optional[Tuple[date, Decimal]]:
+        """(data, valor) da cotação do dia ou do dia anterior mais próximo"""
+        posicao = bisect_right(self.datas, dia)
+        if not posicao:
+            return None
+        return self.datas[posicao - 1], self.valores[posicao - 1]
+
+    def valor(self, dia: date) -> Optional[Decimal]:
+        encontrada = self.cotacao(dia)
+        return encontrada[1] if encontrada else None
+
+
+def carregar_serie(inicio: date, fim: Optional[date] = None) -> SerieCambio:
+    """
+    Cotações de [inicio, fim] mais a última anterior a inicio (numa consulta)
+
+    Args:
+        inicio: Primeiro dia a converter
+        fim: Último dia (padrão: sem limite)
+    """
+    from core.models import Cambio
+
+    anterior = Cambio.objects.filter(data__lt=inicio).order_by("-data").values("data")[:1]
+    cotacoes = Cambio.objects.filter(Q(data__gte=inicio) | Q(data=Subquery(anterior)))
+    if fim:
+        cotacoes = cotacoes.filter(data__lte=fim)
+    rows = list(cotacoes.order_by("data").values_list("data", "valor"))
+    return SerieCambio(tuple(data for data, _ in rows), tuple(valor for _, valor in rows))
+
+
+def serie() -> SerieCambio:
+    """
+    Todas as cotações (série do processo, sem consulta enquanto válida)
+
+    Ordem de busca: memória do processo (CAMBIO_MEMORIA_SEGUNDOS) -> cache
+    -> banco. Uma linha por dia útil: anos de histórico cabem em memória.
+    """
+    global _serie
+    from core.models import Cambio
+
+    agora = time.monotonic()
+    memoria = _serie
+    if memoria is not None and memoria[0] > agora:
+        return memoria[1]
+
+    try:
+        atual = cache.get(SERIE_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Cache indisponível para a série de câmbio: {e}")
+        atual = None
+
+    if atual is None:
+        rows = list(Cambio.objects.order_by("data").values_list("data", "valor"))
+        atual = SerieCambio(tuple(data for data, _ in rows), tuple(valor for _, valor in rows))
+        try:
+            cache.set(SERIE_CACHE_KEY, atual, CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar a série de câmbio no cache: {e}")
+
+    _serie = (agora + settings.CAMBIO_MEMORIA_SEGUNDOS, atual)
+    return atual
+
+
+def cotacao(dia: date) -> Optional[Tuple[date, Decimal]]:
+    """(data, valor) da cotação mais recente até o dia (uma consulta)"""
+    from core.models import Cambio
+
+    return Cambio.objects.filter(data__lte=dia).order_by("-data").values_list("data", "valor").first()
+
+
+def ultima_cotacao() -> Optional[Tuple[date, Decimal]]:
+    """
+    (data, valor) da cotação mais recente conhecida, sem requisição à API
+
+    Ordem de busca: memória do processo (CAMBIO_MEMORIA_SEGUNDOS) -> cache
+    -> banco. O resultado do banco é gravado no cache para os outros
+    processos.
+    """
+    global _memoria
+
+    agora = time.monotonic()
+    memoria = _memoria
+    if memoria is not None and memoria[0] > agora:
+        return memoria[1]
+
+    try:
+        atual = cache.get(CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Cache indisponível para o câmbio: {e}")
+        atual = None
+
+    if atual is None:
+        atual = cotacao(timezone.localdate())
+        if atual is not None:
+            _gravar_cache(atual)
+
+    _memoria = (agora + settings.CAMBIO_MEMORIA_SEGUNDOS, atual)
+    return atual
+
+
+def _gravar_cache(atual: Tuple[date, Decimal]):
+    try:
+        cache.set(CACHE_KEY, atual, CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o câmbio no cache: {e}")
+
+
+def esquecer_cotacao():
+    """Descarta a cotação e a série em memória e no cache (lidas de novo do banco)"""
+    global _memoria, _serie
+
+    _memoria = _serie = None
+    try:
+        cache.delete_many([CACHE_KEY, SERIE_CACHE_KEY])
+    except Exception as e:
+        logger.warning(f"Não foi possível remover o câmbio do cache: {e}")
+
+
+def atualizar(dia: Optional[date] = None) -> Optional[Tuple[date, Decimal]]:
+    """
+    Busca a cotação do dia na AwesomeAPI, grava no banco e publica no cache
+
+    Só uma atualização roda por vez (trava no processo e no cache): quem
+    chega durante uma busca em andamento não repete a requisição.
+
+    Returns:
+        (data, valor) gravado, ou None se outra atualização está em
+        andamento ou a API não respondeu (a última cotação continua valendo)
+    """
+    from core.models import Cambio
+
+    dia = dia or timezone.localdate()
+    if not _atualizando.acquire(blocking=False):
+        return None
+    try:
+        try:
+            if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+                logger.info("Atualização do câmbio já em andamento em outro processo")
+                return None
+        except Exception as e:
+            logger.warning(f"Cache indisponível para a trava do câmbio: {e}")
+
+        try:
+            valor = Cambio.buscar_cambio_awesomeapi(dia)
+            if valor is None:
+                return None
+            Cambio.objects.update_or_create(data=dia, defaults={"valor": valor})
+            esquecer_cotacao()
+            atual = ultima_cotacao()
+            logger.info(f"Câmbio atualizado para {dia}: R$ {valor}")
+            return atual
+        finally:
+            try:
+                cache.delete(LOCK_KEY)
+            except Exception:
+                pass
+    finally:
+        _atualizando.release()
+
+
+def _dias_sem_cotacao() -> set:
+    try:
+        return cache.get(SEM_COTACAO_CACHE_KEY) or set()
+    except Exception as e:
+        logger.warning(f"Cache indisponível para os dias sem cotação: {e}")
+        return set()
+
+
+def _lembrar_sem_cotacao(dias: set) -> None:
+    try:
+        cache.set(SEM_COTACAO_CACHE_KEY, _dias_sem_cotacao() | dias, None)
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar os dias sem cotação no cache: {e}")
+
+
+def preencher_historico(inicio: date, fim: Optional[date] = None) -> int:
+    """
+    Grava as cotações que faltam no período (uma requisição à AwesomeAPI)
+
+    Só faz a requisição se faltar algum dia útil que não seja um feriado já
+    conhecido.
+
+    Returns:
+        Quantidade de dias gravados
+    """
+    from core.models import Cambio
+
+    fim = fim or timezone.localdate()
+    existentes = set(Cambio.objects.filter(data__range=(inicio, fim)).values_list("data", flat=True))
+    uteis = {
+        dia for dia in (inicio + timedelta(days=n) for n in range((fim - inicio).days + 1))
+        if dia.weekday() < 5
+    }
+    faltantes = uteis - existentes - _dias_sem_cotacao()
+    if not faltantes:
+        return 0
+
+    cotacoes = Cambio.buscar_historico_awesomeapi(inicio, fim)
+    if not cotacoes:
+        # Erro na API (ou nada publicado): não marca nenhum dia como feriado
+        return 0
+    novos = [
+        Cambio(data=dia, valor=valor)
+        for dia, valor in sorted(cotacoes.items())
+        if dia not in existentes and valor > 0
+    ]
+    # Dias úteis passados que a API não tem: feriados
+    hoje = timezone.localdate()
+    feriados = {dia for dia in faltantes if dia not in cotacoes and dia < hoje}
+    if feriados:
+        _lembrar_sem_cotacao(feriados)
+
+    criados = Cambio.objects.bulk_create(novos, ignore_conflicts=True)
+    if criados:
+        # bulk_create não dispara os sinais de Cambio
+        esquecer_cotacao()
+    return len(criados)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Estoque de lugares das caravanas (vendidos, reservados e livres)
+
+Cada caravana tem uma linha em EstoqueCaravana com os contadores de lugares
+vendidos e reservados; a capacidade é a quantidade da caravana. Toda
+alteração trava essa linha (SELECT ... FOR UPDATE) antes de conferir os
+lugares livres, então dois vendedores não vendem o mesmo último lugar.
+
+Os lugares de cada venda ficam em ReservaLugar:
+- pré-vendas reservam numero_passageiros lugares até expira_em; qualquer
+  alteração de passageiros renova a reserva
+- a confirmação passa a reserva para vendido (sem validade)
+- cancelar ou remover a venda devolve os lugares
+
+Reservas vencidas são liberadas na próxima reserva da mesma caravana e pelo
+comando liberar_reservas (cron), que também reconcilia os contadores.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .exceptions import PassageirosIndisponiveisError, VendaError
+
+logger = logging.getLogger(__name__)
+
+RESERVADO = "reservado"
+VENDIDO = "vendido"
+
+
+def reserva_minutos() -> int:
+    return getattr(settings, "RESERVA_LUGARES_MINUTOS", 60)
+
+
+def _caravana_id(venda, caravana_id: Optional[int] = None) -> int:
+    """Caravana dos lugares da venda (do bloqueio ou da reserva já feita)"""
+    from core.models import Bloqueio, ReservaLugar
+
+    if caravana_id:
+        return caravana_id
+    if venda.bloqueio_id:
+        if venda._meta.get_field("bloqueio").is_cached(venda):
+            return venda.bloqueio.caravana_id
+        return Bloqueio.objects.values_list("caravana_id", flat=True).get(pk=venda.bloqueio_id)
+    caravana_id = ReservaLugar.objects.filter(venda=venda).values_list("caravana_id", flat=True).first()
+    if caravana_id is None:
+        raise VendaError("Venda sem bloqueio: informe a caravana dos lugares")
+    return caravana_id
+
+
+def _travar(caravana_id: int):
+    """Estoque da caravana travado, com a capacidade atual (criado na primeira vez)"""
+    from core.models import EstoqueCaravana
+
+    EstoqueCaravana.objects.get_or_create(caravana_id=caravana_id)
+    return (
+        EstoqueCaravana.objects.select_for_update(of=("self",))
+        .annotate(capacidade=F("caravana__quantidade"))
+        .get(caravana_id=caravana_id)
+    )
+
+
+def _alterar(estoque, vendidos: int = 0, reservados: int = 0) -> None:
+    """Aplica a variação dos contadores no banco e na instância travada"""
+    from core.models import EstoqueCaravana
+
+    if not (vendidos or reservados):
+        return
+    EstoqueCaravana.objects.filter(pk=estoque.pk).update(
+        vendidos=F("vendidos") + vendidos,
+        reservados=F("reservados") + reservados,
+        updated_at=timezone.now(),
+    )
+    estoque.vendidos += vendidos
+    estoque.reservados += reservados
+
+
+def livres(estoque) -> int:
+    return max(estoque.capacidade - estoque.vendidos - estoque.reservados, 0)
+
+
+def _liberar_vencidas(estoque, agora) -> int:
+    """Remove as reservas vencidas da caravana travada; retorna os lugares liberados"""
+    from core.models import ReservaLugar
+
+    vencidas = ReservaLugar.objects.filter(
+        caravana_id=estoque.pk, status=RESERVADO, expira_em__lte=agora
+    )
+    lugares = vencidas.aggregate(total=Sum("quantidade"))["total"] or 0
+    if lugares:
+        vencidas.delete()
+        _alterar(estoque, reservados=-lugares)
+    return lugares
+
+
+def _ocupar(estoque, solicitados: int, ja_ocupados: int) -> None:
+    """Confere se cabem mais (solicitados - ja_ocupados) lugares na caravana"""
+    if solicitados - ja_ocupados > livres(estoque):
+        raise PassageirosIndisponiveisError(solicitados, livres(estoque) + ja_ocupados)
+
+
+def disponibilidade(caravana_id: int) -> dict:
+    """Capacidade, vendidos, reservados e livres de uma caravana (sem travar)"""
+    from core.models import Caravana
+
+    return Caravana.objects.filter(pk=caravana_id).annotate(**_anotacoes()).values(
+        "quantidade", *_anotacoes()
+    ).get()
+
+
+@transaction.atomic
+def reservar(venda, quantidade: Optional[int] = None, minutos: Optional[int] = None,
+             caravana_id: Optional[int] = None):
+    """
+    Reserva (ou renova) os lugares de uma pré-venda
+
+    Args:
+        quantidade: Lugares (padrão: numero_passageiros da venda)
+        minutos: Validade da reserva (padrão: settings.RESERVA_LUGARES_MINUTOS)
+        caravana_id: Caravana, para vendas ainda sem bloqueio
+
+    Raises:
+        PassageirosIndisponiveisError: Se a caravana não tem lugares livres
+    """
+    from core.models import ReservaLugar
+
+    quantidade = venda.numero_passageiros if quantidade is None else quantidade
+    agora = timezone.now()
+    estoque = _travar(_caravana_id(venda, caravana_id))
+    _liberar_vencidas(estoque, agora)
+
+    reserva = ReservaLugar.objects.filter(venda=venda).first()
+    if reserva is not None and reserva.status == VENDIDO:
+        return reserva
+
+    atual = reserva.quantidade if reserva else 0
+    _ocupar(estoque, quantidade, atual)
+    _alterar(estoque, reservados=quantidade - atual)
+
+    expira_em = agora + timedelta(minutes=reserva_minutos() if minutos is None else minutos)
+    if reserva is None:
+        return ReservaLugar.objects.create(
+            venda=venda, caravana_id=estoque.pk, bloqueio_id=venda.bloqueio_id,
+            quantidade=quantidade, expira_em=expira_em,
+        )
+    reserva.quantidade, reserva.expira_em = quantidade, expira_em
+    reserva.save(update_fields=["quantidade", "expira_em"])
+    return reserva
+
+
+@transaction.atomic
+def confirmar(venda):
+    """
+    Passa os lugares da venda para vendidos
+
+    Se a reserva venceu, os lugares são ocupados de novo (se ainda houver).
+
+    Raises:
+        PassageirosIndisponiveisError: Se a caravana não tem lugares livres
+    """
+    from core.models import ReservaLugar
+
+    estoque = _travar(_caravana_id(venda))
+    _liberar_vencidas(estoque, timezone.now())
+
+    reserva = ReservaLugar.objects.filter(venda=venda).first()
+    if reserva is not None and reserva.status == VENDIDO:
+        return reserva
+
+    reservado = reserva.quantidade if reserva else 0
+    _ocupar(estoque, venda.numero_passageiros, reservado)
+    _alterar(estoque, vendidos=venda.numero_passageiros, reservados=-reservado)
+
+    if reserva is None:
+        return ReservaLugar.objects.create(
+            venda=venda, caravana_id=estoque.pk, bloqueio_id=venda.bloqueio_id,
+            quantidade=venda.numero_passageiros, status=VENDIDO,
+        )
+    reserva.quantidade, reserva.status, reserva.expira_em = venda.numero_passageiros, VENDIDO, None
+    reserva.save(update_fields=["quantidade", "status", "expira_em"])
+    return reserva
+
+
+@transaction.atomic
+def liberar(venda) -> int:
+    """Devolve os lugares da venda (cancelada ou removida); retorna quantos"""
+    from core.models import ReservaLugar
+
+    caravana_id = ReservaLugar.objects.filter(venda=venda).values_list("caravana_id", flat=True).first()
+    if caravana_id is None:
+        return 0
+    estoque = _travar(caravana_id)
+    reserva = ReservaLugar.objects.filter(venda=venda).first()
+    if reserva is None:
+        return 0
+    reserva.delete()
+    if reserva.status == VENDIDO:
+        _alterar(estoque, vendidos=-reserva.quantidade)
+    else:
+        _alterar(estoque, reservados=-reserva.quantidade)
+    return reserva.quantidade
+
+
+def liberar_vencidas(agora=None) -> int:
+    """Libera as reservas vencidas de todas as caravanas; retorna os lugares liberados"""
+    from core.models import ReservaLugar
+
+    agora = agora or timezone.now()
+    caravanas = (
+        ReservaLugar.objects.filter(status=RESERVADO, expira_em__lte=agora)
+        .order_by("caravana_id").values_list("caravana_id", flat=True).distinct()
+    )
+    total = 0
+    for caravana_id in list(caravanas):
+        with transaction.atomic():
+            total += _liberar_vencidas(_travar(caravana_id), agora)
+    if total:
+        logger.info(f"{total} lugar(es) de reservas vencidas liberado(s)")
+    return total
+
+
+def reconciliar(caravana_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recalcula os contadores a partir das reservas
+
+    Returns:
+        Quantidade de caravanas atualizadas
+    """
+    from core.models import Caravana, EstoqueCaravana, ReservaLugar
+
+    caravanas = Caravana.objects.all()
+    if caravana_ids is not None:
+        caravanas = caravanas.filter(pk__in=list(caravana_ids))
+    ids = list(caravanas.values_list("pk", flat=True))
+    EstoqueCaravana.objects.bulk_create(
+        [EstoqueCaravana(caravana_id=pk) for pk in ids], ignore_conflicts=True
+    )
+
+    def soma(status):
+        return Coalesce(
+            Subquery(
+                ReservaLugar.objects.filter(caravana_id=OuterRef("pk"), status=status).order_by()
+                .values("caravana_id").annotate(total=Sum("quantidade")).values("total"),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+    return EstoqueCaravana.objects.filter(pk__in=ids).update(
+        vendidos=soma(VENDIDO), reservados=soma(RESERVADO), updated_at=timezone.now()
+    )
+
+
+def _anotacoes():
+    vendidos = Coalesce(F("estoque__vendidos"), Value(0))
+    reservados = Coalesce(F("estoque__reservados"), Value(0))
+    return {
+        "lugares_vendidos": vendidos,
+        "lugares_reservados": reservados,
+        "total_passageiros_vendidos": vendidos + reservados,
+        "passageiros_disponiveis": F("quantidade") - vendidos - reservados,
+    }
+
+
+def com_estoque(queryset):
+    """
+    Anota as caravanas com os lugares (mesmo JOIN da consulta principal)
+
+    lugares_vendidos, lugares_reservados, total_passageiros_vendidos
+    (vendidos + reservados) e passageiros_disponiveis.
+    """
+    return queryset.annotate(**_anotacoes())
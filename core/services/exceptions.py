@@ -57,4 +57,20 @@ class ValorPagamentoInvalidoError(PagamentoError):
 
 class ClienteError(BusinessError):
     """Exceções relacionadas a clientes"""
-    pass
\ No newline at end of file
+    pass
+
+
+class CambioIndisponivelError(VendaError):
+    """Não há cotação do dólar para converter um valor"""
+    
+    def __init__(self, dia):
+        message = f"Sem cotação do dólar até {dia:%d/%m/%Y} para converter os valores em dólar"
+        super().__init__(message, code='cambio_indisponivel')
+        self.dia = dia
+
+
+class MesclagemError(ClienteError):
+    """Duas pessoas não podem ser mescladas"""
+    
+    def __init__(self, message):
+        super().__init__(message, code='mesclagem')
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Utilitários comuns das exportações em streaming (whatsapp_export e
+venda_export)
+
+As linhas formatadas são agrupadas em pequenos blocos de bytes
+(byte_chunks) e enviadas por StreamingHttpResponse (streaming_response). No
+ASGI (daphne) o conteúdo precisa ser um iterador assíncrono - com um iterador
+comum o Django consome tudo antes de enviar - e a leitura continua na mesma
+thread, onde está o cursor do servidor (async_chunks).
+"""
+
+from datetime import datetime, time, timedelta
+from itertools import islice
+from typing import Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Registros lidos por vez do cursor do servidor
+CHUNK_SIZE = 2000
+
+# Linhas agrupadas por pedaço enviado ao cliente
+LINES_PER_CHUNK = 500
+
+# Fórmulas em planilhas (CSV aberto no Excel) - conteúdo vem de clientes
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class Echo:
+    """Buffer que apenas devolve o que o csv.writer escreve"""
+
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    """Valor de célula CSV: booleanos em português, fórmulas neutralizadas"""
+    if isinstance(value, bool):
+        return "sim" if value else "não"
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return "" if value is None else value
+
+
+def byte_chunks(lines, lines_per_chunk: int = LINES_PER_CHUNK) -> Iterator[bytes]:
+    """Agrupa as linhas em blocos de bytes (UTF-8)"""
+    iterator = iter(lines)
+    while True:
+        chunk = "".join(islice(iterator, lines_per_chunk))
+        if not chunk:
+            return
+        yield chunk.encode("utf-8")
+
+
+async def async_chunks(chunks: Iterator[bytes]):
+    """Iterador assíncrono sobre um iterador síncrono de blocos"""
+    # thread_sensitive: o cursor do servidor fica sempre na mesma conexão
+    next_chunk = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+    while (chunk := await next_chunk()) is not None:
+        yield chunk
+
+
+def streaming_response(request, chunks: Iterator[bytes], content_type: str, filename: str) -> StreamingHttpResponse:
+    """
+    Download em streaming dos blocos
+
+    Args:
+        request: Request atual (define iterador síncrono ou assíncrono)
+        chunks: Blocos de bytes (byte_chunks())
+        content_type: Tipo do conteúdo
+        filename: Nome do arquivo com extensão
+    """
+    if isinstance(request, ASGIRequest):
+        chunks = async_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    # Evita que proxies (nginx) segurem a resposta inteira antes de enviar
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def date_range(start=None, end=None):
+    """Converte datas (inclusivas) em limites de timestamp"""
+    start_at = timezone.make_aware(datetime.combine(start, time.min)) if start else None
+    end_before = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)) if end else None
+    return start_at, end_before
+
+
+def export_filename(prefix: str, *parts: Optional[object]) -> str:
+    """Nome do arquivo (sem extensão) com as partes informadas e a data/hora"""
+    suffix = "_".join(str(part) for part in parts if part)
+    stamp = timezone.localtime().strftime("%Y%m%d_%H%M")
+    return "_".join(filter(None, [prefix, suffix, stamp]))
@@ -0,0 +1,751 @@
+# -*- coding: utf-8 -*-
+"""
+Geração de dados sintéticos em volume de produção (testes de carga)
+
+As factories de core/factories criam um objeto por vez pelo ORM (com Faker
+em cada campo) e servem para os testes; Faker é dependência só de
+desenvolvimento, então aqui nomes e cidades vêm de listas próprias. Para
+milhões de linhas este módulo
+monta os objetos em memória, em lotes, e grava com bulk_create - ou COPY,
+no caso das mensagens, a maior tabela. O resultado é coerente:
+
+- Pessoas com CPF válido e telefones únicos (uma pequena parte duplicada,
+  com outro documento, como acontece nos cadastros reais);
+- contatos WhatsApp ligados às pessoas, conversas e mensagens com horários
+  realistas (mais volume nos dias recentes, em dias úteis e no horário
+  comercial; respostas em minutos, rajadas do cliente em segundos);
+- caravanas, bloqueios, vendas, passageiros (sem ultrapassar a capacidade
+  do bloqueio) e pagamentos com os totais da venda batendo.
+
+Tudo deriva da seed: a mesma seed e o mesmo tamanho geram os mesmos dados
+(relativos à data da execução). Os registros de cada seed são identificáveis
+(conta "Carga <seed>", usuários carga<seed>.N, vendas CG<seed>...), e a
+mesma seed não pode ser gerada duas vezes no mesmo banco.
+
+Ao final os resumos das conversas, o volume por hora, as métricas de
+atendimento e os contadores por status são reconstruídos, já que
+bulk_create/COPY não passam pelo save().
+"""
+
+import logging
+import random
+from operator import attrgetter
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LoadSize:
+    pessoas: int
+    attendants: int
+    accounts: int
+    conversations: int
+    messages: int
+    caravanas: int
+    vendas: int
+
+
+PRESETS = {
+    "small": LoadSize(
+        pessoas=2_000, attendants=10, accounts=2, conversations=2_000,
+        messages=40_000, caravanas=10, vendas=500,
+    ),
+    "medium": LoadSize(
+        pessoas=50_000, attendants=50, accounts=3, conversations=50_000,
+        messages=1_000_000, caravanas=100, vendas=10_000,
+    ),
+    "large": LoadSize(
+        pessoas=500_000, attendants=200, accounts=5, conversations=400_000,
+        messages=8_000_000, caravanas=1_000, vendas=100_000,
+    ),
+}
+
+SIZE_FIELDS = tuple(f.name for f in fields(LoadSize))
+
+BLOQUEIOS_PER_CARAVANA = 4
+
+# Pessoas cadastradas em dobro (mesmo nome e telefone, outro documento)
+DUPLICATE_RATE = 0.01
+
+# Contatos sem cadastro de Pessoa
+UNLINKED_CONTACT_RATE = 0.4
+
+# Peso de cada hora do dia (fuso local) no início das conversas
+HOUR_WEIGHTS = (
+    1, 1, 1, 1, 1, 2, 4, 8, 14, 18, 20, 20,
+    16, 17, 19, 20, 19, 16, 12, 10, 8, 6, 4, 2,
+)
+
+PRIMEIROS_NOMES = (
+    "Ana", "Antônio", "Beatriz", "Bruno", "Camila", "Carlos", "Daniela", "Diego",
+    "Eduarda", "Eduardo", "Fernanda", "Felipe", "Gabriela", "Gustavo", "Helena",
+    "Henrique", "Isabela", "João", "Juliana", "José", "Larissa", "Lucas", "Luiz",
+    "Mariana", "Maria", "Marcos", "Natália", "Paulo", "Patrícia", "Pedro", "Rafaela",
+    "Rafael", "Sofia", "Thiago", "Vitória", "Vinícius",
+)
+
+SOBRENOMES = (
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves",
+    "Pereira", "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho",
+    "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa", "Rocha",
+    "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado",
+    "Mendes", "Freitas", "Cardoso", "Ramos", "Gonçalves", "Santana", "Teixeira",
+)
+
+# (cidade, UF)
+CIDADES = (
+    ("São Paulo", "SP"), ("Campinas", "SP"), ("Rio de Janeiro", "RJ"), ("Niterói", "RJ"),
+    ("Belo Horizonte", "MG"), ("Curitiba", "PR"), ("Joinville", "SC"), ("Porto Alegre", "RS"),
+    ("Brasília", "DF"), ("Goiânia", "GO"), ("Salvador", "BA"), ("Recife", "PE"),
+    ("Fortaleza", "CE"), ("Belém", "PA"), ("Manaus", "AM"), ("Vitória", "ES"),
+)
+
+DDDS = ("11", "21", "31", "41", "47", "51", "61", "62", "71", "81", "85", "91")
+
+DESTINOS = (
+    "Israel", "Jerusalém", "Roma", "Fátima", "Lisboa", "Paris", "Egito",
+    "Turquia", "Grécia", "Santiago de Compostela", "Orlando", "Buenos Aires",
+)
+
+INBOUND_TEXTS = (
+    "Olá, gostaria de informações sobre a caravana para {destino}",
+    "Qual o valor do pacote para {destino} em {mes}?",
+    "Ainda tem vaga para {destino}?",
+    "Posso parcelar no cartão em quantas vezes?",
+    "O seguro viagem está incluso?",
+    "Preciso de passaporte para {destino}?",
+    "Vou com minha esposa e dois filhos, tem desconto?",
+    "Já fiz o PIX, segue o comprovante",
+    "Qual o horário de saída do voo?",
+    "Obrigado!",
+    "Bom dia",
+    "Pode me ligar mais tarde?",
+)
+
+OUTBOUND_TEXTS = (
+    "Olá! Tudo bem? Sou da equipe comercial, vou te ajudar com a viagem para {destino}",
+    "O pacote para {destino} em {mes} está a partir de {valor} por pessoa",
+    "Temos sim, restam poucas vagas para {destino}",
+    "Pode parcelar em até 10x sem juros no cartão",
+    "O seguro viagem é opcional, posso incluir na sua reserva",
+    "Sim, para {destino} é necessário passaporte válido por 6 meses",
+    "Recebi o comprovante, obrigado! Vou confirmar sua reserva",
+    "Segue o roteiro completo da viagem",
+    "Fico à disposição!",
+)
+
+MESES = (
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho",
+    "agosto", "setembro", "outubro", "novembro", "dezembro",
+)
+
+# (tipo, peso) por direção
+INBOUND_TYPES = (("text", 88), ("image", 5), ("audio", 5), ("document", 2))
+OUTBOUND_TYPES = (("text", 90), ("template", 4), ("document", 4), ("image", 2))
+
+
+@dataclass
+class LoadResult:
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, name: str, total: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + total
+
+
+def resolve_size(preset: str, **overrides) -> LoadSize:
+    """Tamanho do preset com os totais informados substituídos"""
+    if preset not in PRESETS:
+        raise ValueError(f"Tamanho inválido: {preset} (opções: {', '.join(PRESETS)})")
+    values = {name: value for name, value in overrides.items() if value is not None}
+    invalid = [name for name, value in values.items() if name not in SIZE_FIELDS or value < 0]
+    if invalid:
+        raise ValueError(f"Totais inválidos: {', '.join(invalid)}")
+    return replace(PRESETS[preset], **values)
+
+
+def cpf(base: int) -> str:
+    """CPF válido (11 dígitos) a partir de um número de 9 dígitos"""
+    digits = [int(d) for d in f"{base:09d}"]
+    for length in (9, 10):
+        total = sum(d * weight for d, weight in zip(digits, range(length + 1, 1, -1)))
+        digits.append((total * 10 % 11) % 10)
+    return "".join(str(d) for d in digits)
+
+
+def copy_objects(model, objects: Iterable) -> int:
+    """
+    Grava os objetos com COPY ... FROM STDIN (sem RETURNING dos ids)
+
+    Lê os atributos direto dos objetos: auto_now/auto_now_add recebem o
+    horário da gravação e só os campos JSON passam pelo get_db_prep_save.
+    Campos gerados pelo banco ficam de fora.
+    """
+    columns = [f for f in model._meta.concrete_fields if not f.primary_key and not f.generated]
+    quote = connection.ops.quote_name
+    sql = (
+        f"COPY {quote(model._meta.db_table)} "
+        f"({', '.join(quote(f.column) for f in columns)}) FROM STDIN"
+    )
+    now = timezone.now()
+    getters = []
+    for f in columns:
+        if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False):
+            getters.append(lambda obj: now)
+        elif f.get_internal_type() == "JSONField":
+            getters.append(lambda obj, f=f: f.get_db_prep_save(getattr(obj, f.attname), connection))
+        else:
+            getters.append(attrgetter(f.attname))
+
+    total = 0
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(sql) as copy:
+            for obj in objects:
+                copy.write_row([getter(obj) for getter in getters])
+                total += 1
+    return total
+
+
+class LoadDataGenerator:
+    """
+    Gera a massa de dados de um tamanho (LoadSize) para uma seed
+
+    Args:
+        size: Totais a gerar
+        seed: Semente dos números aleatórios (e identificador dos registros)
+        days: Período do histórico de conversas e vendas
+        batch_size: Linhas por lote de bulk_create/COPY
+        use_copy: Grava as mensagens com COPY (padrão) em vez de bulk_create
+        rollups: Reconstrói resumos, volume, métricas e contadores ao final
+        log: Função chamada com as mensagens de progresso
+    """
+
+    def __init__(
+        self,
+        size: LoadSize,
+        seed: int = 1,
+        days: int = 365,
+        batch_size: int = 5000,
+        use_copy: bool = True,
+        rollups: bool = True,
+        log: Optional[Callable[[str], None]] = None,
+        now: Optional[datetime] = None,
+    ):
+        if days < 1 or batch_size < 1 or size.attendants < 1 or size.accounts < 1:
+            raise ValueError("days, batch_size, attendants e accounts devem ser maiores que zero")
+        if size.pessoas <= size.attendants:
+            raise ValueError("pessoas deve ser maior que attendants (os atendentes também são Pessoas)")
+        self.size = size
+        self.seed = seed
+        self.days = days
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.rollups = rollups
+        self.log = log or logger.info
+        self.now = now or timezone.now()
+        self.rng = random.Random(seed)
+        # Nomes e cidades com sequência própria: não alteram os demais sorteios
+        self.nomes = random.Random(f"nomes-{seed}")
+        self.tag = f"carga{seed}"
+        self.result = LoadResult()
+
+    # Pessoas -------------------------------------------------------------
+
+    def _doc_base(self, index: int) -> int:
+        # 10 milhões de documentos por seed, sem colisão entre seeds
+        return (self.seed % 90 + 10) * 10_000_000 + index
+
+    def _phone(self, index: int) -> str:
+        # Multiplicação por primo módulo 10^8: único por índice e espalhado
+        return f"9{(index * 7919 + self.seed * 104_729) % 100_000_000:08d}"
+
+    def _nome(self) -> str:
+        sobrenomes = self.nomes.sample(SOBRENOMES, self.nomes.choice((1, 2, 2, 3)))
+        return " ".join([self.nomes.choice(PRIMEIROS_NOMES), *sobrenomes])
+
+    def build_pessoas(self, start: int, count: int) -> List:
+        """Pessoas físicas (não salvas) dos índices start..start+count"""
+        from core.models import Pessoa
+
+        pessoas = []
+        for index in range(start, start + count):
+            nome = self._nome()
+            cidade, estado = self.nomes.choice(CIDADES)
+            sexo = self.rng.choice(("Masculino", "Feminino"))
+            ddd = DDDS[index % len(DDDS)]
+            pessoas.append(Pessoa(
+                nome=nome,
+                slug=slugify(nome),
+                doc=cpf(self._doc_base(index)),
+                tipo_doc="CPF",
+                sexo=sexo,
+                nascimento=self.now.date() - timedelta(days=self.rng.randint(18 * 365, 85 * 365)),
+                cidade=cidade,
+                estado=estado,
+                email1=f"{slugify(nome).replace('-', '.')}.{index}@{self.tag}.example.com",
+                ddi1="55",
+                ddd1=ddd,
+                telefone1=self._phone(index),
+            ))
+        return pessoas
+
+    def _duplicates(self, originals: List, start: int) -> List:
+        from core.models import Pessoa
+
+        duplicates = []
+        for offset, original in enumerate(originals):
+            nome = original.nome.upper() if self.rng.random() < 0.5 else original.nome
+            duplicates.append(Pessoa(
+                nome=nome,
+                slug=slugify(nome),
+                doc=cpf(self._doc_base(start + offset)),
+                tipo_doc="CPF",
+                sexo=original.sexo,
+                nascimento=original.nascimento,
+                email1=original.email1,
+                ddi1=original.ddi1,
+                ddd1=original.ddd1,
+                telefone1=original.telefone1,
+            ))
+        return duplicates
+
+    def generate_pessoas(self) -> List[int]:
+        from core.models import Pessoa
+        from core.services import pessoa_telefones
+
+        ids = []
+        duplicate_index = self.size.pessoas
+        for start in range(0, self.size.pessoas, self.batch_size):
+            batch = self.build_pessoas(start, min(self.batch_size, self.size.pessoas - start))
+            originals = [p for p in batch if self.rng.random() < DUPLICATE_RATE]
+            batch += self._duplicates(originals, duplicate_index)
+            duplicate_index += len(originals)
+            created = Pessoa.objects.bulk_create(batch)
+            # bulk_create não passa pelo save(): índice de telefones à parte
+            pessoa_telefones.indexar(created)
+            ids.extend(p.pk for p in created[:len(created) - len(originals)])
+            self.result.add("pessoas", len(created))
+        self.log(f"{self.result.counts.get('pessoas', 0)} pessoa(s)")
+        return ids
+
+    # Usuários e contas ----------------------------------------------------
+
+    def generate_attendants(self, pessoa_ids: List[int]) -> List[int]:
+        from django.contrib.auth.models import Group
+        from core.models import Usuario
+
+        comercial, _ = Group.objects.get_or_create(name="Comercial")
+        password = make_password(None)
+        users = Usuario.objects.bulk_create([
+            Usuario(username=f"{self.tag}.{index}", pessoa_id=pessoa_id, password=password)
+            for index, pessoa_id in enumerate(pessoa_ids[:self.size.attendants])
+        ])
+        Usuario.groups.through.objects.bulk_create([
+            Usuario.groups.through(usuario_id=user.pk, group_id=comercial.pk) for user in users
+        ])
+        self.result.add("usuarios", len(users))
+        return [user.pk for user in users]
+
+    def generate_accounts(self, responsavel_id: int) -> List:
+        from core.models import WhatsAppAccount
+
+        accounts = WhatsAppAccount.objects.bulk_create([
+            WhatsAppAccount(
+                name=f"Carga {self.seed} #{index + 1}",
+                phone_number=f"+55119{self.seed % 10_000:04d}{index:04d}",
+                phone_number_id=f"{self.tag}-{index}",
+                business_account_id=f"{self.tag}-{index}",
+                access_token=self.tag,
+                responsavel_id=responsavel_id,
+                is_active=False,
+            )
+            for index in range(self.size.accounts)
+        ])
+        self.result.add("contas", len(accounts))
+        return accounts
+
+    # Conversas e mensagens --------------------------------------------------
+
+    def _start_moment(self) -> datetime:
+        """Início de conversa: mais recentes, dias úteis e horário comercial"""
+        first_day = timezone.localdate(self.now) - timedelta(days=self.days - 1)
+        while True:
+            day = first_day + timedelta(days=int(self.rng.random() ** 0.6 * self.days))
+            if day.weekday() < 5 or self.rng.random() < 0.4:
+                break
+        hour = self.rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        moment = timezone.make_aware(datetime.combine(day, time(hour))) + timedelta(
+            seconds=self.rng.randint(0, 3599)
+        )
+        return min(moment, self.now - timedelta(minutes=5))
+
+    def _text(self, direction: str) -> str:
+        texts = INBOUND_TEXTS if direction == "inbound" else OUTBOUND_TEXTS
+        return self.rng.choice(texts).format(
+            destino=self.rng.choice(DESTINOS),
+            mes=self.rng.choice(MESES),
+            valor=f"R$ {self.rng.randrange(4_000, 25_000, 500):,}".replace(",", "."),
+        )
+
+    def _plan(self, total: int):
+        """Horários e direções das mensagens de uma conversa"""
+        moment = self._start_moment()
+        direction = "inbound"
+        plan = []
+        for _ in range(total):
+            if moment > self.now:
+                break
+            plan.append((moment, direction))
+            same = self.rng.random() < 0.35
+            if not same:
+                direction = "outbound" if direction == "inbound" else "inbound"
+            if same:
+                gap = self.rng.uniform(5, 90)  # rajada do mesmo lado
+            elif direction == "outbound":
+                gap = self.rng.lognormvariate(5.2, 1.1)  # resposta do atendente (~3 min)
+            else:
+                gap = self.rng.lognormvariate(6.5, 1.6)  # retorno do cliente
+            if self.rng.random() < 0.03:
+                gap += self.rng.uniform(3600, 3 * 86400)  # conversa retomada depois
+            moment += timedelta(seconds=gap)
+        return plan
+
+    def _conversation_status(self, last_at: datetime):
+        if self.now - last_at > timedelta(days=3):
+            return self.rng.choices(("resolved", "closed", "in_progress"), weights=(85, 10, 5))[0]
+        return self.rng.choices(("pending", "assigned", "in_progress", "resolved"), weights=(30, 15, 40, 15))[0]
+
+    def _message(self, conversation, moment, direction, attendant_id, read, index):
+        from core.models import WhatsAppMessage
+
+        types = INBOUND_TYPES if direction == "inbound" else OUTBOUND_TYPES
+        message_type = self.rng.choices([t for t, _ in types], weights=[w for _, w in types])[0]
+        content = self._text(direction) if message_type in ("text", "template") else ""
+        if direction == "inbound":
+            status = "read" if read else "delivered"
+        else:
+            status = self.rng.choices(("read", "delivered", "sent", "failed"), weights=(75, 20, 4, 1))[0]
+        return WhatsAppMessage(
+            wamid=f"wamid.{self.tag}.{conversation.pk}.{index}",
+            account_id=conversation.account_id,
+            contact_id=conversation.contact_id,
+            conversation_id=conversation.pk,
+            direction=direction,
+            message_type=message_type,
+            content=content,
+            media_id=f"{self.tag}-{conversation.pk}-{index}" if not content else "",
+            status=status,
+            timestamp=moment,
+            delivered_at=moment + timedelta(seconds=2) if status in ("delivered", "read") else None,
+            read_at=moment + timedelta(seconds=self.rng.randint(5, 600)) if status == "read" else None,
+            sent_by_id=attendant_id if direction == "outbound" else None,
+        )
+
+    def _write_messages(self, messages: List) -> None:
+        from core.models import WhatsAppMessage
+
+        if self.use_copy:
+            copy_objects(WhatsAppMessage, messages)
+        else:
+            WhatsAppMessage.objects.bulk_create(messages, batch_size=self.batch_size)
+        self.result.add("mensagens", len(messages))
+
+    def generate_whatsapp(self, accounts: List, pessoas: List[int], attendant_ids: List[int]) -> None:
+        from core.models import Pessoa, WhatsAppContact, WhatsAppConversation
+
+        total = self.size.conversations
+        mean = self.size.messages / total if total else 0
+        contacts_total = max(1, int(total * 0.8)) if total else 0
+        contacts = []
+        for start in range(0, contacts_total, self.batch_size):
+            indexes = range(start, min(start + self.batch_size, contacts_total))
+            # Só os primeiros contatos têm Pessoa (um contato por Pessoa)
+            linked = [
+                index for index in indexes
+                if index < len(pessoas) and self.rng.random() >= UNLINKED_CONTACT_RATE
+            ]
+            cadastros = {
+                pk: (nome, ddd, telefone)
+                for pk, nome, ddd, telefone in Pessoa.objects.filter(
+                    pk__in=[pessoas[index] for index in linked]
+                ).values_list("pk", "nome", "ddd1", "telefone1")
+            }
+            linked = set(linked)
+            batch = []
+            for index in indexes:
+                pessoa_id = pessoas[index] if index in linked else None
+                if pessoa_id:
+                    name, ddd, telefone = cadastros[pessoa_id]
+                    number = f"55{ddd}{telefone}"
+                else:
+                    # Números fora da faixa das pessoas
+                    number = f"55{DDDS[index % len(DDDS)]}{self._phone(self.size.pessoas * 2 + index)}"
+                    name = self.nomes.choice(PRIMEIROS_NOMES) if self.rng.random() < 0.7 else ""
+                batch.append(WhatsAppContact(
+                    account=accounts[index % len(accounts)],
+                    phone_number=f"+{number}",
+                    name=name,
+                    profile_name=name,
+                    pessoa_id=pessoa_id,
+                ))
+            contacts.extend(WhatsAppContact.objects.bulk_create(batch))
+        self.result.add("contatos", len(contacts))
+
+        for start in range(0, total, self.batch_size):
+            plans, conversations = [], []
+            for _ in range(min(self.batch_size, total - start)):
+                contact = self.rng.choice(contacts)
+                # Quantidade de mensagens exponencial em torno da média (poucas conversas longas)
+                plan = self._plan(min(int(self.rng.expovariate(1 / mean)) + 1, int(mean * 10) + 1) if mean else 1)
+                last_at = plan[-1][0]
+                status = self._conversation_status(last_at)
+                attendant_id = self.rng.choice(attendant_ids) if status != "pending" and attendant_ids else None
+                plans.append((plan, attendant_id, status))
+                conversations.append(WhatsAppConversation(
+                    account_id=contact.account_id,
+                    contact_id=contact.pk,
+                    status=status,
+                    assigned_to_id=attendant_id,
+                    priority=self.rng.choices(("low", "medium", "high", "urgent"), weights=(20, 60, 15, 5))[0],
+                    first_message_at=plan[0][0],
+                    assigned_at=plan[0][0] + timedelta(minutes=self.rng.randint(1, 30)) if attendant_id else None,
+                    resolved_at=last_at if status in ("resolved", "closed") else None,
+                ))
+            conversations = WhatsAppConversation.objects.bulk_create(conversations)
+            self.result.add("conversas", len(conversations))
+
+            messages = []
+            for conversation, (plan, attendant_id, status) in zip(conversations, plans):
+                read = status in ("resolved", "closed", "in_progress")
+                for index, (moment, direction) in enumerate(plan):
+                    messages.append(self._message(conversation, moment, direction, attendant_id, read, index))
+                if len(messages) >= self.batch_size:
+                    self._write_messages(messages)
+                    messages = []
+            if messages:
+                self._write_messages(messages)
+            self.log(f"{self.result.counts['conversas']} conversa(s), {self.result.counts.get('mensagens', 0)} mensagem(ns)")
+
+    # Caravanas, vendas e pagamentos --------------------------------------
+
+    def generate_caravanas(self, pessoas: List[int]) -> List:
+        from core.models import Bloqueio, Caravana, Pessoa
+
+        empresas = Pessoa.objects.bulk_create([
+            Pessoa(
+                nome=f"Operadora Carga {self.seed}-{index}",
+                slug=slugify(f"Operadora Carga {self.seed}-{index}"),
+                doc=f"{(self.seed % 90 + 10):02d}{index:012d}",
+                tipo_doc="CNPJ",
+                empresa_gruporom=True,
+                tipo_empresa="Turismo",
+                email1=f"contato{index}@{self.tag}.example.com",
+            )
+            for index in range(3)
+        ])
+        self.result.add("pessoas", len(empresas))
+
+        first_day = timezone.localdate(self.now) - timedelta(days=self.days)
+        caravanas = Caravana.objects.bulk_create([
+            Caravana(
+                nome=f"Caravana {self.rng.choice(DESTINOS)} {index + 1}",
+                empresa_id=self.rng.choice(empresas).pk,
+                promotor_id=self.rng.choice(pessoas),
+                responsavel_id=self.rng.choice(pessoas),
+                tipo=self.rng.choice(("Evangélica", "Católica", "Lazer", "Mentoria")),
+                repasse_valor=Decimal(self.rng.randrange(100, 600, 50)),
+                repasse_tipo=self.rng.choice(("Total", "Por Passageiro")),
+                quantidade=self.rng.randrange(40, 121, 5),
+                data_contrato=first_day + timedelta(days=self.rng.randint(0, self.days)),
+            )
+            for index in range(self.size.caravanas)
+        ], batch_size=self.batch_size)
+
+        bloqueios = []
+        for caravana in caravanas:
+            for index in range(BLOQUEIOS_PER_CARAVANA):
+                preco = Decimal(self.rng.randrange(4_000, 25_000, 100))
+                dolar = self.rng.random() < 0.6
+                bloqueios.append(Bloqueio(
+                    caravana=caravana,
+                    descricao=f"Saída {index + 1}",
+                    saida=caravana.data_contrato + timedelta(days=self.rng.randint(60, 300)),
+                    # calcular_totais() divide o valor do bloqueio pela quantidade da caravana
+                    valor=preco * caravana.quantidade,
+                    taxas=Decimal(self.rng.randrange(200, 1_500, 50)),
+                    moeda_valor="Dólar" if dolar else "Real",
+                    moeda_taxas="Dólar" if dolar else "Real",
+                ))
+        bloqueios = Bloqueio.objects.bulk_create(bloqueios, batch_size=self.batch_size)
+        self.result.add("caravanas", len(caravanas))
+        self.result.add("bloqueios", len(bloqueios))
+        return bloqueios
+
+    def _venda_status(self, saida) -> str:
+        if saida < timezone.localdate(self.now):
+            return self.rng.choices(("concluida", "cancelada"), weights=(90, 10))[0]
+        return self.rng.choices(("pre-venda", "confirmada", "cancelada"), weights=(20, 70, 10))[0]
+
+    def _pagamentos(self, venda, status: str) -> List:
+        from core.models import Pagamento
+
+        if status == "pre-venda" or venda.valor_total <= 0:
+            return []
+        parcelas = self.rng.choice((1, 1, 2, 3, 5, 10))
+        valor = (venda.valor_total / parcelas).quantize(Decimal("0.01"))
+        forma = self.rng.choice(("pix", "cartao_credito", "boleto", "transferencia"))
+        pagas = parcelas if status == "concluida" else self.rng.randint(1, parcelas)
+        pagamentos = []
+        for parcela in range(1, parcelas + 1):
+            # Última parcela absorve o arredondamento
+            parcela_valor = venda.valor_total - valor * (parcelas - 1) if parcela == parcelas else valor
+            data = venda.data_venda + timedelta(days=30 * (parcela - 1))
+            if status == "cancelada":
+                situacao = "estornado" if parcela <= pagas else "cancelado"
+            else:
+                situacao = "confirmado" if parcela <= pagas else "pendente"
+            pagamentos.append(Pagamento(
+                venda=venda, forma_pagamento=forma, valor=parcela_valor,
+                data_pagamento=data, data_confirmacao=data if situacao == "confirmado" else None,
+                status=situacao, parcela=parcela, total_parcelas=parcelas,
+            ))
+        return pagamentos
+
+    def generate_vendas(self, bloqueios: List, pessoas: List[int], vendedor_ids: List[int]) -> None:
+        from core.models import Pagamento, Passageiro, ReservaLugar, VendaBloqueio
+        from core.services import estoque_lugares, venda_resumo
+
+        if not bloqueios or not pessoas or not vendedor_ids:
+            return
+        # Vagas restantes de cada caravana (compartilhadas pelos bloqueios,
+        # como no estoque de lugares) e próxima pessoa (distinta) de cada bloqueio
+        vagas = {b.caravana_id: b.caravana.quantidade for b in bloqueios}
+        cursor = {b.pk: self.rng.randrange(len(pessoas)) for b in bloqueios}
+        abertos = list(bloqueios)
+        numero = 0
+
+        while numero < self.size.vendas and abertos:
+            vendas, passageiros = [], []
+            for _ in range(min(self.batch_size, self.size.vendas - numero)):
+                if not abertos:
+                    break
+                bloqueio = self.rng.choice(abertos)
+                quantidade = min(self.rng.choices((1, 2, 3, 4, 5), weights=(25, 40, 15, 15, 5))[0], vagas[bloqueio.caravana_id], len(pessoas))
+                vagas[bloqueio.caravana_id] -= quantidade
+                if vagas[bloqueio.caravana_id] <= 0:
+                    abertos = [b for b in abertos if b.caravana_id != bloqueio.caravana_id]
+                membros = [pessoas[(cursor[bloqueio.pk] + k) % len(pessoas)] for k in range(quantidade)]
+                cursor[bloqueio.pk] += quantidade
+
+                status = self._venda_status(bloqueio.saida)
+                data_venda = timezone.make_aware(datetime.combine(
+                    bloqueio.saida - timedelta(days=self.rng.randint(20, 240)), time(self.rng.randint(8, 19))
+                ))
+                data_venda = min(data_venda, self.now)
+                valor_passageiros = (bloqueio.valor / bloqueio.caravana.quantidade * quantidade).quantize(Decimal("0.01"))
+                valor_seguro = Decimal(150 * quantidade) if self.rng.random() < 0.3 else Decimal("0")
+                valor_taxas = bloqueio.taxas * quantidade
+                valor_desconto = Decimal(self.rng.choice((0, 0, 0, 100, 250, 500)))
+                venda = VendaBloqueio(
+                    codigo=f"CG{self.seed % 100:02d}{numero:08d}",
+                    bloqueio=bloqueio,
+                    cliente_id=membros[0],
+                    vendedor_id=self.rng.choice(vendedor_ids),
+                    status=status,
+                    data_venda=data_venda,
+                    data_confirmacao=data_venda + timedelta(days=2) if status in ("confirmada", "concluida") else None,
+                    data_cancelamento=data_venda + timedelta(days=10) if status == "cancelada" else None,
+                    data_viagem=bloqueio.saida,
+                    valor_passageiros=valor_passageiros,
+                    valor_seguro=valor_seguro,
+                    valor_taxas=valor_taxas,
+                    valor_desconto=valor_desconto,
+                    valor_total=valor_passageiros + valor_seguro + valor_taxas - valor_desconto,
+                    numero_passageiros=quantidade,
+                    possui_seguro=valor_seguro > 0,
+                    motivo_cancelamento="Desistência do cliente" if status == "cancelada" else "",
+                )
+                vendas.append((venda, membros))
+                numero += 1
+
+            created = VendaBloqueio.objects.bulk_create([venda for venda, _ in vendas], batch_size=self.batch_size)
+            pagamentos, reservas = [], []
+            expira_em = self.now + timedelta(minutes=estoque_lugares.reserva_minutos())
+            for venda, membros in vendas:
+                parcelas = self._pagamentos(venda, venda.status)
+                venda.valor_pago = sum((p.valor for p in parcelas if p.status == "confirmado"), Decimal("0"))
+                venda.valor_pendente = venda.valor_total - venda.valor_pago
+                pagamentos.extend(parcelas)
+                passageiros.extend(
+                    Passageiro(pessoa_id=pessoa_id, bloqueio_id=venda.bloqueio_id, venda=venda)
+                    for pessoa_id in membros
+                )
+                if venda.status != "cancelada":
+                    pre_venda = venda.status == "pre-venda"
+                    reservas.append(ReservaLugar(
+                        venda=venda, caravana_id=venda.bloqueio.caravana_id, bloqueio_id=venda.bloqueio_id,
+                        quantidade=venda.numero_passageiros,
+                        status=estoque_lugares.RESERVADO if pre_venda else estoque_lugares.VENDIDO,
+                        expira_em=expira_em if pre_venda else None,
+                    ))
+            VendaBloqueio.objects.bulk_update(
+                [venda for venda, _ in vendas], ["valor_pago", "valor_pendente"], batch_size=self.batch_size
+            )
+            Passageiro.objects.bulk_create(passageiros, batch_size=self.batch_size)
+            Pagamento.objects.bulk_create(pagamentos, batch_size=self.batch_size)
+            ReservaLugar.objects.bulk_create(reservas, batch_size=self.batch_size)
+            self.result.add("vendas", len(created))
+            self.result.add("passageiros", len(passageiros))
+            self.result.add("pagamentos", len(pagamentos))
+        estoque_lugares.reconciliar({b.caravana_id for b in bloqueios})
+        # Vendas e pagamentos em massa não passam pelo save()
+        venda_resumo.reconciliar()
+        self.log(f"{self.result.counts.get('vendas', 0)} venda(s), {self.result.counts.get('pagamentos', 0)} pagamento(s)")
+
+    # Execução -------------------------------------------------------------
+
+    def rebuild_rollups(self, accounts: List) -> None:
+        from core.models import WhatsAppConversation, WhatsAppMessage
+        from core.services import whatsapp_analytics, whatsapp_counters, whatsapp_summary, whatsapp_volume
+
+        # Estatísticas do planejador atualizadas depois da carga em massa
+        with connection.cursor() as cursor:
+            for model in (WhatsAppConversation, WhatsAppMessage):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+        conversations = WhatsAppConversation.objects.filter(account__in=accounts)
+        whatsapp_summary.rebuild_summaries(conversations)
+        # last_activity é auto_now: volta para a última mensagem gerada
+        conversations.filter(last_message_at__isnull=False).update(last_activity=F("last_message_at"))
+        whatsapp_volume.rebuild_volume(since=self.now - timedelta(days=self.days + 1))
+        whatsapp_analytics.rebuild_response_stats()
+        whatsapp_counters.reconcile_status_counts()
+        self.log("Resumos, volume, métricas e contadores reconstruídos")
+
+    def run(self) -> LoadResult:
+        from core.models import WhatsAppAccount
+
+        if WhatsAppAccount.objects.filter(phone_number_id__startswith=f"{self.tag}-").exists():
+            raise ValueError(f"Dados da seed {self.seed} já existem neste banco - use outra --seed")
+
+        with transaction.atomic():
+            pessoas = self.generate_pessoas()
+            attendants = self.generate_attendants(pessoas)
+            clientes = pessoas[len(attendants):] or pessoas
+            accounts = self.generate_accounts(attendants[0])
+            self.generate_whatsapp(accounts, clientes, attendants)
+            bloqueios = self.generate_caravanas(clientes)
+            self.generate_vendas(bloqueios, clientes, attendants)
+
+        if self.rollups:
+            self.rebuild_rollups(accounts)
+        return self.result
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Busca de pessoas (listagens e autocompletes)
+
+A busca usa as colunas geradas de Pessoa, todas com índices GIN de trigramas
+(ver migração 0045):
+- nome_busca: nome em minúsculas e sem acentos ("João" e "joao" casam);
+- doc_busca: documento só com letras e dígitos (CPF com ou sem pontuação);
+- telefones_busca: DDI+DDD+número dos três telefones, só dígitos;
+- emails_busca: os três emails em minúsculas.
+
+O termo passa pela mesma normalização em Python (normalizar()). Cada palavra
+do termo precisa aparecer no nome; documento, telefone e email são buscados
+pelo termo inteiro. Os resultados vêm ordenados por relevância: documento
+exato, nome começando pelo termo, palavra do nome começando pelo termo, e
+por fim os demais.
+
+Os autocompletes consultam a cada tecla: buscar() guarda os ids encontrados
+por termo num cache curto, invalidado quando uma pessoa é gravada (ver
+core/signals.py).
+"""
+
+import hashlib
+import logging
+import re
+from typing import List
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+
+logger = logging.getLogger(__name__)
+
+# Termos menores não são buscados
+MIN_CARACTERES = 2
+# Documento e telefone só são buscados a partir desta quantidade de dígitos
+MIN_DIGITOS = 3
+
+LIMITE = 20
+
+CACHE_TIMEOUT = 60
+VERSION_KEY = "pessoa_busca:versao"
+
+_TABELA = str.maketrans(
+    "ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ",
+    "AAAAAEEEEIIIIOOOOOUUUUCNaaaaaeeeeiiiiooooouuuucn",
+)
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples (igual a nome_busca)"""
+    return " ".join((texto or "").translate(_TABELA).lower().split())
+
+
+def so_documento(texto: str) -> str:
+    """Só letras e dígitos, em minúsculas (igual a doc_busca)"""
+    return re.sub(r"[^0-9a-z]", "", (texto or "").lower())
+
+
+def filtrar(queryset, termo: str):
+    """
+    Filtra e ordena pessoas pela busca
+
+    Args:
+        queryset: Pessoas candidatas (já filtradas pela tela)
+        termo: Texto digitado pelo usuário
+
+    Returns:
+        QuerySet anotado com busca_rank, ordenado por relevância e nome
+        (sem termo, o próprio queryset)
+    """
+    termo = normalizar(termo)
+    if not termo:
+        return queryset
+
+    nome = Q()
+    for palavra in termo.split():
+        nome &= Q(nome_busca__contains=palavra)
+    criterios = nome | Q(emails_busca__contains=termo)
+
+    documento = so_documento(termo)
+    digitos = re.sub(r"\D", "", termo)
+    if len(digitos) >= MIN_DIGITOS:
+        criterios |= Q(doc_busca__contains=documento) | Q(telefones_busca__contains=digitos)
+
+    relevancia = [When(doc_busca=documento, then=Value(4))] if documento else []
+    relevancia += [
+        When(nome_busca__startswith=termo, then=Value(3)),
+        When(nome_busca__contains=f" {termo}", then=Value(2)),
+        When(nome, then=Value(1)),
+    ]
+    rank = Case(*relevancia, default=Value(0), output_field=IntegerField())
+    return queryset.filter(criterios).annotate(busca_rank=rank).order_by("-busca_rank", "nome", "pk")
+
+
+def _versao() -> int:
+    try:
+        return cache.get_or_set(VERSION_KEY, 1, None)
+    except Exception:
+        return 0
+
+
+def _chave(escopo: str, termo: str, limite: int) -> str:
+    resumo = hashlib.md5(f"{escopo}|{limite}|{termo}".encode()).hexdigest()
+    return f"pessoa_busca:{_versao()}:{resumo}"
+
+
+def buscar(termo: str, queryset=None, escopo: str = "todas", limite: int = LIMITE) -> List:
+    """
+    Pessoas mais relevantes para o termo (autocompletes)
+
+    Args:
+        termo: Texto digitado
+        queryset: Pessoas candidatas (padrão: todas)
+        escopo: Identifica o queryset no cache - telas com filtros diferentes
+            precisam de escopos diferentes
+        limite: Quantidade máxima de resultados
+
+    Returns:
+        Lista de Pessoa (vazia para termos curtos)
+    """
+    from core.models import Pessoa
+
+    termo = normalizar(termo)
+    if len(termo) < MIN_CARACTERES:
+        return []
+    if queryset is None:
+        queryset = Pessoa.objects.all()
+
+    chave = _chave(escopo, termo, limite)
+    try:
+        ids = cache.get(chave)
+    except Exception as e:
+        logger.warning(f"Cache indisponível para a busca de pessoas: {e}")
+        ids = None
+
+    if ids is None:
+        ids = list(filtrar(queryset, termo).values_list("pk", flat=True)[:limite])
+        try:
+            cache.set(chave, ids, CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar a busca de pessoas no cache: {e}")
+
+    pessoas = Pessoa.objects.in_bulk(ids)
+    return [pessoas[pk] for pk in ids if pk in pessoas]
+
+
+def por_documento(documento: str):
+    """Pessoa com o documento (com ou sem pontuação) ou o número do passaporte"""
+    from core.models import Pessoa
+
+    documento = so_documento(documento)
+    if not documento:
+        return None
+    return Pessoa.objects.filter(
+        Q(doc_busca=documento) | Q(passaporte_numero__iexact=documento)
+    ).order_by("pk").first()
+
+
+def _incrementar_versao():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Chave ainda não existe (ou expirou) - qualquer valor novo serve
+        cache.add(VERSION_KEY, 2, None)
+    except Exception as e:
+        logger.warning(f"Não foi possível invalidar a busca de pessoas: {e}")
+
+
+def invalidar():
+    """Descarta as buscas em cache (pessoa criada, alterada ou removida)"""
+    _incrementar_versao()
+    # De novo após o commit: uma busca concorrente pode ter gravado no
+    # cache o resultado lido antes do commit
+    transaction.on_commit(_incrementar_versao)
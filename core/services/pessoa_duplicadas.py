@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Detecção e mesclagem de pessoas duplicadas
+
+detectar() não compara todos os pares: só pessoas que compartilham alguma
+chave de bloqueio são comparadas:
+- documento normalizado (doc_busca: CPF com ou sem pontuação);
+- email em minúsculas;
+- telefone do índice E.164 (PessoaTelefone), na forma sem o nono dígito;
+- chave fonética do primeiro e do último nome ("Luiz"/"Luis",
+  "Thiago"/"Tiago").
+
+Blocos com mais de MAX_BLOCO pessoas (nomes muito comuns, emails genéricos)
+são ignorados. Um par presente em vários blocos é comparado uma vez só (no
+bloco de menor chave). Cada par recebe uma pontuação de 0 a 1 e os que
+atingem LIMIAR vão para a fila de revisão (PessoaDuplicada); pares
+descartados na revisão não voltam.
+
+mesclar() junta duas pessoas numa transação: tudo o que aponta para a pessoa
+removida (passageiros, vendas, usuário, colaborador, fornecedor, contatos
+WhatsApp, caravanas...) passa para a mantida, que também recebe os emails,
+telefones e campos vazios da outra.
+"""
+
+import logging
+import re
+import sys
+from decimal import Decimal
+from difflib import SequenceMatcher
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, FrozenSet, List, NamedTuple, Set, Tuple
+
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from core.services import pessoa_busca, pessoa_telefones
+from core.services.exceptions import MesclagemError
+
+logger = logging.getLogger(__name__)
+
+LIMIAR = 0.6
+MAX_BLOCO = 50
+BATCH_SIZE = 5000
+
+# Documentos menores não formam bloco (ex.: "0", "123")
+MIN_DOCUMENTO = 5
+
+PESOS = {
+    "documento": 0.5,
+    "email": 0.25,
+    "telefone": 0.25,
+    "nome": 0.3,
+    "nascimento": 0.15,
+}
+# Documentos ou nascimentos diferentes indicam pessoas diferentes
+PENALIDADE_DOCUMENTO = 0.2
+PENALIDADE_NASCIMENTO = 0.3
+# Semelhança mínima dos nomes para pontuar
+SEMELHANCA_NOME = 0.8
+
+PARTICULAS = {"de", "da", "do", "das", "dos", "e"}
+
+_FONETICA = [(re.compile(padrao), troca) for padrao, troca in (
+    (r"ph", "f"),
+    (r"th", "t"),
+    (r"lh", "li"),
+    (r"nh", "ni"),
+    (r"[cs]h", "x"),
+    (r"c([ei])", r"s\1"),
+    (r"g([ei])", r"j\1"),
+    (r"gu([ei])", r"g\1"),
+    (r"qu", "k"),
+    (r"[cq]", "k"),
+    (r"kt", "t"),
+    (r"y", "i"),
+    (r"w", "v"),
+    (r"z", "s"),
+    (r"h", ""),
+)]
+_VOGAIS = re.compile(r"[aeiou]")
+_REPETIDAS = re.compile(r"(.)\1+")
+_NAO_LETRAS = re.compile(r"[^a-z]")
+
+
+class Deteccao(NamedTuple):
+    pessoas: int
+    comparacoes: int
+    pares: int
+    blocos_ignorados: int
+
+
+class _Dados(NamedTuple):
+    nome: str
+    documento: str
+    nascimento: object
+    emails: FrozenSet[str]
+
+
+def _palavras(nome: str) -> List[str]:
+    palavras = (_NAO_LETRAS.sub("", palavra) for palavra in pessoa_busca.normalizar(nome).split())
+    return [palavra for palavra in palavras if palavra and palavra not in PARTICULAS]
+
+
+# Nomes se repetem muito: cada palavra é codificada uma vez
+@lru_cache(maxsize=100_000)
+def _fonetica(palavra: str) -> str:
+    for padrao, troca in _FONETICA:
+        palavra = padrao.sub(troca, palavra)
+    if not palavra:
+        return ""
+    return _REPETIDAS.sub(r"\1", palavra[0] + _VOGAIS.sub("", palavra[1:]))
+
+
+def _chave(palavras: List[str]) -> str:
+    codigos = [codigo for codigo in map(_fonetica, palavras) if codigo]
+    if len(codigos) > 1:
+        codigos = [codigos[0], codigos[-1]]
+    return " ".join(codigos)
+
+
+def chave_fonetica(nome: str) -> str:
+    """Código fonético do primeiro e do último nome ("" se não houver)"""
+    return _chave(_palavras(nome))
+
+
+def _telefone(numero: str) -> str:
+    """Forma do número usada no bloco (celular brasileiro sem o nono dígito)"""
+    return min(pessoa_telefones.variantes(numero), key=len)
+
+
+def _pontuar(a: _Dados, b: _Dados, telefones_a: Set[str], telefones_b: Set[str]) -> Tuple[float, List[str]]:
+    pontos, motivos = 0.0, []
+
+    if a.documento and b.documento:
+        if a.documento == b.documento:
+            pontos += PESOS["documento"]
+            motivos.append("documento")
+        else:
+            pontos -= PENALIDADE_DOCUMENTO
+    if a.emails & b.emails:
+        pontos += PESOS["email"]
+        motivos.append("email")
+    if telefones_a & telefones_b:
+        pontos += PESOS["telefone"]
+        motivos.append("telefone")
+
+    semelhanca = SequenceMatcher(None, a.nome, b.nome).ratio()
+    if semelhanca >= SEMELHANCA_NOME:
+        pontos += PESOS["nome"] * semelhanca
+        motivos.append("nome")
+
+    if a.nascimento and b.nascimento:
+        if a.nascimento == b.nascimento:
+            pontos += PESOS["nascimento"]
+            motivos.append("nascimento")
+        else:
+            pontos -= PENALIDADE_NASCIMENTO
+
+    return max(0.0, min(1.0, pontos)), motivos
+
+
+def _gravar(pares: List) -> None:
+    from core.models import PessoaDuplicada
+
+    # Par já na fila: só atualiza a pontuação
+    PessoaDuplicada.objects.bulk_create(
+        pares,
+        update_conflicts=True,
+        unique_fields=["pessoa", "duplicata"],
+        update_fields=["pontuacao", "motivos", "detectado_em"],
+    )
+
+
+def detectar(queryset=None, limiar: float = LIMIAR, batch_size: int = BATCH_SIZE) -> Deteccao:
+    """
+    Atualiza a fila de revisão de pessoas duplicadas
+
+    Args:
+        queryset: Pessoas comparadas (padrão: todas)
+        limiar: Pontuação mínima para o par entrar na fila
+        batch_size: Linhas lidas e pares gravados por vez
+
+    Returns:
+        Deteccao com as quantidades de pessoas, comparações, pares na fila e
+        blocos ignorados por tamanho
+    """
+    from core.models import Pessoa, PessoaDuplicada, PessoaTelefone
+
+    if queryset is None:
+        queryset = Pessoa.objects.all()
+    inicio = timezone.now()
+
+    dados: Dict[int, _Dados] = {}
+    telefones: Dict[int, Set[str]] = {}
+    chaves: Dict[int, List[str]] = {}
+    blocos: Dict[str, List[int]] = {}
+
+    def bloquear(pk, chave):
+        # intern(): cada chave fica uma vez na memória, em blocos e em chaves
+        chave = sys.intern(chave)
+        blocos.setdefault(chave, []).append(pk)
+        chaves.setdefault(pk, []).append(chave)
+
+    linhas = queryset.order_by().values_list("pk", "nome", "doc_busca", "nascimento", "email1", "email2", "email3")
+    for pk, nome, documento, nascimento, *emails in linhas.iterator(chunk_size=batch_size):
+        documento = documento or ""
+        emails = frozenset(email.strip().lower() for email in emails if email and email.strip())
+        palavras = _palavras(nome)
+        dados[pk] = _Dados(" ".join(sorted(palavras)), documento, nascimento, emails)
+
+        if len(documento) >= MIN_DOCUMENTO:
+            bloquear(pk, f"d:{documento}")
+        for email in emails:
+            bloquear(pk, f"e:{email}")
+        chave = _chave(palavras)
+        if chave:
+            bloquear(pk, f"n:{chave}")
+
+    numeros = PessoaTelefone.objects.filter(pessoa__in=queryset).values_list("pessoa_id", "numero")
+    for pk, numero in numeros.iterator(chunk_size=batch_size):
+        numero = _telefone(numero)
+        if numero not in telefones.setdefault(pk, set()):
+            telefones[pk].add(numero)
+            bloquear(pk, f"t:{numero}")
+
+    validos = {chave for chave, pks in blocos.items() if 1 < len(pks) <= MAX_BLOCO}
+    ignorados = sum(1 for pks in blocos.values() if len(pks) > MAX_BLOCO)
+    sem_telefone: Set[str] = set()
+    descartados = set(PessoaDuplicada.objects.filter(status="descartada").values_list("pessoa_id", "duplicata_id"))
+
+    comparacoes, total, pares = 0, 0, []
+    for chave in validos:
+        for a, b in combinations(sorted(blocos[chave]), 2):
+            # Par com várias chaves em comum: só no bloco de menor chave
+            if min(c for c in chaves[a] if c in validos and c in chaves[b]) != chave:
+                continue
+            if (a, b) in descartados:
+                continue
+            comparacoes += 1
+            pontos, motivos = _pontuar(dados[a], dados[b], telefones.get(a, sem_telefone), telefones.get(b, sem_telefone))
+            if pontos < limiar:
+                continue
+            pares.append(PessoaDuplicada(
+                pessoa_id=a,
+                duplicata_id=b,
+                pontuacao=Decimal(f"{pontos:.3f}"),
+                motivos=", ".join(motivos),
+                detectado_em=inicio,
+            ))
+            if len(pares) >= batch_size:
+                _gravar(pares)
+                total += len(pares)
+                pares = []
+    if pares:
+        _gravar(pares)
+        total += len(pares)
+
+    # Pendentes que não foram encontrados de novo (pessoa corrigida)
+    PessoaDuplicada.objects.filter(
+        status="pendente", detectado_em__lt=inicio, pessoa__in=queryset, duplicata__in=queryset,
+    ).delete()
+
+    logger.info(f"Duplicatas: {len(dados)} pessoas, {comparacoes} comparações, {total} pares")
+    return Deteccao(len(dados), comparacoes, total, ignorados)
+
+
+def _transferir(relacao, manter, remover) -> None:
+    """Passa para manter o que aponta para remover numa relação reversa de Pessoa"""
+    modelo = relacao.related_model
+    try:
+        with transaction.atomic():
+            if relacao.many_to_many:
+                through = relacao.through
+                campo = relacao.field.m2m_reverse_field_name()
+                outro = relacao.field.m2m_field_name()
+                existentes = through.objects.filter(**{campo: manter}).values(outro)
+                through.objects.filter(**{campo: remover}).exclude(**{f"{outro}__in": existentes}).update(**{campo: manter})
+                through.objects.filter(**{campo: remover}).delete()
+            else:
+                campo = relacao.field.name
+                modelo._base_manager.filter(**{campo: remover}).update(**{campo: manter})
+    except IntegrityError:
+        raise MesclagemError(
+            f"{manter.nome} e {remover.nome} têm {modelo._meta.verbose_name_plural} que não podem "
+            f"ser unidos (ex.: as duas no mesmo bloqueio ou com usuário próprio)"
+        )
+
+
+def _completar(manter, remover) -> None:
+    """Emails, telefones e campos vazios de manter preenchidos com os de remover"""
+    from core.models import Pessoa
+
+    emails, vistos = [], set()
+    for email in (manter.email1, manter.email2, manter.email3, remover.email1, remover.email2, remover.email3):
+        if email and email.lower() not in vistos:
+            vistos.add(email.lower())
+            emails.append(email)
+    emails += [None] * 3
+    manter.email1, manter.email2, manter.email3 = emails[0] or "", emails[1], emails[2]
+
+    telefones, vistos = [], set()
+    for pessoa in (manter, remover):
+        for campos in pessoa_telefones.CAMPOS_TELEFONE:
+            partes = tuple(getattr(pessoa, campo) for campo in campos)
+            numero = pessoa_telefones.e164(*partes)
+            if numero and numero not in vistos:
+                vistos.update(pessoa_telefones.variantes(numero))
+                telefones.append(partes)
+    if telefones:
+        telefones += [(None, None, None)] * 3
+        for campos, partes in zip(pessoa_telefones.CAMPOS_TELEFONE, telefones):
+            for campo, valor in zip(campos, partes):
+                setattr(manter, campo, valor)
+
+    ja_unidos = {"id", "nome", "slug", "doc", "tipo_doc", "email1", "email2", "email3"}
+    ja_unidos.update(campo for campos in pessoa_telefones.CAMPOS_TELEFONE for campo in campos)
+    for field in Pessoa._meta.concrete_fields:
+        if field.name in ja_unidos or field.generated or isinstance(field, models.BooleanField):
+            continue
+        if not getattr(manter, field.attname) and getattr(remover, field.attname):
+            setattr(manter, field.attname, getattr(remover, field.attname))
+
+
+def mesclar(manter, remover, usuario=None):
+    """
+    Junta duas pessoas, mantendo a primeira
+
+    Args:
+        manter: Pessoa que continua (nome e documento dela)
+        remover: Pessoa excluída depois de transferir tudo para manter
+        usuario: Quem mesclou (log)
+
+    Returns:
+        A pessoa mantida, atualizada
+
+    Raises:
+        MesclagemError: Pessoas iguais, já removidas ou com registros em
+            conflito (a transação é desfeita)
+    """
+    from core.models import Pessoa, PessoaDuplicada, PessoaTelefone, Usuario
+    from core.services import auth_profile
+
+    if manter.pk == remover.pk:
+        raise MesclagemError("Selecione duas pessoas diferentes")
+
+    with transaction.atomic():
+        pessoas = Pessoa.objects.select_for_update().order_by("pk").in_bulk([manter.pk, remover.pk])
+        if len(pessoas) < 2:
+            raise MesclagemError("Pessoa não encontrada (já foi mesclada ou excluída?)")
+        manter, remover = pessoas[manter.pk], pessoas[remover.pk]
+        usuarios = list(Usuario.objects.filter(pessoa=remover).values_list("pk", flat=True))
+
+        for relacao in Pessoa._meta.related_objects:
+            # Índice de telefones é refeito pelo save(); a fila é da pessoa removida
+            if relacao.related_model in (PessoaTelefone, PessoaDuplicada):
+                continue
+            _transferir(relacao, manter, remover)
+
+        _completar(manter, remover)
+        remover_pk = remover.pk
+        remover.delete()
+        manter.save()
+        auth_profile.invalidate_users(usuarios)
+
+    logger.info(f"Pessoa {remover_pk} mesclada na pessoa {manter.pk} por {usuario}")
+    return manter
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Telefones das pessoas em E.164 e vínculo com os contatos WhatsApp
+
+Pessoa guarda até três telefones em partes (ddiN/dddN/telefoneN); o
+WhatsAppContact guarda o número em E.164 (+5511987654321). A tabela
+PessoaTelefone tem os números de cada pessoa já em E.164, com índice: achar
+a pessoa de um contato é uma consulta por igualdade.
+
+- sincronizar(): chamado por Pessoa.save() - grava os números atuais da
+  pessoa e vincula os contatos ainda sem pessoa que tenham esses números;
+- vincular_contato(): usado na criação de contatos (webhook, envio);
+- indexar(): pessoas novas gravadas com bulk_create;
+- reconstruir() / vincular_contatos(): preenchimento em lote (comando
+  vincular_contatos_whatsapp), para pessoas alteradas com update() e
+  contatos antigos.
+
+Celulares brasileiros aparecem com e sem o nono dígito (o WhatsApp ainda usa
+o número antigo em muitas contas): a busca tenta as duas formas. Um número
+de mais de uma pessoa não é vinculado automaticamente.
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DDI_PADRAO = "55"
+
+# Tamanho mínimo do número local (sem DDI/DDD)
+MIN_DIGITOS = 7
+# E.164: até 15 dígitos
+MAX_DIGITOS = 15
+
+BATCH_SIZE = 1000
+
+CAMPOS_TELEFONE = (
+    ("ddi1", "ddd1", "telefone1"),
+    ("ddi2", "ddd2", "telefone2"),
+    ("ddi3", "ddd3", "telefone3"),
+)
+
+
+def _digitos(valor) -> str:
+    return re.sub(r"\D", "", valor or "")
+
+
+def e164(ddi, ddd, telefone) -> Optional[str]:
+    """Número em E.164 (+5511987654321) ou None se incompleto/inválido"""
+    telefone = _digitos(telefone)
+    if len(telefone) < MIN_DIGITOS:
+        return None
+    numero = (_digitos(ddi) or DDI_PADRAO) + _digitos(ddd) + telefone
+    if len(numero) > MAX_DIGITOS:
+        return None
+    return f"+{numero}"
+
+
+def numeros(pessoa) -> Set[str]:
+    """Telefones da pessoa em E.164"""
+    encontrados = set()
+    for campos in CAMPOS_TELEFONE:
+        numero = e164(*(getattr(pessoa, campo) for campo in campos))
+        if numero:
+            encontrados.add(numero)
+    return encontrados
+
+
+def variantes(numero: str) -> List[str]:
+    """O número e, para celular brasileiro, a forma com/sem o nono dígito"""
+    digitos = _digitos(numero)
+    formas = [f"+{digitos}"]
+    if digitos.startswith("55"):
+        local = digitos[4:]
+        if len(local) == 9 and local[0] == "9":
+            formas.append(f"+{digitos[:4]}{local[1:]}")
+        elif len(local) == 8 and local[0] in "6789":
+            formas.append(f"+{digitos[:4]}9{local}")
+    return formas
+
+
+def _pessoas_por_numero(todos: Iterable[str]) -> Dict[str, Set[int]]:
+    from core.models import PessoaTelefone
+
+    por_numero: Dict[str, Set[int]] = {}
+    for numero, pessoa_id in PessoaTelefone.objects.filter(numero__in=set(todos)).values_list("numero", "pessoa_id"):
+        por_numero.setdefault(numero, set()).add(pessoa_id)
+    return por_numero
+
+
+def _unica(formas: List[str], por_numero: Dict[str, Set[int]]) -> Optional[int]:
+    pessoas = set().union(*(por_numero.get(forma, set()) for forma in formas))
+    return pessoas.pop() if len(pessoas) == 1 else None
+
+
+def pessoa_do_telefone(numero: str) -> Optional[int]:
+    """Id da única pessoa com o número (None se nenhuma ou mais de uma)"""
+    formas = variantes(numero)
+    return _unica(formas, _pessoas_por_numero(formas))
+
+
+def sincronizar(pessoa) -> None:
+    """Grava os números atuais da pessoa e vincula contatos sem pessoa com esses números"""
+    from core.models import PessoaTelefone, WhatsAppContact
+
+    atuais = numeros(pessoa)
+    gravados = set(pessoa.telefones_e164.values_list("numero", flat=True))
+    if atuais == gravados:
+        return
+
+    with transaction.atomic():
+        pessoa.telefones_e164.filter(numero__in=gravados - atuais).delete()
+        PessoaTelefone.objects.bulk_create(
+            [PessoaTelefone(pessoa=pessoa, numero=numero) for numero in atuais - gravados],
+            ignore_conflicts=True,
+        )
+
+    novos = atuais - gravados
+    if novos:
+        vincular_contatos(WhatsAppContact.objects.filter(
+            pessoa__isnull=True,
+            phone_number__in={forma for numero in novos for forma in variantes(numero)},
+        ))
+
+
+def vincular_contato(contact) -> bool:
+    """
+    Vincula um contato sem pessoa à pessoa com o mesmo telefone
+
+    Returns:
+        True se o contato foi vinculado
+    """
+    if contact.pessoa_id:
+        return False
+    pessoa_id = pessoa_do_telefone(contact.phone_number)
+    if pessoa_id is None:
+        return False
+    type(contact).objects.filter(pk=contact.pk, pessoa__isnull=True).update(pessoa_id=pessoa_id)
+    contact.pessoa_id = pessoa_id
+    logger.info(f"Contato WhatsApp {contact.pk} vinculado à pessoa {pessoa_id} pelo telefone")
+    return True
+
+
+def vincular_contatos(queryset=None, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Vincula em lote os contatos sem pessoa (uma consulta ao índice por lote)
+
+    Returns:
+        Quantidade de contatos vinculados
+    """
+    from core.models import WhatsAppContact
+
+    if queryset is None:
+        queryset = WhatsAppContact.objects.all()
+    contatos = queryset.filter(pessoa__isnull=True).order_by("pk").values_list("pk", "phone_number")
+
+    total, ultimo = 0, 0
+    while True:
+        lote = list(contatos.filter(pk__gt=ultimo)[:batch_size])
+        if not lote:
+            return total
+        ultimo = lote[-1][0]
+
+        formas = {pk: variantes(numero) for pk, numero in lote}
+        por_numero = _pessoas_por_numero(forma for lista in formas.values() for forma in lista)
+        vinculos = {pk: _unica(lista, por_numero) for pk, lista in formas.items()}
+        vinculos = {pk: pessoa_id for pk, pessoa_id in vinculos.items() if pessoa_id}
+        if vinculos:
+            WhatsAppContact.objects.bulk_update(
+                [WhatsAppContact(pk=pk, pessoa_id=pessoa_id) for pk, pessoa_id in vinculos.items()],
+                ["pessoa"],
+            )
+            total += len(vinculos)
+
+
+def indexar(pessoas: Iterable) -> int:
+    """
+    Grava os números de pessoas novas criadas com bulk_create (sem save())
+
+    Returns:
+        Quantidade de números inseridos (sem os que já estavam no índice)
+    """
+    from core.models import PessoaTelefone
+
+    pessoas = list(pessoas)
+    gravados = PessoaTelefone.objects.filter(pessoa__in=[pessoa.pk for pessoa in pessoas])
+    antes = gravados.count()
+    # ignore_conflicts: bulk_create devolve todos os objetos, inseridos ou não
+    PessoaTelefone.objects.bulk_create(
+        [PessoaTelefone(pessoa_id=pessoa.pk, numero=numero) for pessoa in pessoas for numero in numeros(pessoa)],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return gravados.count() - antes
+
+
+def reconstruir(queryset=None, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Refaz o índice de telefones a partir das pessoas
+
+    Returns:
+        Quantidade de números gravados
+    """
+    from core.models import Pessoa, PessoaTelefone
+
+    if queryset is None:
+        queryset = Pessoa.objects.all()
+    campos = [campo for grupo in CAMPOS_TELEFONE for campo in grupo]
+
+    gravados = PessoaTelefone.objects.filter(pessoa__in=queryset)
+    with transaction.atomic():
+        gravados.delete()
+        lote = []
+        for pessoa in queryset.only("pk", *campos).order_by("pk").iterator(chunk_size=batch_size):
+            lote.extend(PessoaTelefone(pessoa_id=pessoa.pk, numero=numero) for numero in numeros(pessoa))
+            if len(lote) >= batch_size:
+                PessoaTelefone.objects.bulk_create(lote, ignore_conflicts=True)
+                lote = []
+        PessoaTelefone.objects.bulk_create(lote, ignore_conflicts=True)
+        # ignore_conflicts: bulk_create devolve todos os objetos, inseridos ou não
+        return gravados.count()
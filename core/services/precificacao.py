@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Preços em reais de bloqueios, extras e vendas (valores em Dólar ou Real)
+
+Bloqueios guardam valor e taxas cada um na sua moeda (moeda_valor e
+moeda_taxas) e extras têm a sua moeda. Aqui tudo vira real com uma
+cotação da SerieCambio (core/services/cambio.py), carregada uma vez para
+todos os itens: uma listagem com N bloqueios faz uma consulta de câmbio,
+não N.
+
+As contas são em Decimal (sem float); os totais exibidos são arredondados
+em centavos (ROUND_HALF_UP).
+
+Cada venda fixa a cotação usada (cambio_data/cambio_valor) na criação:
+passageiros e extras adicionados depois, o recálculo em massa e os
+relatórios usam a mesma cotação, mesmo que o dólar mude.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, Optional
+
+from django.utils import timezone
+
+from . import cambio
+from .exceptions import CambioIndisponivelError
+
+MOEDA_DOLAR = "Dólar"
+MOEDA_REAL = "Real"
+
+CENTAVOS = Decimal("0.01")
+ZERO = Decimal("0")
+
+
+def arredondar(valor: Decimal) -> Decimal:
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def para_real(valor, moeda: Optional[str], cotacao: Optional[Decimal], dia: Optional[date] = None) -> Decimal:
+    """
+    Valor em reais (sem arredondar)
+
+    Raises:
+        CambioIndisponivelError: Valor em dólar sem cotação
+    """
+    valor = Decimal(valor or 0)
+    if moeda != MOEDA_DOLAR:
+        return valor
+    if cotacao is None:
+        raise CambioIndisponivelError(dia or timezone.localdate())
+    return valor * cotacao
+
+
+@dataclass(frozen=True)
+class Preco:
+    """Valor e taxas em reais, com a cotação usada (None se tudo já era real)"""
+
+    valor: Optional[Decimal]
+    taxas: Optional[Decimal]
+    cambio: Optional[Decimal] = None
+    data_cambio: Optional[date] = None
+
+    @property
+    def disponivel(self) -> bool:
+        """False se há valor em dólar e nenhuma cotação"""
+        return self.valor is not None and self.taxas is not None
+
+    @property
+    def convertido(self) -> bool:
+        return self.cambio is not None
+
+    @property
+    def total(self) -> Optional[Decimal]:
+        return self.valor + self.taxas if self.disponivel else None
+
+
+def _converter(valor, moeda, cotacao) -> Optional[Decimal]:
+    if moeda == MOEDA_DOLAR and cotacao is None:
+        return None
+    return arredondar(para_real(valor, moeda, cotacao))
+
+
+def _preco(valor, moeda_valor, taxas, moeda_taxas, cotacao_dia) -> Preco:
+    data_cambio, cotacao = cotacao_dia or (None, None)
+    usa_dolar = MOEDA_DOLAR in (moeda_valor, moeda_taxas)
+    return Preco(
+        valor=_converter(valor, moeda_valor, cotacao),
+        taxas=_converter(taxas, moeda_taxas, cotacao),
+        cambio=cotacao if usa_dolar else None,
+        data_cambio=data_cambio if usa_dolar else None,
+    )
+
+
+def precos_bloqueios(bloqueios: Iterable, dia: Optional[date] = None,
+                     serie: Optional[cambio.SerieCambio] = None) -> Dict[int, Preco]:
+    """
+    Preços em reais de vários bloqueios com a cotação do dia
+
+    Args:
+        bloqueios: Bloqueios (instâncias)
+        dia: Data da cotação (padrão: hoje)
+        serie: Cotações já carregadas (padrão: série do processo)
+
+    Returns:
+        {bloqueio_id: Preco}
+    """
+    dia = dia or timezone.localdate()
+    cotacao_dia = (serie if serie is not None else cambio.serie()).cotacao(dia)
+    return {
+        bloqueio.pk: _preco(bloqueio.valor, bloqueio.moeda_valor, bloqueio.taxas, bloqueio.moeda_taxas, cotacao_dia)
+        for bloqueio in bloqueios
+    }
+
+
+def precos_extras(extras: Iterable, dia: Optional[date] = None,
+                  serie: Optional[cambio.SerieCambio] = None) -> Dict[int, Preco]:
+    """Preços em reais de vários extras com a cotação do dia ({extra_id: Preco}; sem taxas)"""
+    dia = dia or timezone.localdate()
+    cotacao_dia = (serie if serie is not None else cambio.serie()).cotacao(dia)
+    return {
+        extra.pk: _preco(extra.valor, extra.moeda, ZERO, MOEDA_REAL, cotacao_dia)
+        for extra in extras
+    }
+
+
+def anotar_precos(bloqueios, dia: Optional[date] = None, serie: Optional[cambio.SerieCambio] = None):
+    """Lista de bloqueios com o atributo preco (Preco) - para templates"""
+    bloqueios = list(bloqueios)
+    precos = precos_bloqueios(bloqueios, dia, serie)
+    for bloqueio in bloqueios:
+        bloqueio.preco = precos[bloqueio.pk]
+    return bloqueios
+
+
+def fixar_cambio(venda) -> bool:
+    """
+    Fixa na venda a cotação do dia da venda (se ainda não tem)
+
+    A cotação é fixada sempre que existir; só é obrigatória se o bloqueio
+    tem valor ou taxas em dólar.
+
+    Returns:
+        True se cambio_data/cambio_valor foram preenchidos agora
+
+    Raises:
+        CambioIndisponivelError: Bloqueio com valor ou taxas em dólar sem nenhuma
+            cotação até o dia
+    """
+    from core.models import Bloqueio
+
+    if venda.cambio_data is not None or not venda.bloqueio_id:
+        return False
+    dia = timezone.localdate(venda.data_venda) if venda.data_venda else timezone.localdate()
+    encontrada = cambio.cotacao(dia)
+    if encontrada is None:
+        moedas = Bloqueio.objects.filter(pk=venda.bloqueio_id).values_list("moeda_valor", "moeda_taxas").first()
+        if moedas and MOEDA_DOLAR in moedas:
+            raise CambioIndisponivelError(dia)
+        return False
+    venda.cambio_data, venda.cambio_valor = encontrada
+    return True
+
+
+def preco_extra_venda(extra, venda) -> Decimal:
+    """Valor unitário em reais de um extra para a venda (cotação fixada na venda)"""
+    cotacao = venda.cambio_valor
+    if cotacao is None and extra.moeda == MOEDA_DOLAR:
+        encontrada = cambio.cotacao(timezone.localdate())
+        cotacao = encontrada[1] if encontrada else None
+    return arredondar(para_real(extra.valor, extra.moeda, cotacao))
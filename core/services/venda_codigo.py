@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Códigos das vendas de bloqueio (VB + ano + sequencial)
+
+Cada ano tem uma sequence no PostgreSQL (core_vendabloqueio_codigo_<ano>):
+nextval() é O(1), não trava linhas e nunca entrega o mesmo número duas
+vezes, mesmo com várias vendas sendo criadas ao mesmo tempo. Números de
+transações desfeitas não voltam para a fila (podem sobrar lacunas na
+numeração).
+
+A sequence do ano é criada no primeiro código do ano, começando depois do
+maior código já existente; a migração 0041 cria as dos anos que já têm
+vendas e sincronizar_sequencias() refaz esse alinhamento (ex.: depois de
+importar vendas com código).
+"""
+
+import logging
+from typing import Dict, Optional
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import BigIntegerField, Max
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = "VB"
+
+DIGITOS = 5
+
+
+def sequence_name(ano: int) -> str:
+    return f"core_vendabloqueio_codigo_{int(ano)}"
+
+
+def formatar_codigo(ano: int, numero: int) -> str:
+    return f"{PREFIXO}{ano}{numero:0{DIGITOS}d}"
+
+
+def ultimo_numero(ano: int) -> int:
+    """Maior sequencial já usado no ano (pelo valor numérico, não pelo texto)"""
+    from core.models import VendaBloqueio
+
+    inicio = len(PREFIXO) + 4 + 1
+    return VendaBloqueio.objects.filter(
+        codigo__regex=rf"^{PREFIXO}{int(ano)}[0-9]+$"
+    ).aggregate(
+        ultimo=Max(Cast(Substr("codigo", inicio), BigIntegerField()))
+    )["ultimo"] or 0
+
+
+def _criar_sequencia(cursor, ano: int) -> None:
+    name = sequence_name(ano)
+    try:
+        with transaction.atomic():
+            cursor.execute(
+                f"CREATE SEQUENCE IF NOT EXISTS {name} START WITH %s",
+                [ultimo_numero(ano) + 1],
+            )
+    except DatabaseError:
+        # Criada ao mesmo tempo por outra transação
+        logger.info(f"Sequence {name} criada por outra transação")
+
+
+def proximo_numero(ano: int) -> int:
+    """Reserva o próximo sequencial do ano"""
+    name = sequence_name(ano)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        if not cursor.fetchone()[0]:
+            _criar_sequencia(cursor, ano)
+        cursor.execute("SELECT nextval(%s)", [name])
+        return cursor.fetchone()[0]
+
+
+def proximo_codigo(ano: Optional[int] = None) -> str:
+    """Próximo código de venda do ano (padrão: ano atual)"""
+    ano = ano or timezone.now().year
+    return formatar_codigo(ano, proximo_numero(ano))
+
+
+def sincronizar_sequencias() -> Dict[int, int]:
+    """
+    Alinha as sequences de todos os anos com os códigos existentes
+
+    A sequence nunca volta: continua do maior entre o último código
+    gravado e o último número já entregue.
+
+    Returns:
+        Dict {ano: último sequencial}
+    """
+    from core.models import VendaBloqueio
+
+    anos = (
+        VendaBloqueio.objects.filter(codigo__regex=rf"^{PREFIXO}[0-9]{{4}}[0-9]+$")
+        .annotate(ano=Substr("codigo", len(PREFIXO) + 1, 4))
+        .order_by("ano").values_list("ano", flat=True).distinct()
+    )
+    ultimos = {}
+    with connection.cursor() as cursor:
+        for ano in map(int, anos):
+            name = sequence_name(ano)
+            _criar_sequencia(cursor, ano)
+            cursor.execute(
+                f"SELECT setval(%s, GREATEST(%s, 1, (SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {name})))",
+                [name, ultimo_numero(ano)],
+            )
+            ultimos[ano] = cursor.fetchone()[0]
+    return ultimos
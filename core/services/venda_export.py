@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação de vendas, passageiros e pagamentos (CSV e XLSX)
+
+Mesmo esquema da exportação de mensagens (whatsapp_export): as linhas são
+lidas com .iterator(chunk_size=...) - cursor no servidor, relacionamentos
+por select_related e contagens/somas por subconsultas - e enviadas em
+streaming assim que formatadas. Exportar um ano inteiro usa a mesma memória
+que exportar um dia e o download começa imediatamente.
+
+O XLSX é escrito direto no zip de saída, uma linha por vez (planilha só de
+escrita com strings inline - sem tabela de strings compartilhadas em memória).
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .export_utils import (
+    CHUNK_SIZE, LINES_PER_CHUNK, Echo, byte_chunks, csv_value, date_range, export_filename, streaming_response,
+)
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _nome(pessoa) -> str:
+    return pessoa.nome if pessoa else ""
+
+
+def _vendedor(usuario) -> str:
+    return _nome(getattr(usuario, "pessoa", None)) or usuario.username
+
+
+def _local(value):
+    return timezone.localtime(value) if value else None
+
+
+RELATORIOS = {
+    "vendas": [
+        ("codigo", lambda v: v.codigo),
+        ("data_venda", lambda v: _local(v.data_venda)),
+        ("status", lambda v: v.get_status_display()),
+        ("cliente", lambda v: _nome(v.cliente)),
+        ("documento_cliente", lambda v: v.cliente.doc if v.cliente else ""),
+        ("vendedor", lambda v: _vendedor(v.vendedor)),
+        ("caravana", lambda v: v.bloqueio.caravana.nome),
+        ("bloqueio", lambda v: v.bloqueio.descricao),
+        ("saida", lambda v: v.bloqueio.saida),
+        ("passageiros", lambda v: v.numero_passageiros),
+        ("passageiros_cadastrados", lambda v: v.total_passageiros_count),
+        ("valor_passageiros", lambda v: v.valor_passageiros),
+        ("valor_extras", lambda v: v.valor_extras),
+        ("valor_seguro", lambda v: v.valor_seguro),
+        ("valor_taxas", lambda v: v.valor_taxas),
+        ("valor_desconto", lambda v: v.valor_desconto),
+        ("valor_total", lambda v: v.valor_total),
+        ("valor_pago", lambda v: v.total_pago_calculado),
+        ("valor_pendente", lambda v: v.valor_total - v.total_pago_calculado),
+        ("pagamentos", lambda v: v.total_pagamentos_count),
+        ("cambio_data", lambda v: v.cambio_data),
+        ("cambio_valor", lambda v: v.cambio_valor),
+        ("data_confirmacao", lambda v: _local(v.data_confirmacao)),
+        ("data_cancelamento", lambda v: _local(v.data_cancelamento)),
+    ],
+    "passageiros": [
+        ("venda", lambda p: p.venda.codigo),
+        ("data_venda", lambda p: _local(p.venda.data_venda)),
+        ("status_venda", lambda p: p.venda.get_status_display()),
+        ("vendedor", lambda p: _vendedor(p.venda.vendedor)),
+        ("caravana", lambda p: p.bloqueio.caravana.nome),
+        ("bloqueio", lambda p: p.bloqueio.descricao),
+        ("saida", lambda p: p.bloqueio.saida),
+        ("nome", lambda p: p.pessoa.nome),
+        ("tipo_documento", lambda p: p.pessoa.tipo_doc),
+        ("documento", lambda p: p.pessoa.doc),
+        ("tipo", lambda p: p.get_tipo_display() if p.tipo else ""),
+        ("single", lambda p: p.single),
+        ("email", lambda p: p.pessoa.email1),
+        ("telefone", lambda p: p.pessoa.telefone_completo),
+    ],
+    "pagamentos": [
+        ("venda", lambda p: p.venda.codigo),
+        ("cliente", lambda p: _nome(p.venda.cliente)),
+        ("vendedor", lambda p: _vendedor(p.venda.vendedor)),
+        ("caravana", lambda p: p.venda.bloqueio.caravana.nome),
+        ("data_pagamento", lambda p: _local(p.data_pagamento)),
+        ("data_confirmacao", lambda p: _local(p.data_confirmacao)),
+        ("forma_pagamento", lambda p: p.get_forma_pagamento_display()),
+        ("status", lambda p: p.get_status_display()),
+        ("parcela", lambda p: p.parcela),
+        ("total_parcelas", lambda p: p.total_parcelas),
+        ("valor", lambda p: p.valor),
+        ("referencia", lambda p: p.referencia),
+    ],
+}
+
+
+def iter_relatorio(relatorio: str, *, vendedor=None, start=None, end=None, status=None,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Registros do relatório em ordem cronológica
+
+    Args:
+        relatorio: "vendas", "passageiros" ou "pagamentos"
+        vendedor: Restringe às vendas do vendedor (None = todas)
+        start / end: Datas inclusivas - da venda (pagamentos: do pagamento)
+        status: Status da venda (opcional)
+        chunk_size: Linhas por busca no cursor do servidor
+    """
+    from core.models import Pagamento, Passageiro, VendaBloqueio
+
+    start_at, end_before = date_range(start, end)
+    if relatorio == "vendas":
+        queryset, prefixo, data = VendaBloqueio.objects.para_relatorio_vendas(), "", "data_venda"
+        queryset = queryset.select_related("vendedor__pessoa").order_by("data_venda", "id")
+    elif relatorio == "passageiros":
+        queryset, prefixo, data = Passageiro.objects.select_related(
+            "pessoa", "venda__vendedor__pessoa", "bloqueio__caravana"
+        ).filter(venda__isnull=False), "venda__", "venda__data_venda"
+        queryset = queryset.order_by("venda__data_venda", "venda_id", "id")
+    elif relatorio == "pagamentos":
+        queryset, prefixo, data = Pagamento.objects.select_related(
+            "venda__cliente", "venda__vendedor__pessoa", "venda__bloqueio__caravana"
+        ), "venda__", "data_pagamento"
+        queryset = queryset.order_by("data_pagamento", "id")
+    else:
+        raise ValueError(f"Relatório desconhecido: {relatorio}")
+
+    if vendedor is not None:
+        queryset = queryset.filter(**{f"{prefixo}vendedor": vendedor})
+    if status:
+        queryset = queryset.filter(**{f"{prefixo}status": status})
+    if start_at:
+        queryset = queryset.filter(**{f"{data}__gte": start_at})
+    if end_before:
+        queryset = queryset.filter(**{f"{data}__lt": end_before})
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+# CSV ----------------------------------------------------------------------
+
+def _csv_cell(value):
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return csv_value(value)
+
+
+def csv_lines(columns, rows) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    # BOM para o Excel reconhecer UTF-8 (acentos)
+    yield "\ufeff" + writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow([_csv_cell(getter(row)) for _, getter in columns])
+
+
+# XLSX ---------------------------------------------------------------------
+
+# Estilos (índices de cellXfs em styles.xml)
+_ESTILO_DATA, _ESTILO_DATA_HORA, _ESTILO_VALOR, _ESTILO_CABECALHO = 1, 2, 3, 4
+
+_EPOCH = datetime(1899, 12, 30)
+
+# Caracteres de controle não são aceitos em XML
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="2"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/>'
+        '<numFmt numFmtId="165" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="5">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _workbook(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_cell(value, style: int = 0) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, datetime):
+        dias = (timezone.make_naive(value) if timezone.is_aware(value) else value) - _EPOCH
+        return f'<c s="{_ESTILO_DATA_HORA}"><v>{dias.total_seconds() / 86400:.6f}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="{_ESTILO_DATA}"><v>{(value - _EPOCH.date()).days}</v></c>'
+    if isinstance(value, Decimal):
+        return f'<c s="{_ESTILO_VALOR}"><v>{value}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    texto = escape(_INVALID_XML.sub("", str(value)))
+    estilo = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def xlsx_rows(columns, rows) -> Iterator[str]:
+    """XML da planilha, linha a linha"""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+        '</sheetView></sheetViews><sheetData>'
+    )
+    yield "<row>" + "".join(_xlsx_cell(name, _ESTILO_CABECALHO) for name, _ in columns) + "</row>"
+    for row in rows:
+        yield "<row>" + "".join(_xlsx_cell(getter(row)) for _, getter in columns) + "</row>"
+    yield "</sheetData></worksheet>"
+
+
+class _Saida:
+    """Arquivo só de escrita: o zip escreve, o gerador envia o que acumulou"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, data):
+        self.partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self) -> bytes:
+        data = b"".join(self.partes)
+        self.partes.clear()
+        return data
+
+
+def xlsx_chunks(columns, rows, sheet_name: str, lines_per_chunk: int = LINES_PER_CHUNK) -> Iterator[bytes]:
+    """
+    Arquivo XLSX em pedaços, sem montar a planilha em memória
+
+    O zip é escrito num arquivo sem seek (tamanhos nos descritores de dados,
+    zip64 para planilhas grandes); a cada bloco de linhas o que o deflate já
+    comprimiu é enviado.
+    """
+    saida = _Saida()
+    with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED) as pacote:
+        for nome, conteudo in _XLSX_PARTS.items():
+            pacote.writestr(nome, conteudo)
+        pacote.writestr("xl/workbook.xml", _workbook(sheet_name))
+        with pacote.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as planilha:
+            for chunk in byte_chunks(xlsx_rows(columns, rows), lines_per_chunk):
+                planilha.write(chunk)
+                data = saida.esvaziar()
+                if data:
+                    yield data
+    yield saida.esvaziar()
+
+
+def export_response(request, relatorio: str, rows, export_format: str, filename: str) -> StreamingHttpResponse:
+    """
+    Resposta em streaming com o relatório no formato pedido
+
+    Args:
+        request: Request atual (define iterador síncrono ou assíncrono)
+        relatorio: Chave de RELATORIOS (colunas)
+        rows: Iterável de registros (normalmente iter_relatorio())
+        export_format: "csv" ou "xlsx"
+        filename: Nome do arquivo sem extensão
+    """
+    columns = RELATORIOS[relatorio]
+    if export_format == "xlsx":
+        chunks = xlsx_chunks(columns, rows, relatorio.capitalize())
+    else:
+        chunks = byte_chunks(csv_lines(columns, rows), LINES_PER_CHUNK)
+    return streaming_response(request, chunks, FORMATS[export_format], f"{filename}.{export_format}")
+
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Resumo diário das vendas de bloqueio
+
+VendaResumoDiario guarda, por dia da venda (fuso local), vendedor, caravana
+e status, quantas vendas existem, quantos passageiros e a soma dos valores
+total, pago e pendente. Cada escrita de venda soma a diferença entre a
+linha antes e depois da alteração, com a venda travada:
+- VendaBloqueio.save()/delete() (criação, mudança de status, passageiros...)
+- deltas de pagamentos e extras (venda_totais.aplicar_delta)
+
+O comando reconciliar_resumo_vendas (noturno) reconstrói um período a partir
+das vendas, para corrigir update() em massa e cargas. Painéis e resumos do
+mês somam estes registros - o custo depende de dias x vendedores x
+caravanas, não do histórico de vendas.
+"""
+
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CONTADORES = ("quantidade", "passageiros")
+VALORES = ("valor_total", "valor_pago", "valor_pendente")
+
+# Campos da venda que entram no resumo
+CAMPOS_VENDA = (
+    "data_venda", "vendedor_id", "status", "numero_passageiros", "valor_total", "valor_pago", "valor_pendente",
+)
+
+
+def valores_linha(queryset):
+    """values() com os campos do resumo (a caravana vem do bloqueio)"""
+    return queryset.values(*CAMPOS_VENDA, caravana_id=F("bloqueio__caravana_id"))
+
+
+def linha(venda_id: Optional[int]) -> Optional[Dict]:
+    """Campos do resumo da venda gravada (None se não existe)"""
+    from core.models import VendaBloqueio
+
+    if not venda_id:
+        return None
+    return valores_linha(VendaBloqueio.objects.filter(pk=venda_id)).first()
+
+
+def _chave(row: Dict):
+    return (timezone.localdate(row["data_venda"]), row["vendedor_id"], row["caravana_id"], row["status"])
+
+
+def _somar(chave, deltas: Dict) -> None:
+    from core.models import VendaResumoDiario
+
+    dia, vendedor_id, caravana_id, status = chave
+    lookup = {"dia": dia, "vendedor_id": vendedor_id, "caravana_id": caravana_id, "status": status}
+    resumo = VendaResumoDiario.objects.filter(**lookup)
+    if resumo.update(**{campo: F(campo) + valor for campo, valor in deltas.items()}):
+        return
+    if deltas["quantidade"] <= 0:
+        # Nada a descontar de um dia ainda não contabilizado (a reconciliação corrige)
+        return
+    try:
+        with transaction.atomic():
+            VendaResumoDiario.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Criado por outra venda simultânea
+        resumo.update(**{campo: F(campo) + valor for campo, valor in deltas.items()})
+
+
+def registrar(antes: Optional[Dict], depois: Optional[Dict]) -> None:
+    """
+    Soma ao resumo a diferença entre duas versões da mesma venda
+
+    antes=None para venda criada, depois=None para venda removida.
+    """
+    deltas = {}
+    for row, sinal in ((antes, -1), (depois, 1)):
+        if row is None or row["data_venda"] is None:
+            continue
+        delta = deltas.setdefault(_chave(row), {campo: 0 for campo in CONTADORES + VALORES})
+        delta["quantidade"] += sinal
+        delta["passageiros"] += sinal * (row["numero_passageiros"] or 0)
+        for campo in VALORES:
+            delta[campo] += sinal * (row[campo] or Decimal("0"))
+    for chave, delta in deltas.items():
+        if any(delta.values()):
+            _somar(chave, delta)
+
+
+@contextmanager
+def acompanhar(venda):
+    """Registra no resumo o que mudou na venda dentro do bloco (use com a venda travada)"""
+    antes = linha(venda.pk)
+    yield
+    registrar(antes, linha(venda.pk))
+
+
+def reconciliar(inicio: Optional[date] = None, fim: Optional[date] = None) -> int:
+    """
+    Reconstrói o resumo dos dias [inicio, fim] a partir das vendas
+
+    Returns:
+        Quantidade de vendas contabilizadas
+    """
+    from core.models import VendaBloqueio, VendaResumoDiario
+
+    vendas = VendaBloqueio.objects.order_by()
+    resumos = VendaResumoDiario.objects.all()
+    if inicio:
+        vendas = vendas.filter(data_venda__gte=timezone.make_aware(datetime.combine(inicio, time.min)))
+        resumos = resumos.filter(dia__gte=inicio)
+    if fim:
+        vendas = vendas.filter(data_venda__lt=timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min)))
+        resumos = resumos.filter(dia__lte=fim)
+
+    rows = (
+        vendas.annotate(dia=TruncDate("data_venda"), caravana_id=F("bloqueio__caravana_id"))
+        .values("dia", "vendedor_id", "caravana_id", "status")
+        .annotate(
+            quantidade=Count("id"), passageiros=Sum("numero_passageiros"),
+            soma_total=Sum("valor_total"), soma_pago=Sum("valor_pago"), soma_pendente=Sum("valor_pendente"),
+        )
+    )
+    with transaction.atomic():
+        resumos.delete()
+        criados = VendaResumoDiario.objects.bulk_create([
+            VendaResumoDiario(
+                dia=row["dia"], vendedor_id=row["vendedor_id"], caravana_id=row["caravana_id"],
+                status=row["status"], quantidade=row["quantidade"], passageiros=row["passageiros"] or 0,
+                valor_total=row["soma_total"] or 0, valor_pago=row["soma_pago"] or 0,
+                valor_pendente=row["soma_pendente"] or 0,
+            )
+            for row in rows
+        ], batch_size=1000)
+
+    total = sum(resumo.quantidade for resumo in criados)
+    logger.info(f"Resumo diário de {total} venda(s) reconstruído")
+    return total
+
+
+# Leitura ------------------------------------------------------------------
+
+def _resumos(vendedor=None, inicio: Optional[date] = None, fim: Optional[date] = None, caravana=None):
+    from core.models import VendaResumoDiario
+
+    queryset = VendaResumoDiario.objects.order_by()
+    if vendedor is not None:
+        queryset = queryset.filter(vendedor=vendedor)
+    if caravana is not None:
+        queryset = queryset.filter(caravana=caravana)
+    if inicio:
+        queryset = queryset.filter(dia__gte=inicio)
+    if fim:
+        queryset = queryset.filter(dia__lte=fim)
+    return queryset
+
+
+def totais(vendedor=None, inicio: Optional[date] = None, fim: Optional[date] = None, caravana=None) -> Dict:
+    """
+    Totais do período, com a quantidade de vendas por status
+
+    Returns:
+        {"total_vendas", "total_passageiros", "total_valor", "total_pago",
+         "total_pendente", "por_status": {status: quantidade}}
+    """
+    queryset = _resumos(vendedor, inicio, fim, caravana)
+    resultado = {"total_vendas": 0, "total_passageiros": 0, "total_valor": Decimal("0"),
+                 "total_pago": Decimal("0"), "total_pendente": Decimal("0"), "por_status": {}}
+    rows = queryset.values("status").annotate(
+        vendas=Sum("quantidade"), passageiros=Sum("passageiros"),
+        soma_total=Sum("valor_total"), soma_pago=Sum("valor_pago"), soma_pendente=Sum("valor_pendente"),
+    )
+    for row in rows:
+        if not row["vendas"]:
+            continue
+        resultado["por_status"][row["status"]] = row["vendas"]
+        resultado["total_vendas"] += row["vendas"]
+        resultado["total_passageiros"] += row["passageiros"] or 0
+        resultado["total_valor"] += row["soma_total"] or 0
+        resultado["total_pago"] += row["soma_pago"] or 0
+        resultado["total_pendente"] += row["soma_pendente"] or 0
+    return resultado
+
+
+def inicio_do_mes(hoje: Optional[date] = None) -> date:
+    return (hoje or timezone.localdate()).replace(day=1)
+
+
+def totais_do_mes(vendedor=None, hoje: Optional[date] = None) -> Dict:
+    """Totais do mês corrente (fuso local)"""
+    return totais(vendedor, inicio=inicio_do_mes(hoje))
+
+
+def serie_diaria(inicio: date, fim: date, vendedor=None, excluir_status=("cancelada",)):
+    """
+    Vendas e valor por dia do período, com os dias sem vendas zerados
+
+    Returns:
+        [{"dia": date, "vendas": int, "valor": Decimal}, ...]
+    """
+    serie = {inicio + timedelta(days=offset): {"vendas": 0, "valor": Decimal("0")}
+             for offset in range((fim - inicio).days + 1)}
+    rows = (
+        _resumos(vendedor, inicio, fim).exclude(status__in=excluir_status)
+        .values("dia").annotate(vendas=Sum("quantidade"), valor=Sum("valor_total"))
+    )
+    for row in rows:
+        serie[row["dia"]] = {"vendas": row["vendas"] or 0, "valor": row["valor"] or Decimal("0")}
+    return [{"dia": dia, **valores} for dia, valores in serie.items()]
+
+
+def ranking_vendedores(inicio: Optional[date] = None, fim: Optional[date] = None, limite: int = 10,
+                       excluir_status=("cancelada",)):
+    """Vendedores com maior valor vendido no período"""
+    return list(
+        _resumos(inicio=inicio, fim=fim).exclude(status__in=excluir_status)
+        .values("vendedor_id", "vendedor__username")
+        .annotate(vendas=Sum("quantidade"), valor=Sum("valor_total"))
+        .filter(vendas__gt=0)
+        .order_by("-valor")[:limite]
+    )
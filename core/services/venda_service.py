@@ -6,6 +6,7 @@ Este service centraliza todas as regras de negócio relacionadas a vendas,
 mantendo as views focadas apenas em apresentação.
 """
 
+from datetime import datetime, time
 from decimal import Decimal
 from django.db import transaction
 from django.db.models import Q
@@ -17,9 +18,11 @@ from core.models import (
     VendaBloqueio, Bloqueio, Pessoa, Passageiro, 
     ExtraVenda, Extra, Pagamento, Cambio
 )
+from . import estoque_lugares, precificacao, venda_resumo
 from .exceptions import (
     VendaError, PassageirosIndisponiveisError, 
-    VendaNaoEditavelError, PagamentoError, ValorPagamentoInvalidoError
+    VendaNaoEditavelError, PagamentoError, ValorPagamentoInvalidoError,
+    CambioIndisponivelError
 )
 
 
@@ -48,16 +51,13 @@ class VendaService:
         Raises:
             VendaError: Se houver erro nas regras de negócio
         """
-        # 1. Validar disponibilidade
         bloqueio = self._get_bloqueio(dados_venda['bloqueio_id'])
         quantidade = dados_venda['quantidade']
         
-        self._validar_disponibilidade_passageiros(bloqueio, quantidade)
-        
-        # 2. Calcular valores
+        # 1. Calcular valores
         valores = self._calcular_valores_venda(bloqueio, quantidade)
         
-        # 3. Criar venda
+        # 2. Criar venda
         venda = VendaBloqueio.objects.create(
             bloqueio=bloqueio,
             cliente_id=dados_venda['cliente_id'],
@@ -71,11 +71,15 @@ class VendaService:
             observacoes=dados_venda.get('observacoes', ''),
         )
         
+        # 3. Reservar os lugares (estoque travado - desfaz a venda se não houver)
+        estoque_lugares.reservar(venda)
+        
         # 4. Log da atividade (opcional)
         self._log_atividade_venda(venda, 'Venda criada', dados_venda['vendedor'])
         
         return venda
     
+    @transaction.atomic
     def adicionar_passageiro_venda(self, venda_id: int, pessoa_id: int, 
                                    valor_individual: Optional[Decimal] = None) -> Passageiro:
         """
@@ -100,7 +104,7 @@ class VendaService:
         
         # Calcular valor se não fornecido
         if valor_individual is None:
-            valor_individual = self._calcular_valor_por_passageiro(venda.bloqueio)
+            valor_individual = self._calcular_valor_por_passageiro(venda.bloqueio, venda)
         
         # Criar passageiro
         passageiro = Passageiro.objects.create(
@@ -109,6 +113,9 @@ class VendaService:
             venda=venda
         )
         
+        # Renovar a reserva dos lugares da pré-venda
+        estoque_lugares.reservar(venda)
+        
         # Recalcular totais da venda
         self._recalcular_totais_venda(venda)
         
@@ -154,12 +161,11 @@ class VendaService:
             observacoes=dados_pagamento.get('observacoes', ''),
         )
         
-        # Recalcular totais (feito automaticamente no save do pagamento)
-        # mas vamos forçar para garantir
-        self._recalcular_totais_venda(venda)
+        # Totais da venda atualizados no save do pagamento (delta no banco)
         
         return pagamento
     
+    @transaction.atomic
     def cancelar_venda(self, venda_id: int, motivo: str, usuario) -> VendaBloqueio:
         """
         Cancela uma venda
@@ -192,6 +198,9 @@ class VendaService:
         venda.motivo_cancelamento = motivo
         venda.save()
         
+        # Devolver os lugares ao estoque da caravana
+        estoque_lugares.liberar(venda)
+        
         # Liberar passageiros (remover vinculo com venda)
         venda.passageiros.update(venda=None)
         
@@ -199,6 +208,7 @@ class VendaService:
         
         return venda
     
+    @transaction.atomic
     def confirmar_venda(self, venda_id: int, usuario) -> VendaBloqueio:
         """
         Confirma uma venda (após pagamento completo)
@@ -215,6 +225,9 @@ class VendaService:
         if not venda.pode_confirmar:
             raise VendaError("Venda não pode ser confirmada. Verifique o status e pagamentos.")
         
+        # Reserva da pré-venda passa a lugares vendidos (falha se venceu e lotou)
+        estoque_lugares.confirmar(venda)
+        
         venda.status = 'confirmada'
         venda.data_confirmacao = timezone.now()
         venda.save()
@@ -282,21 +295,20 @@ class VendaService:
         if not usuario.is_superuser:
             vendas_base = vendas_base.filter(vendedor=usuario)
         
-        # Estatísticas gerais - usando aggregate diretamente
-        from django.db.models import Count, Sum
-        resumo_geral = vendas_base.aggregate(
-            total_vendas=Count('id'),
-            total_valor=Sum('valor_total'),
-            vendas_pre_venda=Count('id', filter=Q(status='pre-venda')),
-            vendas_confirmadas=Count('id', filter=Q(status='confirmada')),
-        )
+        # Estatísticas gerais - lidas do resumo diário
+        vendedor = None if usuario.is_superuser else usuario
+        totais = venda_resumo.totais(vendedor)
+        resumo_geral = {
+            'total_vendas': totais['total_vendas'],
+            'total_valor': totais['total_valor'],
+            'vendas_pre_venda': totais['por_status'].get('pre-venda', 0),
+            'vendas_confirmadas': totais['por_status'].get('confirmada', 0),
+        }
         
         # Vendas do mês atual
         hoje = timezone.now()
-        vendas_mes = vendas_base.filter(
-            data_venda__year=hoje.year,
-            data_venda__month=hoje.month
-        )[:10]
+        inicio_mes = timezone.make_aware(datetime.combine(venda_resumo.inicio_do_mes(), time.min))
+        vendas_mes = vendas_base.filter(data_venda__gte=inicio_mes)[:10]
         
         # Vendas com pagamento pendente
         pendentes = vendas_base.filter(valor_pendente__gt=0)[:5]
@@ -313,7 +325,7 @@ class VendaService:
             'vendas_mes': vendas_mes,
             'vendas_pendentes': pendentes,
             'viagens_proximas': viagens_proximas,
-            'total_vendas_usuario': vendas_base.count(),
+            'total_vendas_usuario': totais['total_vendas'],
         }
     
     # Métodos privados auxiliares
@@ -335,20 +347,6 @@ class VendaService:
         except VendaBloqueio.DoesNotExist:
             raise VendaError(f"Venda {venda_id} não encontrada")
     
-    def _validar_disponibilidade_passageiros(self, bloqueio: Bloqueio, quantidade: int):
-        """Valida se há passageiros disponíveis"""
-        # Contar passageiros já vendidos
-        vendidos = Passageiro.objects.filter(
-            bloqueio=bloqueio,
-            venda__isnull=False,
-            venda__status__in=['confirmada', 'concluida']
-        ).count()
-        
-        disponiveis = bloqueio.caravana.quantidade - vendidos
-        
-        if quantidade > disponiveis:
-            raise PassageirosIndisponiveisError(quantidade, disponiveis)
-    
     def _calcular_valores_venda(self, bloqueio: Bloqueio, quantidade: int) -> Dict:
         """Calcula valores da venda"""
         valor_por_passageiro = self._calcular_valor_por_passageiro(bloqueio)
@@ -360,19 +358,34 @@ class VendaService:
             'valor_total': valor_total,
         }
     
-    def _calcular_valor_por_passageiro(self, bloqueio: Bloqueio) -> Decimal:
-        """Calcula valor por passageiro com conversão de moeda se necessário"""
-        valor_base = bloqueio.valor + bloqueio.taxas
-        
-        # TODO: Implementar conversão USD/BRL se necessário
-        # Por enquanto assumindo que já está em BRL
-        return Decimal(str(valor_base))
+    def _calcular_valor_por_passageiro(self, bloqueio: Bloqueio, venda: Optional[VendaBloqueio] = None) -> Decimal:
+        """
+        Valor mais taxas do bloqueio em reais
+
+        Usa a cotação fixada na venda ou, sem venda, a cotação de hoje.
+
+        Raises:
+            CambioIndisponivelError: Bloqueio em dólar sem cotação
+        """
+        if venda is not None and venda.cambio_valor is not None:
+            return precificacao.arredondar(
+                precificacao.para_real(bloqueio.valor, bloqueio.moeda_valor, venda.cambio_valor)
+                + precificacao.para_real(bloqueio.taxas, bloqueio.moeda_taxas, venda.cambio_valor)
+            )
+        preco = precificacao.precos_bloqueios([bloqueio])[bloqueio.pk]
+        if not preco.disponivel:
+            raise CambioIndisponivelError(timezone.localdate())
+        return preco.total
     
     def _recalcular_totais_venda(self, venda: VendaBloqueio):
-        """Recalcula todos os totais da venda"""
-        venda.calcular_totais()
-        venda.save(update_fields=[
-            'valor_passageiros', 'valor_extras', 'valor_total', 
+        """
+        Atualiza a venda em memória com os totais gravados
+
+        Pagamentos e extras já aplicam a sua parte direto no banco; para
+        reconstruir os totais a partir do zero use venda_totais.recalcular_totais().
+        """
+        venda.refresh_from_db(fields=[
+            'valor_passageiros', 'valor_extras', 'valor_total',
             'valor_pago', 'valor_pendente', 'numero_passageiros', 'status'
         ])
     
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Totais das vendas de bloqueio mantidos de forma incremental
+
+Pagamentos e extras não recalculam a venda inteira: criar, confirmar,
+cancelar ou remover um deles soma/subtrai só a sua parte em valor_pago ou
+valor_extras (e em valor_total/valor_pendente), com UPDATE ... SET campo =
+campo + delta feito com a venda travada (SELECT ... FOR UPDATE). A parte
+anterior do pagamento/extra é lida do banco dentro da mesma trava, então
+duas confirmações simultâneas do mesmo pagamento não contam duas vezes.
+
+Mudanças nos componentes da própria venda (passageiros, seguro, taxas e
+desconto) entram como delta no VendaBloqueio.save(); um save() completo de
+uma venda carregada antes de um pagamento não sobrescreve os campos
+incrementais (ficam fora do UPDATE).
+
+recalcular_totais() - e o comando recalcular_vendas - reconstrói tudo a
+partir dos pagamentos e extras, em lotes, depois de cargas ou alterações
+em massa que não passam pelo save().
+"""
+
+import logging
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0")
+
+# Mantidos por deltas - fora do UPDATE de um save() completo da venda
+INCREMENTAL_FIELDS = ("valor_extras", "valor_pago", "valor_total", "valor_pendente")
+
+# Componentes do total que vêm da própria venda
+BASE_FIELDS = ("valor_passageiros", "valor_seguro", "valor_taxas", "valor_desconto")
+
+# Campos que mudam o valor dos passageiros
+PASSAGEIROS_FIELDS = ("bloqueio", "bloqueio_id", "numero_passageiros")
+
+# Status ajustados automaticamente conforme o valor pago
+STATUS_AGUARDANDO = "aguardando_pagamento"
+STATUS_PARCIAL = "parcialmente_pago"
+STATUS_PAGO = "pago"
+
+
+def valor_base(valores) -> Decimal:
+    """Parte do total que vem da própria venda (sem extras)"""
+    return (
+        (valores["valor_passageiros"] or ZERO) + (valores["valor_seguro"] or ZERO)
+        + (valores["valor_taxas"] or ZERO) - (valores["valor_desconto"] or ZERO)
+    )
+
+
+def valor_passageiros(bloqueio_id: Optional[int], numero_passageiros: int, cambio: Optional[Decimal] = None) -> Decimal:
+    """
+    Valor do bloqueio dividido pela quantidade da caravana, vezes os passageiros
+
+    Bloqueios em dólar são convertidos com a cotação fixada na venda (cambio);
+    vendas antigas sem cotação ficam com o valor como está (igual a
+    recalcular_totais).
+    """
+    from core.models import Bloqueio
+    from core.services.precificacao import para_real
+
+    if not bloqueio_id:
+        return ZERO
+    row = Bloqueio.objects.filter(pk=bloqueio_id).values("valor", "moeda_valor", "caravana__quantidade").first()
+    if not row:
+        return ZERO
+    valor = para_real(row["valor"], row["moeda_valor"], cambio) if cambio is not None else row["valor"] or ZERO
+    return valor / (row["caravana__quantidade"] or 1) * (numero_passageiros or 0)
+
+
+def valor_pagamento(status: Optional[str], valor) -> Decimal:
+    """Quanto um pagamento conta no valor pago da venda"""
+    return Decimal(valor or 0) if status == "confirmado" else ZERO
+
+
+def novo_status(status: str, total: Decimal, pago: Decimal) -> str:
+    """Status da venda depois de uma mudança nos valores"""
+    if total - pago <= 0 and total > 0:
+        if status in (STATUS_AGUARDANDO, STATUS_PARCIAL):
+            return STATUS_PAGO
+    elif pago > 0 and status == STATUS_AGUARDANDO:
+        return STATUS_PARCIAL
+    return status
+
+
+@contextmanager
+def travar_venda(venda_id: Optional[int]):
+    """
+    Transação com a venda travada (SELECT ... FOR UPDATE)
+
+    Serializa as alterações de pagamentos/extras da mesma venda: o que for
+    lido dentro do bloco não muda até o commit.
+    """
+    from core.models import VendaBloqueio
+
+    with transaction.atomic():
+        if venda_id:
+            list(VendaBloqueio.objects.select_for_update().filter(pk=venda_id).values_list("pk", flat=True))
+        yield
+
+
+def aplicar_delta(venda_id: int, base=ZERO, extras=ZERO, pago=ZERO, resumo: bool = True) -> Optional[Dict]:
+    """
+    Soma os deltas aos totais da venda, com a linha travada
+
+    Args:
+        base: Variação dos componentes da venda (passageiros, seguro, taxas, desconto)
+        extras: Variação de valor_extras
+        pago: Variação de valor_pago (pagamentos confirmados)
+        resumo: Também soma a diferença no resumo diário (False quando o
+            chamador já acompanha a venda, como no VendaBloqueio.save())
+
+    Returns:
+        Valores atualizados (valor_extras, valor_pago, valor_total,
+        valor_pendente, status) ou None se nada mudou
+    """
+    from core.models import VendaBloqueio
+    from core.services import venda_resumo
+
+    base, extras, pago = Decimal(base), Decimal(extras), Decimal(pago)
+    if not (base or extras or pago):
+        return None
+
+    with transaction.atomic():
+        vendas = VendaBloqueio.objects.filter(pk=venda_id)
+        # Também os campos do resumo diário (a trava fica só na venda)
+        atual = vendas.select_for_update(of=("self",)).values(
+            "valor_extras", *venda_resumo.CAMPOS_VENDA, caravana_id=F("bloqueio__caravana_id")
+        ).first()
+        if atual is None:
+            return None
+        valores = {
+            "valor_extras": atual["valor_extras"] + extras,
+            "valor_pago": atual["valor_pago"] + pago,
+            "valor_total": atual["valor_total"] + base + extras,
+            "valor_pendente": atual["valor_pendente"] + base + extras - pago,
+        }
+        valores["status"] = novo_status(atual["status"], valores["valor_total"], valores["valor_pago"])
+        vendas.update(
+            valor_extras=F("valor_extras") + extras,
+            valor_pago=F("valor_pago") + pago,
+            valor_total=F("valor_total") + base + extras,
+            valor_pendente=F("valor_pendente") + base + extras - pago,
+            status=valores["status"],
+            updated_at=timezone.now(),
+        )
+        if resumo:
+            venda_resumo.registrar(atual, {**atual, **valores})
+    return valores
+
+
+def sincronizar_instancia(venda, valores: Optional[Dict]) -> None:
+    """Copia os valores atualizados para a venda já carregada em memória"""
+    if venda is None or not valores:
+        return
+    for name, value in valores.items():
+        setattr(venda, name, value)
+
+
+def _soma(subquery):
+    return Coalesce(
+        Subquery(subquery), Value(ZERO),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def soma_extras(ref="pk"):
+    """Subconsulta correlacionada: soma dos extras da venda"""
+    from core.models import ExtraVenda
+
+    return _soma(
+        ExtraVenda.objects.filter(venda=OuterRef(ref)).order_by()
+        .values("venda").annotate(total=Sum("valor_total")).values("total")
+    )
+
+
+def soma_pagamentos(ref="pk", status="confirmado"):
+    """Subconsulta correlacionada: soma dos pagamentos da venda com o status"""
+    from core.models import Pagamento
+
+    return _soma(
+        Pagamento.objects.filter(venda=OuterRef(ref), status=status).order_by()
+        .values("venda").annotate(total=Sum("valor")).values("total")
+    )
+
+
+def totais_do_banco(venda_id: int, bloqueio_id: Optional[int], numero_passageiros: int,
+                    cambio: Optional[Decimal] = None) -> Dict:
+    """Passageiros, extras e pagos de uma venda calculados a partir do banco"""
+    from core.models import VendaBloqueio
+
+    valores = VendaBloqueio.objects.filter(pk=venda_id).annotate(
+        total_extras=soma_extras(), total_pago=soma_pagamentos(),
+    ).values("total_extras", "total_pago").first() if venda_id else None
+    valores = valores or {}
+    return {
+        "valor_passageiros": valor_passageiros(bloqueio_id, numero_passageiros, cambio),
+        "valor_extras": valores.get("total_extras") or ZERO,
+        "valor_pago": valores.get("total_pago") or ZERO,
+    }
+
+
+def recalcular_totais(queryset=None, batch_size: int = 1000) -> int:
+    """
+    Reconstrói os totais das vendas a partir dos extras e pagamentos
+
+    Cada lote é um UPDATE com subconsultas correlacionadas (as vendas não
+    são carregadas no Python), mais um UPDATE para o status.
+
+    Returns:
+        Quantidade de vendas atualizadas
+    """
+    from core.models import Bloqueio, VendaBloqueio
+    from core.services.precificacao import MOEDA_DOLAR
+
+    if queryset is None:
+        queryset = VendaBloqueio.objects.all()
+    money = DecimalField(max_digits=10, decimal_places=2)
+
+    # Bloqueios em dólar com a cotação fixada na venda (vendas antigas sem
+    # cotação ficam com o valor como está)
+    valor_real = Case(
+        When(moeda_valor=MOEDA_DOLAR, then=F("valor") * Coalesce(OuterRef("cambio_valor"), Value(Decimal("1")))),
+        default=F("valor"),
+    )
+    por_passageiro = Bloqueio.objects.filter(pk=OuterRef("bloqueio_id")).annotate(
+        por_passageiro=valor_real / Coalesce(F("caravana__quantidade"), Value(1))
+    ).values("por_passageiro")[:1]
+    passageiros = Coalesce(
+        Subquery(por_passageiro, output_field=money) * F("numero_passageiros"),
+        Value(ZERO), output_field=money,
+    )
+    extras, pago = soma_extras(), soma_pagamentos()
+    total = passageiros + extras + F("valor_seguro") + F("valor_taxas") - F("valor_desconto")
+
+    ids = list(queryset.order_by("pk").values_list("pk", flat=True))
+    updated = 0
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            batch = VendaBloqueio.objects.filter(pk__in=ids[start:start + batch_size])
+            updated += batch.update(
+                valor_passageiros=passageiros,
+                valor_extras=extras,
+                valor_pago=pago,
+                valor_total=total,
+                valor_pendente=total - pago,
+            )
+            # Mesmas regras de novo_status(), sobre os valores já gravados
+            batch.filter(status__in=(STATUS_AGUARDANDO, STATUS_PARCIAL)).update(
+                status=Case(
+                    When(Q(valor_pendente__lte=0) & Q(valor_total__gt=0), then=Value(STATUS_PAGO)),
+                    When(Q(valor_pago__gt=0) & Q(status=STATUS_AGUARDANDO), then=Value(STATUS_PARCIAL)),
+                    default=F("status"),
+                )
+            )
+
+    logger.info(f"Totais de {updated} venda(s) recalculados")
+    return updated
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Tempos de atendimento das conversas WhatsApp
+
+Cada WhatsAppConversation guarda o tempo da primeira resposta, a soma e a
+quantidade de respostas (tempo médio de resposta) e o tempo de resolução. As
+métricas são incrementais: uma mensagem recebida sem resposta pendente marca
+o início da espera (awaiting_reply_since) e a próxima mensagem enviada fecha a
+espera, somando a latência.
+
+Os mesmos valores são acumulados por dia, conta e atendente em
+WhatsAppResponseStats - os painéis leem alguns registros por dia em vez de
+percorrer as mensagens. O comando rebuild_whatsapp_response_stats reconstrói
+tudo a partir das mensagens (inclusive arquivadas).
+
+O atendente de cada registro é o responsável pela conversa (assigned_to) ou,
+em conversas sem responsável, o usuário que enviou a resposta.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Período padrão dos relatórios (dias)
+REPORT_DAYS = 30
+
+# Campos da conversa atualizados direto no banco
+METRIC_FIELDS = (
+    "awaiting_reply_since",
+    "first_response_at",
+    "first_response_seconds",
+    "reply_count",
+    "reply_seconds_total",
+    "resolution_seconds",
+)
+
+STAT_FIELDS = (
+    "first_response_count",
+    "first_response_seconds",
+    "reply_count",
+    "reply_seconds",
+    "resolved_count",
+    "resolution_seconds",
+)
+
+
+def _average(total: int, count: int) -> Optional[timedelta]:
+    return timedelta(seconds=total / count) if count else None
+
+
+@dataclass
+class ResponseSummary:
+    attendant: Optional[object] = None
+    first_response_count: int = 0
+    first_response_seconds: int = 0
+    reply_count: int = 0
+    reply_seconds: int = 0
+    resolved_count: int = 0
+    resolution_seconds: int = 0
+
+    @property
+    def avg_first_response(self) -> Optional[timedelta]:
+        return _average(self.first_response_seconds, self.first_response_count)
+
+    @property
+    def avg_reply(self) -> Optional[timedelta]:
+        return _average(self.reply_seconds, self.reply_count)
+
+    @property
+    def avg_resolution(self) -> Optional[timedelta]:
+        return _average(self.resolution_seconds, self.resolved_count)
+
+    def add(self, **values) -> None:
+        for field, value in values.items():
+            setattr(self, field, getattr(self, field) + (value or 0))
+
+
+def _seconds(start, end) -> int:
+    return max(int((end - start).total_seconds()), 0)
+
+
+def add_to_daily_stats(day, account_id: int, attendant_id: Optional[int], **deltas) -> None:
+    """Soma os valores ao agregado do dia (cria o registro se necessário)"""
+    from core.models import WhatsAppResponseStats
+
+    lookup = {"day": day, "account_id": account_id, "attendant_id": attendant_id}
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if WhatsAppResponseStats.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            WhatsAppResponseStats.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Criado por outra mensagem simultânea
+        WhatsAppResponseStats.objects.filter(**lookup).update(**changes)
+
+
+def record_message(message) -> None:
+    """Atualiza os tempos de resposta da conversa com uma mensagem recém-criada"""
+    from core.models import WhatsAppConversation
+
+    if not message.conversation_id:
+        return
+
+    conversations = WhatsAppConversation.objects.filter(pk=message.conversation_id)
+    if message.direction == "inbound":
+        # Só a primeira mensagem sem resposta inicia a espera
+        conversations.filter(awaiting_reply_since__isnull=True).update(
+            awaiting_reply_since=message.timestamp
+        )
+        return
+
+    with transaction.atomic():
+        conversation = (
+            conversations.select_for_update()
+            .filter(awaiting_reply_since__lte=message.timestamp)
+            .values("account_id", "assigned_to_id", "awaiting_reply_since", "first_response_at")
+            .first()
+        )
+        if not conversation:
+            return
+
+        seconds = _seconds(conversation["awaiting_reply_since"], message.timestamp)
+        changes = {
+            "awaiting_reply_since": None,
+            "reply_count": F("reply_count") + 1,
+            "reply_seconds_total": F("reply_seconds_total") + seconds,
+        }
+        stats = {"reply_count": 1, "reply_seconds": seconds}
+        if conversation["first_response_at"] is None:
+            changes.update(first_response_at=message.timestamp, first_response_seconds=seconds)
+            stats.update(first_response_count=1, first_response_seconds=seconds)
+        conversations.update(**changes)
+
+        add_to_daily_stats(
+            timezone.localdate(message.timestamp),
+            conversation["account_id"],
+            conversation["assigned_to_id"] or message.sent_by_id,
+            **stats,
+        )
+
+
+def record_resolution(conversation) -> None:
+    """
+    Registra o tempo de resolução (primeira mensagem até a resolução)
+
+    Só a primeira resolução conta: uma conversa reaberta e resolvida de novo
+    não é somada outra vez nos agregados (nem o tempo de vida inteiro dela).
+    """
+    from core.models import WhatsAppConversation
+
+    resolved_at = conversation.resolved_at or timezone.now()
+    seconds = _seconds(conversation.first_message_at, resolved_at)
+    first = WhatsAppConversation.objects.filter(
+        pk=conversation.pk, resolution_seconds__isnull=True
+    ).update(resolution_seconds=seconds)
+    if not first:
+        return
+    conversation.resolution_seconds = seconds
+
+    add_to_daily_stats(
+        timezone.localdate(resolved_at),
+        conversation.account_id,
+        conversation.assigned_to_id,
+        resolved_count=1,
+        resolution_seconds=seconds,
+    )
+
+
+def response_report(start, end, account=None) -> Tuple[ResponseSummary, List[ResponseSummary]]:
+    """
+    Tempos de atendimento do período a partir dos agregados diários
+
+    Args:
+        start / end: Datas inclusivas
+        account: Conta WhatsApp (opcional)
+
+    Returns:
+        (total do período, totais por atendente - mais respostas primeiro)
+    """
+    from core.models import Usuario, WhatsAppResponseStats
+
+    queryset = WhatsAppResponseStats.objects.filter(day__range=(start, end))
+    if account is not None:
+        queryset = queryset.filter(account=account)
+    rows = list(
+        queryset.order_by().values("attendant_id").annotate(
+            **{field: Sum(field) for field in STAT_FIELDS}
+        )
+    )
+
+    attendants = Usuario.objects.select_related("pessoa").in_bulk(
+        [row["attendant_id"] for row in rows if row["attendant_id"]]
+    )
+    total = ResponseSummary()
+    by_attendant = []
+    for row in rows:
+        values = {field: row[field] for field in STAT_FIELDS}
+        total.add(**values)
+        by_attendant.append(ResponseSummary(attendant=attendants.get(row["attendant_id"]), **values))
+    by_attendant.sort(key=lambda summary: summary.reply_count, reverse=True)
+    return total, by_attendant
+
+
+def _replay(conversation, messages, stats: Dict) -> None:
+    """Recalcula as métricas da conversa percorrendo as mensagens em ordem"""
+    # resolved_at guarda só a última resolução; o tempo gravado é o da primeira
+    first_resolution = conversation.resolution_seconds
+    conversation.awaiting_reply_since = None
+    conversation.first_response_at = None
+    conversation.first_response_seconds = None
+    conversation.reply_count = 0
+    conversation.reply_seconds_total = 0
+    conversation.resolution_seconds = None
+
+    def add(day, attendant_id, **values):
+        key = (day, conversation.account_id, attendant_id)
+        stats.setdefault(key, ResponseSummary()).add(**values)
+
+    for direction, timestamp, sent_by_id in messages:
+        if direction == "inbound":
+            if conversation.awaiting_reply_since is None:
+                conversation.awaiting_reply_since = timestamp
+            continue
+        if conversation.awaiting_reply_since is None or conversation.awaiting_reply_since > timestamp:
+            continue
+
+        seconds = _seconds(conversation.awaiting_reply_since, timestamp)
+        conversation.awaiting_reply_since = None
+        conversation.reply_count += 1
+        conversation.reply_seconds_total += seconds
+        values = {"reply_count": 1, "reply_seconds": seconds}
+        if conversation.first_response_at is None:
+            conversation.first_response_at = timestamp
+            conversation.first_response_seconds = seconds
+            values.update(first_response_count=1, first_response_seconds=seconds)
+        add(timezone.localdate(timestamp), conversation.assigned_to_id or sent_by_id, **values)
+
+    if first_resolution is not None:
+        resolved_at = conversation.first_message_at + timedelta(seconds=first_resolution)
+    elif conversation.resolved_at and conversation.status in ("resolved", "closed"):
+        resolved_at = conversation.resolved_at
+    else:
+        resolved_at = None
+    if resolved_at:
+        seconds = _seconds(conversation.first_message_at, resolved_at)
+        conversation.resolution_seconds = seconds
+        add(
+            timezone.localdate(resolved_at),
+            conversation.assigned_to_id,
+            resolved_count=1,
+            resolution_seconds=seconds,
+        )
+
+
+def rebuild_response_stats(batch_size: int = 500) -> int:
+    """
+    Reconstrói as métricas de todas as conversas e os agregados diários
+
+    Conversas resolvidas mais de uma vez contam apenas a primeira resolução
+    (como no registro incremental).
+
+    Returns:
+        Quantidade de conversas processadas
+    """
+    from core.models import (
+        WhatsAppConversation, WhatsAppMessage, WhatsAppMessageArchive, WhatsAppResponseStats
+    )
+
+    stats = {}
+    conversation_ids = list(WhatsAppConversation.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(conversation_ids), batch_size):
+        batch = conversation_ids[start:start + batch_size]
+        messages = {pk: [] for pk in batch}
+        for archive in WhatsAppMessageArchive.objects.filter(conversation_id__in=batch).iterator(chunk_size=50):
+            messages[archive.conversation_id].extend(
+                (m.direction, m.timestamp, m.sent_by_id) for m in archive.get_messages()
+            )
+        for conversation_id, *row in WhatsAppMessage.objects.filter(
+            conversation_id__in=batch
+        ).values_list("conversation_id", "direction", "timestamp", "sent_by_id").iterator():
+            messages[conversation_id].append(tuple(row))
+
+        conversations = list(WhatsAppConversation.objects.filter(pk__in=batch).only(
+            "account_id", "assigned_to_id", "status", "first_message_at", "resolved_at", *METRIC_FIELDS
+        ))
+        for conversation in conversations:
+            _replay(conversation, sorted(messages[conversation.pk], key=lambda m: m[1]), stats)
+        WhatsAppConversation.objects.bulk_update(conversations, METRIC_FIELDS)
+
+    with transaction.atomic():
+        WhatsAppResponseStats.objects.all().delete()
+        WhatsAppResponseStats.objects.bulk_create([
+            WhatsAppResponseStats(
+                day=day, account_id=account_id, attendant_id=attendant_id,
+                **{field: getattr(summary, field) for field in STAT_FIELDS}
+            )
+            for (day, account_id, attendant_id), summary in stats.items()
+        ], batch_size=1000)
+
+    logger.info(f"Tempos de atendimento de {len(conversation_ids)} conversas WhatsApp reconstruídos")
+    return len(conversation_ids)
@@ -6,6 +6,7 @@ from typing import Dict, List, Optional, Any
 from django.conf import settings
 from django.utils import timezone
 from ..models import WhatsAppAccount, WhatsAppMessage, WhatsAppContact
+from . import pessoa_telefones, whatsapp_summary
 
 logger = logging.getLogger(__name__)
 
@@ -1139,11 +1140,14 @@ class WhatsAppWebhookProcessor:
         # Atualiza última atividade da conversa
         await sync_to_async(lambda: setattr(conversation, 'last_activity', timestamp) or conversation.save(update_fields=['last_activity']))()
         
+        # Resumo (total, não lidas, última mensagem) foi atualizado no banco pelo save da mensagem
+        await sync_to_async(conversation.refresh_from_db)(fields=list(whatsapp_summary.SUMMARY_FIELDS))
+        
         # Notifica nova mensagem via WebSocket
         await self._notify_new_message(message, conversation)
         
         # Se é uma nova conversa, notifica também
-        if conversation.messages.count() == 1:  # Primeira mensagem da conversa
+        if conversation.message_count == 1:  # Primeira mensagem da conversa
             await self._notify_new_conversation(conversation)
         
         logger.info(f"Mensagem inbound processada: {wamid} - Conversa: {conversation.id}")
@@ -1247,6 +1251,8 @@ class WhatsAppWebhookProcessor:
                 phone_number=f"+{phone_number}",
                 profile_name=contact_info.get('profile', {}).get('name', '')
             )
+            # Vincula à pessoa cadastrada com o mesmo telefone
+            await sync_to_async(pessoa_telefones.vincular_contato)(contact)
             
             logger.info(f"Novo contato criado: {phone_number}")
             return contact
@@ -1289,66 +1295,61 @@ class WhatsAppWebhookProcessor:
         """
         Notifica nova mensagem via WebSocket
         """
-        from channels.layers import get_channel_layer
+        from core.services.whatsapp_events import apublish_event
+        
+        # Serializa mensagem
+        message_data = {
+            'id': message.id,
+            'wamid': message.wamid,
+            'contact_id': message.contact.id,
+            'contact_name': message.contact.display_name,
+            'direction': message.direction,
+            'message_type': message.message_type,
+            'content': message.get_display_content(),
+            'status': message.status,
+            'timestamp': message.timestamp.isoformat()
+        }
         
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            # Serializa mensagem
-            message_data = {
-                'id': message.id,
-                'wamid': message.wamid,
-                'contact_id': message.contact.id,
-                'contact_name': message.contact.display_name,
-                'direction': message.direction,
-                'message_type': message.message_type,
-                'content': message.get_display_content(),
-                'status': message.status,
-                'timestamp': message.timestamp.isoformat()
-            }
-            
-            # Notifica área comercial
-            await channel_layer.group_send(
-                'whatsapp_comercial',
-                {
-                    'type': 'message_received',
-                    'message': message_data,
-                    'conversation_id': conversation.id
-                }
-            )
+        # Notifica área comercial (registra no stream de eventos)
+        await apublish_event({
+            'type': 'message_received',
+            'message': message_data,
+            'conversation_id': conversation.id
+        })
     
     async def _notify_new_conversation(self, conversation):
         """
         Notifica nova conversa aguardando atendimento via WebSocket
         """
-        from channels.layers import get_channel_layer
         from asgiref.sync import sync_to_async
+        from core.services.whatsapp_events import apublish_event
+        
+        # Serializa conversa
+        conversation_data = {
+            'id': conversation.id,
+            'contact_name': conversation.contact.display_name,
+            'contact_phone': conversation.contact.display_phone,
+            'account_name': conversation.account.name,
+            'status': conversation.status,
+            'priority': conversation.priority,
+            'first_message_at': conversation.first_message_at.isoformat(),
+            'last_activity': conversation.last_activity.isoformat(),
+            'messages_count': conversation.message_count,
+            'unread_count': conversation.unread_inbound_count
+        }
         
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            # Serializa conversa
-            conversation_data = {
-                'id': conversation.id,
-                'contact_name': conversation.contact.display_name,
-                'contact_phone': conversation.contact.display_phone,
-                'account_name': conversation.account.name,
-                'status': conversation.status,
-                'priority': conversation.priority,
-                'first_message_at': conversation.first_message_at.isoformat(),
-                'last_activity': conversation.last_activity.isoformat(),
-                'messages_count': await sync_to_async(conversation.messages.count)(),
-                'unread_count': await sync_to_async(conversation.unread_messages_count)
-            }
-            
-            # Notifica área comercial sobre nova conversa aguardando
-            await channel_layer.group_send(
-                'whatsapp_comercial',
-                {
-                    'type': 'conversation_new',
-                    'conversation': conversation_data
-                }
-            )
-            
-            # Chat functionality removed - keeping only account-level notifications
+        # Notifica área comercial sobre nova conversa aguardando
+        await apublish_event({
+            'type': 'conversation_new',
+            'conversation': conversation_data
+        })
+        
+        # Distribuição automática entre os atendentes online
+        if getattr(settings, 'WHATSAPP_AUTO_ASSIGN', False):
+            from core.services.whatsapp_assignment import distribute_pending
+            await sync_to_async(distribute_pending)(limit=1)
+        
+        # Chat functionality removed - keeping only account-level notifications
     
     async def _notify_status_update(self, message):
         """
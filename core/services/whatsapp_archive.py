@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Arquivo (armazenamento frio) das mensagens WhatsApp
+
+Mensagens de conversas resolvidas/encerradas há mais de N meses saem de
+core_whatsappmessage - a tabela e os índices usados pelo atendimento ficam
+apenas com o histórico recente - e passam para WhatsAppMessageArchive, um
+registro por conversa e mês com as mensagens serializadas em JSON comprimido.
+
+Leitura transparente: WhatsAppMessage.objects.including_archived(conversa)
+completa as páginas do histórico (latest_page) com as mensagens arquivadas,
+mantendo os mesmos cursores (timestamp, id).
+
+O resumo da conversa continua válido: message_count inclui as arquivadas
+(archived_message_count) e as mensagens arquivadas deixam de contar como não
+lidas.
+"""
+
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, prefetch_related_objects
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ARCHIVABLE_STATUSES = ("resolved", "closed")
+
+COMPRESSION_LEVEL = 9
+
+MESSAGE_TABLE = "core_whatsappmessage"
+
+
+@dataclass
+class ArchiveResult:
+    conversations: int = 0
+    messages: int = 0
+    segments: int = 0
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    """Mantém os microssegundos das datas (o cursor de paginação depende deles)"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _archived_fields():
+    from core.models import WhatsAppMessage
+
+    # search_vector é gerado pelo banco - não faz parte do arquivo
+    return [field for field in WhatsAppMessage._meta.concrete_fields if not field.generated]
+
+
+def pack_messages(messages) -> bytes:
+    """Serializa mensagens em JSON comprimido (zlib)"""
+    fields = _archived_fields()
+    rows = [{field.attname: getattr(message, field.attname) for field in fields} for message in messages]
+    return zlib.compress(
+        json.dumps(rows, cls=ArchiveJSONEncoder, separators=(",", ":")).encode("utf-8"),
+        COMPRESSION_LEVEL,
+    )
+
+
+def unpack_messages(payload) -> List:
+    """Restaura as mensagens (instâncias não salvas, is_archived=True)"""
+    from core.models import WhatsAppMessage
+
+    fields = {field.attname: field for field in _archived_fields()}
+    messages = []
+    for row in json.loads(zlib.decompress(bytes(payload)).decode("utf-8")):
+        message = WhatsAppMessage(**{
+            name: fields[name].to_python(value) for name, value in row.items() if name in fields
+        })
+        message._state.adding = False
+        message.is_archived = True
+        messages.append(message)
+    return messages
+
+
+def archivable_conversations(months: int, now=None):
+    """Conversas resolvidas/encerradas sem atividade há mais de `months` meses"""
+    from core.models import WhatsAppConversation, WhatsAppMessage
+
+    cutoff = (now or timezone.now()) - timedelta(days=30 * months)
+    return WhatsAppConversation.objects.filter(
+        Exists(WhatsAppMessage.objects.filter(conversation=OuterRef("pk"))),
+        status__in=ARCHIVABLE_STATUSES,
+        last_activity__lt=cutoff,
+    )
+
+
+def _month_of(timestamp):
+    return timezone.localtime(timestamp).date().replace(day=1)
+
+
+def archive_conversation(conversation_id: int) -> Tuple[int, int]:
+    """
+    Move todas as mensagens da conversa para o arquivo
+
+    Returns:
+        (mensagens arquivadas, registros mensais gravados)
+    """
+    from core.models import WhatsAppConversation, WhatsAppMessage, WhatsAppMessageArchive
+
+    with transaction.atomic():
+        conversation = WhatsAppConversation.objects.select_for_update().get(pk=conversation_id)
+        messages = list(conversation.messages.order_by("timestamp", "id"))
+        if not messages:
+            return 0, 0
+
+        by_month = {}
+        for message in messages:
+            by_month.setdefault(_month_of(message.timestamp), []).append(message)
+
+        for month, month_messages in by_month.items():
+            segment = WhatsAppMessageArchive.objects.filter(
+                conversation=conversation, month=month
+            ).first()
+            if segment:
+                # Conversa reaberta e arquivada de novo: junta ao mês existente
+                known = {message.pk for message in month_messages}
+                month_messages = sorted(
+                    [m for m in segment.get_messages() if m.pk not in known] + month_messages,
+                    key=lambda m: (m.timestamp, m.pk),
+                )
+            else:
+                segment = WhatsAppMessageArchive(conversation=conversation, month=month)
+            segment.message_count = len(month_messages)
+            segment.first_timestamp = month_messages[0].timestamp
+            segment.last_timestamp = month_messages[-1].timestamp
+            segment.payload = pack_messages(month_messages)
+            segment.save()
+
+        # QuerySet.delete() não passa pelo WhatsAppMessage.delete() - o resumo é
+        # ajustado aqui (total inalterado, arquivadas não contam como não lidas)
+        WhatsAppMessage.objects.filter(pk__in=[message.pk for message in messages]).delete()
+        WhatsAppConversation.objects.filter(pk=conversation.pk).update(
+            archived_message_count=F("archived_message_count") + len(messages),
+            unread_inbound_count=0,
+        )
+
+    return len(messages), len(by_month)
+
+
+def archive_conversations(queryset) -> ArchiveResult:
+    """Arquiva as conversas do queryset, uma transação por conversa"""
+    result = ArchiveResult()
+    for conversation_id in queryset.values_list("pk", flat=True).iterator():
+        archived, segments = archive_conversation(conversation_id)
+        if archived:
+            result.conversations += 1
+            result.messages += archived
+            result.segments += segments
+    logger.info(
+        f"{result.messages} mensagens de {result.conversations} conversas WhatsApp arquivadas"
+    )
+    return result
+
+
+def archived_page(conversation, before: Optional[Tuple] = None, limit: int = 50) -> Tuple[List, bool]:
+    """
+    Mensagens arquivadas mais recentes da conversa (anteriores a `before`)
+
+    Returns:
+        (até `limit` mensagens em ordem cronológica, há mensagens anteriores)
+    """
+    segments = conversation.message_archives.order_by("-month")
+    if before:
+        segments = segments.filter(first_timestamp__lte=before[0])
+
+    collected = []
+    for segment in segments.iterator(chunk_size=1):
+        messages = segment.get_messages()
+        if before:
+            messages = [m for m in messages if (m.timestamp, m.pk) < before]
+        collected = messages + collected
+        if len(collected) > limit:
+            break
+
+    has_older = len(collected) > limit
+    collected = collected[-limit:] if limit else []
+    for message in collected:
+        if message.contact_id == conversation.contact_id:
+            message.contact = conversation.contact
+        message.conversation = conversation
+    prefetch_related_objects(collected, "sent_by__pessoa")
+    return collected, has_older
+
+
+def restore_conversation(conversation_id: int) -> int:
+    """Devolve as mensagens arquivadas da conversa para a tabela de mensagens"""
+    from core.models import WhatsAppConversation, WhatsAppMessage
+
+    with transaction.atomic():
+        conversation = WhatsAppConversation.objects.select_for_update().get(pk=conversation_id)
+        segments = list(conversation.message_archives.all())
+        messages = [message for segment in segments for message in segment.get_messages()]
+        restored_ids = {message.pk for message in messages}
+        reply_ids = {message.reply_to_id for message in messages if message.reply_to_id} - restored_ids
+        existing = set(WhatsAppMessage.objects.filter(pk__in=reply_ids).values_list("pk", flat=True))
+        for message in messages:
+            message._state.adding = True
+            # Respostas a mensagens que não existem mais (mesmo comportamento do SET_NULL)
+            if message.reply_to_id and message.reply_to_id not in restored_ids | existing:
+                message.reply_to_id = None
+        # bulk_create não passa pelo save(): o total não muda (arquivadas já contavam)
+        WhatsAppMessage.objects.bulk_create(messages, batch_size=500)
+        conversation.message_archives.all().delete()
+        WhatsAppConversation.objects.filter(pk=conversation.pk).update(archived_message_count=0)
+    return len(messages)
+
+
+def message_table_sizes() -> dict:
+    """Tamanho (bytes) da tabela de mensagens e dos seus índices"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_table_size(%s), pg_indexes_size(%s)", [MESSAGE_TABLE, MESSAGE_TABLE]
+        )
+        table, indexes = cursor.fetchone()
+    return {"table": table, "indexes": indexes}
+
+
+def reindex_message_table() -> None:
+    """
+    Reconstrói os índices da tabela de mensagens sem bloquear escritas
+
+    Após arquivar, o espaço das linhas removidas só é devolvido pelos índices
+    reconstruídos. REINDEX CONCURRENTLY não roda dentro de transação.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"REINDEX TABLE CONCURRENTLY {MESSAGE_TABLE}")
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Atribuição de conversas WhatsApp pendentes aos atendentes
+
+Cada atribuição é uma transação curta que trava apenas a conversa escolhida
+com SELECT ... FOR UPDATE SKIP LOCKED: atendentes (ou processos) disputando a
+fila pegam conversas diferentes em vez de esperar uns pelos outros, e uma
+conversa nunca é atribuída duas vezes.
+
+A fila segue a prioridade (urgente → baixa) e, dentro dela, a conversa mais
+antiga (first_message_at) - uma consulta por prioridade, servida pelo índice
+(status, priority, first_message_at).
+
+distribute_pending() reparte as pendentes entre os atendentes do Comercial
+com o WhatsApp aberto (presença mantida pelo consumer do WebSocket), pelo
+atendente menos ocupado ("least_loaded") ou pela atribuição mais antiga
+("round_robin"), respeitando WHATSAPP_ASSIGNMENT_MAX_ACTIVE. Com
+WHATSAPP_AUTO_ASSIGN ligado roda a cada nova conversa e a cada atendente que
+conecta; o comando assign_whatsapp_conversations faz o mesmo sob demanda.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, Max, Q, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_ORDER = ("urgent", "high", "medium", "low")
+
+ACTIVE_STATUSES = ("assigned", "in_progress")
+
+STRATEGIES = ("least_loaded", "round_robin")
+
+# Tempo de vida da presença - renovado a cada conexão do WebSocket
+PRESENCE_TIMEOUT = 60 * 60 * 12
+
+
+def _presence_key(user_id: int) -> str:
+    return f"whatsapp:online:{user_id}"
+
+
+def mark_online(user_id: int) -> None:
+    """Registra um socket aberto do atendente (várias abas somam)"""
+    key = _presence_key(user_id)
+    try:
+        if not cache.add(key, 1, PRESENCE_TIMEOUT):
+            cache.incr(key)
+            cache.touch(key, PRESENCE_TIMEOUT)
+    except ValueError:
+        # Expirou entre o add() e o incr()
+        cache.add(key, 1, PRESENCE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Erro ao registrar presença do atendente {user_id}: {e}")
+
+
+def mark_offline(user_id: int) -> None:
+    """Remove um socket do atendente"""
+    key = _presence_key(user_id)
+    try:
+        if cache.decr(key) <= 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+    except Exception as e:
+        logger.warning(f"Erro ao remover presença do atendente {user_id}: {e}")
+
+
+def online_user_ids(user_ids) -> List[int]:
+    """IDs (entre os informados) com ao menos um socket aberto"""
+    keys = {_presence_key(user_id): user_id for user_id in user_ids}
+    try:
+        online = cache.get_many(keys)
+    except Exception as e:
+        logger.warning(f"Cache indisponível para presença dos atendentes: {e}")
+        return []
+    return [keys[key] for key, sockets in online.items() if sockets and sockets > 0]
+
+
+def queue_ordering():
+    """Ordenação da fila: prioridade (urgente primeiro), depois a mais antiga"""
+    return [
+        Case(
+            *[When(priority=priority, then=Value(rank)) for rank, priority in enumerate(PRIORITY_ORDER)],
+            default=Value(len(PRIORITY_ORDER)),
+        ),
+        "first_message_at",
+        "pk",
+    ]
+
+
+def _claim(queryset, user):
+    """Trava e atribui a primeira conversa pendente do queryset (ou None)"""
+    conversation = queryset.select_for_update(skip_locked=True).filter(status="pending").first()
+    if conversation is None:
+        return None
+
+    conversation.assigned_to = user
+    conversation.status = "in_progress"
+    conversation.assigned_at = timezone.now()
+    conversation.save(update_fields=["assigned_to", "status", "assigned_at", "atualizado_em"])
+    transaction.on_commit(lambda: _notify_assigned(conversation, user))
+    return conversation
+
+
+def claim_conversation(conversation_id: int, user):
+    """
+    Atribui uma conversa específica ao usuário, se ainda estiver pendente
+
+    Returns:
+        A conversa atribuída ou None (já atribuída ou travada por outro atendente)
+    """
+    from core.models import WhatsAppConversation
+
+    with transaction.atomic():
+        return _claim(WhatsAppConversation.objects.filter(pk=conversation_id), user)
+
+
+def claim_next(user):
+    """
+    Atribui ao usuário a próxima conversa da fila (prioridade, depois a mais antiga)
+
+    Returns:
+        A conversa atribuída ou None se não há pendentes livres
+    """
+    from core.models import WhatsAppConversation
+
+    with transaction.atomic():
+        for priority in PRIORITY_ORDER:
+            conversation = _claim(
+                WhatsAppConversation.objects.filter(priority=priority).order_by("first_message_at", "pk"),
+                user,
+            )
+            if conversation:
+                return conversation
+    return None
+
+
+def _notify_assigned(conversation, user) -> None:
+    from core.services.whatsapp_events import publish_event, send_to_user
+
+    event = {
+        "type": "conversation_assigned",
+        "conversation": {
+            "id": conversation.id,
+            "contact_name": conversation.contact.display_name,
+            "assigned_to": user.username,
+            "assigned_to_id": user.id,
+            "status": conversation.status,
+            "priority": conversation.priority,
+        },
+    }
+    try:
+        # Todos os sockets tiram a conversa da fila; o atendente recebe o aviso direto
+        publish_event(event)
+        send_to_user(user.id, {**event, "assigned_to_me": True})
+    except Exception as e:
+        logger.warning(f"Erro ao notificar atribuição da conversa {conversation.id}: {e}")
+
+
+@dataclass
+class Attendant:
+    user: object
+    load: int
+    last_assigned_at: Optional[datetime]
+
+
+def available_attendants(user_ids=None) -> List[Attendant]:
+    """
+    Atendentes do Comercial online e abaixo do limite de conversas em atendimento
+
+    Args:
+        user_ids: Restringe aos usuários informados (padrão: todo o Comercial)
+    """
+    from core.models import Usuario
+
+    candidates = Usuario.objects.filter(is_active=True, groups__name="Comercial")
+    if user_ids is not None:
+        candidates = candidates.filter(pk__in=user_ids)
+    online = online_user_ids(candidates.values_list("pk", flat=True))
+    if not online:
+        return []
+
+    users = Usuario.objects.filter(pk__in=online).annotate(
+        active_load=Count("whatsapp_conversations", filter=Q(whatsapp_conversations__status__in=ACTIVE_STATUSES)),
+        last_assigned=Max("whatsapp_conversations__assigned_at"),
+    )
+    return [
+        Attendant(user=user, load=user.active_load, last_assigned_at=user.last_assigned)
+        for user in users
+        if user.active_load < settings.WHATSAPP_ASSIGNMENT_MAX_ACTIVE
+    ]
+
+
+def _pick(attendants: List[Attendant], strategy: str) -> Attendant:
+    never = datetime.min.replace(tzinfo=dt_timezone.utc)
+    if strategy == "round_robin":
+        return min(attendants, key=lambda a: (a.last_assigned_at or never, a.user.pk))
+    return min(attendants, key=lambda a: (a.load, a.last_assigned_at or never, a.user.pk))
+
+
+def distribute_pending(limit: Optional[int] = None, strategy: Optional[str] = None, user_ids=None) -> List:
+    """
+    Reparte as conversas pendentes entre os atendentes disponíveis
+
+    Args:
+        limit: Máximo de conversas atribuídas nesta execução
+        strategy: "least_loaded" ou "round_robin" (padrão: WHATSAPP_ASSIGNMENT_STRATEGY)
+        user_ids: Restringe os atendentes (ex.: apenas quem acabou de conectar)
+
+    Returns:
+        Conversas atribuídas
+    """
+    strategy = strategy or settings.WHATSAPP_ASSIGNMENT_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estratégia de atribuição inválida: {strategy}")
+
+    attendants = available_attendants(user_ids)
+    assigned = []
+    while attendants and (limit is None or len(assigned) < limit):
+        attendant = _pick(attendants, strategy)
+        conversation = claim_next(attendant.user)
+        if conversation is None:
+            break
+        assigned.append(conversation)
+        attendant.load += 1
+        attendant.last_assigned_at = conversation.assigned_at
+        if attendant.load >= settings.WHATSAPP_ASSIGNMENT_MAX_ACTIVE:
+            attendants.remove(attendant)
+
+    if assigned:
+        logger.info(f"{len(assigned)} conversa(s) WhatsApp distribuída(s) ({strategy})")
+    return assigned
+
+
+@dataclass
+class SimulationResult:
+    claims: int = 0
+    duplicates: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        return self.claims / self.elapsed if self.elapsed else 0.0
+
+
+def simulate_concurrent_claims(users, workers: int) -> SimulationResult:
+    """
+    Esvazia a fila com `workers` threads chamando claim_next() ao mesmo tempo
+
+    Cada thread usa a própria conexão com o banco e um dos usuários
+    informados. Conta as conversas atribuídas mais de uma vez (deve ser zero).
+    """
+    import threading
+    import time
+    from collections import Counter
+
+    from django.db import connection
+
+    claimed = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(workers)
+
+    def worker(user):
+        try:
+            start.wait()
+            while True:
+                conversation = claim_next(user)
+                if conversation is None:
+                    break
+                with lock:
+                    claimed[conversation.pk] += 1
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(users[index % len(users)],))
+        for index in range(workers)
+    ]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return SimulationResult(
+        claims=sum(claimed.values()),
+        duplicates=sum(total - 1 for total in claimed.values() if total > 1),
+        elapsed=time.perf_counter() - began,
+    )
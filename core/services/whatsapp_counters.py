@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Contadores de conversas WhatsApp por status
+
+Mantém no cache (Redis em produção) a quantidade de conversas em cada status,
+global e por conta. Os contadores são incrementados/decrementados de forma
+atômica nas transições de status de WhatsAppConversation e reconstruídos
+periodicamente pelo comando reconcile_whatsapp_counters.
+
+Quando a chave não existe no cache (primeiro acesso, expiração ou cache
+indisponível), a contagem é feita no banco e gravada para as próximas leituras.
+"""
+
+import logging
+from typing import Dict, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+# Tempo de vida das chaves - a reconciliação periódica regrava todas
+COUNTER_TIMEOUT = 60 * 60 * 6
+
+STATUSES = ("pending", "assigned", "in_progress", "resolved", "closed")
+
+
+def _key(status: str, account_id: Optional[int] = None) -> str:
+    scope = account_id if account_id is not None else "all"
+    return f"whatsapp:conversations:{scope}:{status}"
+
+
+def _count_from_db(account_id: Optional[int] = None) -> Dict[str, int]:
+    """Conta conversas por status no banco em uma única query agrupada"""
+    from core.models import WhatsAppConversation
+
+    queryset = WhatsAppConversation.objects.all()
+    if account_id is not None:
+        queryset = queryset.filter(account_id=account_id)
+
+    counts = {status: 0 for status in STATUSES}
+    for row in queryset.order_by().values("status").annotate(total=Count("id")):
+        counts[row["status"]] = row["total"]
+    return counts
+
+
+def get_status_counts(account_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Retorna a quantidade de conversas em cada status
+
+    Args:
+        account_id: ID da conta WhatsApp (None = todas as contas)
+    """
+    keys = {status: _key(status, account_id) for status in STATUSES}
+    try:
+        cached = cache.get_many(keys.values())
+    except Exception as e:
+        logger.warning(f"Cache indisponível para contadores WhatsApp: {e}")
+        cached = {}
+
+    if len(cached) == len(keys):
+        return {status: int(cached[key]) for status, key in keys.items()}
+
+    counts = _count_from_db(account_id)
+    try:
+        # add() não sobrescreve chaves criadas por outro processo nesse meio tempo
+        for status, key in keys.items():
+            if key not in cached:
+                cache.add(key, counts[status], COUNTER_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Erro ao gravar contadores WhatsApp no cache: {e}")
+
+    return counts
+
+
+def get_status_count(status: str, account_id: Optional[int] = None) -> int:
+    """Retorna a quantidade de conversas em um status"""
+    return get_status_counts(account_id)[status]
+
+
+def get_pending_count(account_id: Optional[int] = None) -> int:
+    """Retorna a quantidade de conversas aguardando atendimento"""
+    return get_status_count("pending", account_id)
+
+
+def _apply_delta(status: str, account_id: Optional[int], delta: int):
+    for key in (_key(status), _key(status, account_id)):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Chave ausente - será recontada no banco na próxima leitura
+            pass
+        except Exception as e:
+            logger.warning(f"Erro ao atualizar contador WhatsApp {key}: {e}")
+
+
+def record_status_transition(account_id: int, old_status: Optional[str], new_status: Optional[str]):
+    """
+    Registra a mudança de status de uma conversa nos contadores
+
+    Use old_status=None para conversas criadas e new_status=None para conversas
+    removidas. A atualização só é aplicada após o commit da transação, para que
+    um rollback não deixe os contadores divergentes do banco.
+    """
+    if old_status == new_status:
+        return
+
+    def apply():
+        if old_status in STATUSES:
+            _apply_delta(old_status, account_id, -1)
+        if new_status in STATUSES:
+            _apply_delta(new_status, account_id, 1)
+
+    transaction.on_commit(apply)
+
+
+def reconcile_status_counts() -> Dict[Optional[int], Dict[str, int]]:
+    """
+    Reconstrói todos os contadores a partir do banco
+
+    Returns:
+        Dict {account_id: {status: total}}, com a chave None para o total global
+    """
+    from core.models import WhatsAppAccount, WhatsAppConversation
+
+    totals = {None: {status: 0 for status in STATUSES}}
+    for account_id in WhatsAppAccount.objects.values_list("id", flat=True):
+        totals[account_id] = {status: 0 for status in STATUSES}
+
+    rows = (
+        WhatsAppConversation.objects.order_by()
+        .values("account_id", "status")
+        .annotate(total=Count("id"))
+    )
+    for row in rows:
+        if row["status"] not in STATUSES:
+            continue
+        totals.setdefault(row["account_id"], {status: 0 for status in STATUSES})
+        totals[row["account_id"]][row["status"]] = row["total"]
+        totals[None][row["status"]] += row["total"]
+
+    cache.set_many(
+        {
+            _key(status, account_id): total
+            for account_id, counts in totals.items()
+            for status, total in counts.items()
+        },
+        COUNTER_TIMEOUT,
+    )
+    return totals
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Publicação de eventos WhatsApp para os sockets da área comercial
+
+Cada evento é anexado a um stream Redis limitado (XADD MAXLEN ~) antes de ser
+distribuído pelo channel layer. O ID gerado pelo Redis é monotônico e vai junto
+com o evento até o navegador; ao reconectar, o navegador informa o último ID
+recebido e o consumer reenvia apenas os eventos perdidos (read_events_after).
+
+Se o Redis estiver indisponível, o evento continua sendo distribuído, apenas
+sem ID - o navegador fará uma ressincronização completa na próxima reconexão.
+"""
+
+import json
+import logging
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+COMERCIAL_GROUP = "whatsapp_comercial"
+STREAM_KEY = "whatsapp:comercial:events"
+
+_redis_client = None
+
+
+def get_redis():
+    """Retorna o cliente Redis (compartilhado pelo processo)"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(
+            settings.WHATSAPP_EVENTS_REDIS_URL,
+            decode_responses=True,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+        )
+    return _redis_client
+
+
+def _parse_id(event_id: str):
+    """Converte um ID de stream ('1700000000000-0') em tupla comparável"""
+    ms, _, seq = str(event_id).partition("-")
+    return int(ms), int(seq or 0)
+
+
+def append_to_stream(event: Dict) -> Optional[str]:
+    """
+    Anexa o evento ao stream e retorna o ID gerado (ou None se falhar)
+    """
+    try:
+        return get_redis().xadd(
+            STREAM_KEY,
+            {"event": json.dumps(event)},
+            maxlen=settings.WHATSAPP_EVENTS_STREAM_MAXLEN,
+            approximate=True,
+        )
+    except Exception as e:
+        logger.warning(f"Não foi possível anexar evento ao stream WhatsApp: {e}")
+        return None
+
+
+def publish_event(event: Dict, group: str = COMERCIAL_GROUP) -> Optional[str]:
+    """
+    Registra o evento no stream e envia para o grupo do channel layer
+
+    Args:
+        event: Mensagem do channel layer ('type' = nome do handler do consumer)
+        group: Grupo de destino
+
+    Returns:
+        ID do evento no stream, ou None se não foi possível registrá-lo
+    """
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    event_id = append_to_stream(event)
+    if event_id:
+        event = {**event, "event_id": event_id}
+
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        logger.warning("Channel layer não configurado - notificação WebSocket ignorada")
+        return event_id
+
+    async_to_sync(channel_layer.group_send)(group, event)
+    return event_id
+
+
+def user_group(user_id: int) -> str:
+    """Grupo do channel layer com os sockets de um atendente"""
+    return f"whatsapp_user_{user_id}"
+
+
+def send_to_user(user_id: int, event: Dict) -> None:
+    """
+    Envia o evento apenas aos sockets do atendente
+
+    Não passa pelo stream: o replay após reconexão é compartilhado por todos
+    os sockets e não deve reenviar eventos de outro atendente.
+    """
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        async_to_sync(channel_layer.group_send)(user_group(user_id), event)
+
+
+async def apublish_event(event: Dict, group: str = COMERCIAL_GROUP) -> Optional[str]:
+    """Versão assíncrona de publish_event (para o WhatsAppWebhookProcessor)"""
+    from asgiref.sync import sync_to_async
+    from channels.layers import get_channel_layer
+
+    event_id = await sync_to_async(append_to_stream)(event)
+    if event_id:
+        event = {**event, "event_id": event_id}
+
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        await channel_layer.group_send(group, event)
+    return event_id
+
+
+def read_events_after(last_event_id: str, limit: Optional[int] = None) -> Optional[List[Dict]]:
+    """
+    Retorna os eventos publicados depois de last_event_id, em ordem
+
+    Returns:
+        Lista de eventos (cada um com 'event_id'), ou None quando não é possível
+        garantir a continuidade - ID inválido, eventos já descartados pelo limite
+        do stream, mais de `limit` eventos perdidos ou Redis indisponível. Nesse
+        caso o cliente deve fazer uma ressincronização completa.
+    """
+    limit = limit or settings.WHATSAPP_EVENTS_REPLAY_LIMIT
+
+    try:
+        last = _parse_id(last_event_id)
+    except (TypeError, ValueError):
+        return None
+
+    try:
+        client = get_redis()
+        info = client.xinfo_stream(STREAM_KEY)
+
+        # Stream recriado (ex.: FLUSHDB) - o ID do cliente não existe mais
+        if _parse_id(info["last-generated-id"]) < last:
+            return None
+
+        # Eventos posteriores ao último visto já foram descartados pelo MAXLEN
+        max_deleted = info.get("max-deleted-entry-id")
+        if max_deleted is not None:
+            if _parse_id(max_deleted) > last:
+                return None
+        else:
+            first_entry = info.get("first-entry")
+            if first_entry and _parse_id(first_entry[0]) > last:
+                return None
+
+        entries = client.xrange(STREAM_KEY, min=f"({last_event_id}", count=limit + 1)
+    except Exception as e:
+        logger.warning(f"Não foi possível ler o stream de eventos WhatsApp: {e}")
+        return None
+
+    if len(entries) > limit:
+        return None
+
+    events = []
+    for entry_id, fields in entries:
+        try:
+            event = json.loads(fields["event"])
+        except (KeyError, ValueError):
+            continue
+        event["event_id"] = entry_id
+        events.append(event)
+    return events
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação do histórico de mensagens WhatsApp (CSV e JSONL)
+
+As exportações são geradas sob demanda e enviadas em streaming
+(StreamingHttpResponse): as mensagens são lidas em blocos com
+.iterator(chunk_size=...) - cursor no servidor - e enviadas em pequenos blocos
+de linhas assim que formatadas. A memória usada não depende do tamanho do
+histórico e o download começa imediatamente.
+
+Mensagens arquivadas (WhatsAppMessageArchive) entram antes das mensagens da
+tabela, um registro mensal por vez.
+"""
+
+import csv
+import json
+from typing import Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .export_utils import (
+    CHUNK_SIZE, LINES_PER_CHUNK, Echo, byte_chunks, csv_value, date_range, export_filename, streaming_response,
+)
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+COLUMNS = [
+    ("data_hora", lambda m: timezone.localtime(m.timestamp).isoformat()),
+    ("conversa_id", lambda m: m.conversation_id),
+    ("contato", lambda m: m.contact.display_name),
+    ("telefone", lambda m: m.contact.phone_number),
+    ("direcao", lambda m: m.get_direction_display()),
+    ("tipo", lambda m: m.get_message_type_display()),
+    ("status", lambda m: m.get_status_display()),
+    ("conteudo", lambda m: m.get_display_content()),
+    ("arquivo", lambda m: m.media_filename),
+    ("enviada_por", lambda m: _sender_name(m.sent_by)),
+    ("wamid", lambda m: m.wamid),
+    ("arquivada", lambda m: m.is_archived),
+]
+
+def _sender_name(user) -> str:
+    if not user:
+        return ""
+    pessoa = getattr(user, "pessoa", None)
+    return getattr(pessoa, "nome", "") or user.username
+
+
+def iter_messages(*, conversation=None, contact=None, account=None,
+                  start=None, end=None, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Mensagens a exportar em ordem cronológica (arquivadas primeiro)
+
+    Args:
+        conversation / contact / account: Escopo da exportação (ao menos um)
+        start / end: Datas inclusivas (opcionais)
+        chunk_size: Linhas por busca no cursor do servidor
+    """
+    from core.models import WhatsAppMessage, WhatsAppMessageArchive
+
+    start_at, end_before = date_range(start, end)
+
+    def in_range(message):
+        return (not start_at or message.timestamp >= start_at) and (
+            not end_before or message.timestamp < end_before
+        )
+
+    archives = WhatsAppMessageArchive.objects.order_by("month", "conversation_id")
+    messages = WhatsAppMessage.objects.select_related("contact", "sent_by", "sent_by__pessoa")
+    if conversation is not None:
+        archives = archives.filter(conversation=conversation)
+        messages = messages.filter(conversation=conversation)
+    if contact is not None:
+        archives = archives.filter(conversation__contact=contact)
+        messages = messages.filter(contact=contact)
+    if account is not None:
+        archives = archives.filter(conversation__account=account)
+        messages = messages.filter(account=account)
+    if start_at:
+        archives = archives.filter(last_timestamp__gte=start_at)
+        messages = messages.filter(timestamp__gte=start_at)
+    if end_before:
+        archives = archives.filter(first_timestamp__lt=end_before)
+        messages = messages.filter(timestamp__lt=end_before)
+
+    for archive in archives.iterator(chunk_size=1):
+        archived = [m for m in archive.get_messages() if in_range(m)]
+        prefetch_related_objects(archived, "contact", "sent_by__pessoa")
+        yield from archived
+
+    yield from messages.order_by("timestamp", "id").iterator(chunk_size=chunk_size)
+
+
+def csv_lines(messages) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    # BOM para o Excel reconhecer UTF-8 (acentos)
+    yield "\ufeff" + writer.writerow([name for name, _ in COLUMNS])
+    for message in messages:
+        yield writer.writerow([csv_value(getter(message)) for _, getter in COLUMNS])
+
+
+def jsonl_lines(messages) -> Iterator[str]:
+    for message in messages:
+        row = {name: getter(message) for name, getter in COLUMNS}
+        yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + "\n"
+
+
+def export_response(request, messages, export_format: str, filename: str) -> StreamingHttpResponse:
+    """
+    Resposta em streaming com as mensagens no formato pedido
+
+    No ASGI (daphne) o conteúdo precisa ser um iterador assíncrono - com um
+    iterador comum o Django consome tudo antes de enviar.
+
+    Args:
+        request: Request atual (define iterador síncrono ou assíncrono)
+        messages: Iterável de mensagens (normalmente iter_messages())
+        export_format: "csv" ou "jsonl"
+        filename: Nome do arquivo sem extensão
+    """
+    lines = csv_lines(messages) if export_format == "csv" else jsonl_lines(messages)
+    return streaming_response(
+        request, byte_chunks(lines, LINES_PER_CHUNK), FORMATS[export_format], f"{filename}.{export_format}"
+    )
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Busca nas conversas WhatsApp
+
+Combina três critérios, todos atendidos por índices GIN:
+- texto das mensagens: busca textual em português (WhatsAppMessage.search_vector,
+  coluna gerada pelo banco - sempre atualizada, inclusive em bulk_create/update());
+- nome e nome do perfil do contato: trechos via índices de trigramas
+  (UPPER(...) gin_trgm_ops, o mesmo formato usado pelo icontains no PostgreSQL);
+- telefone: trechos apenas com os dígitos informados (phone_number gin_trgm_ops).
+
+As conversas são ordenadas pela relevância da melhor mensagem somada a um
+peso para o nome do contato (começo do nome vale mais que trecho no meio).
+attach_matches() adiciona às conversas exibidas os trechos das mensagens
+encontradas, com os termos destacados.
+"""
+
+import re
+from typing import Iterable, List
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+SEARCH_CONFIG = "portuguese"
+
+# Telefones só são buscados a partir desta quantidade de dígitos
+MIN_PHONE_DIGITS = 4
+
+# Peso do nome do contato na relevância (SearchRank fica entre 0 e 1)
+NAME_PREFIX_SCORE = 1.0
+NAME_MATCH_SCORE = 0.5
+
+# Trechos destacados por conversa
+MATCHES_PER_CONVERSATION = 2
+
+# Marcadores do ts_headline - substituídos por <mark> após escapar o conteúdo
+_START, _STOP = "\x02", "\x03"
+
+
+def build_query(term: str) -> SearchQuery:
+    """Consulta textual no formato "websearch" (aceita qualquer texto digitado)"""
+    return SearchQuery(term, config=SEARCH_CONFIG, search_type="websearch")
+
+
+def phone_digits(term: str) -> str:
+    return re.sub(r"\D", "", term)
+
+
+def search_conversations(queryset, term: str):
+    """
+    Filtra e ordena conversas pela busca
+
+    Args:
+        queryset: Conversas candidatas (já filtradas por status, atendente, etc.)
+        term: Texto digitado pelo usuário
+
+    Returns:
+        QuerySet anotado com search_rank, ordenado por relevância
+    """
+    from core.models import WhatsAppMessage
+
+    term = (term or "").strip()
+    if not term:
+        return queryset
+
+    query = build_query(term)
+    matching = WhatsAppMessage.objects.filter(search_vector=query)
+
+    name_match = Q(contact__name__icontains=term) | Q(contact__profile_name__icontains=term)
+    criteria = name_match | Q(pk__in=matching.values("conversation_id"))
+    digits = phone_digits(term)
+    if len(digits) >= MIN_PHONE_DIGITS:
+        criteria |= Q(contact__phone_number__contains=digits)
+
+    best_message_rank = Subquery(
+        matching.filter(conversation=OuterRef("pk"))
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank")
+        .values("rank")[:1],
+        output_field=FloatField(),
+    )
+    name_score = Case(
+        When(
+            Q(contact__name__istartswith=term) | Q(contact__profile_name__istartswith=term),
+            then=Value(NAME_PREFIX_SCORE),
+        ),
+        When(name_match, then=Value(NAME_MATCH_SCORE)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+    return (
+        queryset.filter(criteria)
+        .annotate(search_rank=Coalesce(best_message_rank, Value(0.0)) + name_score)
+        .order_by("-search_rank", "-last_activity")
+    )
+
+
+def _highlight(headline: str) -> str:
+    return mark_safe(
+        escape(headline).replace(_START, "<mark>").replace(_STOP, "</mark>")
+    )
+
+
+def attach_matches(conversations: Iterable, term: str,
+                   per_conversation: int = MATCHES_PER_CONVERSATION) -> List:
+    """
+    Adiciona `search_matches` (mensagens encontradas) a cada conversa
+
+    Cada mensagem recebe `highlight`: trecho do conteúdo (HTML escapado) com
+    os termos encontrados em <mark>. Executa uma única consulta para todas as
+    conversas, limitada a `per_conversation` mensagens por conversa.
+    """
+    from core.models import WhatsAppMessage
+
+    conversations = list(conversations)
+    for conversation in conversations:
+        conversation.search_matches = []
+
+    term = (term or "").strip()
+    if not term or not conversations:
+        return conversations
+
+    query = build_query(term)
+    by_id = {conversation.pk: conversation for conversation in conversations}
+    messages = (
+        WhatsAppMessage.objects.filter(conversation_id__in=by_id, search_vector=query)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F("conversation_id"),
+                order_by=[SearchRank(F("search_vector"), query).desc(), F("timestamp").desc()],
+            ),
+            headline=SearchHeadline(
+                "content",
+                query,
+                config=SEARCH_CONFIG,
+                start_sel=_START,
+                stop_sel=_STOP,
+                max_words=20,
+                min_words=8,
+            ),
+        )
+        .filter(position__lte=per_conversation)
+        .order_by("conversation_id", "position")
+    )
+    for message in messages:
+        message.highlight = _highlight(message.headline)
+        by_id[message.conversation_id].search_matches.append(message)
+    return conversations
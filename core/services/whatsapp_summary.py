@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Resumo denormalizado das conversas WhatsApp
+
+Cada WhatsAppConversation guarda a quantidade de mensagens, as não lidas
+recebidas e os dados da última mensagem (data, prévia e direção), além da
+data da última mensagem recebida (janela de 24h). Assim as listas de
+conversas não precisam agregar nem pré-carregar as mensagens.
+
+Os campos são atualizados pelo WhatsAppMessage.save()/delete() com um único
+UPDATE usando expressões F/Case - atômico mesmo com mensagens simultâneas na
+mesma conversa. O comando rebuild_whatsapp_summaries reconstrói tudo a partir
+das mensagens (após importações, update() em massa, etc.).
+"""
+
+import logging
+from typing import Optional
+
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+logger = logging.getLogger(__name__)
+
+# Mensagens recebidas nesses status ainda não foram lidas pelo atendente
+UNREAD_STATUSES = ("sent", "delivered")
+
+PREVIEW_LENGTH = 255
+
+SUMMARY_FIELDS = (
+    "message_count",
+    "unread_inbound_count",
+    "last_message_at",
+    "last_message_preview",
+    "last_message_direction",
+    "last_inbound_at",
+    "archived_message_count",
+)
+
+
+def is_unread(direction: Optional[str], status: Optional[str]) -> bool:
+    return direction == "inbound" and status in UNREAD_STATUSES
+
+
+def message_preview(message) -> str:
+    """Texto exibido nas listas de conversas"""
+    return (message.get_display_content() or "")[:PREVIEW_LENGTH]
+
+
+def _newer_than(field: str, timestamp) -> Q:
+    return Q(**{f"{field}__isnull": True}) | Q(**{f"{field}__lte": timestamp})
+
+
+def record_new_message(message) -> None:
+    """Atualiza o resumo da conversa com uma mensagem recém-criada"""
+    from core.models import WhatsAppConversation
+
+    if not message.conversation_id:
+        return
+
+    is_latest = _newer_than("last_message_at", message.timestamp)
+    changes = {
+        "message_count": F("message_count") + 1,
+        "last_message_at": Case(
+            When(is_latest, then=Value(message.timestamp)),
+            default=F("last_message_at"),
+        ),
+        "last_message_preview": Case(
+            When(is_latest, then=Value(message_preview(message))),
+            default=F("last_message_preview"),
+        ),
+        "last_message_direction": Case(
+            When(is_latest, then=Value(message.direction)),
+            default=F("last_message_direction"),
+        ),
+    }
+    if message.direction == "inbound":
+        changes["last_inbound_at"] = Case(
+            When(_newer_than("last_inbound_at", message.timestamp), then=Value(message.timestamp)),
+            default=F("last_inbound_at"),
+        )
+    if is_unread(message.direction, message.status):
+        changes["unread_inbound_count"] = F("unread_inbound_count") + 1
+
+    WhatsAppConversation.objects.filter(pk=message.conversation_id).update(**changes)
+
+
+def record_unread_change(conversation_id: Optional[int], delta: int) -> None:
+    """Aplica a variação de não lidas (mudança de status de mensagem recebida)"""
+    from core.models import WhatsAppConversation
+
+    if not conversation_id or not delta:
+        return
+    WhatsAppConversation.objects.filter(pk=conversation_id).update(
+        unread_inbound_count=Greatest(F("unread_inbound_count") + delta, Value(0))
+    )
+
+
+def rebuild_summaries(queryset=None, batch_size: int = 500) -> int:
+    """
+    Reconstrói o resumo das conversas a partir das mensagens
+
+    Args:
+        queryset: Conversas a reconstruir (padrão: todas)
+        batch_size: Conversas por lote na atualização das prévias
+
+    Returns:
+        Quantidade de conversas atualizadas
+    """
+    from core.models import WhatsAppConversation, WhatsAppMessage
+
+    if queryset is None:
+        queryset = WhatsAppConversation.objects.all()
+
+    messages = WhatsAppMessage.objects.filter(conversation=OuterRef("pk")).order_by()
+    latest = messages.order_by("-timestamp", "-id")
+
+    def count(qs):
+        return Coalesce(
+            Subquery(qs.values("conversation").annotate(total=Count("id")).values("total")),
+            0,
+        )
+
+    def latest_or_archived(field, subquery):
+        # Conversas com mensagens arquivadas mantêm os dados já calculados
+        # quando não há mensagens mais novas na tabela
+        return Case(
+            When(archived_message_count__gt=0, then=Coalesce(subquery, F(field))),
+            default=subquery,
+        )
+
+    updated = queryset.update(
+        message_count=count(messages) + F("archived_message_count"),
+        unread_inbound_count=count(messages.filter(direction="inbound", status__in=UNREAD_STATUSES)),
+        last_message_at=latest_or_archived("last_message_at", Subquery(latest.values("timestamp")[:1])),
+        last_message_direction=Coalesce(
+            latest_or_archived("last_message_direction", Subquery(latest.values("direction")[:1])),
+            Value(""),
+        ),
+        last_inbound_at=latest_or_archived("last_inbound_at", Subquery(
+            messages.filter(direction="inbound").order_by("-timestamp").values("timestamp")[:1]
+        )),
+    )
+
+    # A prévia usa get_display_content() (depende do tipo da mensagem) - calculada em Python
+    rows = list(queryset.order_by("pk").values_list("pk", "archived_message_count"))
+    for start in range(0, len(rows), batch_size):
+        batch = dict(rows[start:start + batch_size])
+        previews = {
+            message.conversation_id: message_preview(message)
+            for message in WhatsAppMessage.objects.filter(conversation_id__in=batch)
+            .order_by("conversation_id", "-timestamp", "-id")
+            .distinct("conversation_id")
+        }
+        conversations = [
+            WhatsAppConversation(pk=pk, last_message_preview=previews.get(pk, ""))
+            for pk, archived in batch.items()
+            if pk in previews or not archived
+        ]
+        WhatsAppConversation.objects.bulk_update(conversations, ["last_message_preview"])
+
+    logger.info(f"Resumo de {updated} conversas WhatsApp reconstruído")
+    return updated
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Volume de mensagens WhatsApp por hora
+
+WhatsAppMessageVolume guarda quantas mensagens existem em cada hora por
+conta, direção, tipo e status. Os registros são atualizados pelo
+WhatsAppMessage.save()/delete() - recebimento pelo webhook, envio pelo
+atendimento e mudanças de status (enviada → entregue → lida) - e o comando
+rebuild_whatsapp_message_volume recontabiliza um período a partir das
+mensagens (inclusive arquivadas), para corrigir importações ou update() em
+massa.
+
+O painel do WhatsApp, a lista de contas e o gráfico de 30 dias somam estes
+registros em vez de contar a tabela de mensagens.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Greatest, Trunc, TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHART_DAYS = 30
+
+
+def hour_of(timestamp):
+    """Início da hora (UTC) da data informada"""
+    return timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _add(account_id: int, hour, direction: str, message_type: str, status: str, delta: int) -> None:
+    from core.models import WhatsAppMessageVolume
+
+    lookup = {
+        "account_id": account_id, "hour": hour,
+        "direction": direction, "message_type": message_type, "status": status,
+    }
+    volume = WhatsAppMessageVolume.objects.filter(**lookup)
+    if volume.update(count=Greatest(F("count") + delta, Value(0))) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            WhatsAppMessageVolume.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # Criado por outra mensagem simultânea
+        volume.update(count=F("count") + delta)
+
+
+def record_message(message, delta: int = 1) -> None:
+    """Conta uma mensagem criada (delta=1) ou removida (delta=-1)"""
+    if not message.account_id or not message.timestamp:
+        return
+    _add(
+        message.account_id, hour_of(message.timestamp),
+        message.direction, message.message_type, message.status, delta,
+    )
+
+
+def record_status_change(message, old_status: str) -> None:
+    """Move a mensagem do status anterior para o atual"""
+    if not message.account_id or not message.timestamp:
+        return
+    hour = hour_of(message.timestamp)
+    _add(message.account_id, hour, message.direction, message.message_type, old_status, -1)
+    _add(message.account_id, hour, message.direction, message.message_type, message.status, 1)
+
+
+def _volume(since=None, account=None):
+    from core.models import WhatsAppMessageVolume
+
+    queryset = WhatsAppMessageVolume.objects.order_by()
+    if since is not None:
+        queryset = queryset.filter(hour__gte=hour_of(since))
+    if account is not None:
+        queryset = queryset.filter(account=account)
+    return queryset
+
+
+def volume_totals(since=None, account=None) -> Dict[str, int]:
+    """Total, recebidas e enviadas desde `since` (início da hora)"""
+    totals = _volume(since, account).aggregate(
+        total=Sum("count"),
+        inbound=Sum("count", filter=Q(direction="inbound")),
+        outbound=Sum("count", filter=Q(direction="outbound")),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def account_counts(account_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """Total de mensagens e de mensagens lidas por conta"""
+    counts = {account_id: {"total": 0, "read": 0} for account_id in account_ids}
+    rows = (
+        _volume().filter(account_id__in=counts)
+        .values("account_id")
+        .annotate(total=Sum("count"), read=Sum("count", filter=Q(status="read")))
+    )
+    for row in rows:
+        counts[row["account_id"]] = {"total": row["total"] or 0, "read": row["read"] or 0}
+    return counts
+
+
+def daily_series(days: int = CHART_DAYS, account=None) -> List[Dict]:
+    """
+    Mensagens recebidas e enviadas por dia (fuso local), com os dias sem
+    mensagens zerados
+
+    Returns:
+        [{"day": date, "inbound": int, "outbound": int, "total": int}, ...]
+    """
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    since = timezone.make_aware(datetime.combine(first_day, time.min))
+
+    series = {
+        first_day + timedelta(days=offset): {"inbound": 0, "outbound": 0}
+        for offset in range(days)
+    }
+    rows = (
+        _volume(since, account)
+        .annotate(day=TruncDate("hour"))
+        .values("day", "direction")
+        .annotate(total=Sum("count"))
+    )
+    for row in rows:
+        if row["day"] in series:
+            series[row["day"]][row["direction"]] = row["total"]
+
+    return [
+        {"day": day, **values, "total": values["inbound"] + values["outbound"]}
+        for day, values in series.items()
+    ]
+
+
+def rebuild_volume(since=None) -> int:
+    """
+    Recontabiliza o volume a partir das mensagens
+
+    Args:
+        since: Recontabiliza apenas as horas a partir desta data (padrão: tudo)
+
+    Returns:
+        Quantidade de mensagens contabilizadas
+    """
+    from core.models import WhatsAppMessage, WhatsAppMessageArchive, WhatsAppMessageVolume
+
+    start = hour_of(since) if since else None
+    messages = WhatsAppMessage.objects.order_by()
+    archives = WhatsAppMessageArchive.objects.order_by()
+    if start:
+        messages = messages.filter(timestamp__gte=start)
+        archives = archives.filter(last_timestamp__gte=start)
+
+    counts = Counter()
+    rows = (
+        messages.annotate(hour=Trunc("timestamp", "hour", tzinfo=dt_timezone.utc))
+        .values_list("account_id", "hour", "direction", "message_type", "status")
+        .annotate(total=Count("id"))
+    )
+    for *key, total in rows:
+        counts[tuple(key)] += total
+
+    # Mensagens arquivadas continuam no volume histórico
+    for archive in archives.iterator(chunk_size=50):
+        for message in archive.get_messages():
+            if not start or message.timestamp >= start:
+                counts[(
+                    message.account_id, hour_of(message.timestamp),
+                    message.direction, message.message_type, message.status,
+                )] += 1
+
+    with transaction.atomic():
+        existing = WhatsAppMessageVolume.objects.all()
+        if start:
+            existing = existing.filter(hour__gte=start)
+        existing.delete()
+        WhatsAppMessageVolume.objects.bulk_create([
+            WhatsAppMessageVolume(
+                account_id=account_id, hour=hour, direction=direction,
+                message_type=message_type, status=status, count=total,
+            )
+            for (account_id, hour, direction, message_type, status), total in counts.items()
+        ], batch_size=1000)
+
+    total = sum(counts.values())
+    logger.info(f"Volume de {total} mensagens WhatsApp recontabilizado")
+    return total
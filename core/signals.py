@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Invalidação do perfil de acesso em cache (core.services.auth_profile)
+
+Grupos, permissões e empresas do usuário são relações many-to-many, que não
+passam pelo save() dos models - por isso a invalidação usa sinais.
+
+Também descarta a cotação do dólar em cache (core.services.cambio) quando um
+câmbio é gravado ou removido (ex.: pelo admin) e as buscas de pessoas em
+cache (core.services.pessoa_busca) quando uma pessoa muda.
+"""
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import Cambio, Pessoa, Usuario
+from core.services import auth_profile, cambio, pessoa_busca
+
+
+def _on_user_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Grupos, permissões diretas ou empresas de usuários alterados"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        auth_profile.forget_profile(instance)
+        auth_profile.invalidate_users([instance.pk])
+    elif pk_set:
+        auth_profile.invalidate_users(pk_set)
+    else:
+        # clear() pelo lado do grupo/empresa não informa os usuários afetados
+        auth_profile.invalidate_all()
+
+
+m2m_changed.connect(_on_user_m2m_changed, sender=Usuario.groups.through)
+m2m_changed.connect(_on_user_m2m_changed, sender=Usuario.user_permissions.through)
+m2m_changed.connect(_on_user_m2m_changed, sender=Usuario.empresas.through)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _on_group_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        auth_profile.invalidate_all()
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def _on_usuario_changed(sender, instance, **kwargs):
+    auth_profile.forget_profile(instance)
+    auth_profile.invalidate_users([instance.pk])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def _on_group_changed(sender, **kwargs):
+    auth_profile.invalidate_all()
+
+
+@receiver(pre_save, sender=Pessoa)
+def _on_empresa_saving(sender, instance, **kwargs):
+    """Guarda se a pessoa era empresa do Grupo ROM antes da alteração"""
+    # Se ainda é empresa do Grupo ROM, o post_save invalida de qualquer forma
+    instance._era_empresa_gruporom = bool(instance.pk) and not instance.empresa_gruporom and (
+        Pessoa.objects.filter(pk=instance.pk, empresa_gruporom=True).exists()
+    )
+
+
+@receiver(post_save, sender=Pessoa)
+def _on_empresa_changed(sender, instance, created, **kwargs):
+    """Empresa do Grupo ROM alterada (tipo) ou desmarcada"""
+    if created:
+        return
+    if instance.empresa_gruporom or getattr(instance, '_era_empresa_gruporom', False):
+        auth_profile.invalidate_all()
+
+
+@receiver(post_delete, sender=Pessoa)
+def _on_empresa_deleted(sender, instance, **kwargs):
+    if instance.empresa_gruporom:
+        auth_profile.invalidate_all()
+
+
+@receiver(post_save, sender=Cambio)
+@receiver(post_delete, sender=Cambio)
+def _on_cambio_changed(sender, **kwargs):
+    cambio.esquecer_cotacao()
+
+
+@receiver(post_save, sender=Pessoa)
+@receiver(post_delete, sender=Pessoa)
+def _on_pessoa_changed(sender, **kwargs):
+    pessoa_busca.invalidar()
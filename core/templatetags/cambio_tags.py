@@ -1,16 +1,32 @@
 # -*- coding: utf-8 -*-
 """
 Template tags relacionados a câmbio
+
+As cotações vêm da série em memória do processo (core.services.cambio):
+converter os valores de uma tabela inteira não faz consultas nem requisições
+à AwesomeAPI. Datas sem cotação usam a do último dia útil anterior.
 """
 from django import template
 from datetime import date, timedelta
 from core.models import Cambio
+from core.services import cambio
 import logging
 
 register = template.Library()
 logger = logging.getLogger(__name__)
 
 
+def _data(data_consulta):
+    """Converte "AAAA-MM-DD" (ou date/datetime) em date; padrão: hoje"""
+    if not data_consulta:
+        return date.today()
+    if isinstance(data_consulta, str):
+        return date.fromisoformat(data_consulta)
+    if hasattr(data_consulta, 'date'):
+        return data_consulta.date()
+    return data_consulta
+
+
 @register.simple_tag
 def cambio_data(data_consulta=None):
     """
@@ -20,16 +36,11 @@ def cambio_data(data_consulta=None):
     Uso: {% cambio_data %} (data atual)
     """
     try:
-        if data_consulta:
-            if isinstance(data_consulta, str):
-                # Converte string para date
-                ano, mes, dia = data_consulta.split('-')
-                data_consulta = date(int(ano), int(mes), int(dia))
-        else:
-            data_consulta = date.today()
-        
-        cambio = Cambio.obter_cambio(data_consulta)
-        return cambio
+        encontrada = cambio.serie().cotacao(_data(data_consulta))
+        if encontrada is None:
+            return None
+        data, valor = encontrada
+        return Cambio(data=data, valor=valor)
     except Exception as e:
         logger.error(f"Erro no template tag cambio_data: {e}")
         return None
@@ -43,8 +54,11 @@ def valor_dolar(data_consulta=None):
     Uso: {% valor_dolar %}
     Uso: {% valor_dolar "2025-08-01" %}
     """
-    cambio = cambio_data(data_consulta)
-    return cambio.valor if cambio else None
+    try:
+        return cambio.serie().valor(_data(data_consulta))
+    except Exception as e:
+        logger.error(f"Erro no template tag valor_dolar: {e}")
+        return None
 
 
 @register.simple_tag
@@ -108,13 +122,13 @@ def widget_cambio(mostrar_data=True, mostrar_variacao=False):
     Uso: {% widget_cambio mostrar_data=False %}
     """
     try:
-        cambio_hoje = Cambio.obter_cambio(date.today())
+        cambio_hoje = cambio_data()
         cambio_ontem = None
         variacao = None
         
         if mostrar_variacao and cambio_hoje:
-            ontem = date.today() - timedelta(days=1)
-            cambio_ontem = Cambio.obter_cambio(ontem)
+            # Cotação do dia útil anterior à exibida
+            cambio_ontem = cambio_data(cambio_hoje.data - timedelta(days=1))
             
             if cambio_ontem:
                 variacao = cambio_hoje.valor - cambio_ontem.valor
@@ -131,4 +145,4 @@ def widget_cambio(mostrar_data=True, mostrar_variacao=False):
         return {
             'cambio_hoje': None,
             'erro': True,
-        }
\ No newline at end of file
+        }
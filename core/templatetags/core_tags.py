@@ -93,3 +93,24 @@ def smart_datetime(timestamp):
     else:
         # Outro ano: data completa
         return timestamp.strftime("%d/%m/%Y %H:%M")
+
+
+@register.filter
+def duracao(value):
+    """
+    Formata uma duração (timedelta ou segundos) de forma compacta:
+    "45s", "12min", "2h 05min", "3d 4h"
+    """
+    if value is None or value == "":
+        return "-"
+    seconds = int(value.total_seconds() if isinstance(value, timedelta) else value)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}min"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes:02d}min"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h"
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o perfil de acesso em cache (grupos, permissões e empresas)
+"""
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.context_processors import dados_globais
+from core.factories import UsuarioFactory, EmpresaGrupoROMFactory
+from core.middleware import LoginRequiredMiddleware
+from core.models import Usuario
+from core.services import auth_profile
+from core.tests.utils import LOCMEM_CACHE
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AuthProfileTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.comercial = Group.objects.create(name='Comercial')
+        self.administracao = Group.objects.create(name='Administração')
+        self.usuario = UsuarioFactory(groups=[self.comercial])
+
+    def fresh_user(self):
+        """Simula o request seguinte (novo objeto de usuário)"""
+        return Usuario.objects.get(pk=self.usuario.pk)
+
+    def test_perfil_carregado_uma_vez(self):
+        """Testa que as verificações seguintes não consultam o banco"""
+        user = self.fresh_user()
+        self.assertTrue(auth_profile.user_in_group(user, 'Comercial'))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(auth_profile.user_in_group(user, 'Administração'))
+            self.assertTrue(auth_profile.user_in_group(user, 'Administração', 'Comercial'))
+            self.assertFalse(user.has_perm('core.controle_whatsapp'))
+
+        # Próximo request: perfil vem do cache
+        outro_request = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(auth_profile.user_in_group(outro_request, 'Comercial'))
+
+    def test_mudanca_de_grupo_invalida_perfil(self):
+        """Testa invalidação ao adicionar/remover grupos pelos dois lados"""
+        self.assertFalse(auth_profile.user_in_group(self.fresh_user(), 'Administração'))
+
+        self.usuario.groups.add(self.administracao)
+        self.assertTrue(auth_profile.user_in_group(self.fresh_user(), 'Administração'))
+
+        self.administracao.user_set.remove(self.usuario)
+        self.assertFalse(auth_profile.user_in_group(self.fresh_user(), 'Administração'))
+
+        self.comercial.name = 'Vendas'
+        self.comercial.save()
+        self.assertTrue(auth_profile.user_in_group(self.fresh_user(), 'Vendas'))
+
+    def test_permissao_controle_whatsapp(self):
+        """Testa que a permissão do gerente comercial reflete no perfil"""
+        self.assertFalse(auth_profile.user_has_perm(self.fresh_user(), 'core.controle_whatsapp'))
+
+        self.usuario.gerente_comercial = True
+        self.usuario.save()
+        self.assertTrue(auth_profile.user_has_perm(self.fresh_user(), 'core.controle_whatsapp'))
+
+        permissao = Permission.objects.get(codename='change_pessoa')
+        self.comercial.permissions.add(permissao)
+        self.assertTrue(auth_profile.user_has_perm(self.fresh_user(), 'core.change_pessoa'))
+
+    def test_context_processor_usa_perfil(self):
+        """Testa área, grupos e tipos de empresa no contexto global"""
+        empresa = EmpresaGrupoROMFactory(tipo_empresa='Turismo')
+        self.usuario.empresas.add(empresa)
+
+        request = RequestFactory().get('/comercial/whatsapp/')
+        request.user = self.fresh_user()
+        auth_profile.get_profile(request.user)
+
+        with self.assertNumQueries(0):
+            contexto = dados_globais(request)
+
+        self.assertEqual(contexto['area'], 'comercial')
+        self.assertEqual(contexto['grupos_usuario'], ['Comercial'])
+        self.assertEqual(contexto['tipos_empresa_usuario'], ['Turismo'])
+
+        empresa.tipo_empresa = 'Alimentação'
+        empresa.save()
+        request.user = self.fresh_user()
+        self.assertEqual(dados_globais(request)['tipos_empresa_usuario'], ['Alimentação'])
+
+    def test_empresa_desmarcada_ou_excluida_invalida_perfil(self):
+        """Testa tipos de empresa atualizados ao desmarcar e ao excluir a empresa do Grupo ROM"""
+        turismo = EmpresaGrupoROMFactory(tipo_empresa='Turismo')
+        alimentacao = EmpresaGrupoROMFactory(tipo_empresa='Alimentação')
+        self.usuario.empresas.add(turismo, alimentacao)
+        self.assertEqual(set(auth_profile.get_profile(self.fresh_user()).tipos_empresa), {'Turismo', 'Alimentação'})
+
+        turismo.empresa_gruporom = False
+        turismo.save()
+        self.assertEqual(auth_profile.get_profile(self.fresh_user()).tipos_empresa, ('Alimentação',))
+
+        alimentacao.delete()
+        self.assertEqual(auth_profile.get_profile(self.fresh_user()).tipos_empresa, ())
+
+    def test_redirect_to_group_usa_perfil(self):
+        """Testa o redirecionamento inicial sem consultar os grupos no banco"""
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('redirect_to_group'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('redirect_to_group'))
+        self.assertRedirects(response, '/comercial/', fetch_redirect_response=False)
+        # Grupos vêm do perfil em cache
+        self.assertFalse([q for q in queries.captured_queries if 'auth_group' in q['sql']])
+
+
+class LoginRequiredMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.middleware = LoginRequiredMiddleware(lambda request: HttpResponse())
+        self.factory = RequestFactory()
+
+    def process(self, path):
+        from django.contrib.auth.models import AnonymousUser
+        request = self.factory.get(path)
+        request.user = AnonymousUser()
+        return self.middleware.process_view(request, None, (), {})
+
+    def test_urls_isentas(self):
+        """Testa padrões padrão e LOGIN_EXEMPT_URLS"""
+        self.assertIsNone(self.process('/login/'))
+        self.assertIsNone(self.process('/webhook/whatsapp/'))
+        self.assertIsNone(self.process('/inclusive/privacidade/'))
+
+    def test_url_protegida_redireciona(self):
+        """Testa que usuário anônimo é redirecionado ao login"""
+        response = self.process('/comercial/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login/', response.url)
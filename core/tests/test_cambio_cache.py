@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a cotação do dólar em cache (context processor e atualizar_cambio)
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from core.context_processors import cambio_do_dia
+from core.models import Cambio
+from core.services import cambio
+from core.tests.utils import LOCMEM_CACHE
+
+
+@override_settings(CACHES=LOCMEM_CACHE, CAMBIO_MEMORIA_SEGUNDOS=60)
+class CambioCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cambio.esquecer_cotacao()
+        self.hoje = timezone.localdate()
+        self.ontem = self.hoje - timedelta(days=1)
+        Cambio.objects.create(data=self.ontem, valor=Decimal('5.4321'))
+        self.request = RequestFactory().get('/')
+
+    def tearDown(self):
+        cambio.esquecer_cotacao()
+
+    @patch('core.models.cambio.requests.get')
+    def test_pagina_usa_ultima_cotacao_sem_rede(self, mock_get):
+        """Testa o context processor sem a cotação de hoje: sem requisição e com a de ontem"""
+        contexto = cambio_do_dia(self.request)
+
+        mock_get.assert_not_called()
+        self.assertEqual(contexto['dolar_hoje'], Decimal('5.4321'))
+        self.assertEqual(contexto['cambio_hoje'].data, self.ontem)
+
+        # Próximas páginas do processo não consultam banco nem cache
+        with self.assertNumQueries(0), patch.object(cambio, 'cache') as mock_cache:
+            self.assertEqual(cambio_do_dia(self.request)['dolar_hoje'], Decimal('5.4321'))
+        mock_cache.get.assert_not_called()
+
+    @patch('core.models.cambio.Cambio.buscar_cambio_awesomeapi', return_value=Decimal('5.5000'))
+    def test_atualizar_cambio_publica_nova_cotacao(self, mock_buscar):
+        """Testa o comando gravando a cotação do dia e as páginas passando a exibi-la"""
+        self.assertEqual(cambio_do_dia(self.request)['dolar_hoje'], Decimal('5.4321'))
+
+        saida = StringIO()
+        call_command('atualizar_cambio', stdout=saida)
+
+        mock_buscar.assert_called_once_with(self.hoje)
+        self.assertIn('5.5000', saida.getvalue())
+        self.assertEqual(Cambio.objects.get(data=self.hoje).valor, Decimal('5.5000'))
+        self.assertEqual(cache.get(cambio.CACHE_KEY), (self.hoje, Decimal('5.5000')))
+        self.assertEqual(cambio_do_dia(self.request)['dolar_hoje'], Decimal('5.5000'))
+
+    @patch('core.models.cambio.Cambio.buscar_cambio_awesomeapi')
+    def test_uma_atualizacao_por_vez(self, mock_buscar):
+        """Testa que outra busca em andamento (trava no cache) não repete a requisição"""
+        cache.add(cambio.LOCK_KEY, 1, cambio.LOCK_TIMEOUT)
+
+        self.assertIsNone(cambio.atualizar())
+        mock_buscar.assert_not_called()
+        self.assertTrue(cache.get(cambio.LOCK_KEY))
+
+    @patch('core.models.cambio.Cambio.buscar_cambio_awesomeapi', return_value=None)
+    def test_falha_da_api_mantem_ultima_cotacao(self, mock_buscar):
+        """Testa a API fora do ar: comando falha e a página segue com a última cotação"""
+        with self.assertRaisesMessage(CommandError, self.ontem.strftime('%d/%m/%Y')):
+            call_command('atualizar_cambio', stdout=StringIO())
+
+        self.assertIsNone(cache.get(cambio.LOCK_KEY))
+        self.assertEqual(cambio_do_dia(self.request)['dolar_hoje'], Decimal('5.4321'))
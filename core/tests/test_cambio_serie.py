@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a série de câmbio do processo e o preenchimento do histórico
+"""
+from datetime import date, datetime, time, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.models import Cambio
+from core.services import cambio
+from core.tests.utils import LOCMEM_CACHE
+
+
+def cotacao_api(dia, bid, hora=18):
+    """Item do endpoint daily da AwesomeAPI"""
+    momento = timezone.make_aware(datetime.combine(dia, time(hora)))
+    return {'bid': bid, 'timestamp': str(int(momento.astimezone(dt_timezone.utc).timestamp()))}
+
+
+@override_settings(CAMBIO_MEMORIA_SEGUNDOS=60)
+class CambioSerieTest(TestCase):
+
+    def setUp(self):
+        # Sexta e segunda (sem fim de semana)
+        Cambio.objects.create(data=date(2025, 1, 3), valor=Decimal('6.1000'))
+        Cambio.objects.create(data=date(2025, 1, 6), valor=Decimal('6.2000'))
+
+    def tearDown(self):
+        cambio.esquecer_cotacao()
+
+    @patch('core.models.cambio.requests.get')
+    def test_tags_convertem_tabela_sem_consultas(self, mock_get):
+        """Testa 500 conversões com uma única leitura da série e sem requisições"""
+        template = Template(
+            '{% load cambio_tags %}'
+            '{% for valor, dia in linhas %}{{ valor|converter_real:dia|floatformat:2 }};{% endfor %}'
+            '{% valor_dolar "2025-01-05" %}'
+        )
+        linhas = [(Decimal('10'), '2025-01-0%d' % (3 + n % 4)) for n in range(500)]
+
+        with self.assertNumQueries(1):
+            saida = template.render(Context({'linhas': linhas}))
+
+        mock_get.assert_not_called()
+        valores = saida.split(';')
+        # Sábado e domingo usam a cotação de sexta
+        self.assertEqual(valores[:4], ['61,00', '61,00', '61,00', '62,00'])
+        self.assertEqual(valores[-1], '6.1000')
+
+        with self.assertNumQueries(0):
+            template.render(Context({'linhas': linhas}))
+
+    def test_serie_atualizada_quando_cambio_muda(self):
+        """Testa que uma nova cotação invalida a série do processo"""
+        self.assertEqual(cambio.serie().valor(date(2025, 1, 8)), Decimal('6.2000'))
+
+        Cambio.objects.create(data=date(2025, 1, 7), valor=Decimal('6.3000'))
+        self.assertEqual(cambio.serie().valor(date(2025, 1, 8)), Decimal('6.3000'))
+
+    @patch('core.models.cambio.requests.get')
+    def test_preenche_periodo_numa_requisicao(self, mock_get):
+        """Testa o comando gravando só os dias que faltam com uma requisição"""
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = [
+            cotacao_api(date(2025, 1, 8), '6.4000'),
+            cotacao_api(date(2025, 1, 7), '6.3500', hora=17),
+            cotacao_api(date(2025, 1, 7), '6.3000', hora=10),
+            cotacao_api(date(2025, 1, 6), '9.9999'),
+        ]
+        cambio.serie()
+
+        saida = StringIO()
+        call_command('preencher_cambio', '--inicio', '2025-01-06', '--fim', '2025-01-08', stdout=saida)
+
+        mock_get.assert_called_once()
+        self.assertIn('start_date=20250106&end_date=20250108', mock_get.call_args[0][0])
+        self.assertIn('2 cotação(ões)', saida.getvalue())
+        self.assertEqual(
+            list(Cambio.objects.filter(data__gte=date(2025, 1, 6)).values_list('data', 'valor')),
+            [(date(2025, 1, 8), Decimal('6.4000')), (date(2025, 1, 7), Decimal('6.3500')),
+             (date(2025, 1, 6), Decimal('6.2000'))],
+        )
+        self.assertEqual(cambio.serie().valor(date(2025, 1, 9)), Decimal('6.4000'))
+
+        # Período completo: nem faz a requisição
+        self.assertEqual(cambio.preencher_historico(date(2025, 1, 6), date(2025, 1, 8)), 0)
+        mock_get.assert_called_once()
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    @patch('core.models.cambio.requests.get')
+    def test_fim_de_semana_e_feriado_nao_repetem_requisicao(self, mock_get):
+        """Testa o período com fim de semana e feriado preenchido com uma única requisição"""
+        cache.clear()
+        mock_get.return_value = Mock(status_code=200)
+        # Sem 09/01 (feriado) e, como sempre, sem sábado e domingo
+        mock_get.return_value.json.return_value = [
+            cotacao_api(date(2025, 1, 10), '6.5000'),
+            cotacao_api(date(2025, 1, 8), '6.4000'),
+            cotacao_api(date(2025, 1, 7), '6.3000'),
+        ]
+
+        self.assertEqual(cambio.preencher_historico(date(2025, 1, 3), date(2025, 1, 12)), 3)
+        self.assertEqual(cambio.preencher_historico(date(2025, 1, 3), date(2025, 1, 12)), 0)
+        self.assertEqual(cambio.preencher_historico(date(2025, 1, 4), date(2025, 1, 7)), 0)
+
+        mock_get.assert_called_once()
+        self.assertEqual(cambio.serie().valor(date(2025, 1, 9)), Decimal('6.4000'))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o estoque de lugares das caravanas (reservas de pré-vendas e vendas)
+"""
+import threading
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from core.factories import BloqueioFactory, CaravanaFactory, UsuarioFactory
+from core.models import Caravana, EstoqueCaravana, ReservaLugar, VendaBloqueio
+from core.services import estoque_lugares, venda_codigo
+from core.services.exceptions import PassageirosIndisponiveisError
+from core.services.venda_service import VendaService
+
+
+def novo_bloqueio(quantidade):
+    caravana = CaravanaFactory(quantidade=quantidade)
+    return BloqueioFactory(caravana=caravana, paises=[], inclusos=[], hoteis=[])
+
+
+def contadores(caravana_id):
+    estoque = EstoqueCaravana.objects.get(pk=caravana_id)
+    return estoque.vendidos, estoque.reservados
+
+
+class EstoqueLugaresTest(TestCase):
+
+    def setUp(self):
+        self.bloqueio = novo_bloqueio(5)
+        self.caravana_id = self.bloqueio.caravana_id
+        self.vendedor = UsuarioFactory()
+        self.service = VendaService()
+
+    def criar(self, quantidade, bloqueio=None):
+        return self.service.criar_venda_bloqueio({
+            'bloqueio_id': (bloqueio or self.bloqueio).id, 'cliente_id': None,
+            'vendedor': self.vendedor, 'quantidade': quantidade,
+        })
+
+    def test_reserva_confirmacao_e_cancelamento(self):
+        """Testa a pré-venda reservando, a confirmação vendendo e o cancelamento devolvendo os lugares"""
+        primeira = self.criar(3)
+        self.assertEqual(contadores(self.caravana_id), (0, 3))
+
+        # Não cabe: a venda é desfeita junto
+        with self.assertRaises(PassageirosIndisponiveisError) as erro:
+            self.criar(3)
+        self.assertEqual(erro.exception.disponiveis, 2)
+        self.assertEqual(VendaBloqueio.objects.count(), 1)
+
+        # Outro bloqueio da mesma caravana divide a capacidade
+        outro = BloqueioFactory(caravana=self.bloqueio.caravana, paises=[], inclusos=[], hoteis=[])
+        segunda = self.criar(2, bloqueio=outro)
+        self.assertEqual(contadores(self.caravana_id), (0, 5))
+
+        estoque_lugares.confirmar(primeira)
+        self.assertEqual(contadores(self.caravana_id), (3, 2))
+        self.assertEqual(ReservaLugar.objects.get(venda=primeira).expira_em, None)
+
+        self.service.cancelar_venda(primeira.id, 'Desistência', self.vendedor)
+        segunda.delete()
+        self.assertEqual(contadores(self.caravana_id), (0, 0))
+        self.assertFalse(ReservaLugar.objects.exists())
+
+    def test_reservas_vencidas(self):
+        """Testa reservas vencidas liberadas na próxima reserva, pelo comando e refeitas na confirmação"""
+        vencida = self.criar(4)
+        ReservaLugar.objects.filter(venda=vencida).update(expira_em=timezone.now() - timedelta(minutes=1))
+
+        # A próxima reserva da caravana libera os lugares vencidos antes de conferir
+        self.criar(3)
+        self.assertEqual(contadores(self.caravana_id), (0, 3))
+
+        # Confirmar a venda vencida reocupa os lugares se ainda houver
+        with self.assertRaises(PassageirosIndisponiveisError):
+            estoque_lugares.confirmar(vencida)
+
+        outra = self.criar(2)
+        ReservaLugar.objects.filter(venda=outra).update(expira_em=timezone.now() - timedelta(minutes=1))
+        saida = StringIO()
+        call_command('liberar_reservas', '--reconciliar', stdout=saida)
+        self.assertIn('2 lugar(es)', saida.getvalue())
+        self.assertEqual(contadores(self.caravana_id), (0, 3))
+
+    def test_reconciliar_e_listagem(self):
+        """Testa a reconciliação dos contadores e a listagem lendo o estoque numa única consulta"""
+        venda = self.criar(2)
+        estoque_lugares.confirmar(venda)
+        self.criar(1)
+        EstoqueCaravana.objects.filter(pk=self.caravana_id).update(vendidos=0, reservados=0)
+        for _ in range(3):
+            novo_bloqueio(10)
+
+        self.assertEqual(estoque_lugares.reconciliar(), 4)
+        self.assertEqual(contadores(self.caravana_id), (2, 1))
+
+        with self.assertNumQueries(1):
+            caravanas = {c.pk: c for c in estoque_lugares.com_estoque(Caravana.objects.all())}
+        self.assertEqual(caravanas[self.caravana_id].passageiros_disponiveis, 2)
+        self.assertEqual(caravanas[self.caravana_id].total_passageiros_vendidos, 3)
+        self.assertEqual(estoque_lugares.disponibilidade(self.caravana_id)['lugares_vendidos'], 2)
+
+
+class EstoqueLugaresConcorrenciaTest(TransactionTestCase):
+
+    def tearDown(self):
+        # Sequence dos códigos não é desfeita com o flush do TransactionTestCase
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SEQUENCE IF EXISTS {venda_codigo.sequence_name(timezone.now().year)}')
+
+    def test_ultimos_lugares_nao_sao_vendidos_duas_vezes(self):
+        """Testa várias threads reservando os últimos lugares ao mesmo tempo"""
+        bloqueio = novo_bloqueio(5)
+        vendedor = UsuarioFactory()
+        workers = 8
+        inicio = threading.Barrier(workers)
+        resultados = []
+
+        def reservar():
+            try:
+                inicio.wait()
+                VendaService().criar_venda_bloqueio({
+                    'bloqueio_id': bloqueio.id, 'cliente_id': None, 'vendedor': vendedor, 'quantidade': 1,
+                })
+                resultados.append('ok')
+            except PassageirosIndisponiveisError:
+                resultados.append('lotado')
+            except Exception as e:
+                resultados.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reservar) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(resultados), ['lotado'] * 3 + ['ok'] * 5)
+        self.assertEqual(contadores(bloqueio.caravana_id), (0, 5))
+        self.assertEqual(VendaBloqueio.objects.count(), 5)
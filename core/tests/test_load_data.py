@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o gerador de dados de carga (comando generate_load_data)
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.test import TestCase
+from core.models import (
+    Pagamento, Passageiro, Pessoa, VendaBloqueio, WhatsAppContact, WhatsAppConversation,
+    WhatsAppMessage, WhatsAppMessageVolume
+)
+from core.services import load_data
+from core.utils.validators import validar_cpf
+
+PEQUENO = [
+    '--pessoas', '300', '--attendants', '4', '--conversations', '120', '--messages', '1500',
+    '--caravanas', '2', '--vendas', '60', '--batch-size', '50',
+]
+
+
+class LoadDataTest(TestCase):
+
+    def test_comando_gera_dados_coerentes(self):
+        """Testa os totais gerados, as mensagens via COPY e os agregados reconstruídos"""
+        saida = StringIO()
+        call_command('generate_load_data', '--seed', '7', *PEQUENO, stdout=saida)
+        self.assertIn('registro(s) gerado(s)', saida.getvalue())
+
+        self.assertEqual(WhatsAppConversation.objects.count(), 120)
+        mensagens = WhatsAppMessage.objects.count()
+        self.assertGreater(mensagens, 120)
+        self.assertEqual(
+            WhatsAppConversation.objects.aggregate(total=Sum('message_count'))['total'], mensagens
+        )
+        self.assertEqual(WhatsAppMessageVolume.objects.aggregate(total=Sum('count'))['total'], mensagens)
+        self.assertFalse(WhatsAppMessage.objects.filter(search_vector__isnull=True).exclude(content='').exists())
+
+        # Conversas começam com mensagem do cliente; pendentes não têm atendente
+        conversa = WhatsAppConversation.objects.exclude(status='pending').first()
+        primeira = conversa.messages.order_by('timestamp', 'id').first()
+        self.assertEqual((primeira.direction, primeira.timestamp), ('inbound', conversa.first_message_at))
+        self.assertFalse(WhatsAppConversation.objects.filter(status='pending', assigned_to__isnull=False).exists())
+
+        # Contatos ligados a Pessoas usam o telefone do cadastro
+        contato = WhatsAppContact.objects.filter(pessoa__isnull=False).select_related('pessoa').first()
+        self.assertEqual(contato.phone_number, f'+55{contato.pessoa.ddd1}{contato.pessoa.telefone1}')
+        self.assertTrue(validar_cpf(Pessoa.objects.filter(tipo_doc='CPF').first().doc))
+
+    def test_vendas_respeitam_capacidade_e_pagamentos(self):
+        """Testa a capacidade dos bloqueios e os totais pagos de cada venda"""
+        call_command('generate_load_data', '--seed', '8', '--no-copy', '--skip-rollups', *PEQUENO, stdout=StringIO())
+
+        self.assertEqual(VendaBloqueio.objects.count(), 60)
+        for venda in VendaBloqueio.objects.select_related('bloqueio__caravana'):
+            self.assertEqual(venda.passageiros.count(), venda.numero_passageiros)
+            confirmado = venda.pagamentos.filter(status='confirmado').aggregate(total=Sum('valor'))['total'] or 0
+            self.assertEqual(venda.valor_pago, confirmado)
+            self.assertEqual(venda.valor_pendente, venda.valor_total - venda.valor_pago)
+            if venda.status == 'concluida':
+                self.assertEqual(venda.valor_pendente, 0)
+
+            # Mesmos totais que o model calcula
+            valor_total, valor_pago = venda.valor_total, venda.valor_pago
+            venda.calcular_totais()
+            self.assertAlmostEqual(venda.valor_total, valor_total, places=1)
+            self.assertEqual(venda.valor_pago, valor_pago)
+
+        for bloqueio_id, quantidade in Passageiro.objects.values_list('bloqueio_id', 'bloqueio__caravana__quantidade'):
+            self.assertLessEqual(Passageiro.objects.filter(bloqueio_id=bloqueio_id).count(), quantidade)
+        self.assertFalse(Pagamento.objects.filter(venda__status='pre-venda').exists())
+
+    def test_seed_deterministica_e_repetida(self):
+        """Testa a mesma seed gerando os mesmos dados e a recusa de gerar a seed duas vezes"""
+        tamanho = load_data.resolve_size('small', pessoas=20, attendants=2)
+        primeiro = load_data.LoadDataGenerator(tamanho, seed=3).build_pessoas(0, 20)
+        segundo = load_data.LoadDataGenerator(tamanho, seed=3).build_pessoas(0, 20)
+        outro = load_data.LoadDataGenerator(tamanho, seed=4).build_pessoas(0, 20)
+        self.assertEqual([(p.nome, p.doc, p.telefone1) for p in primeiro], [(p.nome, p.doc, p.telefone1) for p in segundo])
+        self.assertNotEqual([p.doc for p in primeiro], [p.doc for p in outro])
+
+        call_command('generate_load_data', '--seed', '9', '--skip-rollups', *PEQUENO, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'seed 9'):
+            call_command('generate_load_data', '--seed', '9', *PEQUENO, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('generate_load_data', '--pessoas', '2', '--attendants', '5', stdout=StringIO())
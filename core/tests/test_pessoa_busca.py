@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a busca de pessoas (sem acento, documento/telefone normalizados e cache)
+"""
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from core.factories import GroupFactory, PessoaFactory, UsuarioFactory
+from core.models import Pessoa
+from core.services import pessoa_busca
+from core.tests.utils import LOCMEM_CACHE
+
+
+class PessoaBuscaTest(TestCase):
+
+    def setUp(self):
+        self.joao = PessoaFactory(
+            nome='João Conceição', doc='123.456.789-00', email1='jc@exemplo.com',
+            email2=None, email3=None, ddi1='55', ddd1='11', telefone1='987654321',
+        )
+        self.maria = PessoaFactory(nome='Maria de Jõao', email1='maria@exemplo.com', email2=None, email3=None)
+        self.outro = PessoaFactory(nome='Pedro Alves', email1='pedro@exemplo.com', email2=None, email3=None)
+
+    def buscar(self, termo):
+        return list(pessoa_busca.filtrar(Pessoa.objects.all(), termo))
+
+    def test_nome_sem_acento_e_relevancia(self):
+        """Testa acentos/maiúsculas ignorados e o começo do nome primeiro"""
+        self.assertEqual(self.buscar('joao'), [self.joao, self.maria])
+        self.assertEqual(self.buscar('  JOÃO  '), [self.joao, self.maria])
+        self.assertEqual(self.buscar('conceicao joao'), [self.joao])
+        self.assertEqual(self.buscar('ALVES'), [self.outro])
+
+    def test_documento_telefone_e_email(self):
+        """Testa documento com ou sem pontuação, telefone só com dígitos e email"""
+        self.assertEqual(self.buscar('12345678900'), [self.joao])
+        self.assertEqual(self.buscar('456.789'), [self.joao])
+        self.assertEqual(self.buscar('(11) 98765-4321'), [self.joao])
+        self.assertEqual(self.buscar('MARIA@exemplo'), [self.maria])
+        self.assertEqual(pessoa_busca.por_documento('123456789-00'), self.joao)
+        self.assertIsNone(pessoa_busca.por_documento('999'))
+
+    def test_colunas_atualizadas_sem_save(self):
+        """Testa as colunas geradas pelo banco também em update()"""
+        Pessoa.objects.filter(pk=self.outro.pk).update(nome='Pedro Ávila')
+        self.assertEqual(self.buscar('avila'), [self.outro])
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_cache_por_termo_invalidado_ao_gravar(self):
+        """Testa a mesma busca sem refazer a consulta e o cache descartado ao gravar uma pessoa"""
+        cache.clear()
+        self.assertEqual(pessoa_busca.buscar('joa'), [self.joao, self.maria])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(pessoa_busca.buscar('JOA'), [self.joao, self.maria])
+
+        PessoaFactory(nome='Joana', email2=None, email3=None)
+        self.assertEqual([p.nome for p in pessoa_busca.buscar('joa')], ['Joana', 'João Conceição', 'Maria de Jõao'])
+        self.assertEqual(pessoa_busca.buscar('j'), [])
+
+    def test_autocomplete_comercial(self):
+        """Testa o autocomplete de passageiros usando a busca"""
+        usuario = UsuarioFactory()
+        usuario.groups.add(GroupFactory(name='Comercial'))
+        client = Client()
+        client.force_login(usuario)
+
+        response = client.get(reverse('comercial:buscar_pessoa_passageiro'), {'pessoa_search': 'conceicao'})
+        self.assertContains(response, 'João Conceição')
+        self.assertNotContains(response, 'Pedro Alves')
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a detecção de pessoas duplicadas (fila de revisão) e a mesclagem
+"""
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from core.factories import (
+    BloqueioFactory, CaravanaFactory, PassageiroFactory, PessoaFactory, UsuarioAdministracaoFactory,
+    UsuarioFactory, WhatsAppContactFactory,
+)
+from core.models import Passageiro, Pessoa, PessoaDuplicada, VendaBloqueio, WhatsAppContact
+from core.services import pessoa_duplicadas
+from core.services.exceptions import MesclagemError
+
+
+def criar_pessoa(nome, doc, **campos):
+    dados = {'email1': f'{doc}@exemplo.com', 'email2': None, 'email3': None,
+             'ddi1': '55', 'ddd1': '21', 'telefone1': f'9{doc[-8:]}',
+             'ddi2': None, 'ddd2': None, 'telefone2': None,
+             'ddi3': None, 'ddd3': None, 'telefone3': None,
+             'nascimento': date(1980, 5, 1), 'passaporte_numero': None}
+    dados.update(campos)
+    return PessoaFactory(nome=nome, doc=doc, **dados)
+
+
+class PessoaDuplicadaTest(TestCase):
+
+    def setUp(self):
+        contato = {'email1': 'joao@exemplo.com', 'ddd1': '11', 'telefone1': '987654321'}
+        self.joao = criar_pessoa('João da Silva', '123.456.789-00', **contato)
+        # Mesmo CPF sem pontuação
+        self.mesmo_cpf = criar_pessoa('JOAO SILVA', '12345678900')
+        # Outro CPF, mesmo email e telefone sem o nono dígito
+        self.mesmo_contato = criar_pessoa(
+            'Joao Silva', '98765432100', email1='JOAO@exemplo.com', ddd1='11', telefone1='87654321',
+            email2='joao.silva@exemplo.com', passaporte_numero='FX123456',
+        )
+        # Familiar: mesmo email e telefone, outro nome e nascimento
+        self.familiar = criar_pessoa('Maria da Silva', '11122233344', nascimento=date(1955, 3, 2), **contato)
+        criar_pessoa('Pedro Alves', '55566677788')
+
+    def pares(self, **filtros):
+        return set(PessoaDuplicada.objects.filter(**filtros).values_list('pessoa', 'duplicata', 'motivos'))
+
+    def test_detecta_pares_pelos_blocos(self):
+        """Testa os pares encontrados por documento, email/telefone e nome, sem o familiar"""
+        self.assertEqual(pessoa_duplicadas.chave_fonetica('Thiago Luiz de Souza'), pessoa_duplicadas.chave_fonetica('Tiago Sousa'))
+
+        saida = StringIO()
+        call_command('detectar_pessoas_duplicadas', stdout=saida)
+
+        self.assertIn('2 par(es) na fila de revisão', saida.getvalue())
+        self.assertEqual(self.pares(), {
+            (self.joao.pk, self.mesmo_cpf.pk, 'documento, nome, nascimento'),
+            (self.joao.pk, self.mesmo_contato.pk, 'email, telefone, nome, nascimento'),
+        })
+
+    def test_descartado_nao_volta_e_pendente_corrigido_sai(self):
+        """Testa que pares descartados continuam fora da fila e pares corrigidos são removidos"""
+        pessoa_duplicadas.detectar()
+        admin = UsuarioAdministracaoFactory()
+        client = Client()
+        client.force_login(admin)
+
+        par = PessoaDuplicada.objects.get(duplicata=self.mesmo_cpf)
+        response = client.post(reverse('administracao:pessoas_duplicada_descartar', args=[par.pk]))
+        self.assertEqual(response.status_code, 200)
+
+        self.mesmo_contato.email1 = 'outro@exemplo.com'
+        self.mesmo_contato.telefone1 = '911112222'
+        self.mesmo_contato.nascimento = date(1990, 1, 1)
+        self.mesmo_contato.save()
+        resultado = pessoa_duplicadas.detectar()
+
+        self.assertEqual(resultado.pares, 0)
+        self.assertEqual(self.pares(status='pendente'), set())
+        par.refresh_from_db()
+        self.assertEqual((par.status, par.revisado_por), ('descartada', admin))
+
+        response = client.get(reverse('administracao:pessoas_duplicadas'))
+        self.assertContains(response, 'Nenhuma possível duplicata')
+
+    def test_mesclar_transfere_relacoes_e_dados(self):
+        """Testa passageiros, vendas, usuário, contatos e líderes passando para a pessoa mantida"""
+        bloqueio = BloqueioFactory(paises=[], inclusos=[], hoteis=[])
+        passageiro = PassageiroFactory(pessoa=self.mesmo_contato, bloqueio=bloqueio)
+        venda = VendaBloqueio.objects.create(
+            bloqueio=bloqueio, vendedor=UsuarioFactory(), cliente=self.mesmo_contato, status='pre-venda',
+        )
+        usuario = UsuarioFactory(pessoa=self.mesmo_contato)
+        contato = WhatsAppContactFactory(phone_number='+551187654321', pessoa=self.mesmo_contato)
+        caravana = CaravanaFactory(lideres=[self.joao, self.mesmo_contato])
+
+        pessoa_duplicadas.mesclar(self.joao, self.mesmo_contato)
+
+        self.assertFalse(Pessoa.objects.filter(pk=self.mesmo_contato.pk).exists())
+        self.assertEqual(Passageiro.objects.get(pk=passageiro.pk).pessoa, self.joao)
+        self.assertEqual(VendaBloqueio.objects.get(pk=venda.pk).cliente, self.joao)
+        usuario.refresh_from_db()
+        self.assertEqual(usuario.pessoa, self.joao)
+        self.assertEqual(WhatsAppContact.objects.get(pk=contato.pk).pessoa, self.joao)
+        self.assertEqual(list(caravana.lideres.all()), [self.joao])
+
+        self.joao.refresh_from_db()
+        self.assertEqual((self.joao.doc, self.joao.nome), ('123.456.789-00', 'João da Silva'))
+        self.assertEqual((self.joao.email1, self.joao.email2), ('joao@exemplo.com', 'joao.silva@exemplo.com'))
+        # Mesmo telefone (com e sem o nono dígito): não é repetido
+        self.assertIsNone(self.joao.telefone2)
+        self.assertEqual(self.joao.passaporte_numero, 'FX123456')
+
+    def test_conflito_desfaz_mesclagem(self):
+        """Testa as duas pessoas no mesmo bloqueio: erro e nada alterado"""
+        bloqueio = BloqueioFactory(paises=[], inclusos=[], hoteis=[])
+        PassageiroFactory(pessoa=self.joao, bloqueio=bloqueio)
+        WhatsAppContactFactory(pessoa=self.mesmo_cpf)
+        PassageiroFactory(pessoa=self.mesmo_cpf, bloqueio=bloqueio)
+
+        with self.assertRaises(MesclagemError):
+            pessoa_duplicadas.mesclar(self.joao, self.mesmo_cpf)
+
+        self.assertTrue(Pessoa.objects.filter(pk=self.mesmo_cpf.pk).exists())
+        self.assertEqual(WhatsAppContact.objects.get().pessoa, self.mesmo_cpf)
+
+    def test_view_mesclar_mantendo_a_duplicata(self):
+        """Testa a fila mesclando na pessoa escolhida pelo revisor"""
+        pessoa_duplicadas.detectar()
+        client = Client()
+        client.force_login(UsuarioAdministracaoFactory())
+
+        response = client.get(reverse('administracao:pessoas_duplicadas'))
+        self.assertContains(response, 'JOAO SILVA')
+
+        par = PessoaDuplicada.objects.get(duplicata=self.mesmo_cpf)
+        response = client.post(
+            reverse('administracao:pessoas_duplicada_mesclar', args=[par.pk]), {'manter': self.mesmo_cpf.pk},
+        )
+
+        self.assertIn('HX-Redirect', response)
+        self.assertFalse(Pessoa.objects.filter(pk=self.joao.pk).exists())
+        self.assertEqual(Pessoa.objects.get(pk=self.mesmo_cpf.pk).email2, 'joao@exemplo.com')
+        self.assertFalse(PessoaDuplicada.objects.exists())
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o índice de telefones E.164 e o vínculo de contatos WhatsApp com pessoas
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from core.factories import PessoaFactory, WhatsAppAccountFactory, WhatsAppContactFactory
+from core.models import Pessoa, PessoaTelefone, WhatsAppContact
+from core.services import pessoa_telefones
+
+
+def criar_pessoa(**telefones):
+    campos = {'ddi1': '55', 'ddd1': '11', 'telefone1': '987654321',
+              'ddi2': None, 'ddd2': None, 'telefone2': None,
+              'ddi3': None, 'ddd3': None, 'telefone3': None}
+    campos.update(telefones)
+    return PessoaFactory(**campos)
+
+
+class PessoaTelefoneTest(TestCase):
+
+    def setUp(self):
+        self.account = WhatsAppAccountFactory()
+
+    def numeros(self, pessoa):
+        return set(PessoaTelefone.objects.filter(pessoa=pessoa).values_list('numero', flat=True))
+
+    def test_save_mantem_indice(self):
+        """Testa os números gravados em E.164 e atualizados ao trocar o telefone"""
+        pessoa = criar_pessoa(ddi2='1', ddd2='305', telefone2='555-0100', telefone3='123')
+        self.assertEqual(self.numeros(pessoa), {'+5511987654321', '+13055550100'})
+
+        pessoa.telefone2 = None
+        pessoa.ddd1 = '21'
+        pessoa.save()
+        self.assertEqual(self.numeros(pessoa), {'+5521987654321'})
+
+    def test_indexar_conta_apenas_numeros_inseridos(self):
+        """Testa que números já presentes no índice não entram na contagem"""
+        pessoa = criar_pessoa(ddi2='1', ddd2='305', telefone2='555-0100')
+        pessoa.telefones_e164.filter(numero='+13055550100').delete()
+
+        self.assertEqual(pessoa_telefones.indexar([pessoa]), 1)
+        self.assertEqual(pessoa_telefones.indexar([pessoa]), 0)
+        self.assertEqual(self.numeros(pessoa), {'+5511987654321', '+13055550100'})
+
+    def test_contato_vinculado_com_e_sem_nono_digito(self):
+        """Testa o vínculo de contatos novos pelo número exato e pela forma sem o nono dígito"""
+        pessoa = criar_pessoa()
+        exato = WhatsAppContactFactory(account=self.account, phone_number='+5511987654321')
+        antigo = WhatsAppContactFactory(account=self.account, phone_number='+551187654321')
+        outro = WhatsAppContactFactory(account=self.account, phone_number='+5511911112222')
+
+        with self.assertNumQueries(2):
+            self.assertTrue(pessoa_telefones.vincular_contato(exato))
+        self.assertTrue(pessoa_telefones.vincular_contato(antigo))
+        self.assertFalse(pessoa_telefones.vincular_contato(outro))
+
+        self.assertEqual(WhatsAppContact.objects.get(pk=exato.pk).pessoa, pessoa)
+        self.assertEqual(WhatsAppContact.objects.get(pk=antigo.pk).pessoa, pessoa)
+        self.assertIsNone(WhatsAppContact.objects.get(pk=outro.pk).pessoa)
+
+    def test_numero_de_duas_pessoas_nao_vincula(self):
+        """Testa que um número compartilhado (ex.: duplicata) não é vinculado automaticamente"""
+        criar_pessoa()
+        criar_pessoa(telefone1='87654321')
+        contato = WhatsAppContactFactory(account=self.account, phone_number='+5511987654321')
+
+        self.assertIsNone(pessoa_telefones.pessoa_do_telefone(contato.phone_number))
+        self.assertFalse(pessoa_telefones.vincular_contato(contato))
+
+    def test_pessoa_nova_vincula_contatos_existentes(self):
+        """Testa o contato que chegou antes do cadastro sendo vinculado ao gravar a pessoa"""
+        contato = WhatsAppContactFactory(account=self.account, phone_number='+5511987654321')
+        pessoa = criar_pessoa()
+
+        contato.refresh_from_db()
+        self.assertEqual(contato.pessoa, pessoa)
+
+    def test_comando_reconstroi_e_vincula_em_lote(self):
+        """Testa o comando após update() sem save(): índice refeito e contatos vinculados"""
+        pessoas = [criar_pessoa(telefone1=f'9876543{n:02d}') for n in range(5)]
+        Pessoa.objects.filter(pk__in=[p.pk for p in pessoas]).update(ddd1='31')
+        contatos = [
+            WhatsAppContactFactory(account=self.account, phone_number=f'+553198765430{n}')
+            for n in range(5)
+        ]
+
+        saida = StringIO()
+        call_command('vincular_contatos_whatsapp', '--reconstruir', '--batch-size', '2', stdout=saida)
+
+        self.assertIn(f'{PessoaTelefone.objects.count()} telefone(s) no índice', saida.getvalue())
+        self.assertIn('5 contato(s) vinculado(s)', saida.getvalue())
+        self.assertEqual(
+            [WhatsAppContact.objects.get(pk=c.pk).pessoa_id for c in contatos],
+            [p.pk for p in pessoas],
+        )
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para os preços em reais (câmbio fixado na venda e série de cotações)
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from core.factories import BloqueioFactory, UsuarioFactory
+from core.models import Cambio, VendaBloqueio
+from core.services import cambio, precificacao, venda_totais
+from core.services.exceptions import CambioIndisponivelError
+
+
+class SerieCambioTest(TestCase):
+
+    def setUp(self):
+        Cambio.objects.create(data=date(2025, 1, 3), valor=Decimal('6.1000'))
+        Cambio.objects.create(data=date(2025, 1, 6), valor=Decimal('6.2000'))
+        Cambio.objects.create(data=date(2025, 1, 10), valor=Decimal('6.3000'))
+
+    def test_cotacao_do_dia_anterior_mais_proximo(self):
+        """Testa fim de semana/feriado usando a última cotação até o dia"""
+        serie = cambio.carregar_serie(date(2025, 1, 5))
+
+        self.assertEqual(len(serie), 3)
+        self.assertEqual(serie.cotacao(date(2025, 1, 5)), (date(2025, 1, 3), Decimal('6.1000')))
+        self.assertEqual(serie.valor(date(2025, 1, 6)), Decimal('6.2000'))
+        self.assertEqual(serie.valor(date(2025, 1, 9)), Decimal('6.2000'))
+        self.assertIsNone(serie.cotacao(date(2025, 1, 2)))
+        self.assertEqual(cambio.cotacao(date(2025, 1, 12)), (date(2025, 1, 10), Decimal('6.3000')))
+
+    def test_precos_de_varios_bloqueios_numa_consulta(self):
+        """Testa a conversão de N bloqueios com uma única consulta de câmbio"""
+        bloqueios = [
+            BloqueioFactory(valor=Decimal('100.00'), taxas=Decimal('10.00'), moeda_valor='Dólar',
+                            paises=[], inclusos=[], hoteis=[])
+            for _ in range(5)
+        ] + [BloqueioFactory(valor=Decimal('500.00'), taxas=Decimal('20.00'), paises=[], inclusos=[], hoteis=[])]
+
+        with self.assertNumQueries(1):
+            precos = precificacao.precos_bloqueios(bloqueios, date(2025, 1, 8))
+
+        preco = precos[bloqueios[0].pk]
+        self.assertEqual((preco.valor, preco.taxas, preco.total), (Decimal('620.00'), Decimal('10.00'), Decimal('630.00')))
+        self.assertEqual(preco.data_cambio, date(2025, 1, 6))
+        real = precos[bloqueios[-1].pk]
+        self.assertFalse(real.convertido)
+        self.assertEqual(real.total, Decimal('520.00'))
+
+        sem_cotacao = precificacao.precos_bloqueios(bloqueios[:1], date(2024, 12, 1))[bloqueios[0].pk]
+        self.assertFalse(sem_cotacao.disponivel)
+        self.assertIsNone(sem_cotacao.total)
+
+
+class CambioVendaTest(TestCase):
+
+    def setUp(self):
+        self.hoje = timezone.localdate()
+        Cambio.objects.create(data=self.hoje - timedelta(days=1), valor=Decimal('5.0000'))
+        self.bloqueio = BloqueioFactory(
+            valor=Decimal('1000.00'), moeda_valor='Dólar', caravana__quantidade=10,
+            paises=[], inclusos=[], hoteis=[]
+        )
+        self.vendedor = UsuarioFactory()
+
+    def nova_venda(self, **kwargs):
+        return VendaBloqueio.objects.create(
+            bloqueio=self.bloqueio, vendedor=self.vendedor, numero_passageiros=2, **kwargs
+        )
+
+    def test_venda_fixa_cotacao_e_converte(self):
+        """Testa a cotação fixada na criação e mantida quando o dólar muda"""
+        venda = self.nova_venda()
+        self.assertEqual((venda.cambio_data, venda.cambio_valor), (self.hoje - timedelta(days=1), Decimal('5.0000')))
+        self.assertEqual(venda.valor_passageiros, Decimal('1000.00'))
+
+        Cambio.objects.create(data=self.hoje, valor=Decimal('6.0000'))
+        venda.numero_passageiros = 3
+        venda.save(update_fields=['numero_passageiros'])
+        venda.refresh_from_db()
+        self.assertEqual(venda.cambio_valor, Decimal('5.0000'))
+        self.assertEqual(venda.valor_passageiros, Decimal('1500.00'))
+
+    def test_recalculo_em_massa_usa_cotacao_da_venda(self):
+        """Testa que recalcular_totais chega ao mesmo valor do save()"""
+        venda = self.nova_venda()
+        VendaBloqueio.objects.filter(pk=venda.pk).update(valor_passageiros=0, valor_total=0)
+
+        venda_totais.recalcular_totais(VendaBloqueio.objects.filter(pk=venda.pk))
+        venda.refresh_from_db()
+        self.assertEqual(venda.valor_passageiros, Decimal('1000.00'))
+        self.assertEqual(venda.valor_total, Decimal('1000.00'))
+
+    def test_venda_em_dolar_sem_cotacao(self):
+        """Testa o erro de venda em dólar sem nenhuma cotação até o dia"""
+        Cambio.objects.all().delete()
+        with self.assertRaises(CambioIndisponivelError):
+            self.nova_venda()
+        self.assertFalse(VendaBloqueio.objects.exists())
+
+    def test_venda_com_taxas_em_dolar_sem_cotacao(self):
+        """Testa o mesmo erro quando só as taxas do bloqueio estão em dólar"""
+        Cambio.objects.all().delete()
+        self.bloqueio.moeda_valor = 'Real'
+        self.bloqueio.moeda_taxas = 'Dólar'
+        self.bloqueio.taxas = Decimal('50.00')
+        self.bloqueio.save()
+
+        with self.assertRaises(CambioIndisponivelError):
+            self.nova_venda()
+        self.assertFalse(VendaBloqueio.objects.exists())
+
+        Cambio.objects.create(data=self.hoje, valor=Decimal('5.0000'))
+        venda = self.nova_venda()
+        self.assertEqual(venda.cambio_valor, Decimal('5.0000'))
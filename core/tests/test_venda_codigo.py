@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para os códigos das vendas de bloqueio (sequence por ano)
+"""
+import threading
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from core.factories import BloqueioFactory, UsuarioFactory
+from core.models import VendaBloqueio
+from core.services import venda_codigo
+
+
+def nova_venda(bloqueio, vendedor, **kwargs):
+    return VendaBloqueio.objects.create(bloqueio=bloqueio, vendedor=vendedor, status='pre-venda', **kwargs)
+
+
+class VendaCodigoTest(TestCase):
+
+    def setUp(self):
+        self.bloqueio = BloqueioFactory(paises=[], inclusos=[], hoteis=[])
+        self.vendedor = UsuarioFactory()
+        self.ano = timezone.now().year
+
+    def test_continua_do_maior_codigo_existente(self):
+        """Testa a primeira venda do ano seguindo os códigos já gravados (inclusive acima de 99999)"""
+        for codigo in (f'VB{self.ano}99999', f'VB{self.ano}100002', f'VB{self.ano - 1}00500'):
+            nova_venda(self.bloqueio, self.vendedor, codigo=codigo)
+
+        codigos = [nova_venda(self.bloqueio, self.vendedor).codigo for _ in range(2)]
+        self.assertEqual(codigos, [f'VB{self.ano}100003', f'VB{self.ano}100004'])
+
+        # Ano sem vendas começa do 1
+        self.assertEqual(venda_codigo.proximo_codigo(self.ano + 1), f'VB{self.ano + 1}00001')
+
+    def test_sincronizar_nao_volta_a_sequence(self):
+        """Testa sincronizar_sequencias() com códigos importados e com números já entregues"""
+        nova_venda(self.bloqueio, self.vendedor)
+        nova_venda(self.bloqueio, self.vendedor, codigo=f'VB{self.ano}00040')
+        nova_venda(self.bloqueio, self.vendedor, codigo=f'VB{self.ano - 2}00007')
+
+        self.assertEqual(venda_codigo.sincronizar_sequencias(), {self.ano - 2: 7, self.ano: 40})
+        self.assertEqual(nova_venda(self.bloqueio, self.vendedor).codigo, f'VB{self.ano}00041')
+
+        VendaBloqueio.objects.filter(codigo=f'VB{self.ano}00040').delete()
+        self.assertEqual(venda_codigo.sincronizar_sequencias()[self.ano], 41)
+
+
+class VendaCodigoConcorrenciaTest(TransactionTestCase):
+
+    def tearDown(self):
+        # Sequences não são desfeitas com o flush do TransactionTestCase
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SEQUENCE IF EXISTS {venda_codigo.sequence_name(timezone.now().year)}')
+
+    def test_vendas_simultaneas_sem_codigo_repetido(self):
+        """Testa várias threads criando vendas ao mesmo tempo sem violar o código único"""
+        bloqueio = BloqueioFactory(paises=[], inclusos=[], hoteis=[])
+        vendedor = UsuarioFactory()
+        workers, por_thread = 8, 10
+        inicio = threading.Barrier(workers)
+        erros = []
+
+        def criar():
+            try:
+                inicio.wait()
+                for _ in range(por_thread):
+                    nova_venda(bloqueio, vendedor)
+            except Exception as e:
+                erros.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=criar) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        codigos = list(VendaBloqueio.objects.values_list('codigo', flat=True))
+        self.assertEqual(len(codigos), workers * por_thread)
+        self.assertEqual(len(set(codigos)), len(codigos))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a exportação em streaming de vendas, passageiros e pagamentos
+"""
+import csv
+import io
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from xml.etree import ElementTree
+from django.http import StreamingHttpResponse
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import BloqueioFactory, GroupFactory, PassageiroFactory, UsuarioFactory
+from core.models import Pagamento, VendaBloqueio
+from core.services import venda_export
+
+NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def planilha(conteudo):
+    """Linhas da planilha como listas de textos/valores"""
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+        raiz = ElementTree.fromstring(pacote.read('xl/worksheets/sheet1.xml'))
+    return [
+        [''.join(c.itertext()) for c in row.findall('s:c', NS)]
+        for row in raiz.find('s:sheetData', NS).findall('s:row', NS)
+    ]
+
+
+class VendaExportTest(TestCase):
+
+    def setUp(self):
+        self.vendedor = UsuarioFactory()
+        self.vendedor.groups.add(GroupFactory(name='Comercial'))
+        self.client = Client()
+        self.client.force_login(self.vendedor)
+
+        self.bloqueio = BloqueioFactory(
+            valor=Decimal('1000.00'), caravana__quantidade=10, paises=[], inclusos=[], hoteis=[]
+        )
+        self.venda = self.nova_venda(self.vendedor)
+        self.antiga = self.nova_venda(self.vendedor, data_venda=timezone.now() - timedelta(days=60))
+        self.outra = self.nova_venda(UsuarioFactory())
+        PassageiroFactory(bloqueio=self.bloqueio, venda=self.venda, pessoa__nome='=Maria')
+        Pagamento.objects.create(
+            venda=self.venda, valor=Decimal('80.00'), forma_pagamento='pix', status='confirmado'
+        )
+
+    def nova_venda(self, vendedor, **kwargs):
+        return VendaBloqueio.objects.create(
+            bloqueio=self.bloqueio, vendedor=vendedor, status='confirmada', numero_passageiros=2, **kwargs
+        )
+
+    def exportar(self, **params):
+        response = self.client.get(reverse('comercial:exportar_vendas'), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b''.join(response.streaming_content)
+
+    def test_exporta_vendas_do_periodo_em_csv(self):
+        """Testa o período, as vendas só do vendedor e os totais das subconsultas"""
+        inicio = (timezone.localdate() - timedelta(days=7)).isoformat()
+        response, conteudo = self.exportar(relatorio='vendas', formato='csv', data_inicio=inicio)
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="vendas_', response['Content-Disposition'])
+        linhas = list(csv.DictReader(io.StringIO(conteudo.decode('utf-8').lstrip('\ufeff'))))
+        self.assertEqual([linha['codigo'] for linha in linhas], [self.venda.codigo])
+        self.assertEqual(linhas[0]['valor_total'], '200.00')
+        self.assertEqual(linhas[0]['valor_pago'], '80.00')
+        self.assertEqual((linhas[0]['passageiros_cadastrados'], linhas[0]['pagamentos']), ('1', '1'))
+        self.assertEqual(linhas[0]['data_venda'][:10], timezone.localdate().strftime('%d/%m/%Y'))
+
+    def test_exporta_passageiros_e_pagamentos_em_xlsx(self):
+        """Testa a planilha gerada em streaming (zip válido, tipos e texto sem fórmula)"""
+        response, conteudo = self.exportar(relatorio='passageiros', formato='xlsx')
+        self.assertEqual(response['Content-Type'], venda_export.FORMATS['xlsx'])
+        linhas = planilha(conteudo)
+        self.assertEqual(linhas[0][:2], ['venda', 'data_venda'])
+        self.assertEqual(len(linhas), 2)
+        self.assertEqual(linhas[1][0], self.venda.codigo)
+        self.assertEqual(linhas[1][7], '=Maria')
+
+        _, conteudo = self.exportar(relatorio='pagamentos', formato='xlsx')
+        linhas = planilha(conteudo)
+        self.assertEqual(linhas[1][10], '80.00')
+
+    def test_xlsx_grande_em_pedacos(self):
+        """Testa que a planilha sai em vários pedaços, sem montar o arquivo inteiro"""
+        colunas = [('n', lambda n: n), ('texto', lambda n: f'linha {n} <&>')]
+        chunks = list(venda_export.xlsx_chunks(colunas, range(20000), 'Teste', lines_per_chunk=500))
+
+        self.assertGreater(len(chunks), 3)
+        linhas = planilha(b''.join(chunks))
+        self.assertEqual(len(linhas), 20001)
+        self.assertEqual(linhas[-1], ['19999', 'linha 19999 <&>'])
+
+    def test_formulario_invalido(self):
+        """Testa que um período invertido volta para a lista com a mensagem"""
+        response = self.client.get(reverse('comercial:exportar_vendas'), {
+            'relatorio': 'vendas', 'formato': 'csv', 'data_inicio': '2025-02-01', 'data_fim': '2025-01-01',
+        })
+        self.assertRedirects(response, reverse('comercial:pre_vendas_lista'), fetch_redirect_response=False)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o resumo diário das vendas (VendaResumoDiario e painéis)
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from core.factories import BloqueioFactory, UsuarioFactory
+from core.models import Pagamento, VendaBloqueio, VendaResumoDiario
+from core.services import venda_resumo
+from core.services.venda_service import VendaService
+
+
+def resumo():
+    """Linhas do resumo, sem as zeradas, para comparar com a reconciliação"""
+    return sorted(
+        VendaResumoDiario.objects.exclude(quantidade=0).values_list(
+            'dia', 'vendedor_id', 'caravana_id', 'status', 'quantidade', 'passageiros',
+            'valor_total', 'valor_pago', 'valor_pendente',
+        )
+    )
+
+
+class VendaResumoTest(TestCase):
+
+    def setUp(self):
+        # 1000 / 10 pessoas = 100 por passageiro
+        self.bloqueio = BloqueioFactory(
+            valor=Decimal('1000.00'), caravana__quantidade=10, paises=[], inclusos=[], hoteis=[]
+        )
+        self.vendedor = UsuarioFactory()
+
+    def venda(self, passageiros=2, status='aguardando_pagamento', vendedor=None, **kwargs):
+        return VendaBloqueio.objects.create(
+            bloqueio=self.bloqueio, vendedor=vendedor or self.vendedor, status=status,
+            numero_passageiros=passageiros, **kwargs
+        )
+
+    def assertReconciliado(self):
+        incremental = resumo()
+        venda_resumo.reconciliar()
+        self.assertEqual(incremental, resumo())
+        return incremental
+
+    def test_escritas_mantem_o_resumo(self):
+        """Testa criação, pagamentos, mudança de status, de dia e remoção acompanhando o resumo"""
+        venda = self.venda()
+        outra = self.venda(passageiros=1, status='pre-venda')
+        self.assertReconciliado()
+
+        pagamento = Pagamento.objects.create(venda=venda, valor=Decimal('50.00'), forma_pagamento='pix')
+        pagamento.status = 'confirmado'
+        pagamento.save()
+        linhas = self.assertReconciliado()
+        self.assertIn(
+            (timezone.localdate(), self.vendedor.pk, self.bloqueio.caravana_id, 'parcialmente_pago',
+             1, 2, Decimal('200.00'), Decimal('50.00'), Decimal('150.00')),
+            linhas,
+        )
+
+        Pagamento.objects.create(venda=venda, valor=Decimal('150.00'), forma_pagamento='pix', status='confirmado')
+        outra.numero_passageiros = 3
+        outra.data_venda = timezone.now() - timedelta(days=3)
+        outra.save()
+        self.assertReconciliado()
+
+        VendaService().cancelar_venda(outra.id, 'Desistência', self.vendedor)
+        pagamento.delete()
+        self.assertReconciliado()
+
+        venda.delete()
+        self.assertReconciliado()
+        self.assertEqual(venda_resumo.totais()['por_status'], {'cancelada': 1})
+
+    def test_paineis_leem_o_resumo(self):
+        """Testa os totais do painel sem multiplicar pelos pagamentos e sem agregar as vendas"""
+        venda = self.venda()
+        for valor in ('50.00', '30.00', '20.00'):
+            Pagamento.objects.create(venda=venda, valor=Decimal(valor), forma_pagamento='pix', status='confirmado')
+        self.venda(passageiros=1, status='confirmada')
+        self.venda(passageiros=1, status='cancelada', vendedor=UsuarioFactory())
+        self.venda(passageiros=1, data_venda=timezone.now() - timedelta(days=40))
+
+        with self.assertNumQueries(1):
+            dashboard = VendaBloqueio.objects.dashboard_resumo()
+        self.assertEqual(dashboard['total_vendas'], 4)
+        self.assertEqual(dashboard['total_valor'], Decimal('500.00'))
+        self.assertEqual(dashboard['total_pago'], Decimal('100.00'))
+        self.assertEqual(dashboard['total_pendente'], Decimal('400.00'))
+        self.assertEqual((dashboard['vendas_confirmadas'], dashboard['vendas_canceladas']), (1, 1))
+
+        mes = VendaBloqueio.objects.resumo_do_mes(self.vendedor)
+        self.assertEqual(mes['total_vendas'], 2)
+        self.assertEqual(VendaBloqueio.objects.do_mes_atual().filter(vendedor=self.vendedor).count(), 2)
+
+        dados = VendaService().obter_dashboard_vendas(self.vendedor)
+        self.assertEqual(dados['total_vendas_usuario'], 3)
+        self.assertEqual(dados['resumo_geral']['vendas_confirmadas'], 1)
+
+        serie = venda_resumo.serie_diaria(timezone.localdate() - timedelta(days=1), timezone.localdate())
+        self.assertEqual([dia['vendas'] for dia in serie], [0, 2])
+        self.assertEqual(venda_resumo.ranking_vendedores()[0]['vendedor_id'], self.vendedor.pk)
+
+    def test_comando_reconstroi_o_periodo(self):
+        """Testa o comando noturno corrigindo alterações em massa só nos dias pedidos"""
+        venda = self.venda()
+        antiga = self.venda(data_venda=timezone.now() - timedelta(days=30))
+        VendaBloqueio.objects.filter(pk__in=[venda.pk, antiga.pk]).update(status='confirmada')
+
+        saida = StringIO()
+        call_command('reconciliar_resumo_vendas', '--dias', '1', stdout=saida)
+        self.assertIn('1 venda(s)', saida.getvalue())
+        self.assertEqual(venda_resumo.totais()['por_status'], {'confirmada': 1, 'aguardando_pagamento': 1})
+
+        call_command('reconciliar_resumo_vendas', '--dias', '0', stdout=StringIO())
+        self.assertEqual(venda_resumo.totais()['por_status'], {'confirmada': 2})
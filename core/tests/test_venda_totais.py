@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para os totais incrementais das vendas de bloqueio (comando recalcular_vendas)
+"""
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from core.factories import BloqueioFactory, ExtraFactory, PassageiroFactory, UsuarioFactory
+from core.models import ExtraVenda, Pagamento, VendaBloqueio
+
+
+class VendaTotaisTest(TestCase):
+
+    def setUp(self):
+        # 1000 / 10 pessoas = 100 por passageiro
+        self.bloqueio = BloqueioFactory(
+            valor=Decimal('1000.00'), caravana__quantidade=10, paises=[], inclusos=[], hoteis=[]
+        )
+        self.venda = VendaBloqueio.objects.create(
+            bloqueio=self.bloqueio, vendedor=UsuarioFactory(), status='aguardando_pagamento',
+            numero_passageiros=2, valor_seguro=Decimal('50.00'),
+        )
+
+    def pagamento(self, valor, status='pendente'):
+        return Pagamento.objects.create(venda=self.venda, valor=Decimal(valor), forma_pagamento='pix', status=status)
+
+    def assertTotais(self, total, pago):
+        venda = VendaBloqueio.objects.get(pk=self.venda.pk)
+        self.assertEqual((venda.valor_total, venda.valor_pago, venda.valor_pendente), (total, pago, total - pago))
+        # Mesmo resultado do recálculo completo
+        venda.calcular_totais()
+        self.assertEqual((venda.valor_total, venda.valor_pago), (total, pago))
+        return venda
+
+    def test_deltas_de_extras_e_pagamentos(self):
+        """Testa criar, confirmar, cancelar e remover pagamentos/extras e um save() de venda desatualizada"""
+        self.assertTotais(Decimal('250.00'), 0)
+        desatualizada = VendaBloqueio.objects.get(pk=self.venda.pk)
+
+        extra = ExtraVenda.objects.create(
+            venda=self.venda, extra=ExtraFactory(bloqueio=self.bloqueio), quantidade=2,
+            valor_unitario=Decimal('30.00'), valor_desconto=Decimal('10.00'),
+        )
+        pagamento = self.pagamento('100.00')
+        self.assertTotais(Decimal('300.00'), 0)
+
+        pagamento.status = 'confirmado'
+        pagamento.save()
+        # Venda em cache no pagamento acompanha o delta
+        self.assertEqual((pagamento.venda.valor_pago, pagamento.venda.status), (Decimal('100.00'), 'parcialmente_pago'))
+        self.assertTotais(Decimal('300.00'), Decimal('100.00'))
+
+        # save() completo de uma instância carregada antes não perde extras nem pagamentos
+        desatualizada.valor_desconto = Decimal('20.00')
+        desatualizada.save()
+        self.assertEqual(desatualizada.valor_pago, Decimal('100.00'))
+        self.assertTotais(Decimal('280.00'), Decimal('100.00'))
+
+        self.pagamento('180.00', status='confirmado')
+        self.assertEqual(self.assertTotais(Decimal('280.00'), Decimal('280.00')).status, 'pago')
+
+        pagamento.status = 'cancelado'
+        pagamento.save()
+        extra.delete()
+        self.assertTotais(Decimal('230.00'), Decimal('180.00'))
+
+    def test_confirmacao_repetida_conta_uma_vez(self):
+        """Testa duas instâncias do mesmo pagamento confirmadas (o valor anterior vem do banco)"""
+        pagamento = self.pagamento('80.00')
+        copia = Pagamento.objects.get(pk=pagamento.pk)
+        for instancia in (pagamento, copia):
+            instancia.status = 'confirmado'
+            instancia.save()
+        self.assertTotais(Decimal('250.00'), Decimal('80.00'))
+
+        copia.delete()
+        self.assertTotais(Decimal('250.00'), 0)
+
+    def test_recalcular_vendas_e_anotacoes(self):
+        """Testa o comando reconstruindo totais corrompidos e as anotações da listagem"""
+        for _ in range(3):
+            PassageiroFactory(bloqueio=self.bloqueio, venda=self.venda)
+        self.pagamento('100.00', status='confirmado')
+        self.pagamento('150.00', status='confirmado')
+        self.pagamento('40.00', status='cancelado')
+
+        VendaBloqueio.objects.filter(pk=self.venda.pk).update(
+            valor_passageiros=0, valor_pago=0, valor_total=0, valor_pendente=0, status='aguardando_pagamento'
+        )
+        saida = StringIO()
+        call_command('recalcular_vendas', '--batch-size', '1', stdout=saida)
+        self.assertIn('1 venda(s)', saida.getvalue())
+        venda = self.assertTotais(Decimal('250.00'), Decimal('250.00'))
+        self.assertEqual((venda.valor_passageiros, venda.status), (Decimal('200.00'), 'pago'))
+
+        # Contagens por subconsulta - pagamentos e passageiros não se multiplicam
+        anotada = VendaBloqueio.objects.com_totais_calculados().get(pk=self.venda.pk)
+        self.assertEqual((anotada.total_passageiros_count, anotada.total_pagamentos_count), (3, 3))
+        self.assertEqual(anotada.total_pago_calculado, Decimal('250.00'))
+        self.assertEqual(anotada.status_pagamento, 'pago_completo')
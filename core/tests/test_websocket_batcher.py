@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o agrupamento de eventos WebSocket (EventBatcher)
+"""
+import asyncio
+from django.test import SimpleTestCase
+from core.consumers import EventBatcher
+
+
+def status_event(message_id, status):
+    return {
+        'type': 'message_status_update',
+        'message_status': {'message_id': message_id, 'new_status': status},
+    }
+
+
+class EventBatcherTest(SimpleTestCase):
+
+    def setUp(self):
+        self.frames = []
+
+    async def send_frame(self, payload):
+        self.frames.append(payload)
+
+    async def test_evento_isolado_enviado_sem_atraso(self):
+        """Testa o caminho rápido: primeiro evento sai imediatamente"""
+        batcher = EventBatcher(self.send_frame, window=0.05)
+
+        await batcher.add({'type': 'message_received', 'message': {'id': 1}})
+
+        self.assertEqual(len(self.frames), 1)
+        self.assertEqual(self.frames[0]['type'], 'message_received')
+        batcher.close()
+
+    async def test_eventos_na_janela_viram_um_lote(self):
+        """Testa que eventos dentro da janela são enviados em um único frame"""
+        batcher = EventBatcher(self.send_frame, window=0.05)
+
+        await batcher.add({'type': 'message_received', 'message': {'id': 1}})
+        await batcher.add({'type': 'message_received', 'message': {'id': 2}})
+        await batcher.add({'type': 'message_received', 'message': {'id': 3}})
+        self.assertEqual(len(self.frames), 1)
+
+        await asyncio.sleep(0.12)
+
+        self.assertEqual(len(self.frames), 2)
+        self.assertEqual(self.frames[1]['type'], 'batch')
+        self.assertEqual(
+            [e['message']['id'] for e in self.frames[1]['events']], [2, 3]
+        )
+        batcher.close()
+
+    async def test_status_substituido_descarta_anterior(self):
+        """Testa que só o último status de cada mensagem é enviado"""
+        batcher = EventBatcher(self.send_frame, window=0.05)
+
+        await batcher.add({'type': 'message_received', 'message': {'id': 1}})
+        await batcher.add(status_event(10, 'sent'))
+        await batcher.add(status_event(11, 'delivered'))
+        await batcher.add(status_event(10, 'delivered'))
+        await batcher.add(status_event(10, 'read'))
+
+        await asyncio.sleep(0.12)
+
+        lote = self.frames[1]['events']
+        self.assertEqual(len(lote), 2)
+        self.assertEqual(lote[0]['message_status']['message_id'], 11)
+        self.assertEqual(lote[1]['message_status']['new_status'], 'read')
+        batcher.close()
+
+    async def test_janela_zero_desativa_agrupamento(self):
+        """Testa que janela 0 envia cada evento individualmente"""
+        batcher = EventBatcher(self.send_frame, window=0)
+
+        await batcher.add(status_event(10, 'sent'))
+        await batcher.add(status_event(10, 'read'))
+
+        self.assertEqual(len(self.frames), 2)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o arquivo (armazenamento frio) das mensagens WhatsApp
+"""
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppConversationFactory, WhatsAppMessageFactory
+)
+from core.managers.whatsapp_manager import decode_cursor
+from core.models import WhatsAppConversation, WhatsAppMessage, WhatsAppMessageArchive
+from core.services import whatsapp_archive, whatsapp_summary
+
+
+@override_settings(WHATSAPP_MESSAGES_PAGE_SIZE=3)
+class WhatsAppArchiveTest(TestCase):
+
+    def setUp(self):
+        self.antiga = WhatsAppConversationFactory(status='resolved')
+        inicio = timezone.now() - timedelta(days=400)
+        # Mensagens em dois meses diferentes
+        self.mensagens = [
+            self.mensagem(self.antiga, f'Mensagem {i}', inicio + timedelta(days=20 * (i // 3), minutes=i),
+                          direction='inbound', status='delivered')
+            for i in range(6)
+        ]
+        self.recente = WhatsAppConversationFactory(status='resolved')
+        self.mensagem(self.recente, 'Recente', timezone.now())
+        self.envelhecer(self.antiga, inicio + timedelta(days=60))
+
+    def mensagem(self, conversa, content, timestamp, **kwargs):
+        return WhatsAppMessageFactory(
+            conversation=conversa, account=conversa.account, contact=conversa.contact,
+            content=content, timestamp=timestamp, **kwargs
+        )
+
+    def envelhecer(self, conversa, quando):
+        # last_activity é auto_now - ajustado direto no banco
+        WhatsAppConversation.objects.filter(pk=conversa.pk).update(last_activity=quando)
+
+    def arquivar(self, *args):
+        call_command('archive_whatsapp_messages', *args, stdout=StringIO())
+
+    def test_arquiva_conversas_antigas_por_mes(self):
+        """Testa seleção por inatividade, registros mensais e resumo preservado"""
+        self.arquivar('--months', '6')
+
+        self.assertFalse(WhatsAppMessage.objects.filter(conversation=self.antiga).exists())
+        self.assertTrue(WhatsAppMessage.objects.filter(conversation=self.recente).exists())
+
+        arquivos = WhatsAppMessageArchive.objects.filter(conversation=self.antiga)
+        self.assertEqual(arquivos.count(), 2)
+        self.assertEqual(sum(a.message_count for a in arquivos), 6)
+
+        conversa = WhatsAppConversation.objects.get(pk=self.antiga.pk)
+        self.assertEqual(conversa.archived_message_count, 6)
+        self.assertEqual(conversa.message_count, 6)
+        self.assertEqual(conversa.unread_inbound_count, 0)
+        self.assertEqual(conversa.last_message_preview, 'Mensagem 5')
+
+        # Reconstruir o resumo não perde as mensagens arquivadas
+        whatsapp_summary.rebuild_summaries(WhatsAppConversation.objects.filter(pk=conversa.pk))
+        conversa.refresh_from_db()
+        self.assertEqual(conversa.message_count, 6)
+        self.assertEqual(conversa.last_message_preview, 'Mensagem 5')
+
+    def test_mensagens_restauradas_iguais_as_originais(self):
+        """Testa a serialização comprimida ida e volta"""
+        originais = list(WhatsAppMessage.objects.filter(conversation=self.antiga).order_by('timestamp'))
+        whatsapp_archive.archive_conversation(self.antiga.pk)
+
+        arquivadas = [
+            m for a in WhatsAppMessageArchive.objects.filter(conversation=self.antiga).order_by('month')
+            for m in a.get_messages()
+        ]
+        self.assertEqual([m.pk for m in arquivadas], [m.pk for m in originais])
+        self.assertEqual([m.timestamp for m in arquivadas], [m.timestamp for m in originais])
+        self.assertEqual(arquivadas[0].content, 'Mensagem 0')
+        self.assertTrue(arquivadas[0].is_archived)
+
+    def test_historico_paginado_transparente(self):
+        """Testa latest_page() com mensagens da tabela e do arquivo nos mesmos cursores"""
+        whatsapp_archive.archive_conversation(self.antiga.pk)
+        nova = self.mensagem(self.antiga, 'Reaberta', timezone.now())
+        conversa = WhatsAppConversation.objects.get(pk=self.antiga.pk)
+        mensagens = conversa.messages.including_archived(conversa)
+
+        pagina = mensagens.latest_page()
+        self.assertEqual([m.pk for m in pagina], [self.mensagens[4].pk, self.mensagens[5].pk, nova.pk])
+        self.assertTrue(pagina.has_older)
+
+        anterior = mensagens.latest_page(before=decode_cursor(pagina.older_cursor))
+        self.assertEqual([m.pk for m in anterior], [m.pk for m in self.mensagens[1:4]])
+        self.assertTrue(anterior.has_older)
+
+        primeira = mensagens.latest_page(before=decode_cursor(anterior.older_cursor))
+        self.assertEqual([m.pk for m in primeira], [self.mensagens[0].pk])
+        self.assertFalse(primeira.has_older)
+
+        # Sem including_archived só a tabela é consultada
+        self.assertEqual([m.pk for m in conversa.messages.latest_page()], [nova.pk])
+
+    def test_visualizacao_readonly_inclui_arquivadas(self):
+        """Testa o WhatsApp Geral exibindo o histórico arquivado"""
+        user = UsuarioFactory(gerente_comercial=True)
+        user.groups.add(GroupFactory(name='Comercial'))
+        client = Client()
+        client.force_login(user)
+        whatsapp_archive.archive_conversation(self.antiga.pk)
+
+        url = reverse('comercial:conversation_messages_readonly', args=[self.antiga.id])
+        response = client.get(url)
+        self.assertContains(response, 'Mensagem 5')
+        self.assertEqual(response.context['total_messages'], 6)
+
+        response = client.get(url, {'before': self.mensagens[3].cursor})
+        self.assertContains(response, 'Mensagem 0')
+
+    def test_restaurar_e_dry_run(self):
+        """Testa --dry-run sem alterações e --restore devolvendo as mensagens"""
+        saida = StringIO()
+        call_command('archive_whatsapp_messages', '--months', '6', '--dry-run', stdout=saida)
+        self.assertIn('1 conversa(s) seriam arquivadas', saida.getvalue())
+        self.assertEqual(WhatsAppMessageArchive.objects.count(), 0)
+
+        self.arquivar('--months', '6')
+        self.arquivar('--restore', str(self.antiga.pk))
+
+        self.assertEqual(WhatsAppMessage.objects.filter(conversation=self.antiga).count(), 6)
+        self.assertFalse(WhatsAppMessageArchive.objects.exists())
+        conversa = WhatsAppConversation.objects.get(pk=self.antiga.pk)
+        self.assertEqual(conversa.archived_message_count, 0)
+        self.assertEqual(conversa.message_count, 6)
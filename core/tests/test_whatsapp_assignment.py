@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a atribuição de conversas WhatsApp (fila com SKIP LOCKED)
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppAccountFactory, WhatsAppConversationFactory
+)
+from core.models import WhatsAppConversation
+from core.services import whatsapp_assignment
+from core.tests.utils import LOCMEM_CACHE
+
+
+def pendente(account, minutos_atras, priority='medium'):
+    return WhatsAppConversationFactory(
+        account=account, contact__account=account, assigned_to=None, status='pending',
+        priority=priority, first_message_at=timezone.now() - timedelta(minutes=minutos_atras),
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE, WHATSAPP_ASSIGNMENT_MAX_ACTIVE=2)
+class WhatsAppAssignmentTest(TestCase):
+
+    def setUp(self):
+        self.grupo = GroupFactory(name='Comercial')
+        self.conta = WhatsAppAccountFactory()
+        self.ana, self.bia = UsuarioFactory(), UsuarioFactory()
+        for user in (self.ana, self.bia):
+            user.groups.add(self.grupo)
+
+    def tearDown(self):
+        for user in (self.ana, self.bia):
+            whatsapp_assignment.mark_offline(user.id)
+
+    def test_fila_por_prioridade_e_idade(self):
+        """Testa claim_next() pegando a urgente e depois a mais antiga"""
+        antiga = pendente(self.conta, 60)
+        nova = pendente(self.conta, 5)
+        urgente = pendente(self.conta, 1, priority='urgent')
+
+        atribuidas = [whatsapp_assignment.claim_next(self.ana) for _ in range(4)]
+        self.assertEqual(atribuidas[:3], [urgente, antiga, nova])
+        self.assertIsNone(atribuidas[3])
+
+        antiga.refresh_from_db()
+        self.assertEqual((antiga.status, antiga.assigned_to), ('in_progress', self.ana))
+        self.assertIsNotNone(antiga.assigned_at)
+
+    def test_atribuicao_manual_nao_duplica(self):
+        """Testa a view assign_conversation com dois atendentes na mesma conversa"""
+        conversa = pendente(self.conta, 10)
+        url = reverse('comercial:assign_conversation', args=[conversa.id])
+
+        for user, sucesso in ((self.ana, True), (self.bia, False)):
+            client = Client()
+            client.force_login(user)
+            self.assertEqual(client.post(url).json()['success'], sucesso)
+
+        conversa.refresh_from_db()
+        self.assertEqual(conversa.assigned_to, self.ana)
+
+        # Próxima da fila pelo botão "Atender próxima"
+        outra = pendente(self.conta, 3)
+        client = Client()
+        client.force_login(self.bia)
+        response = client.post(reverse('comercial:assign_next_conversation')).json()
+        self.assertEqual(response['conversation_id'], outra.id)
+        self.assertFalse(client.post(reverse('comercial:assign_next_conversation')).json()['success'])
+
+    def test_distribui_entre_atendentes_online(self):
+        """Testa least_loaded, presença e o limite de conversas em atendimento"""
+        for minutos in range(6):
+            pendente(self.conta, minutos)
+        # Ana já tem uma conversa em atendimento; Carla está offline
+        WhatsAppConversationFactory(account=self.conta, assigned_to=self.ana, status='in_progress')
+        carla = UsuarioFactory()
+        carla.groups.add(self.grupo)
+
+        self.assertEqual(whatsapp_assignment.distribute_pending(), [])
+
+        whatsapp_assignment.mark_online(self.ana.id)
+        whatsapp_assignment.mark_online(self.bia.id)
+        whatsapp_assignment.mark_online(self.bia.id)  # duas abas
+        whatsapp_assignment.mark_offline(self.bia.id)
+
+        atribuidas = whatsapp_assignment.distribute_pending()
+        self.assertEqual([c.assigned_to for c in atribuidas], [self.bia, self.ana, self.bia])
+        self.assertEqual(WhatsAppConversation.objects.filter(status='pending').count(), 3)
+        self.assertFalse(WhatsAppConversation.objects.filter(assigned_to=carla).exists())
+
+    def test_round_robin_e_comando(self):
+        """Testa a estratégia round_robin pelo comando assign_whatsapp_conversations"""
+        for minutos in range(3):
+            pendente(self.conta, minutos)
+        whatsapp_assignment.mark_online(self.ana.id)
+        whatsapp_assignment.mark_online(self.bia.id)
+
+        saida = StringIO()
+        call_command('assign_whatsapp_conversations', '--strategy', 'round_robin', '--limit', '2', stdout=saida)
+        self.assertIn('2 conversa(s) atribuída(s)', saida.getvalue())
+        self.assertEqual(
+            set(WhatsAppConversation.objects.exclude(status='pending').values_list('assigned_to', flat=True)),
+            {self.ana.id, self.bia.id},
+        )
+
+
+@patch('core.services.whatsapp_assignment._notify_assigned')
+class WhatsAppAssignmentConcurrencyTest(TransactionTestCase):
+
+    def test_claims_concorrentes_sem_duplicidade(self, notify):
+        """Testa centenas de claims simultâneos (SKIP LOCKED) sem conversa atribuída duas vezes"""
+        conta = WhatsAppAccountFactory()
+        atendentes = UsuarioFactory.create_batch(4)
+        for minutos in range(200):
+            pendente(conta, minutos, priority=whatsapp_assignment.PRIORITY_ORDER[minutos % 4])
+
+        resultado = whatsapp_assignment.simulate_concurrent_claims(atendentes, workers=8)
+
+        self.assertEqual(resultado.claims, 200)
+        self.assertEqual(resultado.duplicates, 0)
+        self.assertFalse(WhatsAppConversation.objects.filter(status='pending').exists())
+        self.assertEqual(notify.call_count, 200)
+
+    def test_comando_benchmark(self, notify):
+        """Testa o comando de benchmark (dados temporários removidos ao final)"""
+        user = UsuarioFactory()
+        user.groups.add(GroupFactory(name='Comercial'))
+        saida = StringIO()
+
+        call_command('benchmark_whatsapp_assignment', '--conversations', '60', '--workers', '4', stdout=saida)
+
+        self.assertIn('Nenhuma conversa atribuída em dobro', saida.getvalue())
+        self.assertFalse(WhatsAppConversation.objects.exists())
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para os contadores de conversas WhatsApp por status
+"""
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from core.factories import WhatsAppAccountFactory, WhatsAppConversationFactory, UsuarioFactory
+from core.models import WhatsAppConversation
+from core.services import whatsapp_counters
+from core.tests.utils import LOCMEM_CACHE
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class WhatsAppCountersTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.account = WhatsAppAccountFactory()
+        self.outra_conta = WhatsAppAccountFactory()
+
+    def test_conta_no_banco_quando_cache_vazio(self):
+        """Testa que a primeira leitura conta no banco e grava no cache"""
+        WhatsAppConversationFactory(account=self.account, status='pending')
+        WhatsAppConversationFactory(account=self.outra_conta, status='assigned')
+
+        with self.assertNumQueries(1):
+            counts = whatsapp_counters.get_status_counts()
+        self.assertEqual(counts['pending'], 1)
+        self.assertEqual(counts['assigned'], 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(whatsapp_counters.get_pending_count(), 1)
+
+    def test_transicoes_atualizam_contadores(self):
+        """Testa incremento/decremento nas transições de status"""
+        self.assertEqual(whatsapp_counters.get_pending_count(), 0)
+        self.assertEqual(whatsapp_counters.get_pending_count(self.account.id), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            conversa = WhatsAppConversationFactory(account=self.account, status='pending')
+        self.assertEqual(whatsapp_counters.get_pending_count(), 1)
+        self.assertEqual(whatsapp_counters.get_pending_count(self.account.id), 1)
+        self.assertEqual(whatsapp_counters.get_pending_count(self.outra_conta.id), 0)
+
+        conversa = WhatsAppConversation.objects.get(pk=conversa.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            conversa.assign_to_user(UsuarioFactory())
+            conversa.start_attendance()
+
+        with self.assertNumQueries(0):
+            counts = whatsapp_counters.get_status_counts()
+        self.assertEqual(counts['pending'], 0)
+        self.assertEqual(counts['assigned'], 0)
+        self.assertEqual(counts['in_progress'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            conversa.delete()
+        self.assertEqual(whatsapp_counters.get_status_count('in_progress'), 0)
+
+    def test_save_sem_status_nao_altera_contadores(self):
+        """Testa que saves que não tocam o status não mexem nos contadores"""
+        conversa = WhatsAppConversationFactory(account=self.account, status='pending')
+        self.assertEqual(whatsapp_counters.get_pending_count(), 1)
+
+        conversa = WhatsAppConversation.objects.get(pk=conversa.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            conversa.notes = 'Cliente pediu retorno'
+            conversa.save(update_fields=['notes'])
+            conversa.save()
+        self.assertEqual(whatsapp_counters.get_pending_count(), 1)
+
+    def test_reconciliacao_corrige_divergencias(self):
+        """Testa que o comando de reconciliação reconstrói os contadores"""
+        WhatsAppConversationFactory(account=self.account, status='pending')
+        self.assertEqual(whatsapp_counters.get_pending_count(), 1)
+
+        # update() não passa pelo save() e deixa o contador desatualizado
+        WhatsAppConversation.objects.update(status='resolved')
+        self.assertEqual(whatsapp_counters.get_pending_count(), 1)
+
+        call_command('reconcile_whatsapp_counters', stdout=StringIO())
+
+        self.assertEqual(whatsapp_counters.get_pending_count(), 0)
+        self.assertEqual(whatsapp_counters.get_status_count('resolved', self.account.id), 1)
+        self.assertEqual(whatsapp_counters.get_status_count('resolved', self.outra_conta.id), 0)
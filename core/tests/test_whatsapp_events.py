@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o stream de eventos WhatsApp (replay após reconexão)
+"""
+import json
+from unittest.mock import patch, Mock
+from django.test import SimpleTestCase, override_settings
+from core.services import whatsapp_events
+
+
+def stream_info(first_id, last_id, max_deleted='0-0'):
+    return {
+        'first-entry': [first_id, {}],
+        'last-generated-id': last_id,
+        'max-deleted-entry-id': max_deleted,
+    }
+
+
+def entry(entry_id, event_type='message_received'):
+    return (entry_id, {'event': json.dumps({'type': event_type, 'conversation_id': 1})})
+
+
+@override_settings(WHATSAPP_EVENTS_REPLAY_LIMIT=3)
+class ReadEventsAfterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = Mock()
+        patcher = patch.object(whatsapp_events, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retorna_eventos_perdidos(self):
+        """Testa que apenas os eventos posteriores ao último ID são retornados"""
+        self.redis.xinfo_stream.return_value = stream_info('100-0', '103-0')
+        self.redis.xrange.return_value = [entry('102-0'), entry('103-0')]
+
+        events = whatsapp_events.read_events_after('101-0')
+
+        self.redis.xrange.assert_called_once_with(
+            whatsapp_events.STREAM_KEY, min='(101-0', count=4
+        )
+        self.assertEqual([e['event_id'] for e in events], ['102-0', '103-0'])
+        self.assertEqual(events[0]['type'], 'message_received')
+
+    def test_eventos_descartados_pedem_ressincronizacao(self):
+        """Testa que eventos já removidos pelo MAXLEN exigem resync"""
+        self.redis.xinfo_stream.return_value = stream_info('200-0', '250-0', max_deleted='199-0')
+
+        self.assertIsNone(whatsapp_events.read_events_after('150-0'))
+        self.redis.xrange.assert_not_called()
+
+    def test_muitos_eventos_pedem_ressincronizacao(self):
+        """Testa que lacunas acima do limite de replay exigem resync"""
+        self.redis.xinfo_stream.return_value = stream_info('100-0', '110-0')
+        self.redis.xrange.return_value = [entry(f'10{i}-0') for i in range(1, 5)]
+
+        self.assertIsNone(whatsapp_events.read_events_after('100-0'))
+
+    def test_id_invalido_ou_stream_recriado(self):
+        """Testa IDs inválidos e IDs maiores que o último gerado"""
+        self.redis.xinfo_stream.return_value = stream_info('1-0', '5-0')
+
+        self.assertIsNone(whatsapp_events.read_events_after('abc'))
+        self.assertIsNone(whatsapp_events.read_events_after('9-0'))
+
+    def test_redis_indisponivel(self):
+        """Testa que falhas do Redis resultam em resync"""
+        self.redis.xinfo_stream.side_effect = ConnectionError('down')
+
+        self.assertIsNone(whatsapp_events.read_events_after('1-0'))
+
+
+class PublishEventTest(SimpleTestCase):
+
+    @patch('channels.layers.get_channel_layer')
+    @patch.object(whatsapp_events, 'get_redis')
+    def test_evento_publicado_com_id(self, mock_get_redis, mock_get_layer):
+        """Testa que o ID do stream acompanha o evento enviado ao grupo"""
+        mock_get_redis.return_value.xadd.return_value = '123-0'
+        sent = []
+
+        async def group_send(group, event):
+            sent.append((group, event))
+
+        mock_get_layer.return_value.group_send = group_send
+
+        event_id = whatsapp_events.publish_event({'type': 'pending_count_update', 'count': 2})
+
+        self.assertEqual(event_id, '123-0')
+        self.assertEqual(sent[0][0], 'whatsapp_comercial')
+        self.assertEqual(sent[0][1]['event_id'], '123-0')
+
+    @patch('channels.layers.get_channel_layer')
+    @patch.object(whatsapp_events, 'get_redis')
+    def test_falha_no_stream_nao_impede_envio(self, mock_get_redis, mock_get_layer):
+        """Testa que o evento é distribuído mesmo sem o stream"""
+        mock_get_redis.return_value.xadd.side_effect = ConnectionError('down')
+        sent = []
+
+        async def group_send(group, event):
+            sent.append(event)
+
+        mock_get_layer.return_value.group_send = group_send
+
+        self.assertIsNone(whatsapp_events.publish_event({'type': 'pending_count_update', 'count': 2}))
+        self.assertEqual(len(sent), 1)
+        self.assertNotIn('event_id', sent[0])
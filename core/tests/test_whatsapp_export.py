@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a exportação em streaming do histórico de mensagens WhatsApp
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.http import StreamingHttpResponse
+from django.test import TestCase, Client, AsyncRequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppConversationFactory, WhatsAppMessageFactory
+)
+from core.services import whatsapp_archive, whatsapp_export
+
+
+class WhatsAppExportTest(TestCase):
+
+    def setUp(self):
+        self.atendente = UsuarioFactory()
+        self.atendente.groups.add(GroupFactory(name='Comercial'))
+        self.client = Client()
+        self.client.force_login(self.atendente)
+
+        self.conversa = WhatsAppConversationFactory(assigned_to=self.atendente, status='in_progress')
+        self.agora = timezone.now()
+        self.mensagens = [
+            self.mensagem(self.conversa, 'Olá, tudo bem?', self.agora - timedelta(days=3)),
+            self.mensagem(self.conversa, '=HYPERLINK("http://x")', self.agora - timedelta(days=2)),
+            self.mensagem(self.conversa, 'Até logo', self.agora - timedelta(days=1),
+                          direction='outbound', sent_by=self.atendente),
+        ]
+
+    def mensagem(self, conversa, content, timestamp, **kwargs):
+        return WhatsAppMessageFactory(
+            conversation=conversa, account=conversa.account, contact=conversa.contact,
+            content=content, timestamp=timestamp, message_type='text', **kwargs
+        )
+
+    def conteudo(self, response):
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_exporta_conversa_em_csv(self):
+        """Testa cabeçalho, ordem cronológica e proteção contra fórmulas"""
+        response = self.client.get(reverse('comercial:conversation_export', args=[self.conversa.id]))
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="conversa_', response['Content-Disposition'])
+        conteudo = self.conteudo(response)
+        self.assertTrue(conteudo.startswith('\ufeffdata_hora,'))
+
+        linhas = list(csv.DictReader(io.StringIO(conteudo.lstrip('\ufeff'))))
+        self.assertEqual(
+            [linha['conteudo'] for linha in linhas],
+            ['Olá, tudo bem?', '\'=HYPERLINK("http://x")', 'Até logo'],
+        )
+        self.assertEqual(linhas[2]['enviada_por'], self.atendente.pessoa.nome)
+        self.assertEqual(linhas[0]['arquivada'], 'não')
+
+    def test_exportacao_restrita_ao_atendente(self):
+        """Testa que outro atendente sem controle do WhatsApp não exporta"""
+        outro = UsuarioFactory()
+        outro.groups.add(GroupFactory(name='Comercial'))
+        self.client.force_login(outro)
+        url = reverse('comercial:conversation_export', args=[self.conversa.id])
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        outro.gerente_comercial = True
+        outro.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_exporta_conta_por_periodo_e_contato_em_jsonl(self):
+        """Testa o filtro de período/contato e a inclusão das mensagens arquivadas"""
+        admin = UsuarioFactory()
+        admin.groups.add(GroupFactory(name='Administração'))
+        self.client.force_login(admin)
+        outra = WhatsAppConversationFactory(
+            account=self.conversa.account, contact__account=self.conversa.account
+        )
+        self.mensagem(outra, 'Outro contato', self.agora - timedelta(days=2))
+        whatsapp_archive.archive_conversation(self.conversa.id)
+
+        url = reverse('administracao:whatsapp:messages_export')
+        inicio = (self.agora - timedelta(days=2)).date()
+        response = self.client.get(url, {
+            'account': self.conversa.account.id,
+            'inicio': inicio.isoformat(),
+            'formato': 'jsonl',
+        })
+        linhas = [json.loads(linha) for linha in self.conteudo(response).splitlines()]
+        self.assertEqual(
+            {linha['conteudo'] for linha in linhas},
+            {'=HYPERLINK("http://x")', 'Até logo', 'Outro contato'},
+        )
+        self.assertTrue(all(linha['arquivada'] for linha in linhas if linha['conversa_id'] == self.conversa.id))
+
+        response = self.client.get(url, {
+            'account': self.conversa.account.id,
+            'telefone': outra.contact.phone_number,
+            'formato': 'jsonl',
+        })
+        linhas = self.conteudo(response).splitlines()
+        self.assertEqual([json.loads(linha)['conteudo'] for linha in linhas], ['Outro contato'])
+
+        # Período inválido volta para a lista de contas
+        response = self.client.get(url, {
+            'account': self.conversa.account.id, 'inicio': '2025-02-01', 'fim': '2025-01-01',
+            'formato': 'csv',
+        })
+        self.assertRedirects(response, reverse('administracao:whatsapp:accounts_list'),
+                             fetch_redirect_response=False)
+
+    def test_asgi_usa_iterador_assincrono(self):
+        """Testa que no ASGI o conteúdo é enviado por um iterador assíncrono"""
+        request = AsyncRequestFactory().get('/')
+        response = whatsapp_export.export_response(
+            request, whatsapp_export.iter_messages(conversation=self.conversa), 'jsonl', 'teste'
+        )
+        self.assertTrue(response.is_async)
+
+        async def consumir():
+            return [chunk async for chunk in response.streaming_content]
+
+        linhas = b''.join(async_to_sync(consumir)()).decode('utf-8').splitlines()
+        self.assertEqual(len(linhas), 3)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a paginação por cursor do histórico de mensagens WhatsApp
+"""
+from datetime import timedelta
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppConversationFactory, WhatsAppMessageFactory
+)
+from core.managers.whatsapp_manager import decode_cursor
+from core.models import WhatsAppMessage
+
+
+@override_settings(WHATSAPP_MESSAGES_PAGE_SIZE=3)
+class MessagePaginationTest(TestCase):
+
+    def setUp(self):
+        self.user = UsuarioFactory()
+        self.user.groups.add(GroupFactory(name='Comercial'))
+        self.client = Client()
+        self.client.force_login(self.user)
+
+        self.conversation = WhatsAppConversationFactory(assigned_to=self.user, status='in_progress')
+        inicio = timezone.now() - timedelta(hours=1)
+        # Duas mensagens com o mesmo timestamp testam o desempate pelo id
+        self.mensagens = [
+            WhatsAppMessageFactory(
+                conversation=self.conversation,
+                account=self.conversation.account,
+                contact=self.conversation.contact,
+                content=f'Mensagem {i}',
+                timestamp=inicio + timedelta(minutes=min(i, 4)),
+            )
+            for i in range(6)
+        ]
+        self.url = reverse('comercial:conversation_messages', args=[self.conversation.id])
+
+    def ids(self, messages):
+        return [m.id for m in messages]
+
+    def test_cursor_ida_e_volta(self):
+        """Testa codificação/decodificação do cursor"""
+        mensagem = self.mensagens[0]
+        self.assertEqual(decode_cursor(mensagem.cursor), (mensagem.timestamp, mensagem.id))
+        self.assertIsNone(decode_cursor('invalido'))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_paginas_cobrem_historico_sem_repetir(self):
+        """Testa página mais recente e páginas anteriores em ordem cronológica"""
+        mensagens = self.conversation.messages.all()
+
+        pagina = mensagens.latest_page()
+        self.assertEqual(self.ids(pagina), self.ids(self.mensagens[3:]))
+        self.assertTrue(pagina.has_older)
+
+        anterior = mensagens.latest_page(before=decode_cursor(pagina.older_cursor))
+        self.assertEqual(self.ids(anterior), self.ids(self.mensagens[:3]))
+        self.assertFalse(anterior.has_older)
+
+        novas = mensagens.newer_than(decode_cursor(self.mensagens[3].cursor))
+        self.assertEqual(self.ids(novas), self.ids(self.mensagens[4:]))
+        self.assertFalse(novas.has_newer)
+
+    def test_view_retorna_pagina_mais_recente(self):
+        """Testa que a view renderiza apenas a última página e o botão de anteriores"""
+        response = self.client.get(self.url, HTTP_HX_REQUEST='true')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(response.context['messages']), self.ids(self.mensagens[3:]))
+        self.assertContains(response, 'Carregar mensagens anteriores')
+        self.assertContains(response, f'?before={self.mensagens[3].cursor}')
+        self.assertNotContains(response, 'Mensagem 0')
+
+    def test_view_carrega_anteriores(self):
+        """Testa ?before= retornando o trecho anterior sem botão na última página"""
+        response = self.client.get(
+            self.url, {'before': self.mensagens[3].cursor}, HTTP_HX_REQUEST='true'
+        )
+
+        self.assertTemplateUsed(response, 'comercial/whatsapp/partials/messages_chunk.html')
+        self.assertEqual(self.ids(response.context['messages']), self.ids(self.mensagens[:3]))
+        self.assertNotContains(response, 'Carregar mensagens anteriores')
+
+    def test_view_anexa_apenas_novas(self):
+        """Testa ?after= retornando só mensagens novas, sem estado vazio"""
+        response = self.client.get(
+            self.url, {'after': self.mensagens[4].cursor}, HTTP_HX_REQUEST='true'
+        )
+        self.assertEqual(self.ids(response.context['messages']), [self.mensagens[5].id])
+        self.assertFalse(response.has_header('HX-Reswap'))
+
+        response = self.client.get(
+            self.url, {'after': self.mensagens[5].cursor}, HTTP_HX_REQUEST='true'
+        )
+        self.assertEqual(list(response.context['messages']), [])
+        self.assertNotContains(response, 'Nenhuma mensagem')
+
+    def test_muitas_novas_substitui_conteudo(self):
+        """Testa que lacunas maiores que a página recarregam a página mais recente"""
+        response = self.client.get(
+            self.url, {'after': self.mensagens[0].cursor}, HTTP_HX_REQUEST='true'
+        )
+
+        self.assertEqual(response['HX-Reswap'], 'innerHTML')
+        self.assertEqual(self.ids(response.context['messages']), self.ids(self.mensagens[3:]))
+
+    def test_chat_area_e_visualizacao_readonly(self):
+        """Testa a área de chat e a visualização do WhatsApp Geral paginadas"""
+        response = self.client.get(
+            reverse('comercial:conversation_chat_area', args=[self.conversation.id])
+        )
+        self.assertEqual(self.ids(response.context['messages']), self.ids(self.mensagens[3:]))
+        self.assertContains(response, 'Carregar mensagens anteriores')
+
+        url_readonly = reverse('comercial:conversation_messages_readonly', args=[self.conversation.id])
+        response = self.client.get(url_readonly)
+        self.assertEqual(response.context['total_messages'], 6)
+        self.assertContains(response, f'{url_readonly}?before={self.mensagens[3].cursor}')
+
+        response = self.client.get(url_readonly, {'before': self.mensagens[3].cursor})
+        self.assertTemplateUsed(response, 'comercial/whatsapp/partials/message_readonly.html')
+        self.assertEqual(self.ids(response.context['messages']), self.ids(self.mensagens[:3]))
+
+    def test_consulta_limitada_ao_tamanho_da_pagina(self):
+        """Testa que o histórico não é carregado inteiro"""
+        for i in range(20):
+            WhatsAppMessageFactory(
+                conversation=self.conversation,
+                account=self.conversation.account,
+                contact=self.conversation.contact,
+                timestamp=timezone.now() - timedelta(days=1, minutes=i),
+            )
+
+        with self.assertNumQueries(1):
+            pagina = self.conversation.messages.select_related('contact').latest_page()
+        self.assertEqual(len(pagina), 3)
+        self.assertEqual(WhatsAppMessage.objects.filter(conversation=self.conversation).count(), 26)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Orçamentos de desempenho das telas de WhatsApp (comercial e administração)
+
+Cria uma base com as factories e renderiza cada tela conferindo a quantidade
+de consultas, que não deve variar com o tamanho da base. A suíte normal usa
+uma base reduzida (200 conversas) e confere apenas as consultas.
+
+Tempo no banco e pico de memória do Python dependem da máquina e só são
+medidos com WHATSAPP_PERF_SCALE=N: 1.000 x N conversas e 20.000 x N
+mensagens (N=10: 200.000 mensagens). A tabela comparativa é impressa ao final
+(pytest -s) e o teste falha quando algum orçamento é ultrapassado.
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import skipUnless
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppAccountFactory, WhatsAppContactFactory,
+    WhatsAppConversationFactory, WhatsAppMessageFactory
+)
+from core.models import WhatsAppContact, WhatsAppConversation, WhatsAppMessage
+from core.services import whatsapp_analytics, whatsapp_summary, whatsapp_volume
+from core.tests.utils import LOCMEM_CACHE
+
+# 0: base reduzida, apenas quantidade de consultas
+SCALE = max(0, int(os.environ.get('WHATSAPP_PERF_SCALE', '0')))
+CONVERSATIONS = 1000 * SCALE if SCALE else 200
+MESSAGES_PER_CONVERSATION = 20
+PENDING = 100
+MY_CONVERSATIONS = 30
+
+# Tela: (máximo de consultas, ms no banco, MB de pico de memória)
+# Tempo e memória por 1.000 conversas nas telas de TEMPO_CRESCE /
+# MEMORIA_CRESCE; nas demais (paginadas ou de contagem) são fixos
+BUDGETS = {
+    'comercial:whatsapp': (8, 100, 2),
+    'comercial:whatsapp?conversation': (10, 100, 3),
+    'comercial:my_conversations': (8, 100, 2),
+    'comercial:my_conversations?search': (9, 200, 2),
+    'comercial:pending_conversations': (8, 100, 3),
+    'comercial:conversations_table': (8, 100, 3),
+    'comercial:conversation_messages': (9, 100, 2),
+    'comercial:conversation_messages_readonly': (9, 100, 2),
+    'comercial:conversation_chat_area': (10, 100, 2),
+    'comercial:whatsapp_geral': (12, 250, 48),
+    'comercial:whatsapp_geral?search': (13, 750, 64),
+    'comercial:pending_count': (5, 50, 1),
+    'administracao:whatsapp:dashboard': (14, 100, 2),
+    'administracao:whatsapp:accounts_list': (12, 100, 2),
+    'administracao:whatsapp:account_delete_modal': (11, 100, 2),
+}
+
+# Buscas percorrem as mensagens; o WhatsApp Geral lista todas as conversas
+# (sem paginação)
+TEMPO_CRESCE = {'comercial:my_conversations?search', 'comercial:whatsapp_geral', 'comercial:whatsapp_geral?search'}
+MEMORIA_CRESCE = {'comercial:whatsapp_geral', 'comercial:whatsapp_geral?search'}
+
+
+def limites(nome):
+    """(consultas, ms no banco, MB) da tela na escala atual"""
+    max_consultas, max_db_ms, max_memoria = BUDGETS[nome]
+    return (
+        max_consultas,
+        max_db_ms * SCALE if nome in TEMPO_CRESCE else max_db_ms,
+        max_memoria * SCALE if nome in MEMORIA_CRESCE else max_memoria,
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class WhatsAppPerformanceBudgetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        random.seed(42)
+        cls.user = UsuarioFactory(gerente_comercial=True)
+        cls.user.groups.add(GroupFactory(name='Comercial'), GroupFactory(name='Administração'))
+        atendentes = [cls.user] + UsuarioFactory.create_batch(9)
+        for atendente in atendentes[1:]:
+            atendente.groups.add(cls.user.groups.get(name='Comercial'))
+
+        cls.accounts = [WhatsAppAccountFactory(responsavel=cls.user) for _ in range(2)]
+        agora = timezone.now()
+
+        # bulk_create não passa pelo save() - resumos e volume reconstruídos ao final
+        contacts = WhatsAppContact.objects.bulk_create([
+            WhatsAppContactFactory.build(account=cls.accounts[index % 2])
+            for index in range(CONVERSATIONS)
+        ], batch_size=1000)
+
+        conversations = []
+        for index, contact in enumerate(contacts):
+            if index < PENDING:
+                status, assigned_to = 'pending', None
+            elif index < PENDING + MY_CONVERSATIONS:
+                status, assigned_to = 'in_progress', cls.user
+            else:
+                status, assigned_to = random.choice(['in_progress', 'resolved', 'resolved']), random.choice(atendentes[1:])
+            inicio = agora - timedelta(minutes=random.randint(60, 60 * 24 * 30))
+            conversations.append(WhatsAppConversationFactory.build(
+                account=contact.account, contact=contact, status=status, assigned_to=assigned_to,
+                priority=random.choice(['low', 'medium', 'high', 'urgent']),
+                first_message_at=inicio, assigned_at=inicio if assigned_to else None, last_activity=inicio,
+            ))
+        conversations = WhatsAppConversation.objects.bulk_create(conversations, batch_size=1000)
+
+        messages = []
+        for conversation in conversations:
+            for offset in range(MESSAGES_PER_CONVERSATION):
+                inbound = offset % 2 == 0
+                messages.append(WhatsAppMessageFactory.build(
+                    account=conversation.account, contact=conversation.contact, conversation=conversation,
+                    direction='inbound' if inbound else 'outbound',
+                    sent_by=None if inbound else conversation.assigned_to,
+                    status='delivered' if inbound else 'read',
+                    content=f'Mensagem {offset} sobre pacote de viagem para Lisboa',
+                    timestamp=conversation.first_message_at + timedelta(minutes=offset),
+                ))
+            if len(messages) >= 5000:
+                WhatsAppMessage.objects.bulk_create(messages, batch_size=5000)
+                messages = []
+        WhatsAppMessage.objects.bulk_create(messages, batch_size=5000)
+
+        whatsapp_summary.rebuild_summaries()
+        whatsapp_volume.rebuild_volume()
+        whatsapp_analytics.rebuild_response_stats()
+
+        cls.my_conversation = WhatsAppConversation.objects.filter(assigned_to=cls.user).first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def urls(self):
+        conversa = self.my_conversation.id
+        conta = self.accounts[0].id
+        return {
+            'comercial:whatsapp': reverse('comercial:whatsapp'),
+            'comercial:whatsapp?conversation': f"{reverse('comercial:whatsapp')}?conversation={conversa}",
+            'comercial:my_conversations': reverse('comercial:my_conversations'),
+            'comercial:my_conversations?search': f"{reverse('comercial:my_conversations')}?search=lisboa",
+            'comercial:pending_conversations': reverse('comercial:pending_conversations'),
+            'comercial:conversations_table': reverse('comercial:conversations_table'),
+            'comercial:conversation_messages': reverse('comercial:conversation_messages', args=[conversa]),
+            'comercial:conversation_messages_readonly': reverse('comercial:conversation_messages_readonly', args=[conversa]),
+            'comercial:conversation_chat_area': reverse('comercial:conversation_chat_area', args=[conversa]),
+            'comercial:whatsapp_geral': reverse('comercial:whatsapp_geral'),
+            'comercial:whatsapp_geral?search': f"{reverse('comercial:whatsapp_geral')}?search=lisboa",
+            'comercial:pending_count': reverse('comercial:pending_count'),
+            'administracao:whatsapp:dashboard': reverse('administracao:whatsapp:dashboard'),
+            'administracao:whatsapp:accounts_list': reverse('administracao:whatsapp:accounts_list'),
+            'administracao:whatsapp:account_delete_modal': reverse('administracao:whatsapp:account_delete_modal', args=[conta]),
+        }
+
+    def test_consultas_das_telas(self):
+        """Testa a quantidade de consultas de cada tela contra o orçamento"""
+        for nome, url in self.urls().items():
+            with self.subTest(tela=nome):
+                self.assertEqual(self.client.get(url).status_code, 200, url)  # aquece templates e cache
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                    response.content  # noqa: B018 - força a renderização completa
+                self.assertLessEqual(len(queries), BUDGETS[nome][0], url)
+
+    def measure(self, url):
+        """Renderiza a tela e retorna (consultas, ms no banco, MB de pico, ms total)"""
+        self.assertEqual(self.client.get(url).status_code, 200, url)  # aquece templates e cache
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            response.content  # noqa: B018 - força a renderização completa
+        total_ms = (time.perf_counter() - inicio) * 1000
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertEqual(response.status_code, 200, url)
+        db_ms = sum(float(query['time']) for query in queries.captured_queries) * 1000
+        return len(queries), db_ms, pico / (1024 * 1024), total_ms
+
+    @skipUnless(SCALE, 'Tempo e memória só com WHATSAPP_PERF_SCALE=N')
+    def test_orcamentos_das_telas(self):
+        """Testa consultas, tempo no banco e memória de cada tela contra o orçamento"""
+        linhas, estouros = [], []
+        for nome, url in self.urls().items():
+            consultas, db_ms, memoria, total_ms = self.measure(url)
+            max_consultas, max_db_ms, max_memoria = limites(nome)
+            excedidos = [
+                rotulo for rotulo, valor, limite in (
+                    ('consultas', consultas, max_consultas),
+                    ('banco', db_ms, max_db_ms),
+                    ('memória', memoria, max_memoria),
+                ) if valor > limite
+            ]
+            if excedidos:
+                estouros.append(f"{nome}: {', '.join(excedidos)}")
+            linhas.append((
+                nome, f'{consultas}/{max_consultas}', f'{db_ms:.0f}/{max_db_ms}',
+                f'{memoria:.1f}/{max_memoria}', f'{total_ms:.0f}', 'ESTOURO' if excedidos else 'ok',
+            ))
+
+        cabecalho = ('Tela', 'Consultas', 'Banco (ms)', 'Memória (MB)', 'Total (ms)', '')
+        larguras = [max(len(str(linha[i])) for linha in linhas + [cabecalho]) for i in range(len(cabecalho))]
+        sys.stdout.write(
+            f'\nOrçamentos WhatsApp - {CONVERSATIONS} conversas, '
+            f'{CONVERSATIONS * MESSAGES_PER_CONVERSATION} mensagens (medido/limite)\n'
+        )
+        for linha in [cabecalho] + linhas:
+            sys.stdout.write('  '.join(str(valor).ljust(largura) for valor, largura in zip(linha, larguras)) + '\n')
+
+        self.assertEqual(estouros, [], 'Orçamentos de desempenho excedidos')
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para os tempos de atendimento (primeira resposta, resposta média e
+resolução) e os agregados diários por atendente
+"""
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppConversationFactory, WhatsAppMessageFactory
+)
+from core.models import WhatsAppConversation, WhatsAppResponseStats
+from core.services import whatsapp_analytics, whatsapp_archive
+from core.templatetags.core_tags import duracao
+
+
+class WhatsAppResponseStatsTest(TestCase):
+
+    def setUp(self):
+        self.atendente = UsuarioFactory()
+        self.inicio = timezone.now() - timedelta(hours=5)
+        self.conversa = WhatsAppConversationFactory(
+            assigned_to=self.atendente, status='in_progress', first_message_at=self.inicio
+        )
+
+    def mensagem(self, minutos, direction='inbound', conversa=None, **kwargs):
+        conversa = conversa or self.conversa
+        return WhatsAppMessageFactory(
+            conversation=conversa, account=conversa.account, contact=conversa.contact,
+            direction=direction, timestamp=self.inicio + timedelta(minutes=minutos), **kwargs
+        )
+
+    def dialogo(self):
+        self.mensagem(0)
+        self.mensagem(2)                  # ainda aguardando: não reinicia a espera
+        self.mensagem(10, 'outbound')     # 1ª resposta: 10 min
+        self.mensagem(11, 'outbound')     # sem mensagem pendente: ignorada
+        self.mensagem(20)
+        self.mensagem(50, 'outbound')     # 30 min
+
+    def test_metricas_incrementais_da_conversa(self):
+        """Testa primeira resposta, tempo médio de resposta e resolução"""
+        self.dialogo()
+        conversa = WhatsAppConversation.objects.get(pk=self.conversa.pk)
+
+        self.assertEqual(conversa.first_response_time, timedelta(minutes=10))
+        self.assertEqual(conversa.reply_count, 2)
+        self.assertEqual(conversa.response_time, timedelta(minutes=20))
+        self.assertIsNone(conversa.awaiting_reply_since)
+        self.assertIsNone(conversa.resolution_time)
+
+        conversa.resolve()
+        conversa.refresh_from_db()
+        self.assertAlmostEqual(conversa.resolution_time.total_seconds(), 5 * 3600, delta=5)
+
+        # Um save() completo de uma instância antiga não sobrescreve as métricas
+        self.conversa.notes = 'Cliente atendido'
+        self.conversa.save()
+        conversa.refresh_from_db()
+        self.assertEqual(conversa.reply_count, 2)
+
+    def test_agregado_diario_por_atendente(self):
+        """Testa os agregados diários e o relatório por atendente"""
+        self.dialogo()
+        self.conversa.resolve()
+        outra = WhatsAppConversationFactory(
+            account=self.conversa.account, assigned_to=None, first_message_at=self.inicio
+        )
+        self.mensagem(0, conversa=outra)
+        self.mensagem(4, 'outbound', conversa=outra, sent_by=None)
+
+        hoje = timezone.localdate()
+        total, por_atendente = whatsapp_analytics.response_report(hoje - timedelta(days=1), hoje)
+
+        self.assertEqual(total.reply_count, 3)
+        self.assertEqual(total.first_response_count, 2)
+        self.assertEqual(total.avg_first_response, timedelta(minutes=7))
+        self.assertEqual(total.resolved_count, 1)
+        self.assertEqual([linha.attendant for linha in por_atendente], [self.atendente, None])
+        self.assertEqual(por_atendente[0].avg_reply, timedelta(minutes=20))
+
+        # Período sem registros
+        total, por_atendente = whatsapp_analytics.response_report(hoje + timedelta(days=1), hoje + timedelta(days=2))
+        self.assertEqual((total.reply_count, por_atendente), (0, []))
+
+    def test_reabrir_e_resolver_de_novo_conta_uma_vez(self):
+        """Testa resolver -> reabrir -> resolver: a resolução é contada só uma vez"""
+        self.conversa.resolve()
+        primeira = WhatsAppConversation.objects.get(pk=self.conversa.pk).resolution_seconds
+
+        self.conversa.start_attendance()
+        self.conversa.resolved_at = timezone.now() + timedelta(hours=3)
+        self.conversa.status = 'resolved'
+        self.conversa.save(update_fields=['status', 'resolved_at', 'atualizado_em'])
+
+        stats = WhatsAppResponseStats.objects.get()
+        self.assertEqual((stats.resolved_count, stats.resolution_seconds), (1, primeira))
+        self.assertEqual(WhatsAppConversation.objects.get(pk=self.conversa.pk).resolution_seconds, primeira)
+
+        # A reconstrução chega aos mesmos números
+        WhatsAppResponseStats.objects.all().delete()
+        call_command('rebuild_whatsapp_response_stats', stdout=StringIO())
+        stats = WhatsAppResponseStats.objects.get()
+        self.assertEqual((stats.resolved_count, stats.resolution_seconds), (1, primeira))
+
+    def test_reconstrucao_igual_ao_incremental(self):
+        """Testa o comando de reconstrução, inclusive com mensagens arquivadas"""
+        self.dialogo()
+        self.conversa.resolve()
+        esperado = list(WhatsAppResponseStats.objects.values(*whatsapp_analytics.STAT_FIELDS))
+
+        whatsapp_archive.archive_conversation(self.conversa.pk)
+        WhatsAppResponseStats.objects.all().delete()
+        WhatsAppConversation.objects.update(reply_count=0, reply_seconds_total=0, first_response_seconds=None)
+
+        call_command('rebuild_whatsapp_response_stats', stdout=StringIO())
+
+        self.assertEqual(list(WhatsAppResponseStats.objects.values(*whatsapp_analytics.STAT_FIELDS)), esperado)
+        conversa = WhatsAppConversation.objects.get(pk=self.conversa.pk)
+        self.assertEqual(conversa.response_time, timedelta(minutes=20))
+        self.assertEqual(conversa.first_response_time, timedelta(minutes=10))
+
+    def test_whatsapp_geral_exibe_tempos(self):
+        """Testa o painel WhatsApp Geral lendo os agregados"""
+        self.dialogo()
+        gerente = UsuarioFactory(gerente_comercial=True)
+        gerente.groups.add(GroupFactory(name='Comercial'))
+        client = Client()
+        client.force_login(gerente)
+
+        response = client.get(reverse('comercial:whatsapp_geral'))
+        self.assertEqual(response.context['response_total'].reply_count, 2)
+        self.assertContains(response, 'Tempos de Atendimento')
+        self.assertContains(response, '20min')
+
+    def test_filtro_duracao(self):
+        """Testa a formatação das durações"""
+        self.assertEqual(duracao(None), '-')
+        self.assertEqual(duracao(45), '45s')
+        self.assertEqual(duracao(timedelta(minutes=12, seconds=30)), '12min')
+        self.assertEqual(duracao(timedelta(hours=2, minutes=5)), '2h 05min')
+        self.assertEqual(duracao(timedelta(days=3, hours=4)), '3d 4h')
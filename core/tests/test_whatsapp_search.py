@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para a busca textual e por trigramas nas conversas WhatsApp
+"""
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppConversationFactory, WhatsAppMessageFactory
+)
+from core.models import WhatsAppConversation, WhatsAppMessage
+from core.services import whatsapp_search
+
+
+class WhatsAppSearchTest(TestCase):
+
+    def setUp(self):
+        self.user = UsuarioFactory()
+        self.user.groups.add(GroupFactory(name='Comercial'))
+        self.client = Client()
+        self.client.force_login(self.user)
+
+        self.orcamento = self.conversa(
+            name='Maria Souza', phone_number='+5511987654321',
+            mensagens=['Bom dia!', 'Gostaria de um orçamento para as passagens de Lisboa'],
+        )
+        self.reclamacao = self.conversa(
+            name='João Pereira', phone_number='+5521912345678',
+            mensagens=['As passagens chegaram', 'Obrigado'],
+        )
+        self.outra = self.conversa(
+            name='Ana Lima', phone_number='+5531955554444',
+            mensagens=['Qual o horário de atendimento?'],
+        )
+
+    def conversa(self, name, phone_number, mensagens):
+        conversa = WhatsAppConversationFactory(
+            assigned_to=self.user, status='in_progress',
+            contact__name=name, contact__phone_number=phone_number,
+        )
+        agora = timezone.now()
+        for i, conteudo in enumerate(mensagens):
+            WhatsAppMessageFactory(
+                conversation=conversa, account=conversa.account, contact=conversa.contact,
+                content=conteudo, timestamp=agora + timedelta(minutes=i),
+            )
+        return conversa
+
+    def buscar(self, termo):
+        return list(whatsapp_search.search_conversations(WhatsAppConversation.objects.all(), termo))
+
+    def test_vetor_gerado_pelo_banco(self):
+        """Testa que o vetor acompanha o conteúdo, inclusive em update() em massa"""
+        WhatsAppMessage.objects.filter(conversation=self.outra).update(content='Quero cancelar a reserva')
+
+        self.assertEqual(self.buscar('cancelamento'), [self.outra])
+        self.assertEqual(self.buscar('horário'), [])
+
+    def test_busca_textual_com_radicais_e_relevancia(self):
+        """Testa busca em português (radicais) e relevância"""
+        resultado = self.buscar('orçamentos Lisboa')
+        self.assertEqual(resultado, [self.orcamento])
+
+        resultado = self.buscar('passagens')
+        self.assertEqual(set(resultado), {self.orcamento, self.reclamacao})
+        self.assertTrue(all(conversa.search_rank > 0 for conversa in resultado))
+
+    def test_busca_por_nome_e_telefone(self):
+        """Testa trechos do nome do contato e dos dígitos do telefone"""
+        self.assertEqual(self.buscar('pereir'), [self.reclamacao])
+        # Começo do nome tem mais peso que trecho no meio
+        self.assertEqual(self.buscar('ma'), [self.orcamento, self.outra])
+        self.assertEqual(self.buscar('(21) 91234'), [self.reclamacao])
+        # Poucos dígitos não filtram por telefone
+        self.assertEqual(self.buscar('55'), [])
+
+    def test_trechos_destacados_escapam_html(self):
+        """Testa o destaque dos termos sem permitir HTML do conteúdo"""
+        WhatsAppMessageFactory(
+            conversation=self.outra, account=self.outra.account, contact=self.outra.contact,
+            content='<script>alert(1)</script> reserva confirmada',
+        )
+
+        conversas = whatsapp_search.attach_matches(self.buscar('reserva'), 'reserva')
+
+        self.assertEqual(conversas, [self.outra])
+        destaque = conversas[0].search_matches[0].highlight
+        self.assertIn('<mark>reserva</mark>', destaque)
+        self.assertNotIn('<script>', destaque)
+
+    def test_views_usam_busca(self):
+        """Testa a lista de conversas do atendente e o WhatsApp Geral"""
+        response = self.client.get(reverse('comercial:my_conversations'), {'search': 'orçamentos'})
+        self.assertEqual(list(response.context['my_conversations']), [self.orcamento])
+        self.assertContains(response, '<mark>orçamento</mark>')
+
+        self.user.gerente_comercial = True
+        self.user.save()
+        response = self.client.get(reverse('comercial:whatsapp_geral'), {'search': 'passagens'})
+        self.assertEqual(set(response.context['conversas']), {self.orcamento, self.reclamacao})
+        self.assertContains(response, '<mark>passagens</mark>')
+
+    def test_busca_textual_usa_indice(self):
+        """Testa que a busca nas mensagens usa o índice GIN do vetor"""
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            sql, params = WhatsAppMessage.objects.filter(
+                search_vector=whatsapp_search.build_query('passagens')
+            ).values('conversation_id').query.sql_with_params()
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plano = '\n'.join(row[0] for row in cursor.fetchall())
+
+        self.assertIn('whatsapp_message_search_gin', plano)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o resumo denormalizado das conversas WhatsApp
+"""
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppConversationFactory, WhatsAppMessageFactory
+)
+from core.models import WhatsAppConversation, WhatsAppMessage
+
+
+class WhatsAppSummaryTest(TestCase):
+
+    def setUp(self):
+        self.conversation = WhatsAppConversationFactory(status='pending')
+        self.agora = timezone.now()
+
+    def mensagem(self, **kwargs):
+        kwargs.setdefault('timestamp', self.agora)
+        return WhatsAppMessageFactory(
+            conversation=self.conversation,
+            account=self.conversation.account,
+            contact=self.conversation.contact,
+            **kwargs
+        )
+
+    def resumo(self):
+        return WhatsAppConversation.objects.get(pk=self.conversation.pk)
+
+    def test_novas_mensagens_atualizam_resumo(self):
+        """Testa total, não lidas, última mensagem e última recebida"""
+        self.mensagem(direction='inbound', status='delivered', content='Olá',
+                      timestamp=self.agora - timedelta(hours=2))
+        self.mensagem(direction='outbound', status='sent', content='Bom dia!',
+                      timestamp=self.agora - timedelta(hours=1))
+
+        conversa = self.resumo()
+        self.assertEqual(conversa.message_count, 2)
+        self.assertEqual(conversa.unread_inbound_count, 1)
+        self.assertEqual(conversa.unread_messages_count, 1)
+        self.assertEqual(conversa.last_message_preview, 'Bom dia!')
+        self.assertEqual(conversa.last_message_direction, 'outbound')
+        self.assertEqual(conversa.last_inbound_at, self.agora - timedelta(hours=2))
+        self.assertTrue(conversa.is_within_24h_window())
+
+    def test_mensagem_fora_de_ordem_nao_substitui_ultima(self):
+        """Testa que uma mensagem mais antiga não vira a "última mensagem" """
+        self.mensagem(direction='inbound', content='Recente')
+        self.mensagem(direction='inbound', content='Antiga',
+                      timestamp=self.agora - timedelta(days=2))
+
+        conversa = self.resumo()
+        self.assertEqual(conversa.message_count, 2)
+        self.assertEqual(conversa.last_message_preview, 'Recente')
+        self.assertEqual(conversa.last_message_at, self.agora)
+        self.assertEqual(conversa.last_inbound_at, self.agora)
+
+    def test_mudanca_de_status_atualiza_nao_lidas(self):
+        """Testa decremento ao marcar como lida e que outros saves não alteram"""
+        mensagem = self.mensagem(direction='inbound', status='delivered')
+        self.assertEqual(self.resumo().unread_inbound_count, 1)
+
+        mensagem = WhatsAppMessage.objects.get(pk=mensagem.pk)
+        mensagem.content = 'Editada'
+        mensagem.save()
+        self.assertEqual(self.resumo().unread_inbound_count, 1)
+
+        mensagem.status = 'read'
+        mensagem.save()
+        self.assertEqual(self.resumo().unread_inbound_count, 0)
+
+    def test_save_da_conversa_nao_sobrescreve_resumo(self):
+        """Testa que uma instância carregada antes não apaga o resumo"""
+        conversa = self.resumo()
+        self.mensagem(direction='inbound', content='Nova')
+
+        conversa.notes = 'Anotação'
+        conversa.save()
+
+        self.assertEqual(self.resumo().message_count, 1)
+        self.assertEqual(self.resumo().notes, 'Anotação')
+
+    def test_exclusao_e_comando_de_reconstrucao(self):
+        """Testa recálculo após exclusão e após update() em massa"""
+        self.mensagem(direction='inbound', content='Primeira',
+                      timestamp=self.agora - timedelta(minutes=5))
+        ultima = self.mensagem(direction='outbound', status='sent', content='Segunda')
+
+        ultima.delete()
+        conversa = self.resumo()
+        self.assertEqual(conversa.message_count, 1)
+        self.assertEqual(conversa.last_message_preview, 'Primeira')
+
+        # update() não passa pelo save() e deixa o resumo desatualizado
+        WhatsAppConversation.objects.filter(pk=self.conversation.pk).update(
+            message_count=0, unread_inbound_count=0, last_message_preview=''
+        )
+        vazia = WhatsAppConversationFactory()
+
+        call_command('rebuild_whatsapp_summaries', stdout=StringIO())
+
+        conversa = self.resumo()
+        self.assertEqual(conversa.message_count, 1)
+        self.assertEqual(conversa.unread_inbound_count, 1)
+        self.assertEqual(conversa.last_message_preview, 'Primeira')
+        self.assertEqual(conversa.last_message_direction, 'inbound')
+
+        vazia = WhatsAppConversation.objects.get(pk=vazia.pk)
+        self.assertEqual(vazia.message_count, 0)
+        self.assertIsNone(vazia.last_message_at)
+
+    def test_listas_nao_carregam_mensagens(self):
+        """Testa que as listas de conversas não dependem da quantidade de mensagens"""
+        user = UsuarioFactory()
+        user.groups.add(GroupFactory(name='Comercial'))
+        client = Client()
+        client.force_login(user)
+        for i in range(3):
+            conversa = WhatsAppConversationFactory(status='pending')
+            for j in range(5):
+                WhatsAppMessageFactory(
+                    conversation=conversa, account=conversa.account, contact=conversa.contact,
+                    content=f'Mensagem {i}-{j}', timestamp=self.agora + timedelta(minutes=j)
+                )
+
+        response = client.get(reverse('comercial:pending_conversations'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Mensagem 2-4')
+        self.assertContains(response, '5 mensagens')
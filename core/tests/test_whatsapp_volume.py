@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Testes para o volume de mensagens WhatsApp por hora (painel e lista de contas)
+"""
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from core.factories import (
+    UsuarioFactory, GroupFactory, WhatsAppAccountFactory, WhatsAppConversationFactory,
+    WhatsAppMessageFactory
+)
+from core.models import WhatsAppMessage, WhatsAppMessageVolume
+from core.services import whatsapp_archive, whatsapp_volume
+
+
+class WhatsAppVolumeTest(TestCase):
+
+    def setUp(self):
+        self.conversa = WhatsAppConversationFactory(status='resolved')
+        self.conta = self.conversa.account
+        self.agora = timezone.now()
+
+    def mensagem(self, horas_atras=0, **kwargs):
+        kwargs.setdefault('direction', 'inbound')
+        kwargs.setdefault('message_type', 'text')
+        kwargs.setdefault('status', 'delivered')
+        return WhatsAppMessageFactory(
+            conversation=self.conversa, account=self.conta, contact=self.conversa.contact,
+            timestamp=self.agora - timedelta(hours=horas_atras), **kwargs
+        )
+
+    def volume(self):
+        return {
+            (v.direction, v.status): v.count
+            for v in WhatsAppMessageVolume.objects.filter(account=self.conta)
+            if v.count
+        }
+
+    def test_volume_acompanha_criacao_status_e_exclusao(self):
+        """Testa o registro por hora nas novas mensagens, mudanças de status e exclusões"""
+        recebida = self.mensagem()
+        self.mensagem(direction='outbound', status='sent')
+        enviada = self.mensagem(direction='outbound', status='sent')
+        self.assertEqual(self.volume(), {('inbound', 'delivered'): 1, ('outbound', 'sent'): 2})
+
+        enviada = WhatsAppMessage.objects.get(pk=enviada.pk)
+        enviada.mark_as_read()
+        self.assertEqual(
+            self.volume(),
+            {('inbound', 'delivered'): 1, ('outbound', 'sent'): 1, ('outbound', 'read'): 1},
+        )
+
+        recebida.delete()
+        self.assertEqual(self.volume(), {('outbound', 'sent'): 1, ('outbound', 'read'): 1})
+
+    def test_totais_e_serie_diaria(self):
+        """Testa os totais das últimas 24h e a série de 30 dias"""
+        self.mensagem()
+        self.mensagem(direction='outbound', status='read')
+        self.mensagem(horas_atras=72)
+
+        totais = whatsapp_volume.volume_totals(since=self.agora - timedelta(days=1))
+        self.assertEqual(totais, {'total': 2, 'inbound': 1, 'outbound': 1})
+
+        serie = whatsapp_volume.daily_series(30)
+        self.assertEqual(len(serie), 30)
+        self.assertEqual(serie[-1]['day'], timezone.localdate())
+        self.assertEqual(sum(dia['total'] for dia in serie), 3)
+        self.assertEqual(sum(dia['inbound'] for dia in serie), 2)
+
+        contagens = whatsapp_volume.account_counts([self.conta.id])
+        self.assertEqual(contagens[self.conta.id], {'total': 3, 'read': 1})
+
+    def test_reconstrucao_inclui_arquivadas(self):
+        """Testa o comando de recontagem com mensagens arquivadas e período parcial"""
+        self.mensagem(horas_atras=500)
+        self.mensagem(horas_atras=2, direction='outbound', status='read')
+        esperado = self.volume()
+
+        whatsapp_archive.archive_conversation(self.conversa.pk)
+        WhatsAppMessageVolume.objects.all().delete()
+        call_command('rebuild_whatsapp_message_volume', stdout=StringIO())
+        self.assertEqual(self.volume(), esperado)
+
+        # Só as últimas horas são recontabilizadas
+        WhatsAppMessageVolume.objects.filter(direction='inbound').update(count=7)
+        call_command('rebuild_whatsapp_message_volume', '--hours', '24', stdout=StringIO())
+        self.assertEqual(self.volume(), {('inbound', 'delivered'): 7, ('outbound', 'read'): 1})
+
+    def test_painel_e_lista_de_contas(self):
+        """Testa o painel, a lista de contas e o modal de exclusão lendo o volume"""
+        admin = UsuarioFactory()
+        admin.groups.add(GroupFactory(name='Administração'))
+        client = Client()
+        client.force_login(admin)
+        self.mensagem()
+        self.mensagem(direction='outbound', status='read')
+        vazia = WhatsAppAccountFactory()
+
+        response = client.get(reverse('administracao:whatsapp:dashboard'))
+        self.assertEqual(response.context['messages_24h'], 2)
+        self.assertEqual(response.context['inbound_24h'], 1)
+        self.assertEqual(response.context['volume_series'][-1]['total'], 2)
+
+        response = client.get(reverse('administracao:whatsapp:accounts_list'))
+        contas = {conta.id: conta for conta in response.context['page_obj']}
+        self.assertEqual((contas[self.conta.id].messages_total, contas[self.conta.id].messages_read), (2, 1))
+        self.assertEqual(contas[vazia.id].messages_total, 0)
+
+        url = reverse('administracao:whatsapp:account_delete_modal', args=[self.conta.id])
+        self.assertEqual(client.get(url).context['messages_count'], 2)
+        self.assertFalse(client.post(url).json()['success'])
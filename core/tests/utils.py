@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Utilitários comuns dos testes
+"""
+
+# core.test_settings usa DummyCache; testes que dependem do cache usam
+# @override_settings(CACHES=LOCMEM_CACHE)
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'core-tests',
+    }
+}
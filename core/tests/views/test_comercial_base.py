@@ -7,7 +7,8 @@ from core.factories import (
     UsuarioFactory, GroupFactory, CaravanaFactory, 
     BloqueioFactory, PassageiroFactory, PessoaFactory
 )
-from core.models import Usuario
+from core.models import Usuario, VendaBloqueio
+from core.services import estoque_lugares
 
 
 @override_settings(DEFAULT_FILE_STORAGE=InMemoryStorage())
@@ -30,6 +31,16 @@ class ComercialBaseViewsTest(TestCase):
         # Fazer login do usuário comercial
         self.client.force_login(self.user_comercial)
     
+    def vender(self, bloqueio, quantidade):
+        """Venda confirmada com os passageiros (lugares vendidos no estoque)"""
+        venda = VendaBloqueio.objects.create(
+            bloqueio=bloqueio, vendedor=self.user_comercial, status='confirmada', numero_passageiros=quantidade
+        )
+        estoque_lugares.confirmar(venda)
+        for _ in range(quantidade):
+            PassageiroFactory(bloqueio=bloqueio, venda=venda)
+        return venda
+    
     def test_home_comercial_acesso_autorizado(self):
         """Testa se usuário comercial pode acessar a home"""
         response = self.client.get(reverse('comercial:home'))
@@ -94,9 +105,8 @@ class ComercialBaseViewsTest(TestCase):
         # Criar bloqueio para a caravana
         bloqueio = BloqueioFactory(caravana=caravana)
         
-        # Criar 3 passageiros vendidos
-        for _ in range(3):
-            PassageiroFactory(bloqueio=bloqueio)
+        # Vender 3 lugares
+        self.vender(bloqueio, 3)
         
         response = self.client.get(reverse('comercial:caravanas_disponiveis'))
         
@@ -150,9 +160,8 @@ class ComercialBaseViewsTest(TestCase):
         caravana = CaravanaFactory(quantidade=5)
         bloqueio = BloqueioFactory(caravana=caravana)
         
-        # Criar 2 passageiros vendidos
-        for _ in range(2):
-            PassageiroFactory(bloqueio=bloqueio)
+        # Vender 2 lugares
+        self.vender(bloqueio, 2)
         
         response = self.client.get(
             reverse('comercial:caravana_detalhes', kwargs={'caravana_id': caravana.id})
@@ -167,9 +176,8 @@ class ComercialBaseViewsTest(TestCase):
         caravana = CaravanaFactory(quantidade=2)
         bloqueio = BloqueioFactory(caravana=caravana)
         
-        # Criar 2 passageiros (esgota vagas)
-        for _ in range(2):
-            PassageiroFactory(bloqueio=bloqueio)
+        # Vender 2 lugares (esgota vagas)
+        self.vender(bloqueio, 2)
         
         response = self.client.get(
             reverse('comercial:caravana_detalhes', kwargs={'caravana_id': caravana.id})
@@ -14,4 +14,7 @@ urlpatterns = [
     path('<int:pk>/foto/modal/', pessoas.foto_modal, name='pessoas_foto_modal'),
     path('<int:pk>/foto/upload/', pessoas.foto_upload, name='pessoas_foto_upload'),
     path('<int:pk>/foto/remover/', pessoas.foto_remover, name='pessoas_foto_remover'),
+    path('duplicadas/', pessoas.duplicadas, name='pessoas_duplicadas'),
+    path('duplicadas/<int:pk>/mesclar/', pessoas.duplicada_mesclar, name='pessoas_duplicada_mesclar'),
+    path('duplicadas/<int:pk>/descartar/', pessoas.duplicada_descartar, name='pessoas_duplicada_descartar'),
 ]
\ No newline at end of file
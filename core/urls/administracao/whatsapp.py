@@ -17,6 +17,7 @@ urlpatterns = [
     # Listas
     path('contacts/<int:account_id>/', views.contacts_list, name='contacts_list'),
     path('messages/', views.messages_list, name='messages_list'),
+    path('messages/export/', views.messages_export, name='messages_export'),
     
     # Modals CRUD
     path('account/create/', views.account_create_modal, name='account_create_modal'),
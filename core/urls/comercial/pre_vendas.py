@@ -1,6 +1,7 @@
 from django.urls import path
 from core.views.comercial.pre_vendas import (
     pre_vendas_lista,
+    exportar_vendas,
     iniciar_venda_caravana,
     pre_venda_detalhe,
     gerenciar_passageiros_modal,
@@ -39,6 +40,7 @@ from core.views.comercial.pre_vendas import (
 
 urlpatterns = [
     path('', pre_vendas_lista, name='pre_vendas_lista'),
+    path('exportar/', exportar_vendas, name='exportar_vendas'),
     path('<int:venda_id>/', pre_venda_detalhe, name='pre_venda_detalhe'),
     path('iniciar-venda-caravana/<int:caravana_id>/', iniciar_venda_caravana, name='iniciar_venda_caravana'),
     
@@ -10,6 +10,7 @@ urlpatterns = [
     path('pending-conversations/', views.pending_conversations, name='pending_conversations'),
     path('conversation/<int:conversation_id>/messages/', views.conversation_messages, name='conversation_messages'),
     path('conversation/<int:conversation_id>/messages-readonly/', views.conversation_messages_readonly, name='conversation_messages_readonly'),
+    path('conversation/<int:conversation_id>/export/', views.conversation_export, name='conversation_export'),
     path('conversation/<int:conversation_id>/chat-area/', views.conversation_chat_area, name='conversation_chat_area'),
     path('mobile-conversation/<int:conversation_id>/', views.mobile_conversation, name='mobile_conversation'),
     path('mobile-conversation-content/<int:conversation_id>/', views.mobile_conversation_content, name='mobile_conversation_content'),
@@ -18,6 +19,7 @@ urlpatterns = [
     
     # Actions
     path('assign/<int:conversation_id>/', views.assign_conversation, name='assign_conversation'),
+    path('assign/next/', views.assign_next_conversation, name='assign_next_conversation'),
     path('check-24h-window/', views.check_24h_window, name='check_24h_window'),
     path('send-message/', views.send_message, name='send_message'),
     path('send-message-form/', views.send_message_form, name='send_message_form'),
@@ -3,10 +3,11 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import Group
 from core.models import Usuario, Pessoa
+from core.services.auth_profile import user_in_group
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def home(request):
     """
     View principal do painel de administracao
@@ -2,18 +2,22 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.contrib import messages
 from django.http import HttpResponse
 from django.db.models.deletion import ProtectedError
-from core.models import Pessoa
+from django.urls import reverse
+from django.utils import timezone
+from core.models import Pessoa, PessoaDuplicada
 from core.forms.pessoa import PessoaForm
 # from core.forms.contato import TelefoneFormSet, EmailFormSet  # Removido - campos agora estão diretos na Pessoa
 from core.utils.image_processing import crop_to_square, is_valid_image, needs_processing
+from core.services import pessoa_busca, pessoa_duplicadas
+from core.services.exceptions import MesclagemError
+from core.services.auth_profile import user_in_group
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def lista(request):
     """
     View para listagem de pessoas
@@ -27,13 +31,7 @@ def lista(request):
     
     # Aplica filtro de busca se houver
     if search:
-        pessoas = pessoas.filter(
-            Q(nome__icontains=search) |
-            Q(doc__icontains=search) |
-            Q(email1__icontains=search) |
-            Q(email2__icontains=search) |
-            Q(email3__icontains=search)
-        )
+        pessoas = pessoa_busca.filtrar(pessoas, search)
     
     # Aplica filtro de tipo se houver
     if tipo_filter:
@@ -45,8 +43,9 @@ def lista(request):
         elif tipo_filter == 'gruporom':
             pessoas = pessoas.filter(empresa_gruporom=True)
     
-    # Ordenação
-    pessoas = pessoas.order_by('nome')
+    # Ordenação (com busca: por relevância)
+    if not search:
+        pessoas = pessoas.order_by('nome')
     
     # Paginação
     paginator = Paginator(pessoas, 20)
@@ -73,7 +72,7 @@ def lista(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def nova_modal(request):
     """
     View para retornar o modal de criação de pessoa via HTMX
@@ -87,7 +86,7 @@ def nova_modal(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def nova_modal_simples(request):
     """
     View para retornar o modal simplificado de criação de pessoa
@@ -102,7 +101,7 @@ def nova_modal_simples(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def criar(request):
     """
     View para processar o formulário de criação de pessoa
@@ -130,7 +129,7 @@ def criar(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def editar_modal(request, pk):
     """
     View para retornar o modal de edição de pessoa via HTMX
@@ -146,7 +145,7 @@ def editar_modal(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def atualizar(request, pk):
     """
     View para processar o formulário de edição de pessoa
@@ -186,7 +185,7 @@ def atualizar(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def excluir_modal(request, pk):
     """
     View para retornar o modal de confirmação de exclusão via HTMX
@@ -204,7 +203,7 @@ def excluir_modal(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def excluir(request, pk):
     """
     View para processar a exclusão de pessoa
@@ -228,7 +227,7 @@ def excluir(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def foto_modal(request, pk):
     """
     View para retornar o modal de upload de foto via HTMX
@@ -241,7 +240,7 @@ def foto_modal(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def foto_upload(request, pk):
     """
     View para processar o upload de foto com recorte automático
@@ -322,7 +321,7 @@ def foto_upload(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def foto_remover(request, pk):
     """
     View para remover a foto da pessoa
@@ -346,4 +345,69 @@ def foto_remover(request, pk):
         response['HX-Redirect'] = request.META.get('HTTP_REFERER', '/administracao/pessoas/')
         return response
     
-    return redirect('/administracao/pessoas/')
\ No newline at end of file
+    return redirect('/administracao/pessoas/')
+
+
+@login_required
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
+def duplicadas(request):
+    """
+    View para a fila de revisão de pessoas duplicadas
+    (gerada pelo comando detectar_pessoas_duplicadas)
+    """
+    pares = PessoaDuplicada.objects.filter(status='pendente').select_related('pessoa', 'duplicata')
+
+    paginator = Paginator(pares, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'administracao/pessoas/duplicadas.html', context)
+
+
+@login_required
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
+def duplicada_mesclar(request, pk):
+    """
+    View para mesclar um par da fila, mantendo a pessoa escolhida
+    """
+    par = get_object_or_404(PessoaDuplicada, pk=pk, status='pendente')
+
+    if request.method == 'POST':
+        if request.POST.get('manter') == str(par.duplicata_id):
+            manter, remover = par.duplicata, par.pessoa
+        else:
+            manter, remover = par.pessoa, par.duplicata
+
+        try:
+            pessoa_duplicadas.mesclar(manter, remover, usuario=request.user)
+            messages.success(request, f'{remover.nome} mesclada em {manter.nome} com sucesso!')
+        except MesclagemError as e:
+            messages.error(request, e.message)
+
+    # Retorna um redirect HTMX para recarregar a página
+    response = HttpResponse()
+    response['HX-Redirect'] = request.META.get('HTTP_REFERER', reverse('administracao:pessoas_duplicadas'))
+    return response
+
+
+@login_required
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
+def duplicada_descartar(request, pk):
+    """
+    View para marcar um par da fila como pessoas diferentes
+    """
+    par = get_object_or_404(PessoaDuplicada, pk=pk, status='pendente')
+
+    if request.method == 'POST':
+        par.status = 'descartada'
+        par.revisado_por = request.user
+        par.revisado_em = timezone.now()
+        par.save(update_fields=['status', 'revisado_por', 'revisado_em'])
+        messages.success(request, f'{par.pessoa.nome} e {par.duplicata.nome} marcadas como pessoas diferentes.')
+
+    # Retorna um redirect HTMX para recarregar a página
+    response = HttpResponse()
+    response['HX-Redirect'] = request.META.get('HTTP_REFERER', reverse('administracao:pessoas_duplicadas'))
+    return response
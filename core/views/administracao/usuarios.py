@@ -9,10 +9,11 @@ from django.db.models.deletion import ProtectedError
 from django.urls import reverse
 from core.models import Usuario, Pessoa
 from core.forms.usuario import UsuarioForm
+from core.services.auth_profile import user_in_group
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def lista(request):
     """
     View para listagem de usuários
@@ -58,7 +59,7 @@ def lista(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def novo_modal(request):
     """
     View para retornar o modal de criação de usuário via HTMX
@@ -72,7 +73,7 @@ def novo_modal(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def criar(request):
     """
     View para processar o formulário de criação de usuário
@@ -99,7 +100,7 @@ def criar(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def editar_modal(request, pk):
     """
     View para retornar o modal de edição de usuário via HTMX
@@ -123,7 +124,7 @@ def editar_modal(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def atualizar(request, pk):
     """
     View para processar o formulário de edição de usuário
@@ -173,7 +174,7 @@ def atualizar(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def excluir_modal(request, pk):
     """
     View para retornar o modal de confirmação de exclusão via HTMX
@@ -191,7 +192,7 @@ def excluir_modal(request, pk):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def excluir(request, pk):
     """
     View para processar a exclusão de usuário
@@ -16,14 +16,18 @@ import logging
 
 from core.models import WhatsAppAccount, WhatsAppContact, WhatsAppMessage, WhatsAppTemplate
 from core.services.whatsapp_api import WhatsAppAPIService, WhatsAppWebhookProcessor
-from core.forms.whatsapp import WhatsAppAccountForm, WhatsAppAccountTestForm, WhatsAppTemplateForm
+from core.forms.whatsapp import (
+    WhatsAppAccountForm, WhatsAppAccountTestForm, WhatsAppTemplateForm, MessageExportForm
+)
+from core.services import pessoa_telefones, whatsapp_export, whatsapp_volume
+from core.services.auth_profile import user_in_group
 
 # Logger
 logger = logging.getLogger(__name__)
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def dashboard(request):
     """
     Dashboard principal do WhatsApp
@@ -32,22 +36,9 @@ def dashboard(request):
     total_accounts = WhatsAppAccount.objects.filter(is_active=True).count()
     total_contacts = WhatsAppContact.objects.count()
     
-    # Mensagens das últimas 24h
-    yesterday = timezone.now() - timedelta(days=1)
-    messages_24h = WhatsAppMessage.objects.filter(
-        timestamp__gte=yesterday
-    ).count()
-    
-    # Mensagens por direção nas últimas 24h
-    inbound_24h = WhatsAppMessage.objects.filter(
-        timestamp__gte=yesterday,
-        direction='inbound'
-    ).count()
-    
-    outbound_24h = WhatsAppMessage.objects.filter(
-        timestamp__gte=yesterday,
-        direction='outbound'
-    ).count()
+    # Mensagens das últimas 24h por direção (volume por hora - sem contar a tabela de mensagens)
+    volume_24h = whatsapp_volume.volume_totals(since=timezone.now() - timedelta(days=1))
+    volume_series = whatsapp_volume.daily_series()
     
     # Contas ativas
     active_accounts = WhatsAppAccount.objects.filter(
@@ -66,9 +57,11 @@ def dashboard(request):
     context = {
         'total_accounts': total_accounts,
         'total_contacts': total_contacts,
-        'messages_24h': messages_24h,
-        'inbound_24h': inbound_24h,
-        'outbound_24h': outbound_24h,
+        'messages_24h': volume_24h['total'],
+        'inbound_24h': volume_24h['inbound'],
+        'outbound_24h': volume_24h['outbound'],
+        'volume_series': volume_series,
+        'volume_max': max([day['total'] for day in volume_series] + [1]),
         'active_accounts': active_accounts,
         'recent_messages': recent_messages,
         'templates': templates,
@@ -78,7 +71,7 @@ def dashboard(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def accounts_list(request):
     """
     Lista de contas WhatsApp
@@ -105,6 +98,18 @@ def accounts_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Contatos e mensagens da página em consultas agrupadas (mensagens pelo volume por hora)
+    accounts_page = list(page_obj.object_list)
+    message_counts = whatsapp_volume.account_counts(account.id for account in accounts_page)
+    contact_counts = dict(
+        WhatsAppContact.objects.filter(account__in=accounts_page)
+        .values('account').annotate(total=Count('id')).values_list('account', 'total')
+    )
+    for account in accounts_page:
+        account.messages_total = message_counts[account.id]['total']
+        account.messages_read = message_counts[account.id]['read']
+        account.contacts_total = contact_counts.get(account.id, 0)
+    
     context = {
         'page_obj': page_obj,
         'search': search,
@@ -288,6 +293,8 @@ def _process_message_sync(account, message_data, contacts_data):
                 'profile_name': contact_info.get('profile', {}).get('name', '') if contact_info else phone_number,
             }
         )
+        if created:
+            pessoa_telefones.vincular_contato(contact)
         
         # Verifica se mensagem já existe
         if WhatsAppMessage.objects.filter(wamid=wamid).exists():
@@ -487,13 +494,8 @@ def _send_status_update_websocket_notification(message, old_status, new_status):
     Envia notificação WebSocket quando o status de uma mensagem muda (delivered, read)
     """
     try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        
-        channel_layer = get_channel_layer()
-        if not channel_layer:
-            logger.warning("Channel layer não configurado - notificação WebSocket ignorada")
-            return
+        from django.db import transaction
+        from core.services.whatsapp_events import publish_event
         
         # Dados da atualização de status para enviar via WebSocket
         status_data = {
@@ -507,14 +509,11 @@ def _send_status_update_websocket_notification(message, old_status, new_status):
             'read_at': message.read_at.isoformat() if message.read_at else None
         }
         
-        # Envia notificação de mudança de status
-        async_to_sync(channel_layer.group_send)(
-            'whatsapp_comercial',
-            {
-                'type': 'message_status_update',
-                'message_status': status_data
-            }
-        )
+        # Envia notificação de mudança de status (após o commit)
+        transaction.on_commit(lambda: publish_event({
+            'type': 'message_status_update',
+            'message_status': status_data
+        }))
         
         logger.info(f"Notificação WebSocket enviada para status update: {message.id} ({old_status} → {new_status})")
         
@@ -528,14 +527,9 @@ def _send_websocket_notification(conversation, message_content):
     Envia notificação WebSocket para usuários comerciais sobre nova conversa
     """
     try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        from core.models import WhatsAppConversation
-        
-        channel_layer = get_channel_layer()
-        if not channel_layer:
-            logger.warning("Channel layer não configurado - notificação WebSocket ignorada")
-            return
+        from django.db import transaction
+        from core.services.whatsapp_counters import get_pending_count
+        from core.services.whatsapp_events import publish_event
         
         # Dados da conversa para enviar via WebSocket
         conversation_data = {
@@ -547,18 +541,16 @@ def _send_websocket_notification(conversation, message_content):
             'status': conversation.status
         }
         
-        # Conta atual de conversas pendentes
-        pending_count = WhatsAppConversation.objects.filter(status='pending').count()
-        
-        # Envia evento único com nova conversa e contador atualizado
-        async_to_sync(channel_layer.group_send)(
-            'whatsapp_comercial',
-            {
+        def notify():
+            # Após o commit o contador em cache já inclui a nova conversa
+            publish_event({
                 'type': 'conversation_new',
                 'conversation': conversation_data,
-                'pending_count': pending_count
-            }
-        )
+                'pending_count': get_pending_count()
+            })
+        
+        # Envia evento único com nova conversa e contador atualizado
+        transaction.on_commit(notify)
         
         logger.info(f"Notificações WebSocket enviadas para nova conversa {conversation.id}")
         
@@ -572,13 +564,8 @@ def _send_message_websocket_notification(conversation, message, message_content)
     Envia notificação WebSocket sobre nova mensagem em conversa existente
     """
     try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        
-        channel_layer = get_channel_layer()
-        if not channel_layer:
-            logger.warning("Channel layer não configurado - notificação WebSocket ignorada")
-            return
+        from django.db import transaction
+        from core.services.whatsapp_events import publish_event
         
         # Dados da mensagem para enviar via WebSocket
         message_data = {
@@ -590,15 +577,12 @@ def _send_message_websocket_notification(conversation, message, message_content)
             'contact_name': conversation.contact.name or conversation.contact.profile_name or conversation.contact.phone_number,
         }
         
-        # Envia notificação de nova mensagem
-        async_to_sync(channel_layer.group_send)(
-            'whatsapp_comercial',
-            {
-                'type': 'message_received',
-                'message': message_data,
-                'conversation_id': conversation.id
-            }
-        )
+        # Envia notificação de nova mensagem (após o commit)
+        transaction.on_commit(lambda: publish_event({
+            'type': 'message_received',
+            'message': message_data,
+            'conversation_id': conversation.id
+        }))
         
         logger.info(f"Notificação WebSocket enviada para nova mensagem {message.id} na conversa {conversation.id}")
         
@@ -686,7 +670,7 @@ def webhook(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def webhook_debug(request, account_id):
     """
     View para debug do webhook - mostra informações da conta e testa conectividade
@@ -744,7 +728,7 @@ def webhook_debug(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_POST
 def test_webhook(request, account_id):
     """
@@ -820,7 +804,7 @@ def test_webhook(request, account_id):
 # ==================== VIEWS DE TEMPLATES ====================
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def templates_list(request, account_id):
     """
     Lista de templates de uma conta
@@ -878,7 +862,7 @@ def templates_list(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def template_create_modal(request):
     """
     Modal para criar template
@@ -911,7 +895,7 @@ def template_create_modal(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def template_edit_modal(request, template_id):
     """
     Modal para editar template
@@ -948,7 +932,7 @@ def template_edit_modal(request, template_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())  
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))  
 def template_delete_modal(request, template_id):
     """
     Modal para excluir template
@@ -972,7 +956,7 @@ def template_delete_modal(request, template_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def template_preview_modal(request, template_id):
     """
     Modal para prévia do template
@@ -1017,7 +1001,7 @@ def template_preview_modal(request, template_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_http_methods(["POST"])
 def template_submit_approval(request, template_id):
     """
@@ -1087,7 +1071,7 @@ def template_submit_approval(request, template_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def api_permissions_test(request, account_id):
     """
     Testa as permissões da API do WhatsApp para uma conta
@@ -1117,7 +1101,7 @@ def api_permissions_test(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_http_methods(["POST"])
 def template_check_status(request, template_id):
     """
@@ -1178,7 +1162,7 @@ def template_check_status(request, template_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def contacts_list(request, account_id):
     """
     Lista de contatos de uma conta
@@ -1220,7 +1204,7 @@ def contacts_list(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def messages_list(request):
     """
     Lista de todas as mensagens
@@ -1287,7 +1271,39 @@ def messages_list(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
+def messages_export(request):
+    """
+    Exporta as mensagens de uma conta (opcionalmente de um contato) no período
+    
+    CSV ou JSONL em streaming - não carrega o histórico em memória.
+    """
+    form = MessageExportForm(request.GET)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return redirect('administracao:whatsapp:accounts_list')
+    
+    data = form.cleaned_data
+    account, contact = data['account'], data['contact']
+    filename = whatsapp_export.export_filename(
+        'mensagens', account.id, contact.phone_number if contact else None,
+        data['inicio'] and data['inicio'].strftime('%Y%m%d'),
+        data['fim'] and data['fim'].strftime('%Y%m%d'),
+    )
+    return whatsapp_export.export_response(
+        request,
+        whatsapp_export.iter_messages(
+            account=account, contact=contact, start=data['inicio'], end=data['fim']
+        ),
+        data['formato'],
+        filename,
+    )
+
+
+@login_required
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def account_create_modal(request):
     """
     Modal para criar nova conta WhatsApp
@@ -1311,7 +1327,7 @@ def account_create_modal(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def account_edit_modal(request, account_id):
     """
     Modal para editar conta WhatsApp
@@ -1338,7 +1354,7 @@ def account_edit_modal(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def account_delete_modal(request, account_id):
     """
     Modal para excluir conta WhatsApp
@@ -1349,11 +1365,12 @@ def account_delete_modal(request, account_id):
         try:
             account_name = account.name
             
-            # Verifica se há mensagens relacionadas
-            messages_count = WhatsAppMessage.objects.filter(account=account).count()
+            # Verifica se há mensagens relacionadas (o volume por hora inclui as
+            # arquivadas; exists() cobre mensagens ainda não contabilizadas)
+            messages_count = whatsapp_volume.account_counts([account.id])[account.id]['total']
             contacts_count = WhatsAppContact.objects.filter(account=account).count()
             
-            if messages_count > 0:
+            if messages_count > 0 or WhatsAppMessage.objects.filter(account=account).exists():
                 messages.warning(
                     request, 
                     f'Não é possível excluir a conta "{account_name}" pois possui {messages_count} mensagens e {contacts_count} contatos relacionados. Desative a conta em vez de excluí-la.'
@@ -1379,7 +1396,7 @@ def account_delete_modal(request, account_id):
             })
     
     # Calcula estatísticas para exibir no modal
-    messages_count = WhatsAppMessage.objects.filter(account=account).count()
+    messages_count = whatsapp_volume.account_counts([account.id])[account.id]['total']
     contacts_count = WhatsAppContact.objects.filter(account=account).count()
     
     return render(request, 'administracao/whatsapp/modals/account_delete.html', {
@@ -1391,7 +1408,7 @@ def account_delete_modal(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def account_test_modal(request, account_id):
     """
     Modal para testar conectividade da conta WhatsApp
@@ -1462,7 +1479,7 @@ def account_test_modal(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def bulk_send_modal(request, account_id):
     """
     Modal para envio de mensagens em massa
@@ -1501,7 +1518,7 @@ def bulk_send_modal(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def load_recipients(request):
     """
     Carrega interface de seleção de destinatários baseado no tipo
@@ -1568,7 +1585,7 @@ def load_recipients(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def filter_recipients(request):
     """
     Filtra destinatários com os mesmos parâmetros do load_recipients
@@ -1577,7 +1594,7 @@ def filter_recipients(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def template_preview(request):
     """
     Carrega prévia do template selecionado
@@ -1601,7 +1618,7 @@ def template_preview(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_POST
 def update_count(request):
     """
@@ -1618,7 +1635,7 @@ def update_count(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_POST
 def select_all_recipients(request):
     """
@@ -1631,7 +1648,7 @@ def select_all_recipients(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_POST
 def clear_selection(request):
     """
@@ -1642,7 +1659,7 @@ def clear_selection(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_POST
 def bulk_send_process(request, account_id):
     """
@@ -1776,7 +1793,7 @@ def bulk_send_process(request, account_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 def count_selected(request):
     """
     Retorna a contagem de destinatários selecionados
@@ -1786,7 +1803,7 @@ def count_selected(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Administração').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Administração'))
 @require_POST
 def update_preview(request):
     """
@@ -7,6 +7,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from core.models import Pessoa, Funcao
 from core.choices import TIPO_DOC_CHOICES, SEXO_CHOICES
+from core.services.auth_profile import get_profile, user_in_group
 
 
 @login_required
@@ -15,12 +16,11 @@ def redirect_to_group(request):
     View que redireciona para o primeiro grupo encontrado no usuário.
     Se o usuário não tiver grupos, faz logout e exibe mensagem de erro.
     """
-    user = request.user
+    # Grupos do perfil em cache, na mesma ordem de user.groups (id)
+    profile = get_profile(request.user)
 
     # Verifica se o usuário tem grupos
-    user_groups = user.groups.all()
-
-    if not user_groups.exists():
+    if not profile.groups:
         # Faz logout e exibe mensagem
         logout(request)
         messages.error(
@@ -29,9 +29,8 @@ def redirect_to_group(request):
         return redirect("/login/")
 
     # Redireciona para o primeiro grupo
-    first_group = user_groups.first()
-    group_name = slugify(first_group.name)
-    
+    group_name = slugify(profile.groups[0])
+
     # Redireciona baseado no nome do grupo
     return redirect(f"/{group_name}/")
 
@@ -56,7 +55,7 @@ def pode_cadastrar_pessoa(user):
     Usuários dos grupos Administração, Comercial e Operacional podem cadastrar.
     """
     grupos_permitidos = ['Administração', 'Comercial', 'Operacional']
-    return user.groups.filter(name__in=grupos_permitidos).exists()
+    return user_in_group(user, *grupos_permitidos)
 
 
 @login_required
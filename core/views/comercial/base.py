@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Count
-from core.models import Caravana, Bloqueio, Passageiro
+from core.models import Caravana, Bloqueio
+from core.services import estoque_lugares, precificacao
+from core.services.auth_profile import user_in_group
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def home(request):
     """
     View principal da área comercial
@@ -19,7 +20,7 @@ def home(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def nova_venda(request):
     """
     View para página de nova venda com opções de tipos de venda
@@ -32,26 +33,18 @@ def nova_venda(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def caravanas_disponiveis(request):
     """
     View para listagem de caravanas disponíveis para venda
     """
-    caravanas = (
+    # Lugares vendidos/reservados lidos do estoque no mesmo JOIN
+    caravanas = estoque_lugares.com_estoque(
         Caravana.objects.all()
         .select_related("empresa", "promotor", "responsavel")
         .prefetch_related("lideres")
         .order_by("data_contrato")
     )
-    
-    # Adicionar cálculo de disponíveis
-    for caravana in caravanas:
-        # Conta passageiros em todos os bloqueios desta caravana
-        total_passageiros_vendidos = Passageiro.objects.filter(
-            bloqueio__caravana=caravana
-        ).count()
-        caravana.total_passageiros_vendidos = total_passageiros_vendidos
-        caravana.passageiros_disponiveis = caravana.quantidade - total_passageiros_vendidos
 
     context = {
         "title": "Caravanas Disponíveis",
@@ -62,7 +55,7 @@ def caravanas_disponiveis(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def caravana_detalhes(request, caravana_id):
     """
     View para detalhes da caravana selecionada para venda
@@ -74,11 +67,13 @@ def caravana_detalhes(request, caravana_id):
         'paises', 'hoteis', 'inclusos'
     ).order_by('saida')
     
-    # Calcular passageiros disponíveis
-    total_passageiros_vendidos = Passageiro.objects.filter(
-        bloqueio__caravana=caravana
-    ).count()
-    passageiros_disponiveis = caravana.quantidade - total_passageiros_vendidos
+    # Preços em reais com a cotação de hoje (uma consulta para todos os bloqueios)
+    bloqueios = precificacao.anotar_precos(bloqueios)
+    
+    # Lugares vendidos/reservados do estoque da caravana
+    lugares = estoque_lugares.disponibilidade(caravana.id)
+    total_passageiros_vendidos = lugares["total_passageiros_vendidos"]
+    passageiros_disponiveis = lugares["passageiros_disponiveis"]
     
     context = {
         "title": f"Detalhes - {caravana.nome}",
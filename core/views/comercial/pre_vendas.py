@@ -5,19 +5,27 @@ from django.core.paginator import Paginator
 from django.contrib import messages
 from django.views.decorators.http import require_POST, require_http_methods
 from django.http import JsonResponse, HttpResponse
-from django.db.models import Q
+from django.db import transaction
 from core.models.caravana import Caravana
 from core.models.venda import VendaBloqueio
 from core.models.bloqueio import Bloqueio
 from core.models.pessoa import Pessoa
 from core.models.pais import Pais
 from core.models.passageiro import Passageiro
+from core.services import estoque_lugares, pessoa_busca, precificacao, venda_export
 from core.services.venda_service import VendaService
 from core.forms.pessoa import PessoaForm
+from core.forms.venda_forms import ExportarVendasForm
+from core.services.auth_profile import user_in_group
+
+
+def _lugares_disponiveis(venda):
+    """Lugares livres na caravana da venda, lidos do estoque"""
+    return estoque_lugares.disponibilidade(venda.bloqueio.caravana_id)['passageiros_disponiveis']
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def pre_vendas_lista(request):
     """
     View para listagem de pré-vendas
@@ -61,6 +69,7 @@ def pre_vendas_lista(request):
     
     context = {
         'title': 'Pré-vendas',
+        'export_form': ExportarVendasForm(initial={'status': status_filter}),
         'page_obj': page_obj,
         'search': search,
         'status_filter': status_filter,
@@ -80,7 +89,45 @@ def pre_vendas_lista(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
+def exportar_vendas(request):
+    """
+    Exporta vendas, passageiros ou pagamentos do período (CSV ou XLSX)
+    
+    Streaming - não carrega o período em memória. Vendedores exportam só
+    as próprias vendas, como na listagem.
+    """
+    form = ExportarVendasForm(request.GET)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return redirect('comercial:pre_vendas_lista')
+    
+    data = form.cleaned_data
+    relatorio = data['relatorio']
+    filename = venda_export.export_filename(
+        relatorio,
+        data['data_inicio'] and data['data_inicio'].strftime('%Y%m%d'),
+        data['data_fim'] and data['data_fim'].strftime('%Y%m%d'),
+    )
+    return venda_export.export_response(
+        request,
+        relatorio,
+        venda_export.iter_relatorio(
+            relatorio,
+            vendedor=None if request.user.is_superuser else request.user,
+            start=data['data_inicio'],
+            end=data['data_fim'],
+            status=data['status'],
+        ),
+        data['formato'],
+        filename,
+    )
+
+
+@login_required
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def iniciar_venda_caravana(request, caravana_id):
     """
@@ -98,15 +145,19 @@ def iniciar_venda_caravana(request, caravana_id):
         if bloqueio_id:
             bloqueio = get_object_or_404(Bloqueio, pk=bloqueio_id)
         
-        # Criar a venda em pré-venda (sem cliente definido inicialmente)
-        venda = VendaBloqueio.objects.create(
-            bloqueio=bloqueio,
-            cliente=None,  # Cliente deve ser definido após criação da pré-venda
-            vendedor=request.user,
-            status='pre-venda',
-            numero_passageiros=int(quantidade) if quantidade else 1,  # Usar a quantidade informada
-            observacoes=f'Venda iniciada a partir da caravana: {caravana.nome}'
-        )
+        with transaction.atomic():
+            # Criar a venda em pré-venda (sem cliente definido inicialmente)
+            venda = VendaBloqueio.objects.create(
+                bloqueio=bloqueio,
+                cliente=None,  # Cliente deve ser definido após criação da pré-venda
+                vendedor=request.user,
+                status='pre-venda',
+                numero_passageiros=int(quantidade) if quantidade else 1,  # Usar a quantidade informada
+                observacoes=f'Venda iniciada a partir da caravana: {caravana.nome}'
+            )
+            
+            # Reservar os lugares (desfaz a venda se a caravana lotou)
+            estoque_lugares.reservar(venda, caravana_id=caravana.id)
         
         messages.success(request, f'Pré-venda {venda.codigo} criada com sucesso! Agora defina o comprador, adicione passageiros e registre pagamentos.')
         return redirect('comercial:pre_venda_detalhe', venda_id=venda.id)
@@ -117,7 +168,7 @@ def iniciar_venda_caravana(request, caravana_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def pre_venda_detalhe(request, venda_id):
     """
     View para exibir e editar detalhes de uma pré-venda
@@ -138,21 +189,15 @@ def pre_venda_detalhe(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def gerenciar_passageiros_modal(request, venda_id):
     """
     View para exibir modal de gerenciamento de passageiros
     """
     venda = get_object_or_404(VendaBloqueio, pk=venda_id)
     
-    # Calcular passageiros disponíveis
-    passageiros_vendidos = Passageiro.objects.filter(
-        bloqueio=venda.bloqueio,
-        venda__isnull=False,
-        venda__status__in=['confirmada', 'concluida']
-    ).exclude(venda=venda).count()
-    
-    passageiros_disponiveis = venda.bloqueio.caravana.quantidade - passageiros_vendidos - venda.numero_passageiros
+    # Lugares livres da caravana (a reserva desta venda já está descontada)
+    passageiros_disponiveis = _lugares_disponiveis(venda)
     
     context = {
         'venda': venda,
@@ -163,7 +208,7 @@ def gerenciar_passageiros_modal(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def buscar_pessoa_passageiro(request):
     """
     View para buscar pessoas via HTMX
@@ -172,13 +217,7 @@ def buscar_pessoa_passageiro(request):
     results = []
     
     if query and len(query) >= 2:
-        pessoas = Pessoa.objects.filter(
-            Q(nome__icontains=query) | 
-            Q(cpf__icontains=query) | 
-            Q(passaporte__icontains=query)
-        )[:10]
-        
-        results = list(pessoas.values('id', 'nome', 'cpf', 'passaporte', 'email'))
+        results = pessoa_busca.buscar(query, limite=10)
     
     context = {
         'results': results,
@@ -189,7 +228,7 @@ def buscar_pessoa_passageiro(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def selecionar_pessoa_passageiro(request):
     """
@@ -207,7 +246,7 @@ def selecionar_pessoa_passageiro(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def limpar_pessoa_passageiro(request):
     """
@@ -217,7 +256,7 @@ def limpar_pessoa_passageiro(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def adicionar_passageiro(request, venda_id):
     """
@@ -242,10 +281,7 @@ def adicionar_passageiro(request, venda_id):
         doc_limpo = ''.join(filter(str.isalnum, documento))
         
         # Verificar se já existe
-        pessoa = Pessoa.objects.filter(
-            Q(doc=doc_limpo) | 
-            Q(passaporte_numero=doc_limpo)
-        ).first()
+        pessoa = pessoa_busca.por_documento(documento)
         
         if pessoa:
             # Atualizar pessoa existente com dados do form
@@ -299,14 +335,8 @@ def adicionar_passageiro(request, venda_id):
     # Recarregar venda com dados atualizados
     venda.refresh_from_db()
     
-    # Calcular passageiros disponíveis
-    passageiros_vendidos = Passageiro.objects.filter(
-        bloqueio=venda.bloqueio,
-        venda__isnull=False,
-        venda__status__in=['confirmada', 'concluida']
-    ).exclude(venda=venda).count()
-    
-    passageiros_disponiveis = venda.bloqueio.caravana.quantidade - passageiros_vendidos - venda.numero_passageiros
+    # Lugares livres da caravana (a reserva desta venda já está descontada)
+    passageiros_disponiveis = _lugares_disponiveis(venda)
     
     context = {
         'venda': venda,
@@ -317,7 +347,7 @@ def adicionar_passageiro(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_http_methods(["DELETE"])
 def remover_passageiro(request, venda_id, passageiro_id):
     """
@@ -331,6 +361,10 @@ def remover_passageiro(request, venda_id, passageiro_id):
         passageiro.venda = None
         passageiro.save()
         
+        # Renovar a reserva dos lugares da pré-venda
+        if venda.status == 'pre-venda':
+            estoque_lugares.reservar(venda)
+        
         # Recalcular totais da venda
         service = VendaService()
         service._recalcular_totais_venda(venda)
@@ -342,14 +376,8 @@ def remover_passageiro(request, venda_id, passageiro_id):
     # Recarregar venda com dados atualizados
     venda.refresh_from_db()
     
-    # Calcular passageiros disponíveis
-    passageiros_vendidos = Passageiro.objects.filter(
-        bloqueio=venda.bloqueio,
-        venda__isnull=False,
-        venda__status__in=['confirmada', 'concluida']
-    ).exclude(venda=venda).count()
-    
-    passageiros_disponiveis = venda.bloqueio.caravana.quantidade - passageiros_vendidos - venda.numero_passageiros
+    # Lugares livres da caravana (a reserva desta venda já está descontada)
+    passageiros_disponiveis = _lugares_disponiveis(venda)
     
     context = {
         'venda': venda,
@@ -359,7 +387,7 @@ def remover_passageiro(request, venda_id, passageiro_id):
     return render(request, 'comercial/pre_vendas/partials/passageiros_lista_principal.html', context)
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def registrar_pagamento_modal(request, venda_id):
     """
     View para exibir modal de registro de pagamento
@@ -379,7 +407,7 @@ def registrar_pagamento_modal(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def registrar_pagamento(request, venda_id):
     """
@@ -436,7 +464,7 @@ def registrar_pagamento(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def confirmar_venda_modal(request, venda_id):
     """
     View para exibir modal de confirmação de venda
@@ -455,7 +483,7 @@ def confirmar_venda_modal(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def confirmar_venda(request, venda_id):
     """
@@ -488,7 +516,7 @@ def confirmar_venda(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def cancelar_venda_modal(request, venda_id):
     """
     View para exibir modal de cancelamento de venda
@@ -507,7 +535,7 @@ def cancelar_venda_modal(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name="Comercial").exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def cancelar_venda(request, venda_id):
     """
@@ -552,7 +580,7 @@ def cancelar_venda(request, venda_id):
 
 # Views para gerenciar extras
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def gerenciar_extras_modal(request, venda_id):
     """
     View para exibir modal de gerenciamento de extras
@@ -573,7 +601,7 @@ def gerenciar_extras_modal(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def adicionar_extra(request, venda_id):
     """
@@ -595,7 +623,7 @@ def adicionar_extra(request, venda_id):
             venda=venda,
             extra=extra,
             quantidade=quantidade,
-            valor_unitario=valor_unitario or extra.valor,
+            valor_unitario=valor_unitario or precificacao.preco_extra_venda(extra, venda),
             observacoes=observacoes
         )
         
@@ -617,7 +645,7 @@ def adicionar_extra(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_http_methods(["DELETE"])
 def remover_extra(request, venda_id, extra_id):
     """
@@ -651,7 +679,7 @@ def remover_extra(request, venda_id, extra_id):
 
 # Views para gerenciar pagamentos
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def gerenciar_pagamentos_modal(request, venda_id):
     """
     View para exibir modal de gerenciamento de pagamentos
@@ -666,7 +694,7 @@ def gerenciar_pagamentos_modal(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def adicionar_pagamento(request, venda_id):
     """
@@ -722,7 +750,7 @@ def adicionar_pagamento(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_http_methods(["DELETE"])
 def cancelar_pagamento(request, pagamento_id):
     """
@@ -755,7 +783,7 @@ def cancelar_pagamento(request, pagamento_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def confirmar_pagamento(request, pagamento_id):
     """
@@ -789,7 +817,7 @@ def confirmar_pagamento(request, pagamento_id):
 
 # Views para gerenciar cliente/comprador
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def selecionar_cliente_modal(request, venda_id):
     """
     View para exibir modal de seleção de cliente
@@ -804,7 +832,7 @@ def selecionar_cliente_modal(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def definir_cliente(request, venda_id):
     """
@@ -842,7 +870,7 @@ def definir_cliente(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def buscar_clientes_autocomplete(request):
     """
     View para autocomplete de clientes
@@ -852,24 +880,20 @@ def buscar_clientes_autocomplete(request):
     if len(query) < 2:
         return HttpResponse('')
     
-    clientes = Pessoa.objects.filter(
-        Q(nome__icontains=query) |
-        Q(cpf__icontains=query) |
-        Q(email__icontains=query)
-    )[:10]
+    clientes = pessoa_busca.buscar(query, limite=10)
     
     html = '<div class="list-group position-absolute w-100 shadow" style="z-index: 1000; max-height: 300px; overflow-y: auto;">'
     for cliente in clientes:
         html += f'''
         <button type="button" class="list-group-item list-group-item-action"
-                onclick="selecionarCliente({cliente.id}, '{cliente.nome}', '{cliente.cpf or ""}', '{cliente.email or ""}')">
+                onclick="selecionarCliente({cliente.id}, '{cliente.nome}', '{cliente.doc or ""}', '{cliente.email1 or ""}')">
             <div class="d-flex justify-content-between align-items-center">
                 <div>
                     <strong>{cliente.nome}</strong>
                     <br>
                     <small class="text-muted">
-                        {f"CPF: {cliente.cpf}" if cliente.cpf else ""}
-                        {f" | {cliente.email}" if cliente.email else ""}
+                        {f"{cliente.tipo_doc}: {cliente.doc}" if cliente.doc else ""}
+                        {f" | {cliente.email1}" if cliente.email1 else ""}
                     </small>
                 </div>
                 <i class="fas fa-chevron-right text-muted"></i>
@@ -883,7 +907,7 @@ def buscar_clientes_autocomplete(request):
 
 # Views auxiliares HTMX
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def buscar_pessoas_autocomplete(request):
     """
     View para autocomplete de pessoas
@@ -893,15 +917,11 @@ def buscar_pessoas_autocomplete(request):
     if len(query) < 2:
         return HttpResponse('')
     
-    pessoas = Pessoa.objects.filter(
-        Q(nome__icontains=query) |
-        Q(cpf__icontains=query) |
-        Q(passaporte__icontains=query)
-    )[:10]
+    pessoas = pessoa_busca.buscar(query, limite=10)
     
     html = '<div class="list-group position-absolute w-100 shadow" style="z-index: 1000; max-height: 300px; overflow-y: auto;">'
     for pessoa in pessoas:
-        doc = pessoa.cpf or pessoa.passaporte or 'Sem documento'
+        doc = pessoa.doc or pessoa.passaporte_numero or 'Sem documento'
         html += f'''
         <button type="button" class="list-group-item list-group-item-action"
                 onclick="selecionarPessoa({pessoa.id}, '{pessoa.nome}')">
@@ -917,7 +937,7 @@ def buscar_pessoas_autocomplete(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def listar_passageiros(request, venda_id):
     """
     View para listar passageiros da venda via HTMX
@@ -932,7 +952,7 @@ def listar_passageiros(request, venda_id):
 
 
 @login_required  
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def buscar_por_documento(request):
     """
@@ -943,15 +963,9 @@ def buscar_por_documento(request):
     if not documento:
         return HttpResponse('')
     
-    # Limpar documento removendo formatação
-    doc_limpo = ''.join(filter(str.isalnum, documento))
-    
     try:
         # Buscar pessoa por documento ou passaporte
-        pessoa = Pessoa.objects.filter(
-            Q(doc=doc_limpo) | 
-            Q(passaporte_numero=doc_limpo)
-        ).first()
+        pessoa = pessoa_busca.por_documento(documento)
         
         # Obter lista de países para o formulário
         paises = Pais.objects.all().order_by('nome')
@@ -981,7 +995,7 @@ def buscar_por_documento(request):
 
 
 @login_required  
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def buscar_por_documento_passageiro(request):
     """
@@ -992,15 +1006,9 @@ def buscar_por_documento_passageiro(request):
     if not documento:
         return HttpResponse('')
     
-    # Limpar documento removendo formatação
-    doc_limpo = ''.join(filter(str.isalnum, documento))
-    
     try:
         # Buscar pessoa por documento ou passaporte
-        pessoa = Pessoa.objects.filter(
-            Q(doc=doc_limpo) | 
-            Q(passaporte_numero=doc_limpo)
-        ).first()
+        pessoa = pessoa_busca.por_documento(documento)
         
         # Obter lista de países para o formulário
         paises = Pais.objects.all().order_by('nome')
@@ -1032,7 +1040,7 @@ def buscar_por_documento_passageiro(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def upload_passaporte_modal(request, pessoa_id):
     """
     View para exibir modal de upload de passaporte
@@ -1047,7 +1055,7 @@ def upload_passaporte_modal(request, pessoa_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def upload_passaporte(request, pessoa_id):
     """
@@ -1092,7 +1100,7 @@ def upload_passaporte(request, pessoa_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def cadastrar_comprador(request, venda_id):
     """
@@ -1112,10 +1120,7 @@ def cadastrar_comprador(request, venda_id):
         doc_limpo = ''.join(filter(str.isalnum, documento))
         
         # Verificar se já existe
-        pessoa = Pessoa.objects.filter(
-            Q(doc=doc_limpo) | 
-            Q(passaporte_numero=doc_limpo)
-        ).first()
+        pessoa = pessoa_busca.por_documento(documento)
         
         if pessoa:
             # Atualizar pessoa existente
@@ -1168,7 +1173,7 @@ def cadastrar_comprador(request, venda_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_http_methods(["DELETE"])
 def remover_venda(request, venda_id):
     """
@@ -3,40 +3,37 @@ import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q, Count
 from django.db import transaction
 from django.http import JsonResponse, HttpResponseForbidden
+from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.utils import timezone
+from datetime import timedelta
 from django.conf import settings
 from core.models import (
     WhatsAppAccount, WhatsAppTemplate, WhatsAppConversation, 
     WhatsAppMessage, WhatsAppContact
 )
 from core.forms.whatsapp import NovoContatoForm, SendDocumentForm
+from core.services import (
+    pessoa_telefones, whatsapp_analytics, whatsapp_assignment, whatsapp_counters, whatsapp_export, whatsapp_search,
+)
+from core.services.auth_profile import user_in_group, user_has_perm
+from core.managers.whatsapp_manager import decode_cursor
 
 logger = logging.getLogger(__name__)
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists() and u.has_perm('core.controle_whatsapp'))
+@user_passes_test(lambda u: user_in_group(u, 'Comercial') and user_has_perm(u, 'core.controle_whatsapp'))
 def whatsapp_geral(request):
     """
     Página WhatsApp Geral - visualiza todas as conversas de todos os atendentes
     """
     # Busca todas as conversas ordenadas por data de última atividade
-    from django.db.models import Subquery, OuterRef
-    
-    # Subquery para buscar a última mensagem de cada conversa
-    latest_message = WhatsAppMessage.objects.filter(
-        conversation=OuterRef('pk')
-    ).order_by('-timestamp').values('content')[:1]
-    
+    # (total e última mensagem vêm dos campos de resumo da conversa)
     conversas = WhatsAppConversation.objects.select_related(
         'account', 'assigned_to', 'assigned_to__pessoa', 'contact'
-    ).annotate(
-        message_count=Count('messages'),
-        last_message_content=Subquery(latest_message)
     ).order_by('-atualizado_em')
     
     # Filtros opcionais
@@ -54,22 +51,26 @@ def whatsapp_geral(request):
             conversas = conversas.filter(assigned_to__id=atendente_filter)
     
     if search:
-        conversas = conversas.filter(
-            Q(contact__name__icontains=search) |
-            Q(contact__profile_name__icontains=search) |
-            Q(contact__phone_number__icontains=search) |
-            Q(last_message_content__icontains=search)
+        # Busca por relevância, com os trechos das mensagens encontradas
+        conversas = whatsapp_search.attach_matches(
+            whatsapp_search.search_conversations(conversas, search), search
         )
     
-    # Estatísticas
+    # Estatísticas (contadores por status mantidos em cache)
+    status_counts = whatsapp_counters.get_status_counts()
     stats = {
-        'total': WhatsAppConversation.objects.count(),
-        'pending': WhatsAppConversation.objects.filter(status='pending').count(),
-        'assigned': WhatsAppConversation.objects.filter(status='assigned').count(),
-        'in_progress': WhatsAppConversation.objects.filter(status='in_progress').count(),
-        'resolved': WhatsAppConversation.objects.filter(status='resolved').count(),
+        'total': sum(status_counts.values()),
+        'pending': status_counts['pending'],
+        'assigned': status_counts['assigned'],
+        'in_progress': status_counts['in_progress'],
+        'resolved': status_counts['resolved'],
     }
     
+    # Tempos de atendimento do período (agregados diários por atendente)
+    fim = timezone.localdate()
+    inicio = fim - timedelta(days=whatsapp_analytics.REPORT_DAYS - 1)
+    response_total, response_by_attendant = whatsapp_analytics.response_report(inicio, fim)
+    
     # Lista de atendentes para filtro
     from django.contrib.auth import get_user_model
     User = get_user_model()
@@ -82,6 +83,9 @@ def whatsapp_geral(request):
         'title': 'WhatsApp Geral',
         'conversas': conversas,
         'stats': stats,
+        'response_total': response_total,
+        'response_by_attendant': response_by_attendant,
+        'report_days': whatsapp_analytics.REPORT_DAYS,
         'atendentes': atendentes,
         'status_filter': status_filter,
         'atendente_filter': atendente_filter,
@@ -93,7 +97,7 @@ def whatsapp_geral(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def test_websocket(request):
     """
@@ -121,7 +125,7 @@ def test_websocket(request):
         }
         
         # Conta atual de conversas pendentes
-        pending_count = WhatsAppConversation.objects.filter(status='pending').count()
+        pending_count = whatsapp_counters.get_pending_count()
         
         # Envia via WebSocket
         async_to_sync(channel_layer.group_send)(
@@ -151,26 +155,17 @@ def test_websocket(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def dashboard(request):
     """
     Dashboard do WhatsApp comercial - Layout de chat completo
     """
-    # Conversas serão carregadas via HTMX (my_conversations view)
-    
-    # Conversas pendentes (para o modal)
-    pending_conversations = WhatsAppConversation.objects.filter(
-        status='pending'
-    ).select_related(
-        'contact', 'account'
-    ).annotate(
-        messages_count=Count('messages')
-    ).order_by('-last_activity')
+    # Conversas serão carregadas via HTMX (my_conversations e pending_conversations)
     
     # Conversa selecionada (APENAS se especificada na URL - não abre automaticamente)
     selected_conversation_id = request.GET.get('conversation')
     selected_conversation = None
-    messages = []
+    messages_page = None
     
     if selected_conversation_id:
         try:
@@ -181,10 +176,10 @@ def dashboard(request):
                 assigned_to=request.user,
                 status__in=['assigned', 'in_progress']
             )
-            # Mensagens da conversa selecionada
-            messages = selected_conversation.messages.select_related(
-                'contact'
-            ).order_by('timestamp')
+            # Página mais recente de mensagens da conversa selecionada
+            messages_page = selected_conversation.messages.including_archived(
+                selected_conversation
+            ).select_related('contact').latest_page()
         except WhatsAppConversation.DoesNotExist:
             pass
     
@@ -192,9 +187,13 @@ def dashboard(request):
     
     context = {
         'title': 'WhatsApp Business',
-        'pending_count': pending_conversations.count(),
+        'pending_count': whatsapp_counters.get_pending_count(),
         'selected_conversation': selected_conversation,
-        'messages': messages,
+        'messages': messages_page.messages if messages_page else [],
+        'messages_page': messages_page,
+        'older_messages_url': reverse(
+            'comercial:conversation_messages', args=[selected_conversation.id]
+        ) if selected_conversation else None,
         'hide_messages': True,  # Oculta as mensagens do Django na página de chat
         'hide_padding': True,   # Remove padding para layout fullscreen
         # Breadcrumb
@@ -207,25 +206,18 @@ def dashboard(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def conversations_table(request):
     """
     Retorna apenas a tabela de conversas para atualização via HTMX
     """
     # Conversas aguardando atendimento (pendentes)
+    # Mesma ordem da fila de atribuição (prioridade, depois a mais antiga)
     pending_conversations = WhatsAppConversation.objects.filter(
         status='pending'
     ).select_related(
         'contact', 'account'
-    ).prefetch_related(
-        'messages'
-    ).annotate(
-        messages_count=Count('messages'),
-        unread_count=Count('messages', filter=Q(
-            messages__direction='inbound',
-            messages__status__in=['sent', 'delivered']
-        ))
-    ).order_by('-last_activity')
+    ).order_by(*whatsapp_assignment.queue_ordering())
     
     context = {
         'pending_conversations': pending_conversations,
@@ -235,7 +227,7 @@ def conversations_table(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def my_conversations(request):
     """
     Retorna lista de conversas do usuário (para atualização HTMX)
@@ -247,25 +239,9 @@ def my_conversations(request):
         status__in=['assigned', 'in_progress']
     ).select_related(
         'contact', 'account'
-    ).prefetch_related(
-        'messages'
     )
     
-    # Aplica filtro de busca se fornecido
-    if search:
-        my_conversations_qs = my_conversations_qs.filter(
-            Q(contact__name__icontains=search) |
-            Q(contact__profile_name__icontains=search) |
-            Q(contact__phone_number__icontains=search)
-        )
-    
-    my_conversations = my_conversations_qs.annotate(
-        messages_count=Count('messages'),
-        unread_count=Count('messages', filter=Q(
-            messages__direction='inbound',
-            messages__status__in=['sent', 'delivered']
-        ))
-    ).order_by('-last_activity')
+    my_conversations = my_conversations_qs.order_by('-last_activity')
     
     selected_conversation_id = request.GET.get('conversation')
     selected_conversation = None
@@ -275,6 +251,12 @@ def my_conversations(request):
         except:
             pass
     
+    # Aplica busca (por relevância) se fornecida
+    if search:
+        my_conversations = whatsapp_search.attach_matches(
+            whatsapp_search.search_conversations(my_conversations, search), search
+        )
+    
     context = {
         'my_conversations': my_conversations,
         'selected_conversation': selected_conversation,
@@ -284,7 +266,7 @@ def my_conversations(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def pending_conversations(request):
     """
     Retorna conversas pendentes para o modal
@@ -293,10 +275,6 @@ def pending_conversations(request):
         status='pending'
     ).select_related(
         'contact', 'account'
-    ).prefetch_related(
-        'messages'
-    ).annotate(
-        messages_count=Count('messages')
     ).order_by('-last_activity')
     
     return render(request, 'comercial/whatsapp/partials/pending_conversations.html', {
@@ -305,10 +283,14 @@ def pending_conversations(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def conversation_messages(request, conversation_id):
     """
     Retorna mensagens de uma conversa (para atualização HTMX)
+    
+    Sem parâmetros retorna a página mais recente. Com ?before=<cursor> retorna
+    as mensagens anteriores (botão "Carregar mensagens anteriores") e com
+    ?after=<cursor> apenas as mensagens novas, para anexar ao final do chat.
     """
     conversation = get_object_or_404(
         WhatsAppConversation,
@@ -316,19 +298,67 @@ def conversation_messages(request, conversation_id):
         assigned_to=request.user
     )
     
-    messages = conversation.messages.select_related(
-        'contact'
-    ).order_by('timestamp')
+    messages_qs = conversation.messages.including_archived(conversation).select_related('contact')
+    message_template = 'comercial/whatsapp/partials/chat_message.html'
+    if not request.headers.get('HX-Request'):
+        message_template = 'comercial/whatsapp/partials/message_item.html'
+    
+    response = _render_messages_chunk(
+        request, messages_qs, message_template,
+        reverse('comercial:conversation_messages', args=[conversation.id])
+    )
+    if response:
+        return response
+    
+    messages_page = messages_qs.latest_page()
     
     # Usa template sem script se for requisição HTMX
     template_name = 'comercial/whatsapp/partials/messages_clean.html' if request.headers.get('HX-Request') else 'comercial/whatsapp/partials/messages.html'
     return render(request, template_name, {
-        'messages': messages
+        'messages': messages_page.messages,
+        'messages_page': messages_page,
+        'older_messages_url': reverse('comercial:conversation_messages', args=[conversation.id]),
+    })
+
+
+def _render_messages_chunk(request, messages_qs, message_template, older_messages_url):
+    """
+    Trata os parâmetros de cursor (?before / ?after) das views de mensagens
+    
+    Retorna None quando não há cursor válido (a view renderiza a página mais recente).
+    """
+    before = decode_cursor(request.GET.get('before'))
+    after = decode_cursor(request.GET.get('after'))
+    if not before and not after:
+        return None
+    
+    if before:
+        messages_page = messages_qs.latest_page(before=before)
+    else:
+        messages_page = messages_qs.newer_than(after)
+        if messages_page.has_newer:
+            # Muitas mensagens novas: substitui o conteúdo pela página mais recente
+            messages_page = messages_qs.latest_page()
+            response = render(request, 'comercial/whatsapp/partials/messages_chunk.html', {
+                'messages': messages_page.messages,
+                'messages_page': messages_page,
+                'message_template': message_template,
+                'older_messages_url': older_messages_url,
+            })
+            response['HX-Reswap'] = 'innerHTML'
+            return response
+    
+    return render(request, 'comercial/whatsapp/partials/messages_chunk.html', {
+        'messages': messages_page.messages,
+        'messages_page': messages_page,
+        'message_template': message_template,
+        'older_messages_url': older_messages_url,
+        'before': bool(before),
     })
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def conversation_chat_area(request, conversation_id):
     """
     Retorna área de chat completa para uma conversa (para substituir apenas a área de chat)
@@ -340,20 +370,50 @@ def conversation_chat_area(request, conversation_id):
         status__in=['assigned', 'in_progress']
     )
     
-    messages = conversation.messages.select_related(
+    messages_page = conversation.messages.including_archived(conversation).select_related(
         'contact'
-    ).order_by('timestamp')
+    ).latest_page()
     
     context = {
         'selected_conversation': conversation,
-        'messages': messages,
+        'messages': messages_page.messages,
+        'messages_page': messages_page,
+        'older_messages_url': reverse('comercial:conversation_messages', args=[conversation.id]),
     }
     
     return render(request, 'comercial/whatsapp/partials/chat_area.html', context)
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
+def conversation_export(request, conversation_id):
+    """
+    Exporta o histórico completo de uma conversa (CSV ou JSONL, em streaming)
+    
+    Disponível para o atendente da conversa e para quem controla o WhatsApp.
+    """
+    conversation = get_object_or_404(
+        WhatsAppConversation.objects.select_related('contact'), id=conversation_id
+    )
+    if conversation.assigned_to_id != request.user.id and not user_has_perm(
+        request.user, 'core.controle_whatsapp'
+    ):
+        return HttpResponseForbidden('Sem permissão para exportar esta conversa')
+    
+    export_format = request.GET.get('formato', 'csv')
+    if export_format not in whatsapp_export.FORMATS:
+        export_format = 'csv'
+    
+    return whatsapp_export.export_response(
+        request,
+        whatsapp_export.iter_messages(conversation=conversation),
+        export_format,
+        whatsapp_export.export_filename('conversa', conversation.id, conversation.contact.phone_number),
+    )
+
+
+@login_required
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def conversation_messages_readonly(request, conversation_id):
     """
     Retorna mensagens de qualquer conversa (para visualização read-only no WhatsApp Geral)
@@ -365,28 +425,40 @@ def conversation_messages_readonly(request, conversation_id):
         id=conversation_id
     )
     
-    messages = conversation.messages.select_related(
+    messages_qs = conversation.messages.including_archived(conversation).select_related(
         'contact', 'sent_by', 'sent_by__pessoa'
-    ).order_by('timestamp')
+    )
+    older_messages_url = reverse('comercial:conversation_messages_readonly', args=[conversation.id])
+    
+    response = _render_messages_chunk(
+        request, messages_qs, 'comercial/whatsapp/partials/message_readonly.html', older_messages_url
+    )
+    if response:
+        return response
+    
+    messages_page = messages_qs.latest_page()
     
     return render(request, 'comercial/whatsapp/partials/messages_readonly.html', {
-        'messages': messages,
+        'messages': messages_page.messages,
+        'messages_page': messages_page,
+        'older_messages_url': older_messages_url,
+        'total_messages': conversation.message_count,
         'conversation': conversation
     })
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def pending_count(request):
     """
     Retorna contador de conversas pendentes (JSON)
     """
-    count = WhatsAppConversation.objects.filter(status='pending').count()
+    count = whatsapp_counters.get_pending_count()
     return JsonResponse({'count': count})
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def check_24h_window(request):
     """
@@ -412,14 +484,10 @@ def check_24h_window(request):
         }
         
         if not within_window:
-            # Busca última mensagem recebida para mostrar no toast
-            last_inbound = conversation.messages.filter(
-                direction='inbound'
-            ).order_by('-timestamp').first()
-            
-            if last_inbound:
+            # Última mensagem recebida para mostrar no toast
+            if conversation.last_inbound_at:
                 from django.utils import timezone
-                time_diff = timezone.now() - last_inbound.timestamp
+                time_diff = timezone.now() - conversation.last_inbound_at
                 hours_passed = int(time_diff.total_seconds() / 3600)
                 response_data['hours_since_last_message'] = hours_passed
             
@@ -430,7 +498,7 @@ def check_24h_window(request):
         return JsonResponse({'error': 'Erro interno do servidor'}, status=500)
 
 
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def send_message(request):
     """
@@ -533,7 +601,7 @@ def send_message(request):
 
 
 # @login_required
-# @user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+# @user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 # @require_POST
 # def finish_conversation(request, conversation_id):
 #     """
@@ -553,7 +621,7 @@ def send_message(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def resend_message(request, message_id):
     """
@@ -569,14 +637,13 @@ def resend_message(request, message_id):
             status__in=['failed', 'sending']
         )
     except WhatsAppMessage.DoesNotExist:
-        # Se não encontrar, retorna as mensagens sem fazer nada
-        conversation = WhatsAppConversation.objects.filter(
-            messages__id=message_id
+        # Se não encontrar, retorna a mensagem como está sem fazer nada
+        message = WhatsAppMessage.objects.select_related('contact').filter(
+            id=message_id
         ).first()
-        if conversation:
-            messages = conversation.messages.select_related('contact').order_by('timestamp')
-            return render(request, 'comercial/whatsapp/partials/messages.html', {
-                'messages': messages
+        if message:
+            return render(request, 'comercial/whatsapp/partials/chat_message.html', {
+                'message': message
             })
         return JsonResponse({'success': False, 'error': 'Mensagem não encontrada'})
     
@@ -625,61 +692,55 @@ def resend_message(request, message_id):
         
         logger.error(f"Erro ao reenviar mensagem: {api_error}")
     
-    # Retorna as mensagens atualizadas via HTMX
-    messages = conversation.messages.select_related('contact').order_by('timestamp')
-    return render(request, 'comercial/whatsapp/partials/messages.html', {
-        'messages': messages
+    # Retorna apenas a mensagem reenviada (substitui a bolha via HTMX)
+    return render(request, 'comercial/whatsapp/partials/chat_message.html', {
+        'message': message
     })
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def assign_conversation(request, conversation_id):
     """
     Atribui uma conversa ao usuário logado
     """
-    conversation = get_object_or_404(WhatsAppConversation, id=conversation_id)
+    get_object_or_404(WhatsAppConversation, id=conversation_id)
     
-    if conversation.status != 'pending':
+    # Trava a conversa (SKIP LOCKED): dois atendentes nunca pegam a mesma conversa
+    # - a notificação via WebSocket é enviada após o commit
+    if not whatsapp_assignment.claim_conversation(conversation_id, request.user):
         return JsonResponse({'success': False, 'message': 'Esta conversa já foi atribuída ou não está disponível.'})
     
-    # Atribui a conversa ao usuário
-    conversation.assign_to_user(request.user)
-    conversation.start_attendance()
-    
-    # Notifica via WebSocket sobre atribuição
-    from channels.layers import get_channel_layer
-    from asgiref.sync import async_to_sync
-    
-    channel_layer = get_channel_layer()
-    if channel_layer:
-        conversation_data = {
-            'id': conversation.id,
-            'contact_name': conversation.contact.display_name,
-            'assigned_to': request.user.username,
-            'status': conversation.status,
-        }
-        
-        async_to_sync(channel_layer.group_send)(
-            'whatsapp_comercial',
-            {
-                'type': 'conversation_assigned',
-                'conversation': conversation_data
-            }
-        )
-    
     return JsonResponse({'success': True, 'message': f'Conversa atribuída com sucesso!'})
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
+@require_POST
+def assign_next_conversation(request):
+    """
+    Atribui ao usuário logado a próxima conversa da fila (prioridade, depois a mais antiga)
+    """
+    conversation = whatsapp_assignment.claim_next(request.user)
+    if not conversation:
+        return JsonResponse({'success': False, 'message': 'Nenhuma conversa aguardando atendimento.'})
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Conversa atribuída com sucesso!',
+        'conversation_id': conversation.id,
+    })
+
+
+@login_required
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def register_client(request):
     """
     Cadastra um cliente a partir do contato WhatsApp
     """
     try:
-        from core.models import Pessoa, WhatsAppContact, Telefone, Email
+        from core.models import Pais, Pessoa, WhatsAppContact
         
         # Dados do formulário
         whatsapp_contact_id = request.POST.get('whatsapp_contact_id')
@@ -740,26 +801,13 @@ def register_client(request):
             bairro=bairro or None,
             cidade=cidade or None,
             estado=estado or None,
-            pais=pais or None,
+            pais=Pais.objects.filter(nome__iexact=pais).first() if pais else None,
             cep=cep or None,
-        )
-        
-        # Cria o telefone principal
-        Telefone.objects.create(
-            pessoa=pessoa,
-            ddi=ddi,
-            ddd=ddd,
-            telefone=telefone,
-            tipo='whatsapp',  # Marca como WhatsApp já que veio do WhatsApp
-            principal=True
-        )
-        
-        # Cria o email principal
-        Email.objects.create(
-            pessoa=pessoa,
-            email=email,
-            tipo='pessoal',
-            principal=True
+            # Telefone e email principais (o telefone entra no índice E.164)
+            ddi1=ddi,
+            ddd1=ddd,
+            telefone1=telefone,
+            email1=email,
         )
         
         # Vincula o contato WhatsApp à pessoa criada
@@ -783,7 +831,7 @@ def register_client(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 # def conversation_detail(request, conversation_id):
 #     """
 #     REMOVIDO - usar dashboard com ?conversation=ID
@@ -792,7 +840,7 @@ def register_client(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def mobile_conversation(request, conversation_id):
     """
     Retorna template do offcanvas mobile para uma conversa específica
@@ -814,7 +862,7 @@ def mobile_conversation(request, conversation_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def media_modal(request):
     """
     Modal HTMX para visualizar mídia
@@ -833,7 +881,7 @@ def media_modal(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def send_message_form(request):
     """
@@ -883,7 +931,7 @@ def send_message_form(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def mobile_conversation_content(request, conversation_id):
     """
     Retorna apenas o conteúdo da conversa mobile (sem header do offcanvas)
@@ -905,7 +953,7 @@ def mobile_conversation_content(request, conversation_id):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def save_data_retorno(request):
     """
@@ -939,7 +987,7 @@ def save_data_retorno(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def load_templates(request):
     """
     Carrega templates ativos para o select
@@ -955,7 +1003,7 @@ def load_templates(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def preview_template(request):
     """
     Retorna preview do template com campos para parâmetros
@@ -986,7 +1034,7 @@ def preview_template(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def template_preview(request):
     """
     Retorna preview do template e campos de parâmetros via HTMX
@@ -1024,7 +1072,7 @@ def template_preview(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def novo_contato(request):
     """
     Cria novo contato e inicia conversa WhatsApp
@@ -1104,6 +1152,8 @@ def novo_contato(request):
                         'account': account,
                     }
                 )
+                if created:
+                    pessoa_telefones.vincular_contato(contact)
                 
                 if not created and not contact.name:
                     contact.name = nome
@@ -1225,7 +1275,7 @@ def novo_contato(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def send_template(request):
     """
@@ -1394,7 +1444,7 @@ def send_template(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 @require_POST
 def send_document_new(request):
     """
@@ -1652,7 +1702,7 @@ def _send_pdf_whatsapp(conversation, document, signed_url, caption, request_user
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Comercial').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Comercial'))
 def debug_failed_messages(request):
     """
     View para monitorar mensagens PDF que falharam em produção
@@ -1,12 +1,13 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import user_passes_test
+from core.services.auth_profile import user_in_group
 
 
 def is_operacional_user(user):
     """
     Verifica se o usuário pertence ao grupo Operacional
     """
-    return user.is_authenticated and user.groups.filter(name='Operacional').exists()
+    return user_in_group(user, 'Operacional')
 
 
 @user_passes_test(is_operacional_user, login_url='/login/')
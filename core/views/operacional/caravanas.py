@@ -8,11 +8,12 @@ from django.http import HttpResponse
 from core.models import Caravana
 from core.forms.caravana import CaravanaForm
 from core.choices import TIPO_CARAVANA_CHOICES
+from core.services.auth_profile import user_in_group
 
 
 def is_operacional(user):
     """Verifica se o usuário pertence ao grupo Operacional"""
-    return user.groups.filter(name='Operacional').exists()
+    return user_in_group(user, 'Operacional')
 
 
 @login_required
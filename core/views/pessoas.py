@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from core.models import Pessoa, Fornecedor
 from core.decorators import group_area_required
+from core.services import pessoa_busca
 
 
 @login_required
@@ -30,15 +31,8 @@ def buscar_pessoas(request, area):
     if not all_pessoas:
         pessoas_query = pessoas_query.filter(usuario__isnull=True)
 
-    pessoas = (
-        pessoas_query.filter(
-            Q(nome__icontains=query)
-            | Q(doc__icontains=query)
-            | Q(email1__icontains=query)
-            | Q(email2__icontains=query)
-            | Q(email3__icontains=query)
-        )
-        .order_by("nome")[:20]
+    pessoas = pessoa_busca.buscar(
+        query, pessoas_query, escopo="todas" if all_pessoas else "sem_usuario"
     )  # Limita a 20 resultados
 
     context = {"pessoas": pessoas, "query": query}
@@ -66,16 +60,10 @@ def buscar_pessoas_para_edicao(request, area):
     if usuario_id:
         filter_condition |= Q(usuario__id=usuario_id)
 
-    pessoas = (
-        Pessoa.objects.filter(filter_condition)
-        .filter(
-            Q(nome__icontains=query)
-            | Q(doc__icontains=query)
-            | Q(email1__icontains=query)
-            | Q(email2__icontains=query)
-            | Q(email3__icontains=query)
-        )
-        .order_by("nome")[:20]
+    pessoas = pessoa_busca.buscar(
+        query,
+        Pessoa.objects.filter(filter_condition),
+        escopo=f"edicao:{usuario_id or ''}",
     )
 
     context = {"pessoas": pessoas, "query": query}
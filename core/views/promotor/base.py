@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required, user_passes_test
+from core.services.auth_profile import user_in_group
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Promotor').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Promotor'))
 def home_view(request):
     """
     View principal da área promotor
@@ -7,10 +7,11 @@ from django.db import transaction
 from django.http import HttpResponse
 from core.models import Caravana, Pessoa, Bloqueio, Pais, Aeroporto
 from core.forms.caravana_promotor import CaravanaPromotorForm
+from core.services.auth_profile import user_in_group
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='Promotor').exists())
+@user_passes_test(lambda u: user_in_group(u, 'Promotor'))
 def cadastrar_caravana_view(request):
     """
     View principal para cadastrar caravana com HTMX multistep